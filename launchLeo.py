@@ -4,5 +4,7 @@
 A minimal script to launch leo.
 """
 
-import leo.core.runLeo
-leo.core.runLeo.run()
+# Processes created by multiprocessing import this file again.
+if __name__ == '__main__':
+    import leo.core.runLeo
+    leo.core.runLeo.run()
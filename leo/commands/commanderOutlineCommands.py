@@ -303,11 +303,11 @@ def pasteAsTemplate(self, event=None):
         # paste as a first child of current position
         vpar = p.v
         index = 0
-        parStack = p.stack + [(p.v, p._childIndex)]
+        parStack = p._getStack() + [(p.v, p._childIndex)]
     else:
         # paste after the current position
-        parStack = p.stack
-        vpar = p.stack[-1][0] if p.stack else c.hiddenRootNode
+        parStack = p._getStack()
+        vpar = p._parentVnode()
         index = p._childIndex + 1
 
     #@-<< prepare destination data >>
@@ -296,6 +296,16 @@ class EditCommandsClass(BaseEditCommandsClass):
         """Dump, all of Leo's file caches."""
         g.app.global_cacher.dump()
         g.app.commander_cacher.dump()
+
+    @cmd('show-external-files-cache')
+    def showExternalFilesCache(self, event=None):
+        """Show hits and misses of the external files and @auto caches."""
+        for name in ('external_files_cache', 'at_auto_cache'):
+            cache = getattr(g.app.commander_cacher, name, None)
+            if cache:
+                g.es_print(cache.stats())
+            else:
+                g.es_print(f"no {name.replace('_', ' ')}")
     #@+node:ekr.20150514063305.118: *3* ec.doNothing
     @cmd('do-nothing')
     def doNothing(self, event):
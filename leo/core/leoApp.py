@@ -1340,6 +1340,8 @@ class LeoApp:
             if veto: return False
         g.app.setLog(None)  # no log until we reactive a window.
         g.doHook("close-frame", c=c)
+        if c.findCommands.symbol_index:
+            c.findCommands.symbol_index.save()
         #
         # Save the window state for *all* open files.
         g.app.commander_cacher.commit()
@@ -1545,6 +1547,8 @@ class LeoApp:
 
                 scanner_for_at_auto_cb.scanner_name = aClass.__name__
                     # For traces in ic.createOutline.
+                scanner_for_at_auto_cb.scanner_class = aClass
+                    # For ic.get_import_signature.
                 return scanner_for_at_auto_cb
         return None
     #@+node:ekr.20140130172810.15471: *4* app.scanner_for_ext
@@ -1565,6 +1569,8 @@ class LeoApp:
 
             scanner_for_ext_cb.scanner_name = aClass.__name__
                 # For traces in ic.createOutline.
+            scanner_for_ext_cb.scanner_class = aClass
+                # For ic.get_import_signature.
             return scanner_for_ext_cb
         return None
     #@+node:ekr.20170429152049.1: *3* app.listenToLog
@@ -19,6 +19,7 @@ the parse tree. For more details, see the "Overview" section below.
 usage:
     leoAst.py --help
     leoAst.py [--fstringify | --fstringify-diff | --orange | --orange-diff] PATHS
+        [--jobs N] [--no-cache] [--recursive]
     leoAst.py --py-cov [ARGS]
     leoAst.py --pytest [ARGS]
     leoAst.py --unittest [ARGS]
@@ -40,6 +41,13 @@ optional arguments:
   --py-cov           run pytest --cov on leoAst.py
   --pytest           run pytest on leoAst.py
   --unittest         run unittest on leoAst.py
+  --jobs N           number of processes (default: one per cpu)
+  --no-cache         process files that were already clean
+  --recursive        include subdirectories of PATHS
+
+The --fstringify and --orange commands (and their --diff variants) process
+files in a pool of processes. A cache (~/.leo/leoAst-cache.json) remembers
+the files that are already clean, so later runs skip them.
 
     
 **Overview**
@@ -102,10 +110,13 @@ with parent/child links even more quickly.
 
 Memory: The TOG class makes no significant demands on python's
 resources. Generators add nothing to python's call stack.
-TOG.node_stack is the only variable-length data. This stack resides in
-python's heap, so its length is unimportant. In the worst case, it
-might contain a few thousand entries. The TOT class uses no
-variable-length data at all.
+TOG.node_stack and TOG.statement_stack are the only variable-length
+data. These stacks reside in python's heap, so their length is
+unimportant. In the worst case, they might contain a few thousand
+entries. The TOT class uses no variable-length data at all.
+
+Tokens are slotted and share the list of the file's lines, so the
+token list needs little more memory than the file's text.
 
 **Links**
 
@@ -328,50 +339,40 @@ class LeoGlobals:  # pragma: no cover
         return s2 + '\n' if s.endswith('\n') else s2
     #@-others
 #@+node:ekr.20200702114522.1: **  leoAst.py: top-level commands
+#@+node:ekr.20261018215411.9: *3* command: batch_command
+def batch_command(kind, files, processes=None, use_cache=True):  # pragma: no cover
+    """
+    Run the BatchBeautifier class on the given files and print a summary.
+
+    kind: one of BatchBeautifier.kinds.
+    """
+    batch = BatchBeautifier(kind, processes=processes, use_cache=use_cache)
+    batch.run(files)
+    print(batch.summary())
 #@+node:ekr.20200702114557.1: *3* command: fstringify_command
-def fstringify_command(files):
+def fstringify_command(files, processes=None, use_cache=True):
     """
     Entry point for --fstringify.
     
     Fstringify the given file, overwriting the file.
     """
-    for filename in files:  # pragma: no cover
-        if os.path.exists(filename):
-            print(f"fstringify {filename}") 
-            Fstringify().fstringify_file_silent(filename)
-        else:
-            print(f"file not found: {filename}")
+    batch_command('fstringify', files, processes, use_cache)  # pragma: no cover
 #@+node:ekr.20200702121222.1: *3* command: fstringify_diff_command
-def fstringify_diff_command(files):
+def fstringify_diff_command(files, processes=None, use_cache=True):
     """
     Entry point for --fstringify-diff.
     
     Print the diff that would be produced by fstringify.
     """
-    for filename in files:  # pragma: no cover
-        if os.path.exists(filename):
-            print(f"fstringify-diff {filename}")
-            Fstringify().fstringify_file_diff(filename)
-        else:
-            print(f"file not found: {filename}")
+    batch_command('fstringify-diff', files, processes, use_cache)  # pragma: no cover
 #@+node:ekr.20200702115002.1: *3* command: orange_command
-def orange_command(files):
+def orange_command(files, processes=None, use_cache=True):
 
-    for filename in files:  # pragma: no cover
-        if os.path.exists(filename):
-            print(f"orange {filename}")
-            Orange().beautify_file(filename)
-        else:
-            print(f"file not found: {filename}")
+    batch_command('orange', files, processes, use_cache)  # pragma: no cover
 #@+node:ekr.20200702121315.1: *3* command: orange_diff_command
-def orange_diff_command(files):
+def orange_diff_command(files, processes=None, use_cache=True):
 
-    for filename in files:  # pragma: no cover
-        if os.path.exists(filename):
-            print(f"orange-diff {filename}")
-            Orange().beautify_file_diff(filename)
-        else:
-            print(f"file not found: {filename}")
+    batch_command('orange-diff', files, processes, use_cache)  # pragma: no cover
 #@+node:ekr.20160521104628.1: **  leoAst.py: top-level utils
 if 1:  # pragma: no cover
     #@+others
@@ -382,6 +383,7 @@ if 1:  # pragma: no cover
             '',
             '    leoAst.py --help',
             '    leoAst.py [--fstringify | --fstringify-diff | --orange | --orange-diff] PATHS',
+            '        [--jobs N] [--no-cache] [--recursive]',
             '    leoAst.py --py-cov [ARGS]',
             '    leoAst.py --pytest [ARGS]',
             '    leoAst.py --unittest [ARGS]',
@@ -403,19 +405,27 @@ if 1:  # pragma: no cover
         add('--py-cov', dest='pycov', metavar='ARGS', nargs='?', const=[], default=False, help='run pytest --cov')
         add('--pytest', dest='pytest', metavar='ARGS', nargs='?', const=[], default=False, help='run pytest')
         add('--unittest', dest='unittest', metavar='ARGS', nargs='?', const=[], default=False, help='run unittest')
+        add2 = parser.add_argument
+        add2('--jobs', dest='jobs', metavar='N', type=int, default=None, help='number of processes (default: one per cpu)')
+        add2('--no-cache', dest='no_cache', action='store_true', help='process files that were already clean')
+        add2('--recursive', dest='recursive', action='store_true', help='include subdirectories of PATHS')
         args = parser.parse_args()
         # g.printObj(args, tag='ARGS')
         files = args.PATHS
         if len(files) == 1 and os.path.isdir(files[0]):
-            files = glob.glob(f"{files[0]}{os.sep}*.py")
+            if args.recursive:
+                files = sorted(glob.glob(f"{files[0]}{os.sep}**{os.sep}*.py", recursive=True))
+            else:
+                files = glob.glob(f"{files[0]}{os.sep}*.py")
+        batch_args = (files, args.jobs, not args.no_cache)
         if args.f:
-            fstringify_command(files)
+            fstringify_command(*batch_args)
         if args.fd:
-            fstringify_diff_command(files)
+            fstringify_diff_command(*batch_args)
         if args.o:
-            orange_command(files)
+            orange_command(*batch_args)
         if args.od:
-            orange_diff_command(files)
+            orange_diff_command(*batch_args)
         if isinstance(args.pycov, (str, list)):
             if not pytest:
                 print('pytest not found')
@@ -634,15 +644,18 @@ if 1:  # pragma: no cover
         j = getattr(node, 'last_i', None)
         return [] if i is None else global_tokens_list[i : j + 1]
     #@+node:ekr.20191124123830.1: *4* function: is_significant & is_significant_token
+    # Making 'endmarker' significant ensures that all tokens are synced.
+    significant_kinds = frozenset(('async', 'await', 'endmarker', 'name', 'number', 'string'))
+    insignificant_ops = frozenset((',', ';', '(', ')'))
+
     def is_significant(kind, value):
         """
         Return True if (kind, value) represent a token that can be used for
         syncing generated tokens with the token list.
         """
-        # Making 'endmarker' significant ensures that all tokens are synced.
         return (
-            kind in ('async', 'await', 'endmarker', 'name', 'number', 'string') or
-            kind == 'op' and value not in ',;()')
+            kind in significant_kinds or
+            kind == 'op' and value not in insignificant_ops)
 
     def is_significant_token(token):
         """Return True if the given token is a syncronizing token"""
@@ -1116,6 +1129,240 @@ if 1:  # pragma: no cover
         token.value = value
         token.node = None  # Should be filled later.
     #@-others
+#@+node:ekr.20261018215411.1: ** class BatchBeautifier
+class BatchBeautifier:
+    """
+    Beautify (orange) or fstringify many files in a pool of processes.
+
+    A persistent cache remembers the files that are already clean, so
+    reruns skip those files without tokenizing, parsing or linking them.
+    """
+
+    kinds = ('fstringify', 'fstringify-diff', 'orange', 'orange-diff')
+    phases = ('read', 'tokenize', 'parse', 'link', 'beautify', 'write')
+
+    #@+others
+    #@+node:ekr.20261018215411.2: *3* batch.ctor
+    def __init__(self, kind, settings=None, processes=None, cache_path=None, use_cache=True):
+        """
+        Ctor for BatchBeautifier class.
+
+        kind:       One of BatchBeautifier.kinds.
+        settings:   A settings dict for the Orange class.
+        processes:  The number of processes. None: one per cpu. 1: no pool.
+        cache_path: The path to the cache, a json file.
+                    None: ~/.leo/leoAst-cache.json.
+        use_cache:  False: don't read or write the cache.
+        """
+        assert kind in self.kinds, repr(kind)
+        self.kind = kind
+        self.settings = settings or {}
+        self.processes = processes or os.cpu_count() or 1
+        self.cache_path = cache_path or os.path.join(
+            os.path.expanduser('~'), '.leo', 'leoAst-cache.json')
+        self.use_cache = use_cache
+        self.cache = {}  # Keys are file names, values are hashes of clean files.
+        self.statuses = {}  # Keys are file names, values are statuses.
+        self.times = {}  # Keys are phases, values are total times.
+        self.total_time = 0.0
+    #@+node:ekr.20261018215411.3: *3* batch.run
+    def run(self, files):
+        """
+        Beautify or fstringify all files, writing changed files or showing
+        the diffs. Return a dict whose keys are file names and whose values
+        are 'cached', 'changed', 'error', 'not found' or 'unchanged'.
+        """
+        t1 = time.perf_counter()
+        self.statuses = {}
+        self.times = {z: 0.0 for z in self.phases}
+        self.load_cache()
+        # Read all files, skipping clean files.
+        todo = []
+        t2 = time.perf_counter()
+        for filename in files:
+            if not os.path.exists(filename):
+                print(f"file not found: {filename}")
+                self.statuses[filename] = 'not found'
+                continue
+            try:
+                with open(filename, 'rb') as f:
+                    bb = f.read()
+            except Exception:
+                print(f"can not read {filename}")
+                self.statuses[filename] = 'error'
+                continue
+            key = self.hash(bb)
+            if self.cache.get(os.path.normcase(filename)) == key:
+                self.statuses[filename] = 'cached'
+            else:
+                todo.append((filename, key))
+        self.times['read'] += time.perf_counter() - t2
+        # Beautify the other files.
+        results = self.beautify_files([z[0] for z in todo])
+        for (filename, key), result in zip(todo, results):
+            status, contents, results, encoding, times = result
+            for phase in times:
+                self.times[phase] += times[phase]
+            self.statuses[filename] = status
+            if status == 'unchanged':
+                self.cache[os.path.normcase(filename)] = key
+            elif status == 'changed':
+                if self.kind.endswith('-diff'):
+                    show_diffs(contents, results, filename=filename)
+                else:
+                    t2 = time.perf_counter()
+                    print(f"Wrote {filename}")
+                    write_file(filename, results, encoding=encoding)
+                    self.times['write'] += time.perf_counter() - t2
+            else:
+                print(f"{self.kind}: error in {filename}\n{contents}")
+        self.save_cache()
+        self.total_time = time.perf_counter() - t1
+        return self.statuses
+    #@+node:ekr.20261018215411.4: *3* batch.beautify_files
+    def beautify_files(self, files):
+        """
+        Yield the results of beautify_file_in_process for all files, in order,
+        using a pool of processes if there is more than one file.
+        """
+        from leo.core.leoProcesses import can_spawn, init_process
+        n = min(len(files), self.processes)
+        i = 0
+        if n > 1 and not can_spawn():
+            print(f"{self.kind}: can not create processes: no __main__ guard")
+            n = 1
+        if n > 1:
+            import concurrent.futures
+            import multiprocessing
+            # Don't fork: Leo's main process may be running Qt.
+            context = multiprocessing.get_context('spawn')
+            try:
+                with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=n, mp_context=context,
+                    initializer=init_process,
+                ) as executor:
+                    for result in executor.map(
+                        beautify_file_in_process,
+                        [self.kind] * len(files),
+                        [self.settings] * len(files),
+                        files,
+                        chunksize=max(1, len(files) // (4 * n)),
+                    ):
+                        yield result
+                        i += 1
+            except Exception:
+                print(f"{self.kind}: process pool failed")
+                g.es_exception()
+        # Beautify the remaining files in this process.
+        for filename in files[i:]:
+            yield beautify_file_in_process(self.kind, self.settings, filename)
+    #@+node:ekr.20261018215411.5: *3* batch.hash
+    def hash(self, bb):
+        """
+        Return the hash of bb, the contents of a file, and of everything else
+        that affects the results: the kind of beautifier, the settings and
+        the version of this file.
+        """
+        import hashlib
+        try:
+            stat = os.stat(__file__)
+            version = (stat.st_mtime, stat.st_size)
+        except Exception:
+            version = None
+        kind = self.kind.replace('-diff', '')
+        signature = repr((kind, sorted(self.settings.items()), version))
+        h = hashlib.md5(bb)
+        h.update(signature.encode('utf-8'))
+        return h.hexdigest()
+    #@+node:ekr.20261018215411.6: *3* batch.load_cache & save_cache
+    def load_cache(self):
+        """Load self.cache from the json file at self.cache_path."""
+        import json
+        self.cache = {}
+        if not self.use_cache or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                d = json.load(f)
+            if isinstance(d, dict):
+                self.cache = d
+        except Exception:
+            print(f"{self.kind}: can not read {self.cache_path}")
+
+    def save_cache(self):
+        """Write self.cache to self.cache_path, forgetting deleted files."""
+        import json
+        if not self.use_cache:
+            return
+        d = {key: val for key, val in self.cache.items() if os.path.exists(key)}
+        try:
+            directory = os.path.dirname(self.cache_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            temp_path = self.cache_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(d, f)
+            os.replace(temp_path, self.cache_path)
+        except Exception:
+            print(f"{self.kind}: can not write {self.cache_path}")
+    #@+node:ekr.20261018215411.7: *3* batch.summary
+    def summary(self):
+        """Return a summary of the last run, including the time spent in each phase."""
+        counts = {}
+        for status in self.statuses.values():
+            counts[status] = counts.get(status, 0) + 1
+        n = len(self.statuses)
+        statuses = ', '.join(f"{counts[z]} {z}" for z in sorted(counts))
+        phases = ' '.join(f"{z}: {self.times.get(z, 0.0):.2f}" for z in self.phases)
+        return (
+            f"{self.kind}: {n} file{g.plural(n)} ({statuses}) "
+            f"in {self.total_time:.2f} sec.\n"
+            f"{self.kind}: phase times (summed over processes): {phases}"
+        )
+    #@-others
+#@+node:ekr.20261018215411.8: ** function: beautify_file_in_process
+def beautify_file_in_process(kind, settings, filename):
+    """
+    Beautify or fstringify one file for BatchBeautifier.beautify_files.
+
+    Return (status, contents, results, encoding, times), where status is
+    'changed', 'error' or 'unchanged' and times is a dict whose keys are
+    phases. contents and results are None unless the file changed. On
+    error, contents is the error message.
+    """
+    times = {}
+    t = time.perf_counter()
+
+    def phase(name):
+        nonlocal t
+        t2 = time.perf_counter()
+        times[name] = t2 - t
+        t = t2
+
+    try:
+        encoding, contents = read_file_with_encoding(filename)
+        phase('read')
+        if not contents:
+            return 'unchanged', None, None, encoding, times
+        tokens = make_tokens(contents)
+        phase('tokenize')
+        tree = parse_ast(contents)
+        phase('parse')
+        if not tokens or not tree:
+            return 'error', 'can not tokenize or parse', None, encoding, times
+        list(TokenOrderGenerator().create_links(tokens, tree, filename))
+        phase('link')
+        if kind.startswith('orange'):
+            results = Orange(settings=settings).beautify(contents, filename, tokens, tree)
+        else:
+            results = Fstringify().fstringify(contents, filename, tokens, tree)
+        phase('beautify')
+    except Exception as e:
+        return 'error', str(e), None, None, times
+    # Something besides newlines must change.
+    if regularize_nls(contents) == regularize_nls(results):
+        return 'unchanged', None, None, encoding, times
+    return 'changed', contents, results, encoding, times
 #@+node:ekr.20191027072910.1: ** Exception classes
 class AssignLinksError(Exception):
     """Assigning links to ast nodes failed."""
@@ -1195,6 +1442,8 @@ class TokenOrderGenerator:
         self.node = None
             # The node being visited.
             # The parent of the about-to-be visited node.
+        self.statement, self.statement_stack = None, []
+            # The nearest statement node and the stack of previous statement nodes.
         self.tokens = tokens
             # The immutable list of input tokens.
         self.tree = tree
@@ -1244,6 +1493,8 @@ class TokenOrderGenerator:
     begin_end_stack = []
     node_index = 0  # The index into the node_stack.
     node_stack = []  # The stack of parent nodes.
+    statement = None  # The nearest statement node: self.node or an ancestor.
+    statement_stack = []  # The stack of previous statement nodes.
 
     def begin_visitor(self, node):
         """Enter a visitor."""
@@ -1263,6 +1514,10 @@ class TokenOrderGenerator:
         self.begin_end_stack.append(node.__class__.__name__)
         # Push the previous node.
         self.node_stack.append(self.node)
+        # Push the previous statement. set_links uses self.statement.
+        self.statement_stack.append(self.statement)
+        if is_statement_node(node):
+            self.statement = node
         # Update self.node *last*.
         self.node = node
     #@+node:ekr.20200104032811.1: *5* tog.end_visitor
@@ -1274,6 +1529,7 @@ class TokenOrderGenerator:
         assert self.node == node, (repr(self.node), repr(node))
         # Restore self.node.
         self.node = self.node_stack.pop()
+        self.statement = self.statement_stack.pop()
     #@+node:ekr.20200110162044.1: *5* tog.find_next_significant_token
     def find_next_significant_token(self):
         """
@@ -1331,14 +1587,20 @@ class TokenOrderGenerator:
         #
         # Step one: Look for token T.
         old_px = px = self.px + 1
-        while px < len(self.tokens):
+        n = len(tokens)
+        while px < n:
             token = tokens[px]
-            if (kind, val) == (token.kind, token.value):
+            token_kind = token.kind
+            if token_kind == kind and token.value == val:
                 break  # Success.
-            if kind == token.kind == 'number':
+            if kind == token_kind == 'number':
                 val = token.value
                 break  # Benign: use the token's value, a string, instead of a number.
-            if is_significant_token(token):  # pragma: no cover
+            # Inline is_significant_token(token).
+            if (
+                token_kind in significant_kinds or
+                token_kind == 'op' and token.value not in insignificant_ops
+            ):  # pragma: no cover
                 line_s = f"line {token.line_number}:"
                 raise AssignLinksError(
                     f"       file: {self.filename}\n"
@@ -1374,17 +1636,22 @@ class TokenOrderGenerator:
     def set_links(self, node, token):
         """Make two-way links between token and the given node."""
         # Don't bother assigning comment, comma, parens, ws and endtoken tokens.
-        if token.kind == 'comment':
+        kind = token.kind
+        if kind == 'comment':
             # Append the comment to node.comment_list.
-            comment_list = getattr(node, 'comment_list', [])
-            node.comment_list = comment_list + [token]
+            comment_list = getattr(node, 'comment_list', None)
+            if comment_list is None:
+                node.comment_list = [token]
+            else:
+                comment_list.append(token)
             return
-        if token.kind in ('endmarker', 'ws'):
+        if kind in ('endmarker', 'ws'):
             return
-        if token.kind == 'op' and token.value in ',()':
+        if kind == 'op' and token.value in ',()':
             return
         # *Always* remember the last statement.
-        statement = find_statement_node(node)
+        # begin_visitor computes the statement node of self.node.
+        statement = self.statement if node is self.node else find_statement_node(node)
         if statement:
             self.last_statement_node = statement
             assert not isinstance(self.last_statement_node, ast.Module)
@@ -1398,16 +1665,20 @@ class TokenOrderGenerator:
                     f" token.node: {token.node.__class__.__name__}\n"
                     f"    callers: {g.callers()}")
         # Assign newlines to the previous statement node, if any.
-        if token.kind in ('newline', 'nl'):
+        if kind in ('newline', 'nl'):
             # Set an *auxilliary* link for the split/join logic.
             # Do *not* set token.node!
             token.statement_node = self.last_statement_node
             return
-        if is_significant_token(token):
+        if kind in significant_kinds or kind == 'op' and token.value not in insignificant_ops:
             # Link the token to the ast node.
             token.node = node
             # Add the token to node's token_list.
-            add_token_to_token_list(token, node)
+            # Like add_token_to_token_list: token indices only increase here.
+            if getattr(node, 'first_i', None) is None:
+                node.first_i = node.last_i = token.index
+            else:
+                node.last_i = token.index
     #@+node:ekr.20191124083124.1: *5* tog.sync_name and sync_op
     # It's valid for these to return None.
 
@@ -3916,6 +4187,47 @@ class Optional_TestFiles(BaseTest):  # pragma: no cover
             for node in asttokens.util.walk(tree):
                 print(f"{node.__class__.__name__:>10} {atok.get_text(node)!s}")
     #@-others
+#@+node:ekr.20261018215411.12: *3* class TestBatchBeautifier (BaseTest)
+class TestBatchBeautifier(BaseTest):
+    """Tests for the BatchBeautifier class."""
+    #@+others
+    #@+node:ekr.20261018215411.13: *4* TestBatchBeautifier.test_batch
+    def test_batch(self):
+        import tempfile
+        clean = 'a = 1\n'
+        dirty = 'a=1\nb  =  f( 2 )\n'
+        expected = 'a = 1\nb = f(2)\n'
+        with tempfile.TemporaryDirectory() as temp_dir:
+            files = []
+            for i, contents in enumerate((clean, dirty, clean, dirty)):
+                filename = os.path.join(temp_dir, f"test{i}.py")
+                with open(filename, 'w') as f:
+                    f.write(contents)
+                files.append(filename)
+            missing = os.path.join(temp_dir, 'missing.py')
+            cache_path = os.path.join(temp_dir, 'cache.json')
+            # Diff in a pool of processes: nothing is written.
+            batch = BatchBeautifier('orange-diff', processes=2, cache_path=cache_path)
+            statuses = batch.run(files + [missing])
+            assert [statuses[z] for z in files] == ['unchanged', 'changed'] * 2, statuses
+            assert statuses[missing] == 'not found', statuses
+            # Beautify in this process: clean files come from the cache.
+            batch = BatchBeautifier('orange', processes=1, cache_path=cache_path)
+            statuses = batch.run(files)
+            assert [statuses[z] for z in files] == ['cached', 'changed'] * 2, statuses
+            for filename in files:
+                with open(filename, 'r') as f:
+                    assert f.read() in (clean, expected), filename
+            # The beautified files are clean.
+            statuses = batch.run(files)
+            assert [statuses[z] for z in files] == ['cached', 'unchanged'] * 2, statuses
+            statuses = batch.run(files)
+            assert set(statuses.values()) == {'cached'}, statuses
+            # Fstringify uses different cache entries.
+            batch = BatchBeautifier('fstringify', processes=1, cache_path=cache_path)
+            statuses = batch.run(files)
+            assert set(statuses.values()) == {'unchanged'}, statuses
+    #@-others
 #@+node:ekr.20191229083512.1: *3* class TestFstringify (BaseTest)
 class TestFstringify(BaseTest):
     """Tests for the TokenOrderGenerator class."""
@@ -5882,6 +6194,28 @@ class TestTokens(BaseTest):
     def test_string_concatentation_3(self):
         # plain string followed by f-string on the same line
         self.check_roundtrip("""'abc' f'xyz'""")
+    #@+node:ekr.20261018223102.2: *4* TT.test_token_lines
+    def test_token_lines(self):
+        # Tokens share the file's lines.
+        contents = """\
+    a = 1  # comment
+    def f():
+        return 2
+    """
+        contents, tokens, tree = self.make_data(contents)
+        lines = g.splitLines(contents)
+        for token in tokens:
+            assert token.lines is tokens[0].lines, token
+            if 0 < token.line_number <= len(lines):
+                assert token.line == lines[token.line_number - 1], token
+            else:
+                assert token.line == '', token
+        comment = [z for z in tokens if z.kind == 'comment'][0]
+        assert comment.line == 'a = 1  # comment\n', repr(comment.line)
+        # Statement nodes and comments are linked as before.
+        assert any(comment in getattr(z, 'comment_list', []) for z in ast.walk(tree))
+        newline = [z for z in tokens if z.kind == 'newline'][0]
+        assert isinstance(newline.statement_node, ast.Assign), newline.statement_node
     #@+node:ekr.20160521103254.1: *4* TT.test_visitors_exist
     def test_visitors_exist(self):
         """Ensure that visitors for all ast nodes exist."""
@@ -6538,27 +6872,48 @@ class Token:
     A class representing a 5-tuple, plus additional data.
 
     The TokenOrderTraverser class creates a list of such tokens.
+
+    Tokens are slotted, and they share the list of the file's lines, so
+    large files need much less memory. The tokenizer does not keep the
+    5-tuples themselves.
     """
 
+    __slots__ = (
+        'index', 'kind', 'level', 'line_number', 'lines', 'node', 'value',
+        # Injected by TokenOrderGenerator and Orange.
+        'matching_paren', 'newline_kind', 'statement_node',
+    )
+
+    five_tuple = None  # Not kept.
+
     def __init__(self, kind, value):
 
         self.kind = kind
         self.value = value
         #
         # Injected by Tokenizer.add_token.
-        self.five_tuple = None
         self.index = 0
-        self.line = ''
-            # The entire line containing the token.
-            # Same as five_tuple.line.
         self.line_number = 0
             # The line number, for errors and dumps.
             # Same as five_tuple.start[0]
+        self.lines = None
+            # The list of all the lines of the file, shared by all tokens.
         #
         # Injected by Tokenizer.add_token.
         self.level = 0
         self.node = None
 
+    @property
+    def line(self):
+        """
+        The entire line containing the token.
+
+        Same as five_tuple.line, except that it is only the first line of
+        tokens that span several lines.
+        """
+        lines, n = self.lines, self.line_number
+        return lines[n - 1] if lines and 0 < n <= len(lines) else ''
+
     def __repr__(self):
         nl_kind = getattr(self, 'newline_kind', '')
         s = f"{self.kind:}.{self.index:<3}"
@@ -6637,12 +6992,11 @@ class Tokenizer:
         Subclasses could override this method to filter out specific tokens.
         """
         tok = Token(kind, value)
-        tok.five_tuple = five_tuple
         tok.index = self.token_index
         # Bump the token index.
         self.token_index += 1
-        tok.line = line
         tok.line_number = s_row
+        tok.lines = self.lines
         self.results.append(tok)
     #@+node:ekr.20191110170551.1: *4* tokenizer.check_results
     def check_results(self, contents):
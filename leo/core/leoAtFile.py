@@ -7,7 +7,10 @@
 #@+<< imports >>
 #@+node:ekr.20041005105605.2: ** << imports >> (leoAtFile)
 import leo.core.leoGlobals as g
+import leo.core.leoCache as leoCache
 import leo.core.leoNodes as leoNodes
+import concurrent.futures
+import hashlib
 import os
 import re
 import sys
@@ -55,8 +58,23 @@ class AtFile:
         self.yesToAll = False
         # User options: set in reloadSettings.
         self.checkPythonCodeOnWrite = False
+        self.persistFileStates = False
+        self.readInParallel = False
+        self.readThreads = 0
         self.runPyFlakesOnWrite = False
         self.underindentEscapeString = '\\-'
+        self.useAtAutoCache = False
+        self.useExternalFilesCache = False
+        # Set only by at.readAll. Must *not* be inited in initCommonIvars.
+        self.prefetched = {}
+            # Keys are full paths, values are the file's bytes.
+        self.prefetchHits = 0
+            # The number of files at.openFileHelper took from at.prefetched.
+        # Must *not* be inited in initCommonIvars.
+        self.fileStates = {}
+            # Keys are real paths.
+            # Values are (hash, mtime, size) of the contents Leo last read or wrote.
+        self.fileStatesLoaded = False
         self.reloadSettings()
     #@+node:ekr.20171113152939.1: *5* at.reloadSettings
     def reloadSettings(self):
@@ -64,10 +82,19 @@ class AtFile:
         c = self.c
         self.checkPythonCodeOnWrite = c.config.getBool(
             'check-python-code-on-write', default=True)
+        self.persistFileStates = c.config.getBool(
+            'persist-external-file-states', default=False)
+        self.readInParallel = c.config.getBool(
+            'read-external-files-in-parallel', default=False)
+        self.readThreads = c.config.getInt('read-external-files-threads') or 0
         self.runPyFlakesOnWrite = c.config.getBool(
             'run-pyflakes-on-write', default=False)
         self.underindentEscapeString = c.config.getString(
             'underindent-escape-string') or '\\-'
+        self.useAtAutoCache = c.config.getBool(
+            'use-at-auto-cache', default=True)
+        self.useExternalFilesCache = c.config.getBool(
+            'use-external-files-cache', default=True)
     #@+node:ekr.20150509194251.1: *4* at.cmd (decorator)
     def cmd(name):
         """Command decorator for the AtFileCommands class."""
@@ -361,9 +388,12 @@ class AtFile:
                 # at.output_newline
                 # at.page_width
                 # at.tab_width
-        gnx2vnode = c.fileCommands.gnxDict
         contents = fromString or file_s
-        FastAtRead(c, gnx2vnode).read_into_root(contents, fileName, root)
+        if fromString:
+            gnx2vnode = c.fileCommands.gnxDict
+            FastAtRead(c, gnx2vnode).read_into_root(contents, fileName, root)
+        else:
+            at.cached_read_into_root(contents, fileName, root)
         root.clearDirty()
         return True
     #@+node:ekr.20100122130101.6174: *6* at.deleteTnodeList
@@ -478,14 +508,21 @@ class AtFile:
         t1 = time.time()
         c.init_error_dialogs()
         files = at.findFilesToRead(force, root)
-        for p in files:
-            at.readFileAtPosition(force, p)
+        parallel = at.readInParallel and len(files) > 1
+        if parallel:
+            at.prefetchFiles(files)
+        try:
+            for p in files:
+                at.readFileAtPosition(force, p)
+        finally:
+            at.prefetched = {}
         for p in files:
             p.v.clearDirty()
         if not g.unitTesting:
             if files:
                 t2 = time.time()
-                g.es(f"read {len(files)} files in {t2 - t1:2.2f} seconds")
+                kind = ' (parallel)' if parallel else ''
+                g.es(f"read {len(files)} files{kind} in {t2 - t1:2.2f} seconds")
             elif force:
                 g.es("no @<file> nodes in the selected tree")
         c.changed = old_changed
@@ -494,40 +531,82 @@ class AtFile:
     def findFilesToRead(self, force, root):
 
         c = self.c
-        p = root.copy()
+        snapshot = c.getOutlineSnapshot()
+        vnodes, ends = snapshot.vnodes, snapshot.ends
+        i = snapshot.indexOf(root)
+        if i < 0:
+            return []
+        end = ends[i] if force else len(vnodes)
         scanned_tnodes = set()
         files = []
-        after = p.nodeAfterTree() if force else None
-        while p and p != after:
-            data = (p.gnx, g.fullPath(c, p))
+        while i < end:
+            v = vnodes[i]
             # skip clones referring to exactly the same paths.
-            if data in scanned_tnodes:
-                p.moveToNodeAfterTree()
-                continue
-            scanned_tnodes.add(data)
-            if not p.h.startswith('@'):
-                p.moveToThreadNext()
-            elif p.isAtIgnoreNode():
-                if p.isAnyAtFileNode():
-                    c.ignored_at_file_nodes.append(p.h)
-                p.moveToNodeAfterTree()
+            # Only repeated vnodes can have more than one entry.
+            if v in snapshot.repeated:
+                data = (v.gnx, g.fullPath(c, snapshot.position(i)))
+                if data in scanned_tnodes:
+                    i = ends[i]
+                    continue
+                scanned_tnodes.add(data)
+            if not v.h.startswith('@'):
+                i += 1
+            elif v.isAtIgnoreNode():
+                if v.isAnyAtFileNode():
+                    c.ignored_at_file_nodes.append(v.h)
+                i = ends[i]
             elif (
-                p.isAtThinFileNode() or
-                p.isAtAutoNode() or
-                p.isAtEditNode() or
-                p.isAtShadowFileNode() or
-                p.isAtFileNode() or
-                p.isAtCleanNode()  # 1134.
+                v.isAtThinFileNode() or
+                v.isAtAutoNode() or
+                v.isAtEditNode() or
+                v.isAtShadowFileNode() or
+                v.isAtFileNode() or
+                v.isAtCleanNode()  # 1134.
             ):
-                files.append(p.copy())
-                p.moveToNodeAfterTree()
-            elif p.isAtAsisFileNode() or p.isAtNoSentFileNode():
+                files.append(snapshot.position(i))
+                i = ends[i]
+            elif v.isAtAsisFileNode() or v.isAtNoSentFileNode():
                 # Note (see #1081): @asis and @nosent can *not* be updated automatically.
                 # Doing so using refresh-from-disk will delete all child nodes.
-                p.moveToNodeAfterTree()
+                i = ends[i]
             else:
-                p.moveToThreadNext()
+                i += 1
         return files
+    #@+node:ekr.20261018091512.1: *6* at.prefetchFiles
+    def prefetchFiles(self, files):
+        """
+        Read the contents of all @file, @thin and @clean nodes in files,
+        using a pool of threads.
+
+        at.openFileHelper uses the prefetched bytes instead of reading the file
+        again. Decoding and scanning happen later, in the main thread, in the
+        order given by files, so the resulting outline is the same as the
+        outline created by a serial read.
+        """
+        at, c = self, self.c
+        paths = []
+        for p in files:
+            if p.isAtThinFileNode() or p.isAtFileNode() or p.isAtCleanNode():
+                path = g.fullPath(c, p)
+                if path and path not in paths:
+                    paths.append(path)
+
+        def read_bytes(path):
+            try:
+                with open(path, 'rb') as f:
+                    return f.read()
+            except Exception:
+                return None  # at.openFileHelper will report the error.
+
+        if len(paths) < 2:
+            return
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=at.readThreads or None,
+        ) as executor:
+            contents = list(executor.map(read_bytes, paths))
+        at.prefetched = {
+            path: s for path, s in zip(paths, contents) if s is not None
+        }
     #@+node:ekr.20190108054803.1: *6* at.readFileAtPosition
     def readFileAtPosition(self, force, p):
         '''Read the @<file> node at p.'''
@@ -582,7 +661,7 @@ class AtFile:
             )
             p.v.b = ''  # Required for @auto API checks.
             p.v._deleteAllChildren()
-            p = ic.createOutline(fileName, parent=p.copy())
+            p = at.cached_import_into_root(fileName, p.copy())
             # Do *not* select a postion here.
             # That would improperly expand nodes.
                 # c.selectPosition(p)
@@ -684,9 +763,8 @@ class AtFile:
         if not g.unitTesting:
             g.es("updating:", root.h)
         root.clearVisitedInTree()
-        gnx2vnode = at.fileCommands.gnxDict
         contents = ''.join(new_private_lines)
-        FastAtRead(c, gnx2vnode).read_into_root(contents, fileName, root)
+        at.cached_read_into_root(contents, fileName, root)
         return True  # Errors not detected.
     #@+node:ekr.20150204165040.7: *6* at.dump_lines
     def dump(self, lines, tag):
@@ -755,6 +833,78 @@ class AtFile:
             p.clearDirty()
         # else: g.doHook('after-shadow', p = p)
         return ic.errors == 0
+    #@+node:ekr.20261018213344.2: *4* at.cached_import_into_root
+    def cached_import_into_root(self, fileName, root):
+        """
+        Import the @auto file into root, an empty @auto node. Return the
+        position returned by ic.createOutline.
+
+        Use the @auto cache if @bool use-at-auto-cache is True.
+        """
+        at, ic = self, self.c.importCommands
+        cache = at.getAtAutoCache()
+        if not cache or g.is_binary_external_file(fileName):
+            return ic.createOutline(fileName, parent=root)
+        try:
+            with open(fileName, 'rb') as f:
+                contents = f.read()
+        except Exception:
+            # ic.createOutline reports the error.
+            return ic.createOutline(fileName, parent=root)
+        signature = ic.get_import_signature(fileName, root)
+        tree = cache.get(fileName, contents, signature)
+        if tree:
+            ic.errors = 0
+            ic.graft_tree(tree, root)
+            for p in root.self_and_subtree():
+                p.clearDirty()
+            at.rememberReadPath(fileName, root)
+            root.contract()
+            return root
+        p = ic.createOutline(fileName, parent=root)
+        if p == root and not ic.errors and not root.v.u:
+            try:
+                cache.put(fileName, contents, ic.tree_of(root.v), signature)
+            except Exception:
+                # The tree can not be pickled.
+                g.es_exception()
+        return p
+    #@+node:ekr.20261018101233.7: *4* at.cached_read_into_root
+    def cached_read_into_root(self, contents, path, root):
+        """
+        Create the tree of vnodes anchored in root.v from the contents of the
+        external file at path.
+
+        Use the external files cache if @bool use-external-files-cache is True.
+        """
+        at, c = self, self.c
+        gnx2vnode = c.fileCommands.gnxDict
+        x = FastAtRead(c, gnx2vnode)
+        cache = at.getExternalFilesCache()
+        if not cache:
+            return x.read_into_root(contents, path, root)
+        data = cache.get(path, contents)
+        if data:
+            return x.read_from_cache(data, root)
+        x.records, x.bodies = [], {}
+        ok = x.read_into_root(contents, path, root)
+        if ok:
+            cache.put(path, contents, x.get_cache_data())
+        return ok
+    #@+node:ekr.20261018213344.3: *4* at.getAtAutoCache
+    def getAtAutoCache(self):
+        """Return the @auto cache, or None."""
+        if not self.useAtAutoCache:
+            return None
+        cache = getattr(g.app.commander_cacher, 'at_auto_cache', None)
+        return cache if isinstance(cache, leoCache.AtAutoCache) else None
+    #@+node:ekr.20261018101233.8: *4* at.getExternalFilesCache
+    def getExternalFilesCache(self):
+        """Return the external files cache, or None."""
+        if not self.useExternalFilesCache:
+            return None
+        cache = getattr(g.app.commander_cacher, 'external_files_cache', None)
+        return cache if isinstance(cache, leoCache.ExternalFilesCache) else None
     #@+node:ekr.20180622110112.1: *4* at.fast_read_into_root
     def fast_read_into_root(self, c, contents, gnx2vnode, path, root):
         """A convenience wrapper for FastAtReAD.read_into_root()"""
@@ -872,10 +1022,17 @@ class AtFile:
     def openFileHelper(self, fileName):
         """Open a file, reporting all exceptions."""
         at = self
+        state = at.getFileStat(fileName)
+        s = at.prefetched.pop(fileName, None)
+        if s is not None:
+            at.prefetchHits += 1
+            at.rememberFileState(fileName, s, state)
+            return s
         s = ''
         try:
             with open(fileName, 'rb') as f:
                 s = f.read()
+            at.rememberFileState(fileName, s, state)
         except IOError:
             at.error(f"can not open {fileName}")
         except Exception:
@@ -1068,11 +1225,13 @@ class AtFile:
         at.cancelFlag = False
         at.yesToAll = False
         files, root = at.findFilesToWrite(all)
+        at.loadFileStates()
         for p in files:
             try:
                 at.writeAllHelper(p, root)
             except Exception:
                 at.internalWriteError(p)
+        at.saveFileStates()
         # Make *sure* these flags are cleared for other commands.
         at.canCancelFlag = False
         at.cancelFlag = False
@@ -1092,37 +1251,40 @@ class AtFile:
         if trace:
             g.trace(f"writing *{'selected' if force else 'all'}* files")
         c = self.c
+        snapshot = c.getOutlineSnapshot()
+        vnodes, ends = snapshot.vnodes, snapshot.ends
         if force:
             # The Write @<file> Nodes command.
             # Write all nodes in the selected tree.
             root = c.p
-            p = c.p
-            after = p.nodeAfterTree()
+            i = snapshot.indexOf(root)
+            end = ends[i] if i > -1 else i
         else:
             # Write dirty nodes in the entire outline.
             root = c.rootPosition()
-            p = c.rootPosition()
-            after = None
+            i, end = 0, len(vnodes)
         seen = set()
         files = []
-        while p and p != after:
-            if p.isAtIgnoreNode() and not p.isAtAsisFileNode():
+        while i < end:
+            v = vnodes[i]
+            if v.isAtIgnoreNode() and not v.isAtAsisFileNode():
                 # Honor @ignore in *body* text, but *not* in @asis nodes.
-                if p.isAnyAtFileNode():
-                    c.ignored_at_file_nodes.append(p.h)
-                p.moveToNodeAfterTree()
-            elif p.isAnyAtFileNode():
-                data = p.v, g.fullPath(c, p)
+                if v.isAnyAtFileNode():
+                    c.ignored_at_file_nodes.append(v.h)
+                i = ends[i]
+            elif v.isAnyAtFileNode():
+                p = snapshot.position(i)
+                data = v, g.fullPath(c, p)
                 if data in seen:
                     if trace and force:
                         g.trace('Already seen', p.h)
                 else:
                     seen.add(data)
-                    files.append(p.copy())
+                    files.append(p)
                 # Don't scan nested trees???
-                p.moveToNodeAfterTree()
+                i = ends[i]
             else:
-                p.moveToThreadNext()
+                i += 1
         # When scanning *all* nodes, we only actually write dirty nodes.
         if not force:
             files = [z for z in files if z.isDirty()]
@@ -2721,6 +2883,7 @@ class AtFile:
         if not g.os_path_exists(fileName):
             ok = g.writeFile(contents, encoding, fileName)
             if ok:
+                at.rememberFileState(fileName, contents, encoding=encoding)
                 c.setFileTimeStamp(fileName)
                 if not g.unitTesting:
                     g.es(f"{timestamp}created: {fileName}")
@@ -2734,13 +2897,17 @@ class AtFile:
             return False  # No change to original file.
         #
         # Compare the old and new contents.
-        old_contents = g.readFileIntoUnicodeString(fileName,
-            encoding=at.encoding, silent=True)
-        unchanged = (
-            contents == old_contents or
-            (not at.explicitLineEnding and at.compareIgnoringLineEndings(
-            old_contents, contents)) or
-            ignoreBlankLines and at.compareIgnoringBlankLines(old_contents, contents))
+        # Read the old file only if it may differ from what Leo last read or wrote.
+        if at.isUnchangedFile(fileName, contents, encoding):
+            old_contents = None
+            unchanged = True
+        else:
+            old_contents = at.readFileAndRememberState(fileName)
+            unchanged = (
+                contents == old_contents or
+                (not at.explicitLineEnding and at.compareIgnoringLineEndings(
+                old_contents, contents)) or
+                ignoreBlankLines and at.compareIgnoringBlankLines(old_contents, contents))
         if unchanged:
             if not g.unitTesting and c.config.getBool(
                 'report-unchanged-files', default=True):
@@ -2761,6 +2928,7 @@ class AtFile:
         # Write a changed file.
         ok = g.writeFile(contents, encoding, fileName)
         if ok:
+            at.rememberFileState(fileName, contents, encoding=encoding)
             c.setFileTimeStamp(fileName)
             if not g.unitTesting:
                 g.es(f"{timestamp}wrote: {sfn}")
@@ -2878,6 +3046,95 @@ class AtFile:
                 g.es_exception()
                 g.trace(g.callers(5))
             return False
+    #@+node:ekr.20261018110754.1: *5* at.file states
+    #@+at at.fileStates describes the contents of each external file as Leo
+    # last read or wrote it. at.replaceFile uses at.fileStates to avoid reading
+    # files that can not have changed. Stat data (mtime and size) reveal
+    # changes made outside of Leo.
+    #@+node:ekr.20261018110754.2: *6* at.getFileStat
+    def getFileStat(self, fileName):
+        """Return (mtime, size) for the given file, or None."""
+        try:
+            st = os.stat(fileName)
+            return st.st_mtime_ns, st.st_size
+        except Exception:
+            return None
+    #@+node:ekr.20261018110754.3: *6* at.isUnchangedFile
+    def isUnchangedFile(self, fileName, contents, encoding):
+        """
+        Return True if the file contains exactly the given contents.
+
+        Return False if the state of the file is unknown or if the file's
+        stat data differ from the remembered state.
+        """
+        at = self
+        data = at.fileStates.get(g.os_path_realpath(fileName))
+        if not data:
+            return False
+        old_hash, old_state = data
+        if old_state != at.getFileStat(fileName):
+            return False
+        s = g.toEncodedString(contents, encoding=encoding)
+        return old_hash == hashlib.md5(s).hexdigest()
+    #@+node:ekr.20261018110754.4: *6* at.loadFileStates & saveFileStates
+    fileStatesKey = 'external-file-states'
+
+    def loadFileStates(self):
+        """Load at.fileStates from c.db, once, if enabled."""
+        at, c = self, self.c
+        if at.fileStatesLoaded or not at.persistFileStates:
+            return
+        at.fileStatesLoaded = True
+        try:
+            d = c.db.get(at.fileStatesKey) or {}
+            for path, data in d.items():
+                at.fileStates.setdefault(path, data)
+        except Exception:
+            g.es_exception()
+
+    def saveFileStates(self):
+        """Save at.fileStates in c.db, if enabled."""
+        at, c = self, self.c
+        if not at.persistFileStates:
+            return
+        try:
+            c.db[at.fileStatesKey] = at.fileStates
+        except Exception:
+            g.es_exception()
+    #@+node:ekr.20261018110754.5: *6* at.readFileAndRememberState
+    def readFileAndRememberState(self, fileName):
+        """
+        Return the contents of the file, decoded with at.encoding, or None.
+        Remember the state of the file.
+        """
+        at = self
+        state = at.getFileStat(fileName)
+        try:
+            with open(fileName, 'rb') as f:
+                s = f.read()
+        except Exception:
+            return None
+        at.rememberFileState(fileName, s, state)
+        return g.toUnicode(s, encoding=at.encoding)
+    #@+node:ekr.20261018110754.6: *6* at.rememberFileState
+    def rememberFileState(self, fileName, s, state=None, encoding=None):
+        """
+        Remember the hash of s, the contents of fileName, and the state
+        (mtime, size) of the file.
+
+        s may be unicode, in which case it is encoded with the given encoding.
+        state should be computed *before* reading a file.
+        """
+        at = self
+        if state is None:
+            state = at.getFileStat(fileName)
+        path = g.os_path_realpath(fileName)
+        if state is None:
+            at.fileStates.pop(path, None)
+            return
+        if g.isUnicode(s):
+            s = g.toEncodedString(s, encoding=encoding)
+        at.fileStates[path] = (hashlib.md5(s).hexdigest(), state)
     #@+node:ekr.20050104132026: *5* at.stat
     def stat(self, fileName):
         '''Return the access mode of named file, removing any setuid, setgid, and sticky bits.'''
@@ -3144,6 +3401,11 @@ class FastAtRead:
         self.gnx2vnode = gnx2vnode
             # The global fc.gnxDict. Keys are gnx's, values are vnodes.
         self.path = None
+        self.records = None
+            # A list of (gnx, headline, level) tuples, one per @+node sentinel.
+            # Set only when the caller wants to cache the results.
+        self.bodies = None
+            # Keys are gnx's, values are body text. Set with self.records.
         self.root = None
         self.VNode = TestVNode if test else leoNodes.VNode
         self.test = test
@@ -3204,6 +3466,9 @@ class FastAtRead:
                 v = gnx2vnode.get(key)
                 assert v, (key, v)
                 v._bodyString = g.toUnicode(''.join(body))
+            if self.bodies is not None:
+                for key in gnx2body:
+                    self.bodies[key] = gnx2vnode.get(key)._bodyString
     #@+node:ekr.20180602103135.2: *3* fast_at.scan_header
     header_pattern = re.compile(
         r'''
@@ -3257,6 +3522,8 @@ class FastAtRead:
             # The current indentation.
         level_stack = []
             # Entries are (vnode, in_clone_tree)
+        records = self.records
+            # Not None: a list of (gnx, head, level) for the external files cache.
         n_last_lines = 0
             # The number of @@last directives seen.
         root_seen = False
@@ -3429,6 +3696,8 @@ class FastAtRead:
                 gnx, head = m.group(2), m.group(5)
                 level = int(m.group(3)) if m.group(3) else 1 + len(m.group(4))
                     # m.group(3) is the level number, m.group(4) is the number of stars.
+                if records is not None:
+                    records.append((gnx, head, level),)
                 v = gnx2vnode.get(gnx)
                 #
                 # Case 1: The root @file node. Don't change the headline.
@@ -3702,6 +3971,66 @@ class FastAtRead:
             gnx2body[root_gnx] = gnx2body[root_gnx] + last_lines
         self.post_pass(gnx2body, gnx2vnode, root_v)
         return root_v, last_lines
+    #@+node:ekr.20261018101233.6: *3* fast_at.get_cache_data & read_from_cache
+    def get_cache_data(self):
+        """
+        Return the data that read_from_cache needs to recreate the tree
+        created by the last call to read_into_root.
+        """
+        return self.records, self.bodies
+
+    def read_from_cache(self, data, root):
+        """
+        Recreate the tree of vnodes anchored in root.v from data returned by
+        get_cache_data.
+
+        The code that links vnodes mirrors << handle node_start >> exactly,
+        so the result is the same as a full scan of the external file.
+        """
+        records, bodies = data
+        gnx2vnode = self.gnx2vnode
+        context = self.c
+        self.root = root
+        root_v = root.v
+        root_v._deleteAllChildren()
+        gnx2vnode[root_v.gnx] = root_v
+        level_stack = [(root_v, False)]
+        root_seen = False
+        for gnx, head, level in records:
+            v = gnx2vnode.get(gnx)
+            # Case 1: The root @file node. Don't change the headline.
+            if not root_seen:
+                root_seen = True
+                if not v:
+                    v = root_v
+                    gnx2vnode[gnx] = v
+                    v.fileIndex = gnx
+                v.children = []
+                continue
+            # Case 2: We are scanning the descendants of a clone.
+            parent_v, clone_v = level_stack[level - 2]
+            if v and clone_v:
+                v._headString = head
+                level_stack = level_stack[: level - 1]
+                level_stack.append((v, clone_v),)
+                v.children = []
+                parent_v.children.append(v)
+                continue
+            # Case 3: we are not already scanning the descendants of a clone.
+            if v:
+                clone_v = v
+                v.children = []
+            else:
+                v = self.VNode(context=context, gnx=gnx)
+            gnx2vnode[gnx] = v
+            v._headString = head
+            level_stack = level_stack[: level - 1]
+            level_stack.append((v, clone_v),)
+            parent_v.children.append(v)
+            v.parents.append(parent_v)
+        for gnx, body in bodies.items():
+            gnx2vnode.get(gnx)._bodyString = body
+        return True
     #@+node:ekr.20180603170614.1: *3* fast_at.read_into_root
     def read_into_root(self, contents, path, root):
         '''
@@ -3737,12 +4066,7 @@ class TestAtFile(unittest.TestCase):
     def bridge(self):
         """Return an instance of Leo's bridge."""
         import leo.core.leoBridge as leoBridge
-        return leoBridge.controller(gui='nullGui',
-            loadPlugins=False,
-            readSettings=False,
-            silent=True,
-            verbose=False,
-        )
+        return leoBridge.headless_controller()
     #@+node:ekr.20200204112501.1: *4* TestAtFile.temp_dir
     def temp_dir(self):
         """Create a temp file with the given name."""
@@ -3757,6 +4081,184 @@ class TestAtFile(unittest.TestCase):
         warnings.simplefilter("ignore")
         import tempfile
         return tempfile.NamedTemporaryFile(mode='w')
+    #@+node:ekr.20261018110754.8: *3* TestAtFile.test_save_reads_only_changed_files
+    def test_save_reads_only_changed_files(self):
+        """Test that saving reads only files that may have changed."""
+        import os
+        bridge = self.bridge()
+        temp_dir = self.temp_dir()
+        filename = f"{temp_dir.name}{os.sep}test_file.leo"
+        c = bridge.openLeoFile(filename)
+        at = c.atFileCommands
+        p = c.rootPosition()
+        p.h = '@file 0'
+        p.b = 'b0\n'
+        for i in range(1, 5):
+            p = p.insertAfter()
+            p.h = f"@file {i}"
+            p.b = f"b{i}\n"
+        c.save()
+        reads = []
+        old_read = at.readFileAndRememberState
+
+        def read(fileName):
+            reads.append(g.shortFileName(fileName))
+            return old_read(fileName)
+
+        at.readFileAndRememberState = read
+
+        def write_all():
+            for p in c.all_positions():
+                p.setDirty()
+            at.writeAll()
+
+        # Change one node and save all files.
+        p = c.rootPosition().next()
+        p.b = 'changed 1\n'
+        write_all()
+        assert reads == ['1'], reads
+        # Change a file outside of Leo and save all files.
+        reads = []
+        path = f"{temp_dir.name}{os.sep}2"
+        with open(path, 'a') as f:
+            f.write('# more\n')
+        write_all()
+        assert reads == ['2'], reads
+        with open(path, 'r') as f:
+            assert '# more' not in f.read()
+        c.close()
+    #@+node:ekr.20261018091512.4: *3* TestAtFile.test_parallel_read
+    def test_parallel_read(self):
+        """Test that parallel and serial reads create the same outline."""
+        import os
+        bridge = self.bridge()
+        temp_dir = self.temp_dir()
+        filename = f"{temp_dir.name}{os.sep}test_file.leo"
+        c = bridge.openLeoFile(filename)
+        p = c.rootPosition()
+        p.h = '@file 0'
+        p.b = 'b0\n@others\n'
+        for i in range(1, 8):
+            p = p.insertAfter()
+            p.h = f"@clean {i}" if i % 2 else f"@file {i}"
+            p.b = f"b{i}\n@others\n"
+            for j in range(3):
+                child = p.insertAsLastChild()
+                child.h = f"child {i}.{j}"
+                child.b = f"child body {i}.{j}\n"
+        c.save()
+        at = c.atFileCommands
+
+        def outline():
+            return [(z.h, z.b, z.gnx) for z in c.all_positions()]
+
+        expected = outline()
+        at.readInParallel = False
+        at.prefetchHits = 0
+        at.readAll(c.rootPosition())
+        assert outline() == expected
+        assert at.prefetchHits == 0, at.prefetchHits
+        at.readInParallel = True
+        at.readAll(c.rootPosition())
+        assert outline() == expected
+        # All eight @file and @clean nodes must use the prefetched bytes.
+        assert at.prefetchHits == 8, at.prefetchHits
+        assert not at.prefetched
+        c.close()
+    #@+node:ekr.20261018101233.10: *3* TestAtFile.test_external_files_cache
+    def test_external_files_cache(self):
+        """Test that the external files cache recreates the same outline."""
+        import os
+        bridge = self.bridge()
+        temp_dir = self.temp_dir()
+        filename = f"{temp_dir.name}{os.sep}test_file.leo"
+        c = bridge.openLeoFile(filename)
+        at = c.atFileCommands
+        cache = at.getExternalFilesCache()
+        assert cache, 'no external files cache'
+        root = c.rootPosition()
+        root.h = '@file 1'
+        root.b = 'root\n@others\n'
+        for i in range(3):
+            child = root.insertAsLastChild()
+            child.h = f"child {i}"
+            child.b = f"body {i}\n@others\n"
+            grand_child = child.insertAsLastChild()
+            grand_child.h = f"grand child {i}"
+            grand_child.b = f"grand child body {i}\n"
+        # Create a clone within the @file tree.
+        clone = root.firstChild().firstChild().clone()
+        clone.moveToLastChildOf(root)
+        c.save()
+
+        def outline():
+            return [(z.h, z.b, z.gnx, z.level()) for z in c.all_positions()]
+
+        expected = outline()
+        hits, misses = cache.hits, cache.misses
+        at.readAll(c.rootPosition())  # Creates the cache entry.
+        assert outline() == expected
+        assert cache.misses == misses + 1
+        at.readAll(c.rootPosition())  # Uses the cache entry.
+        assert outline() == expected
+        assert cache.hits == hits + 1
+        # A change to the file invalidates the entry.
+        path = g.fullPath(c, c.rootPosition())
+        with open(path, 'r') as f:
+            s = f.read()
+        with open(path, 'w') as f:
+            f.write(s.replace('body 1', 'changed body 1'))
+        at.readAll(c.rootPosition())
+        assert cache.misses == misses + 2
+        assert any(z.b == 'changed body 1\n@others\n' for z in c.all_positions())
+        c.close()
+    #@+node:ekr.20261018213344.8: *3* TestAtFile.test_at_auto_cache
+    def test_at_auto_cache(self):
+        """Test that the @auto cache recreates the same outline."""
+        import os
+        bridge = self.bridge()
+        if not g.app.classDispatchDict:
+            g.app.loadManager.createAllImporterData()
+        temp_dir = self.temp_dir()
+        filename = f"{temp_dir.name}{os.sep}test_file.leo"
+        c = bridge.openLeoFile(filename)
+        at = c.atFileCommands
+        cache = at.getAtAutoCache()
+        assert cache, 'no @auto cache'
+        path = f"{temp_dir.name}{os.sep}test_auto.py"
+        s = (
+            'import os\n'
+            '\n'
+            'class A:\n'
+            '    def f(self):\n'
+            '        return 1\n'
+            '\n'
+            'def g():\n'
+            '    return 2\n'
+        )
+        with open(path, 'w') as f:
+            f.write(s)
+        root = c.rootPosition()
+        root.h = f"@auto {path}"
+
+        def outline():
+            return [(z.h, z.b, z.level()) for z in c.all_positions()]
+
+        hits, misses = cache.hits, cache.misses
+        root = at.readOneAtAutoNode(path, root)  # Creates the cache entry.
+        expected = outline()
+        assert len(expected) > 1, expected
+        assert cache.misses == misses + 1
+        root = at.readOneAtAutoNode(path, root)  # Uses the cache entry.
+        assert outline() == expected
+        assert cache.hits == hits + 1
+        # A change to the file invalidates the entry.
+        with open(path, 'w') as f:
+            f.write(s.replace('return 2', 'return 3'))
+        root = at.readOneAtAutoNode(path, root)
+        assert cache.misses == misses + 2
+        assert any('return 3' in z.b for z in c.all_positions())
+        c.close()
     #@+node:ekr.20200204094139.1: *3* TestAtFile.test_save_after_external_file_rename
     def test_save_after_external_file_rename(self):
         """Test #1469."""
@@ -19,6 +19,7 @@ except ImportError:
 
 import os
 import time
+import unittest
 
 try:
     # pylint: disable=import-error
@@ -46,63 +47,16 @@ def orange_diff_files(event):
     Show the diffs that would result from beautifying the external files at
     c.p.
     """
-    import leo.core.leoAst as leoAst
     c = event.get('c')
-    if not c or not c.p:
-        return
-    t1 = time.process_time()
-    tag = 'beautify-files-diff'
-    g.es(f"{tag}...")
-    settings = orange_settings(c)
-    roots = g.findRootsWithPredicate(c, c.p)
-    for root in roots:
-        filename = g.fullPath(c, root)
-        if os.path.exists(filename):
-            print('')
-            print(f"{tag}: {g.shortFileName(filename)}")
-            changed = leoAst.Orange(settings=settings).beautify_file_diff(filename)
-            changed_s = 'changed' if changed else 'unchanged'
-            g.es(f"{changed_s:>9}: {g.shortFileName(filename)}")
-        else:
-            print('')
-            print(f"{tag}: file not found:{filename}")
-            g.es(f"file not found:\n{filename}")
-    t2 = time.process_time()
-    print('')
-    g.es_print(f"{tag}: {len(roots)} file{g.plural(len(roots))} in {t2 - t1:5.2f} sec.")
+    if c and c.p:
+        batch_files(c, 'orange-diff', tag='beautify-files-diff')
 #@+node:ekr.20200107165603.1: *4* beautify-files
 @g.command('beautify-files')
 def orange_files(event):
     """beautify one or more files at c.p."""
     c = event.get('c')
-    if not c or not c.p:
-        return
-    t1 = time.process_time()
-    tag = 'beautify-files'
-    g.es(f"{tag}...")
-    settings = orange_settings(c)
-    roots = g.findRootsWithPredicate(c, c.p)
-    n_changed = 0
-    for root in roots:
-        filename = g.fullPath(c, root)
-        if os.path.exists(filename):
-            print('')
-            print(f"{tag}: {g.shortFileName(filename)}")
-            changed = leoAst.Orange(settings=settings).beautify_file(filename)
-            if changed:
-                n_changed += 1
-            changed_s = 'changed' if changed else 'unchanged'
-            g.es(f"{changed_s:>9}: {g.shortFileName(filename)}")
-        else:
-            print('')
-            print(f"{tag}: file not found:{filename}")
-            g.es(f"{tag}: file not found:\n{filename}")
-    t2 = time.process_time()
-    print('')
-    g.es_print(
-        f"total files: {len(roots)}, "
-        f"changed files: {n_changed}, "
-        f"in {t2 - t1:5.2f} sec.")
+    if c and c.p:
+        batch_files(c, 'orange', tag='beautify-files')
 #@+node:ekr.20200103055814.1: *4* blacken-files
 @g.command('blacken-files')
 def blacken_files(event):
@@ -149,32 +103,8 @@ def blacken_files_diff(event):
 def fstringify_files(event):
     """fstringify one or more files at c.p."""
     c = event.get('c')
-    if not c or not c.p:
-        return
-    t1 = time.process_time()
-    tag = 'fstringify-files'
-    g.es(f"{tag}...")
-    roots = g.findRootsWithPredicate(c, c.p)
-    n_changed = 0
-    for root in roots:
-        filename = g.fullPath(c, root)
-        if os.path.exists(filename):
-            print('')
-            print(g.shortFileName(filename))
-            changed = leoAst.Fstringify().fstringify_file(filename)
-            changed_s = 'changed' if changed else 'unchanged'
-            if changed: n_changed += 1
-            g.es_print(f"{changed_s:>9}: {g.shortFileName(filename)}")
-        else:
-            print('')
-            print(f"File not found:{filename}")
-            g.es(f"File not found:\n{filename}")
-    t2 = time.process_time()
-    print('')
-    g.es_print(
-        f"total files: {len(roots)}, "
-        f"changed files: {n_changed}, "
-        f"in {t2 - t1:5.2f} sec.")
+    if c and c.p:
+        batch_files(c, 'fstringify', tag='fstringify-files')
 #@+node:ekr.20200103055858.1: *4* fstringify-files-diff
 @g.command('diff-fstringify-files')
 @g.command('fstringify-files-diff')
@@ -183,59 +113,53 @@ def fstringify_diff_files(event):
     Show the diffs that would result from fstringifying the external files at
     c.p.
     """
-    import leo.core.leoAst as leoAst
     c = event.get('c')
-    if not c or not c.p:
-        return
-    t1 = time.process_time()
-    tag = 'fstringify-files-diff'
-    g.es(f"{tag}...")
-    roots = g.findRootsWithPredicate(c, c.p)
-    for root in roots:
-        filename = g.fullPath(c, root)
-        if os.path.exists(filename):
-            print('')
-            print(g.shortFileName(filename))
-            changed = leoAst.Fstringify().fstringify_file_diff(filename)
-            changed_s = 'changed' if changed else 'unchanged'
-            g.es_print(f"{changed_s:>9}: {g.shortFileName(filename)}")
-        else:
-            print('')
-            print(f"File not found:{filename}")
-            g.es(f"File not found:\n{filename}")
-    t2 = time.process_time()
-    print('')
-    g.es_print(f"{len(roots)} file{g.plural(len(roots))} in {t2 - t1:5.2f} sec.")
+    if c and c.p:
+        batch_files(c, 'fstringify-diff', tag='fstringify-files-diff')
 #@+node:ekr.20200112060001.1: *4* fstringify-files-silent
 @g.command('silent-fstringify-files')
 @g.command('fstringify-files-silent')
 def fstringify_files_silent(event):
     """Silently fstringifying the external files at c.p."""
-    import leo.core.leoAst as leoAst
     c = event.get('c')
-    if not c or not c.p:
-        return
-    t1 = time.process_time()
-    tag = 'silent-fstringify-files'
+    if c and c.p:
+        batch_files(c, 'fstringify', tag='silent-fstringify-files', silent=True)
+#@+node:ekr.20261018215411.10: *4* batch_files
+def batch_files(c, kind, tag, silent=False):
+    """
+    Beautify or fstringify the external files at c.p using leoAst.BatchBeautifier.
+
+    kind:   one of leoAst.BatchBeautifier.kinds.
+    silent: True: report only the totals.
+    """
+    t1 = time.perf_counter()
     g.es(f"{tag}...")
-    n_changed = 0
     roots = g.findRootsWithPredicate(c, c.p)
-    for root in roots:
-        filename = g.fullPath(c, root)
-        if os.path.exists(filename):
-            changed = leoAst.Fstringify().fstringify_file_silent(filename)
-            if changed:
-                n_changed += 1
-        else:
-            print('')
-            print(f"File not found:{filename}")
-            g.es(f"File not found:\n{filename}")
-    t2 = time.process_time()
+    files = [g.fullPath(c, root) for root in roots]
+    # Leo's launch script may lack a __main__ guard, so default to one process.
+    n = c.config.getInt('beautify-processes') or 1
+    home = g.app.homeLeoDir
+    batch = leoAst.BatchBeautifier(kind,
+        settings=orange_settings(c) if kind.startswith('orange') else None,
+        processes=n,
+        cache_path=g.os_path_finalize_join(home, 'leoAst-cache.json') if home else None,
+    )
+    statuses = batch.run(files)
+    n_changed = 0
+    for filename in files:
+        status = statuses.get(filename)
+        if status == 'changed':
+            n_changed += 1
+        if status == 'not found':
+            g.es(f"{tag}: file not found:\n{filename}")
+        elif not silent:
+            g.es(f"{status:>9}: {g.shortFileName(filename)}")
+    t2 = time.perf_counter()
     print('')
-    n_tot = len(roots)
+    print(batch.summary())
     g.es_print(
-        f"{n_tot} total file{g.plural(len(roots))}, "
-        f"{n_changed} changed file{g.plural(n_changed)} "
+        f"total files: {len(files)}, "
+        f"changed files: {n_changed}, "
         f"in {t2 - t1:5.2f} sec.")
 #@+node:ekr.20200108045048.1: *4* orange_settings
 def orange_settings(c):
@@ -575,6 +499,121 @@ class CPrettyPrinter:
             return len(s)
         return j + 2
     #@-others
+#@+node:ekr.20261019060012.9: ** class TestBatchFiles
+class TestBatchFiles(unittest.TestCase):
+    """Test cases for batch_files."""
+    #@+others
+    #@+node:ekr.20261019060012.10: *3* TestBatchFiles.test_beautify_files
+    def test_beautify_files(self):
+        """Test the beautify-files command, with and without processes."""
+        import concurrent.futures
+        import contextlib
+        import io
+        import sys
+        import tempfile
+        import types
+        from unittest import mock
+        import leo.core.leoBridge as leoBridge
+        import leo.core.leoProcesses as leoProcesses
+        bridge = leoBridge.headless_controller()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        c = bridge.openLeoFile(os.path.join(temp_dir.name, 'test.leo'))
+        self.addCleanup(c.close)
+        dirty = 'a=1\nb  =  f( 2 )\n'
+        expected = 'a = 1\nb = f(2)\n'
+        root = c.rootPosition()
+        paths = []
+        for i in range(4):
+            p = root.insertAsLastChild()
+            path = os.path.join(temp_dir.name, f"x{i}.py")
+            p.h = f"@clean {path}"
+            paths.append(path)
+        c.selectPosition(root)
+        # A launch script without a __main__ guard.
+        unguarded = types.ModuleType('__main__')
+        unguarded.__file__ = os.path.join(temp_dir.name, 'launch.py')
+        unguarded.__spec__ = None
+        with open(unguarded.__file__, 'w') as f:
+            f.write('import leo.core.runLeo\nleo.core.runLeo.run()\n')
+        pools = []
+
+        class Executor(concurrent.futures.ProcessPoolExecutor):
+            def __init__(self, *args, **kwargs):
+                pools.append(kwargs.get('max_workers'))
+                super().__init__(*args, **kwargs)
+
+        main = sys.modules['__main__']
+        table = (
+            # The default: beautify in this process.
+            (0, main, []),
+            # Don't spawn processes that would start Leo again.
+            (2, unguarded, []),
+            # The processes import Leo despite leoBridge's changes to sys.path.
+            (2, main, [2] if leoProcesses.can_spawn() else []),
+        )
+        with mock.patch.object(concurrent.futures, 'ProcessPoolExecutor', Executor), \
+            mock.patch.object(g.app, 'homeLeoDir', temp_dir.name):
+            for n, main_module, expected_pools in table:
+                for path in paths:
+                    with open(path, 'w') as f:
+                        f.write(dirty)
+                pools.clear()
+                c.config.set(None, 'int', 'beautify-processes', n, warn=False)
+                with mock.patch.dict(sys.modules, {'__main__': main_module}):
+                    with contextlib.redirect_stdout(io.StringIO()) as out:
+                        c.executeMinibufferCommand('beautify-files')
+                self.assertEqual(pools, expected_pools, msg=n)
+                self.assertNotIn('process pool failed', out.getvalue())
+                for path in paths:
+                    with open(path, 'r') as f:
+                        self.assertEqual(f.read(), expected, msg=(n, path))
+    #@+node:ekr.20261019060012.7: *3* TestBatchFiles.test_can_spawn
+    def test_can_spawn(self):
+        import importlib.util
+        import sys
+        import tempfile
+        import types
+        import leo.core.leoProcesses as leoProcesses
+        old_main = sys.modules['__main__']
+        self.addCleanup(sys.modules.__setitem__, '__main__', old_main)
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        table = (
+            ('import leo.core.runLeo\nleo.core.runLeo.run()\n', False),
+            ("import leo.core.runLeo\nif __name__ == '__main__':\n"
+             "    leo.core.runLeo.run()\n", True),
+        )
+        for i, (s, expected) in enumerate(table):
+            path = os.path.join(temp_dir.name, f"launch{i}.py")
+            with open(path, 'w') as f:
+                f.write(s)
+            main = types.ModuleType('__main__')
+            main.__file__ = path
+            main.__spec__ = None
+            sys.modules['__main__'] = main
+            self.assertEqual(leoProcesses.can_spawn(), expected, msg=s)
+            # Spawned processes don't run modules run with -m.
+            main.__spec__ = importlib.util.spec_from_file_location('launch', path)
+            self.assertTrue(leoProcesses.can_spawn())
+        # A missing script.
+        main = types.ModuleType('__main__')
+        main.__file__ = os.path.join(temp_dir.name, 'missing.py')
+        main.__spec__ = None
+        sys.modules['__main__'] = main
+        self.assertFalse(leoProcesses.can_spawn())
+    #@+node:ekr.20261019060012.8: *3* TestBatchFiles.test_clean_sys_path
+    def test_clean_sys_path(self):
+        import sys
+        import leo.core.leoProcesses as leoProcesses
+        old_path = sys.path[:]
+        self.addCleanup(sys.path.__setitem__, slice(None), old_path)
+        leo_dir = os.path.dirname(os.path.dirname(os.path.abspath(leoProcesses.__file__)))
+        importers = os.path.join(leo_dir, 'plugins', 'importers')
+        sys.path[:] = ['', os.path.dirname(leo_dir), leo_dir, importers, leo_dir + '2']
+        leoProcesses.clean_sys_path()
+        self.assertEqual(sys.path, ['', os.path.dirname(leo_dir), leo_dir + '2'])
+    #@-others
 #@-others
 #@@language python
 #@@tabwidth -4
@@ -70,6 +70,26 @@ def controller(
             useCaches,
             verbose)
     return gBridgeController
+#@+node:ekr.20261019060012.24: ** headless_controller
+def headless_controller():
+    """
+    Return the singleton bridge controller, creating it without plugins,
+    settings files or messages if necessary.
+
+    Unit tests and Leo's helper processes use this controller.
+    """
+    bridge = controller(gui='nullGui',
+        loadPlugins=False,
+        readSettings=False,
+        silent=True,
+        verbose=False,
+    )
+    # Closing the last commander in an earlier test kills the app,
+    # disabling selection in later commanders.
+    leo_g = bridge.globals()
+    if leo_g:
+        leo_g.app.killed = False
+    return bridge
 #@+node:ekr.20070227092442.2: ** class BridgeController
 class BridgeController:
     """Creates a way for host programs to access Leo."""
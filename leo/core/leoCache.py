@@ -5,6 +5,7 @@
 #@+node:ekr.20100208223942.10436: ** << imports >> (leoCache)
 import leo.core.leoGlobals as g
 import fnmatch
+import hashlib
 import os
 import pickle
 import sqlite3
@@ -31,6 +32,8 @@ class CommanderCacher:
             self.db = SqlitePickleShare(path)
         except Exception:
             self.db = {}
+        self.at_auto_cache = AtAutoCache(self)
+        self.external_files_cache = ExternalFilesCache(self)
     #@+others
     #@+node:ekr.20100209160132.5759: *3* cacher.clear
     def clear(self):
@@ -136,6 +139,100 @@ class CommanderWrapper:
     def __setitem__(self, key, value):
         self.user_keys.add(key)
         self.db[f"{self.key}:::{key}"] = value
+#@+node:ekr.20261018101233.1: ** class ExternalFilesCache
+class ExternalFilesCache:
+    """
+    A cache of the outline structure of external files, kept in the
+    commander cache, g.app.commander_db.
+
+    Keys are normalized paths. Values are tuples (hash, data), where hash
+    is the hash of the file's contents and data is the result of
+    FastAtRead.get_cache_data.
+
+    There is at most one entry per path, so a changed file replaces the
+    previous (stale) entry. Entries for files that no longer exist are
+    pruned once per session.
+    """
+
+    name = 'external files cache'
+    prefix = 'external-file:::'
+
+    def __init__(self, cacher):
+        self.cacher = cacher
+        self.hits = 0
+        self.misses = 0
+        self.pruned = False
+    #@+others
+    #@+node:ekr.20261018101233.2: *3* fcache.get & put
+    def get(self, path, contents, signature=None):
+        """
+        Return the cached data for the path, or None.
+
+        signature is a string describing everything besides the contents
+        that affects the data.
+        """
+        if not self.pruned:
+            self.prune()
+        value = self.cacher.db.get(self.key(path))
+        if value and value[0] == self.hash(contents, signature):
+            self.hits += 1
+            return value[1]
+        self.misses += 1
+        return None
+
+    def put(self, path, contents, data, signature=None):
+        """Cache the data for the given path."""
+        self.cacher.db[self.key(path)] = (self.hash(contents, signature), data)
+    #@+node:ekr.20261018101233.3: *3* fcache.hash & key
+    def hash(self, contents, signature=None):
+        """Return the hash of the contents of an external file."""
+        h = hashlib.md5(g.toEncodedString(contents))
+        if signature:
+            h.update(g.toEncodedString(signature))
+        return h.hexdigest()
+
+    def key(self, path):
+        return self.prefix + normcase(path)
+    #@+node:ekr.20261018101233.4: *3* fcache.keys & prune
+    def keys(self):
+        """Return the keys of all entries in the cache."""
+        db = self.cacher.db
+        if hasattr(db, 'conn'):
+            # SqlitePickleShare.keys yields rows.
+            return [z[0] for z in db.keys(globpat=self.prefix + '*')]
+        return [z for z in db.keys() if z.startswith(self.prefix)]
+
+    def prune(self):
+        """Remove the entries for files that no longer exist."""
+        self.pruned = True
+        try:
+            for key in self.keys():
+                if not g.os_path_exists(key[len(self.prefix) :]):
+                    del self.cacher.db[key]
+        except Exception:
+            g.es_exception()
+    #@+node:ekr.20261018101233.5: *3* fcache.stats
+    def stats(self):
+        """Return a string describing the state of the cache."""
+        n = self.hits + self.misses
+        ratio = 100.0 * self.hits / n if n else 0.0
+        return (
+            f"{self.name}: {len(self.keys())} entries\n"
+            f"hits: {self.hits} misses: {self.misses} ({ratio:.1f}% hits)"
+        )
+    #@-others
+#@+node:ekr.20261018213344.1: ** class AtAutoCache
+class AtAutoCache(ExternalFilesCache):
+    """
+    A cache of the outlines that importers create for @auto nodes.
+
+    Keys are normalized paths. Values are tuples (hash, tree), where hash
+    is the hash of the file's contents and of the importer's signature,
+    and tree is the result of LeoImportCommands.tree_of.
+    """
+
+    name = '@auto cache'
+    prefix = 'at-auto:::'
 #@+node:ekr.20180627041556.1: ** class GlobalCacher
 class GlobalCacher:
     """A singleton global cacher, g.app.db"""
@@ -14,6 +14,8 @@ import string
 # import sys
 import time
 assert time
+import unittest
+import weakref
 import leo.core.leoGlobals as g
 from leo.core.leoQt import Qsci, QtGui, QtWidgets
 from leo.core.leoColor import leo_color_database
@@ -224,6 +226,91 @@ class BaseJEditColorizer(BaseColorizer):
                 else:
                     theList.append(rule)
                 theDict[ch] = theList
+    #@+node:ekr.20261018203120.1: *3* bjc.Background coloring
+    # Bodies with more than @int colorizer-background-lines lines are colored
+    # a screenful at a time. recolor colors the visible lines at once and
+    # defers all later lines. An idle-time handler then colors the deferred
+    # lines in chunks. Bodies with more than @int qt-max-colorized-chars
+    # characters are not colored at all.
+
+    backgroundChunk = 200  # The number of lines colored by the next chunk.
+    backgroundLimit = None  # The last line to be colored, -1 (color nothing) or None (color everything).
+    backgroundTimer = None  # The IdleTime instance that colors deferred lines.
+    backgroundVnode = None  # The vnode whose lines are being colored.
+    deferredState = -2  # The state of deferred lines. Qt uses -1 for new lines.
+    screenLines = 50  # The number of visible lines if there is no body widget.
+    #@+node:ekr.20261018203120.2: *4* bjc.colorInBackground
+    def colorInBackground(self, timer):
+        """
+        An idle-time handler: color the next chunk of deferred lines.
+        Qt recolors lines until their states converge, so this colors every
+        line from the first deferred line to the new limit.
+        """
+        c = self.c
+        limit = self.backgroundLimit
+        if (
+            not c.exists or c.p.v != self.backgroundVnode
+            or limit is None or limit < 0
+        ):
+            timer.stop()
+            return
+        t1 = time.perf_counter()
+        document = self.highlighter.document()
+        n = document.blockCount()
+        self.backgroundLimit = limit + self.backgroundChunk
+        if self.backgroundLimit >= n - 1:
+            self.backgroundLimit = None  # Color all lines from now on.
+            timer.stop()
+        if limit + 1 < n:
+            self.highlighter.rehighlightBlock(document.findBlockByNumber(limit + 1))
+        # Aim for about 50 msec. per chunk.
+        t2 = max(0.001, time.perf_counter() - t1)
+        chunk = int(self.backgroundChunk * 0.05 / t2)
+        self.backgroundChunk = max(50, min(10 * self.backgroundChunk, chunk))
+    #@+node:ekr.20261018203120.3: *4* bjc.deferLine
+    def deferLine(self, p, block_n):
+        """
+        Return True if recolor should leave line block_n of p.b uncolored,
+        either for now or for good.
+        """
+        if p.v != self.backgroundVnode:
+            self.startBackgroundColoring(p)
+        limit = self.backgroundLimit
+        if limit is None or block_n <= limit:
+            return False
+        self.highlighter.setCurrentBlockState(self.deferredState)
+        return True
+    #@+node:ekr.20261018203120.4: *4* bjc.lastVisibleLine
+    def lastVisibleLine(self):
+        """Return the number of the last visible line of the body."""
+        w = self.widget
+        if QtWidgets and isinstance(w, QtWidgets.QTextEdit):
+            cursor = w.cursorForPosition(w.viewport().rect().bottomLeft())
+            return cursor.blockNumber()
+        return self.screenLines
+    #@+node:ekr.20261018203120.5: *4* bjc.makeBackgroundTimer
+    def makeBackgroundTimer(self):
+        """Return an IdleTime instance that calls colorInBackground, or None."""
+        return g.IdleTime(self.colorInBackground, delay=0, tag='colorizer')
+    #@+node:ekr.20261018203120.6: *4* bjc.startBackgroundColoring
+    def startBackgroundColoring(self, p):
+        """Set self.backgroundLimit for p, a newly selected node."""
+        if self.backgroundTimer:
+            self.backgroundTimer.stop()
+        self.backgroundLimit = self.backgroundTimer = None
+        self.backgroundVnode = p.v
+        s = p.b
+        if 0 < self.max_colorized_chars < len(s):
+            self.backgroundLimit = -1  # Leave all lines uncolored.
+            return
+        if self.background_lines <= 0 or s.count('\n') <= self.background_lines:
+            return
+        timer = self.makeBackgroundTimer()
+        if not timer:
+            return  # No idle-time handling. Color everything now.
+        self.backgroundLimit = self.lastVisibleLine() + self.screenLines
+        self.backgroundTimer = timer
+        timer.start()
     #@+node:ekr.20111024091133.16702: *3* bjc.configure_hard_tab_width
     def configure_hard_tab_width(self):
         """Set the width of a hard tab.
@@ -231,7 +318,7 @@ class BaseJEditColorizer(BaseColorizer):
         """
         c, widget, wrapper = self.c, self.widget, self.wrapper
         # For some reason, the size is not accurate.
-        if isinstance(widget, QtWidgets.QTextEdit):
+        if QtWidgets and isinstance(widget, QtWidgets.QTextEdit):
             font = wrapper.widget.currentFont()
             info = QtGui.QFontInfo(font)
             size = info.pointSizeF()
@@ -908,6 +995,8 @@ class BaseJEditColorizer(BaseColorizer):
         self.color_tags_list = []
         self.showInvisibles      = getBool("show-invisibles-by-default")
         self.underline_undefined = getBool("underline-undefined-section-names")
+        self.background_lines    = c.config.getInt("colorizer-background-lines") or 0
+        self.max_colorized_chars = c.config.getInt("qt-max-colorized-chars") or 0
         self.use_hyperlinks      = getBool("use-hyperlinks")
         self.use_pygments        = None # Set in report_changes.
         self.use_pygments_styles = getBool('use-pygments-styles', default=True)
@@ -986,11 +1075,14 @@ class BaseJEditColorizer(BaseColorizer):
             self.prev_style = style_name
     #@+node:ekr.20110605121601.18641: *3* bjc.setTag
     last_v = None
+    lineTags = None  # Set by jedit.colorLine while recording a line.
 
     def setTag(self, tag, s, i, j):
         """Set the tag in the highlighter."""
         trace = 'coloring' in g.app.debug and not g.unitTesting
         self.n_setTag += 1
+        if self.lineTags is not None:
+            self.lineTags.append((tag, i, j))
         if i == j:
             return
         wrapper = self.wrapper  # A QTextEditWrapper
@@ -1001,6 +1093,8 @@ class BaseJEditColorizer(BaseColorizer):
         dots = tag.startswith('dots')
         if dots:
             tag = tag[len('dots') :]
+        if not QtGui:
+            return  # Running headless, from leoBridge.
         colorName = wrapper.configDict.get(tag)
             # This color name should already be valid.
         if not colorName:
@@ -1077,7 +1171,7 @@ class JEditColorizer(BaseJEditColorizer):
         super().__init__(c, widget, wrapper)
         #
         # Create the highlighter. The default is NullObject.
-        if isinstance(widget, QtWidgets.QTextEdit):
+        if QtWidgets and isinstance(widget, QtWidgets.QTextEdit):
             self.highlighter = LeoHighlighter(c,
                 colorizer=self,
                 document=widget.document(),
@@ -1093,6 +1187,17 @@ class JEditColorizer(BaseJEditColorizer):
         self.stateDict = {}  # Keys are state numbers, values state names.
         self.stateNameDict = {}  # Keys are state names, values are state numbers.
         #
+        # The line cache. See colorLine.
+        self.lineCache = weakref.WeakKeyDictionary()
+            # Keys are vnodes, values are dicts.
+            # Keys are (state name, line), values are (state name, restart function, tags).
+        self.lineCacheable = True
+        self.lineCacheDict = None  # The value of self.lineCache[self.lineCacheVnode].
+        self.lineCacheVnode = None
+        self.lineCacheGeneration = self.rulesGeneration
+        self.lineCacheHits = 0
+        self.lineCacheMisses = 0
+        #
         # Init common data...
         self.reloadSettings()
     #@+node:ekr.20110605121601.18580: *4* jedit.init
@@ -1136,6 +1241,7 @@ class JEditColorizer(BaseJEditColorizer):
         self.defineLeoKeywordsDict()
         self.defineDefaultColorsDict()
         self.defineDefaultFontDict()
+        self.clearLineCache()
         self.init()
     #@+node:ekr.20110605121601.18589: *3*  jedit.Pattern matchers
     #@+node:ekr.20110605121601.18590: *4*  About the pattern matchers
@@ -1215,6 +1321,7 @@ class JEditColorizer(BaseJEditColorizer):
         if i != 0:
             return 0
         if g.match_word(s, i, '@language'):
+            self.lineCacheable = False  # The line changes the mode.
             old_name = self.language
             j = g.skip_ws(s, i + len('@language'))
             k = g.skip_c_id(s, j)
@@ -1270,6 +1377,7 @@ class JEditColorizer(BaseJEditColorizer):
         if i == 0 and g.match_word(s, i, seq):
             j = i + len(seq)
             k = g.skip_ws(s, j)
+            self.lineCacheable = False  # Call c.frame.setWrap every time.
             self.colorRangeWithTag(s, i, k, 'leokeyword')
             c.frame.setWrap(c.p, force=True)
             return k - i
@@ -1293,6 +1401,7 @@ class JEditColorizer(BaseJEditColorizer):
         else:
             return 0
         c = self.c
+        self.lineCacheable = False  # The line may change the mode.
         self.colorRangeWithTag(s, 0, j, 'leokeyword')
         # New in Leo 5.5: optionally colorize doc parts using reStructuredText
         if c.config.getBool('color-doc-parts-as-rest'):
@@ -1320,6 +1429,7 @@ class JEditColorizer(BaseJEditColorizer):
                 if tag == '@language':
                     return self.match_at_language(s, 0)
                 j = len(tag)
+                self.lineCacheable = False  # The line changes the mode.
                 self.colorRangeWithTag(s, 0, j, 'leokeyword')  # 'docpart')
                 # Switch languages.
                 self.language = self.after_doc_language
@@ -1341,6 +1451,7 @@ class JEditColorizer(BaseJEditColorizer):
         """Matcher for <img...>"""
         m = self.image_url.match(s, i)
         if m:
+            self.lineCacheable = False
             self.image_src = src = m.group(1)
             j = len(src)
             doc = self.highlighter.document()
@@ -1413,6 +1524,7 @@ class JEditColorizer(BaseJEditColorizer):
         if k == -1:
             return 0
         j = k + 2
+        self.lineCacheable = False  # The coloring depends on the outline.
         self.colorRangeWithTag(s, i, i + 2, 'namebrackets')
         ref = g.findReference(s[i:j], p)
         if ref:
@@ -1708,14 +1820,17 @@ class JEditColorizer(BaseJEditColorizer):
         Return the length of the matching text if
         seq (a regular expression) matches the present position.
         """
-        try:
-            flags = re.MULTILINE
-            if self.ignore_case: flags |= re.IGNORECASE
-            re_obj = re.compile(pattern, flags)
-        except Exception:
-            # Do not call g.es here!
-            g.trace(f"Invalid regular expression: {pattern}")
-            return 0
+        flags = re.MULTILINE
+        if self.ignore_case: flags |= re.IGNORECASE
+        re_obj = self.regexpCache.get((pattern, flags))
+        if re_obj is None:
+            try:
+                re_obj = re.compile(pattern, flags)
+            except Exception:
+                # Do not call g.es here!
+                g.trace(f"Invalid regular expression: {pattern}")
+                return 0
+            self.regexpCache[pattern, flags] = re_obj
         # Match succeeds or fails more quickly than search.
         self.match_obj = mo = re_obj.match(s, i)  # re_obj.search(s,i)
         if mo is None:
@@ -2149,6 +2264,8 @@ class JEditColorizer(BaseJEditColorizer):
             self.n2languageDict[n] = self.language
         return n
     #@+node:ekr.20110605121601.18637: *3* jedit.colorRangeWithTag
+    url_leadins = re.compile('[fhuFHU]')
+
     def colorRangeWithTag(self, s, i, j, tag, delegate='', exclude_match=False):
         """
         Actually colorize the selected range.
@@ -2200,6 +2317,10 @@ class JEditColorizer(BaseJEditColorizer):
             # Allow UNL's and URL's *everywhere*.
             j = min(j, len(s))
             while i < j:
+                m = self.url_leadins.search(s, i, j)
+                if not m:
+                    break
+                i = m.start()
                 ch = s[i].lower()
                 if ch == 'u':
                     n = self.match_unl(s, i)
@@ -2209,6 +2330,44 @@ class JEditColorizer(BaseJEditColorizer):
                     i += max(1, n)
                 else:
                     i += 1
+    #@+node:ekr.20261018201512.1: *3* jedit.Compiled rules
+    # These caches are shared by all colorizers.
+    # The rulesDicts belong to the modes, not to colorizers.
+    leadinsCache = {}  # Keys are id(rulesDict), values are (rulesDict, signature, regex).
+    regexpCache = {}  # Keys are (pattern, flags), values are compiled regexes.
+    rulesGeneration = 0  # Incremented whenever a compiled ruleset changes.
+    #@+node:ekr.20261018201512.2: *4* jedit.compile_leadins
+    null_rules = ('match_blanks', 'match_tabs')  # Rules that never match.
+
+    def compile_leadins(self, rulesDict):
+        """
+        Return a regex matching any character that starts at least one rule
+        in rulesDict, or None. mainLoop skips all other characters.
+        """
+        data = self.leadinsCache.get(id(rulesDict))
+        if data and data[0] is rulesDict:
+            return data[2]
+        chars = sorted(
+            ch for ch, aList in rulesDict.items()
+            if len(ch) == 1 and any(f.__name__ not in self.null_rules for f in aList))
+        regex = re.compile(f"[{''.join(re.escape(ch) for ch in chars)}]") if chars else None
+        signature = self.rules_signature(rulesDict)
+        self.leadinsCache[id(rulesDict)] = rulesDict, signature, regex
+        return regex
+    #@+node:ekr.20261018201512.3: *4* jedit.check_leadins & rules_signature
+    def check_leadins(self, rulesDict):
+        """
+        Forget the compiled leadins of rulesDict if a plugin has changed rulesDict.
+        recolor calls this method when coloring the first line of a body.
+        """
+        data = self.leadinsCache.get(id(rulesDict))
+        if data and data[0] is rulesDict and data[1] != self.rules_signature(rulesDict):
+            del self.leadinsCache[id(rulesDict)]
+            # Cached lines may have been colored with the old rules.
+            JEditColorizer.rulesGeneration += 1
+
+    def rules_signature(self, rulesDict):
+        return len(rulesDict), sum(map(len, rulesDict.values()))
     #@+node:ekr.20110605121601.18638: *3* jedit.mainLoop
     tot_time = 0.0
 
@@ -2225,9 +2384,17 @@ class JEditColorizer(BaseJEditColorizer):
                 print('')
                 g.trace(f"NEW NODE: state {n} = {f_name} {p.h}\n")
         i = f(s) if f else 0
+        rulesDict = None
         while i < len(s):
-            progress = i
-            functions = self.rulesDict.get(s[i], [])
+            if self.rulesDict is not rulesDict:  # Matchers may change the mode.
+                rulesDict = self.rulesDict
+                leadins = self.compile_leadins(rulesDict)
+            # Skip all characters that can not start a match.
+            m = leadins and leadins.search(s, i)
+            if not m:
+                break
+            i = progress = m.start()
+            functions = rulesDict.get(s[i], [])
             for f in functions:
                 n = f(self, s, i)
                 if n is None:
@@ -2256,6 +2423,8 @@ class JEditColorizer(BaseJEditColorizer):
         p = self.c.p
         self.recolorCount += 1
         block_n = self.currentBlockNumber()
+        if self.deferLine(p, block_n):
+            return
         n = self.prevState()
         if p.v == self.old_v:
             new_language = self.n2languageDict.get(n)
@@ -2269,10 +2438,65 @@ class JEditColorizer(BaseJEditColorizer):
             self.init(p)
         if block_n == 0:
             n = self.initBlock0()
+            self.check_leadins(self.rulesDict)
         n = self.setState(n)  # Required.
         # Always color the line, even if colorizing is disabled.
         if s:
+            self.colorLine(p.v, n, s)
+    #@+node:ekr.20261018201512.4: *4* jedit.colorLine & clearLineCache
+    lineCacheSize = 100  # The maximum number of vnodes in self.lineCache.
+    lineCacheLines = 20000  # The maximum number of lines cached per vnode.
+
+    def colorLine(self, v, n, s):
+        """
+        Colorize line s of v.b, starting in state n.
+
+        The coloring of most lines depends only on the line and the starting
+        state. Replay the tags and ending state of such lines from
+        self.lineCache instead of calling mainLoop.
+
+        Matchers that depend on anything else clear self.lineCacheable.
+        """
+        if self.lineCacheGeneration != self.rulesGeneration:
+            self.clearLineCache()
+            self.lineCacheGeneration = self.rulesGeneration
+        if v is not self.lineCacheVnode:
+            # Make v the most recently colored vnode.
+            d = self.lineCache.pop(v, None)
+            if d is None:
+                d = {}
+                if len(self.lineCache) >= self.lineCacheSize:
+                    del self.lineCache[next(iter(self.lineCache))]
+            self.lineCache[v] = d
+            self.lineCacheVnode, self.lineCacheDict = v, d
+        d = self.lineCacheDict
+        key = self.stateDict.get(n), s
+        data = d.get(key)
+        if data:
+            # Replay the line.
+            state, f, tags = data
+            for tag, i, j in tags:
+                self.setTag(tag, s, i, j)
+            self.setState(self.stateNameToStateNumber(f, state))
+            self.lineCacheHits += 1
+            return
+        self.lineCacheMisses += 1
+        self.lineCacheable, self.lineTags = True, []
+        language = self.language
+        try:
             self.mainLoop(n, s)
+        finally:
+            tags, self.lineTags = self.lineTags, None
+        n = self.currentState()
+        state = self.stateDict.get(n)
+        if self.lineCacheable and language == self.language and key[0] and state:
+            if len(d) >= self.lineCacheLines:
+                d.clear()
+            d[key] = state, self.restartDict.get(n), tags
+
+    def clearLineCache(self):
+        self.lineCache.clear()
+        self.lineCacheVnode = self.lineCacheDict = None
     #@+node:ekr.20170126100139.1: *4* jedit.initBlock0
     def initBlock0(self):
         """
@@ -2332,6 +2556,8 @@ class JEditColorizer(BaseJEditColorizer):
                     aList.insert(0, wiki_rule)
                     d[ch] = aList
         self.rulesDict = d
+        self.leadinsCache.pop(id(d), None)
+        self.clearLineCache()
     #@-others
 #@+node:ekr.20110605121601.18565: ** class LeoHighlighter (QSyntaxHighlighter)
 # Careful: we may be running from the bridge.
@@ -2500,6 +2726,91 @@ if QtGui:
             return qcolor
         #@-others
         #@-others
+#@+node:ekr.20261018201512.5: ** class StringHighlighter
+class StringHighlighter:
+    """
+    A headless stand-in for LeoHighlighter, used by unit tests and benchmarks.
+    Like QSyntaxHighlighter, it colorizes a list of lines, one block at a time.
+    """
+    #@+others
+    #@+node:ekr.20261018201512.6: *3* string_h.ctor
+    def __init__(self, colorizer):
+        self.colorizer = colorizer
+        colorizer.highlighter = self
+        self.block_n = -1  # The number of the block being colored.
+        self.lines = []  # The text of each block.
+        self.n_calls = 0
+        self.state = -1  # The state of the block being colored.
+        self.states = []  # The ending state of each block.
+    #@+node:ekr.20261018201512.7: *3* string_h: QSyntaxHighlighter methods
+    def currentBlock(self):
+        return self
+
+    def blockNumber(self):
+        return self.block_n
+
+    def isValid(self):
+        return 0 <= self.block_n < len(self.lines)
+
+    def currentBlockState(self):
+        return self.state
+
+    def previousBlockState(self):
+        return self.states[self.block_n - 1] if self.block_n > 0 else -1
+
+    def setCurrentBlockState(self, n):
+        self.state = n
+
+    def setFormat(self, i, length, format):
+        pass
+    #@+node:ekr.20261018203120.7: *3* string_h: QTextDocument methods
+    # The highlighter is also the document. Blocks are line numbers.
+
+    def document(self):
+        return self
+
+    def blockCount(self):
+        return len(self.lines)
+
+    def findBlockByNumber(self, n):
+        return n
+    #@+node:ekr.20261018201512.8: *3* string_h.highlightBlock
+    def highlightBlock(self, n):
+        """Colorize block n. Return True if its ending state changed."""
+        self.n_calls += 1
+        self.block_n, self.state = n, -1
+        self.colorizer.recolor(self.lines[n])
+        changed = self.state != self.states[n]
+        self.states[n] = self.state
+        return changed
+    #@+node:ekr.20261018201512.9: *3* string_h.rehighlight
+    def rehighlight(self, s):
+        """Colorize all of s, as QSyntaxHighlighter does after setAllText."""
+        self.lines = s.split('\n')
+        self.states = [None] * len(self.lines)
+        for n in range(len(self.lines)):
+            self.highlightBlock(n)
+    #@+node:ekr.20261018201512.10: *3* string_h.setLine
+    def setLine(self, n, s):
+        """
+        Replace line n by s, then recolor lines until their ending states
+        converge, as QSyntaxHighlighter does after an edit.
+
+        Return the number of recolored lines.
+        """
+        self.lines[n] = s
+        return self.rehighlightBlock(n)
+    #@+node:ekr.20261018203120.8: *3* string_h.rehighlightBlock
+    def rehighlightBlock(self, n):
+        """
+        Recolor line n and following lines until their ending states converge.
+        Return the number of recolored lines.
+        """
+        n_calls = self.n_calls
+        while n < len(self.lines) and self.highlightBlock(n):
+            n += 1
+        return self.n_calls - n_calls
+    #@-others
 #@+node:ekr.20140906095826.18717: ** class NullScintillaLexer (QsciLexerCustom)
 if Qsci:
 
@@ -2797,6 +3108,8 @@ class PygmentsColorizer(BaseJEditColorizer):
         """
         p = self.c.p
         self.recolorCount += 1
+        if self.deferLine(p, self.highlighter.currentBlock().blockNumber()):
+            return
         if p.v != self.old_v:
             self.updateSyntaxColorer(p)
                 # Force a full recolor
@@ -3078,6 +3391,136 @@ if pygments:
         # For TravisCi.
         PygmentsBlockUserData = g.NullObject
     #@-others
+#@+node:ekr.20261018201512.11: ** class TestColorizer
+class TestColorizer(unittest.TestCase):
+    """Test cases for the JEditColorizer class."""
+    #@+others
+    #@+node:ekr.20261018201512.12: *3* setUp (TestColorizer)
+    def setUp(self):
+        """Create a headless commander and a headless colorizer."""
+        import os
+        import tempfile
+        import leo.core.leoBridge as leoBridge
+        bridge = leoBridge.headless_controller()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.c = c = bridge.openLeoFile(os.path.join(temp_dir.name, 'test.leo'))
+        self.root = c.rootPosition()
+        self.root.b = (
+            '@language python\n'
+            'def spam(a, b=2):\n'
+            '    """\n'
+            '    A docstring containing http://leoeditor.com\n'
+            '    """\n'
+            '    # A comment.\n'
+            '    return a + b  # Another comment.\n'
+            '\n'
+            '@language c\n'
+            'int main(int argc) {\n'
+            '    /* A\n'
+            '       comment */\n'
+            '    return 0;\n'
+            '}\n'
+        )
+        self.other = self.root.insertAfter()
+        self.other.b = '@language html\n<html><body>\n<!-- a\ncomment -->\n</body></html>\n'
+        self.colorizer = self.make_colorizer()
+
+    def make_colorizer(self):
+        """Return a headless colorizer that remembers all tags."""
+        c = self.c
+        colorizer = JEditColorizer(c, None, c.frame.body.wrapper)
+        highlighter = StringHighlighter(colorizer)
+        colorizer.tags_list = []
+        setTag = colorizer.setTag
+
+        def record(tag, s, i, j):
+            colorizer.tags_list.append((highlighter.block_n, tag, i, j))
+            setTag(tag, s, i, j)
+
+        colorizer.setTag = record
+        return colorizer
+    #@+node:ekr.20261018201512.13: *3* color (TestColorizer)
+    def color(self, colorizer, p):
+        """Select p and colorize p.b. Return (tags, state names)."""
+        c, highlighter = self.c, colorizer.highlighter
+        c.selectPosition(p)
+        colorizer.tags_list = []
+        highlighter.rehighlight(p.b)
+        return colorizer.tags_list, self.state_names(colorizer)
+
+    def state_names(self, colorizer):
+        return [colorizer.stateDict.get(n) for n in colorizer.highlighter.states]
+    #@+node:ekr.20261018201512.14: *3* test_line_cache
+    def test_line_cache(self):
+        x = self.colorizer
+        tags, states = self.color(x, self.root)
+        self.assertTrue(tags)
+        self.assertTrue(any(tag == 'url' for n, tag, i, j in tags))
+        self.assertEqual(states[3], states[2], msg='docstring')
+        self.assertNotEqual(states[3], states[4], msg='docstring')
+        self.assertNotEqual(states[10], states[9], msg='c comment')
+        self.color(x, self.other)
+        # Reselecting a node replays all cached lines.
+        hits, misses = x.lineCacheHits, x.lineCacheMisses
+        self.assertEqual((tags, states), self.color(x, self.root))
+        self.assertGreater(x.lineCacheHits, hits)
+        self.assertEqual(x.lineCacheMisses - misses, 2, msg='only @language lines are recolored')
+        # A new colorizer starts with an empty cache.
+        self.assertEqual((tags, states), self.color(self.make_colorizer(), self.root))
+    #@+node:ekr.20261018201512.15: *3* test_edit_line
+    def test_edit_line(self):
+        x = self.colorizer
+        h = x.highlighter
+        self.color(x, self.root)
+        # Recoloring stops as soon as the states converge.
+        self.assertEqual(h.setLine(5, '    # An edited comment.'), 1)
+        # Opening a docstring changes the state of all following lines.
+        n = h.setLine(5, '    """')
+        self.assertGreater(n, 3)
+        p = self.root.copy()
+        p.b = '\n'.join(h.lines)
+        tags, states = self.color(self.make_colorizer(), p)
+        self.assertEqual(self.state_names(x), states)
+        self.assertEqual(h.setLine(5, '    # A comment.'), n)
+    #@+node:ekr.20261018203120.10: *3* test_background_coloring
+    def test_background_coloring(self):
+
+        class Timer:
+            active = False
+            def start(self):
+                self.active = True
+            def stop(self):
+                self.active = False
+
+        p = self.root.insertAsLastChild()
+        p.b = '@language python\n' + 'def spam():\n    """\n    a\n    """\n' * 250
+        tags, states = self.color(self.make_colorizer(), p)
+        # Color the first lines at once.
+        x, timer = self.make_colorizer(), Timer()
+        x.background_lines = 100
+        x.makeBackgroundTimer = lambda: timer
+        self.color(x, p)
+        self.assertTrue(timer.active)
+        limit = x.backgroundLimit
+        self.assertEqual(limit, x.lastVisibleLine() + x.screenLines)
+        self.assertEqual(x.highlighter.states[limit + 1:], [x.deferredState] * (len(states) - limit - 1))
+        # Color all deferred lines at idle time.
+        for i in range(len(states)):
+            if not timer.active:
+                break
+            x.colorInBackground(timer)
+        self.assertFalse(timer.active)
+        self.assertIsNone(x.backgroundLimit)
+        self.assertEqual(self.state_names(x), states)
+        self.assertEqual(sorted(x.tags_list), sorted(tags))
+        # Don't color huge bodies at all.
+        x, timer = self.make_colorizer(), Timer()
+        x.max_colorized_chars = 100
+        x.makeBackgroundTimer = lambda: timer
+        self.assertEqual(self.color(x, p)[0], [])
+        self.assertFalse(timer.active)
+    #@-others
 #@-others
 #@@language python
 #@@tabwidth -4
@@ -9,11 +9,13 @@ import leo.core.leoNodes as leoNodes
     # The leoCommands ctor now does most leo.core.leo* imports.
     # This breaks circular dependencies.
 import itertools
+import operator
 import os
 import re
 import sys
 import time
 import tokenize  # for c.checkAllPythonCode
+import weakref
 try:
     import tabnanny  # for Check Python command # Does not exist in jython
 except ImportError:
@@ -125,6 +127,7 @@ class Commands:
     def initDebugIvars(self):
         """Init Commander debugging ivars."""
         self.command_count = 0
+        self.pathExpressionCount = 0
         self.scanAtPathDirectivesCount = 0
         self.trace_focus_count = 0
     #@+node:ekr.20120217070122.10471: *5* c.initDocumentIvars
@@ -140,6 +143,20 @@ class Commands:
             # The fileName for c.nodeConflictList.
         self.user_dict = {}
             # Non-persistent dictionary for free use by scripts and plugins.
+        self.directivesCache = weakref.WeakKeyDictionary()
+            # Keys are vnodes, values are dicts. See g.get_directives_dict.
+        self.resolvedDirectivesCache = {}
+            # Keys are (kind, v, parents). See c.getResolvedDirectives.
+        self.resolvedDirectivesGeneration = 0
+            # The tree generation of c.resolvedDirectivesCache.
+        self.changeJournal = None
+            # A list of (kind, v) tuples, or None.
+            # When not None, VNode link, expand and headline methods
+            # append to this list. See leoFastRedraw.py.
+        self.dbChanges = None
+            # A set of vnodes whose rows in the .db file may have changed, or None.
+            # When not None, VNode setters add vnodes to this set.
+            # See fc.exportToSqlite.
     #@+node:ekr.20120217070122.10467: *5* c.initEventIvars
     def initEventIvars(self):
         """Init ivars relating to gui events."""
@@ -249,6 +266,7 @@ class Commands:
         c.fileCommands = DummyFileCommands()
         self.hiddenRootNode = leoNodes.VNode(context=c, gnx=gnx)
         self.hiddenRootNode.h = '<hidden root vnode>'
+        self.outlineSnapshot = leoNodes.OutlineSnapshot(c)
         c.fileCommands = None
         # Create the gui frame.
         title = c.computeWindowTitle(c.mFileName)
@@ -779,14 +797,12 @@ class Commands:
     def all_nodes(self):
         """A generator returning all vnodes in the outline, in outline order."""
         c = self
-        for p in c.all_positions():
-            yield p.v
+        yield from c.outlineSnapshot.nodes()
 
     def all_unique_nodes(self):
         """A generator returning each vnode of the outline."""
         c = self
-        for p in c.all_unique_positions(copy=False):
-            yield p.v
+        yield from c.outlineSnapshot.nodes(unique=True)
 
     # Compatibility with old code...
 
@@ -798,10 +814,7 @@ class Commands:
     def all_positions(self, copy=True):
         """A generator return all positions of the outline, in outline order."""
         c = self
-        p = c.rootPosition()
-        while p:
-            yield p.copy() if copy else p
-            p.moveToThreadNext()
+        yield from c.outlineSnapshot.positions(copy=copy)
 
     # Compatibility with old code...
 
@@ -880,15 +893,7 @@ class Commands:
         Returns only the first position for each vnode.
         """
         c = self
-        p = c.rootPosition()
-        seen = set()
-        while p:
-            if p.v in seen:
-                p.moveToNodeAfterTree()
-            else:
-                seen.add(p.v)
-                yield p.copy() if copy else p
-                p.moveToThreadNext()
+        yield from c.outlineSnapshot.positions(copy=copy, unique=True)
 
     # Compatibility with old code...
 
@@ -1020,6 +1025,17 @@ class Commands:
             j = max(i, len(head) + len(s) - 1)
             oldSel = i, j
         return head, lines, tail, oldSel, oldVview  # string,list,string,tuple.
+    #@+node:ekr.20261018191544.9: *5* c.getOutlineSnapshot
+    def getOutlineSnapshot(self):
+        """
+        Return c.outlineSnapshot, a leoNodes.OutlineSnapshot, first
+        rebuilding it if the structure of the outline has changed.
+        """
+        c = self
+        snapshot = c.outlineSnapshot
+        if not snapshot.isValid():
+            snapshot.build()
+        return snapshot
     #@+node:ekr.20150417073117.1: *5* c.getTabWidth
     def getTabWidth(self, p):
         """Return the tab width in effect at p."""
@@ -1096,8 +1112,8 @@ class Commands:
         """Return True if a position exists in c's tree"""
         if not p or not p.v: return False
 
-        rstack = root.stack + [(root.v, root._childIndex)] if root else []
-        pstack = p.stack + [(p.v, p._childIndex)]
+        rstack = root._getStack() + [(root.v, root._childIndex)] if root else []
+        pstack = p._getStack() + [(p.v, p._childIndex)]
 
         if len(rstack) > len(pstack): return False
 
@@ -1113,7 +1129,7 @@ class Commands:
     def dumpPosition(self, p):
         """Dump position p and it's ancestors."""
         g.trace('=====', p.h, p._childIndex)
-        for i, data in enumerate(p.stack):
+        for i, data in enumerate(p._getStack()):
             v, childIndex = data
             print(f"{i} {childIndex} {v._headString}")
     #@+node:ekr.20040803140033.2: *5* c.rootPosition
@@ -2026,7 +2042,7 @@ class Commands:
             g.es_print(
                 f"\nc.os_path_finalize_join is deprecated. called from: {callers}")
         return g.os_path_finalize_join(*args, **keys)
-    #@+node:ekr.20080827175609.39: *4* c.scanAllDirectives
+    #@+node:ekr.20080827175609.39: *4* c.scanAllDirectives & helper
     #@@nobeautify
 
     def scanAllDirectives(self,p=None):
@@ -2034,16 +2050,27 @@ class Commands:
         Scan p and ancestors for directives.
 
         Returns a dict containing the results, including defaults.
+
+        c.getResolvedDirectives caches the results.
         """
         c = self
         p = p or c.p
-        # Set defaults
         language = c.target_language and c.target_language.lower()
+        wrap = c.config.getBool("body-pane-wraps")
+        context = (
+            language, c.page_width, c.tab_width, wrap, c.getPathContext())
+        d = c.getResolvedDirectives('all', p, context,
+            lambda: c.scanAllDirectivesHelper(p, language, wrap))
+        return dict(d, pluginsList=[])
+
+    def scanAllDirectivesHelper(self, p, language, wrap):
+        """Scan p and ancestors for directives, without using caches."""
+        c = self
+        # Set defaults
         lang_dict = {
             'language':language,
             'delims':g.set_delims_from_language(language),
         }
-        wrap = c.config.getBool("body-pane-wraps")
         table = (
             ('encoding',    None,           g.scanAtEncodingDirectives),
             ('lang-dict',   lang_dict,      g.scanAtCommentAndAtLanguageDirectives),
@@ -2073,6 +2100,48 @@ class Commands:
             "wrap":         d.get('wrap'),
         }
         return d
+    #@+node:ekr.20261018195310.1: *4* c.getResolvedDirectives & getPathContext
+    def getResolvedDirectives(self, kind, p, context, func):
+        """
+        Return func(), the kind of directives in effect at p.
+
+        func() may depend only on context and on the headlines and bodies of
+        p and its ancestors. c.resolvedDirectivesCache caches the result
+        until one of those changes. Results of path expressions may depend
+        on anything, so results that evaluated path expressions aren't cached.
+        """
+        c = self
+        if not isinstance(p, leoNodes.Position):
+            return func()
+        cache = c.resolvedDirectivesCache
+        generation = c.frame.tree.generation
+        if c.resolvedDirectivesGeneration != generation:
+            # Forget positions that may no longer exist.
+            cache.clear()
+            c.resolvedDirectivesGeneration = generation
+        get_texts = operator.attrgetter('_headString', '_bodyString')
+        key = kind, p.v, p._getParents()
+        entry = cache.get(key)
+        if entry:
+            entry_context, vnodes, texts, result = entry
+            if entry_context == context and list(map(get_texts, vnodes)) == texts:
+                return result
+        count = c.pathExpressionCount
+        result = func()
+        if c.pathExpressionCount == count:
+            vnodes = [z.v for z in p.self_and_parents(copy=False)]
+            cache[key] = (context, vnodes, list(map(get_texts, vnodes)), result)
+        return result
+
+    def getPathContext(self):
+        """Return everything besides directives that affects @path directives."""
+        c = self
+        return (
+            c.openDirectory,
+            g.app.config.relative_path_base_directory,
+            g.app.loadDir,
+            g.directives_pat,
+        )
     #@+node:ekr.20080828103146.15: *4* c.scanAtPathDirectives
     def scanAtPathDirectives(self, aList):
         """
@@ -2172,6 +2241,7 @@ class Commands:
     def replace_path_expression(self, expr):
         """ local function to replace a single path expression."""
         c = self
+        c.pathExpressionCount += 1  # See c.getResolvedDirectives.
         d = {
             'c': c,
             'g': g,
@@ -3792,7 +3862,8 @@ class Commands:
         safe_at_file=True,
         theTypes=None,
         # force_at_others=False, # tag:no-longer-used
-        ignore_pattern=None
+        ignore_pattern=None,
+        processes=None,
     ):
         #@+<< docstring >>
         #@+node:ekr.20130823083943.12614: *4* << docstring >>
@@ -3807,6 +3878,8 @@ class Commands:
             safe_at_file=True True: produce @@file nodes instead of @file nodes.
             theTypes=None     A list of file extensions to import.
                               None is equivalent to ['.py']
+            processes=None    The number of processes that import files.
+                              None: use @int recursive-import-processes.
 
         This method cleans imported files as follows:
 
@@ -3829,7 +3902,8 @@ class Commands:
                     safe_at_file=safe_at_file,
                     theTypes=['.py'] if not theTypes else theTypes,
                     # force_at_others = force_at_others,  # tag:no-longer-used
-                    ignore_pattern=ignore_pattern
+                    ignore_pattern=ignore_pattern,
+                    processes=processes,
                 )
                 cc.run(dir_)
             finally:
@@ -3988,8 +4062,7 @@ class Commands:
             return []
 
         def p2link(p):
-            parent_v = p.stack[-1][0] if p.stack else c.hiddenRootNode
-            return p._childIndex, parent_v
+            return p._childIndex, p._parentVnode()
 
         links_to_be_cut = sorted(set(map(p2link, aList)), key=lambda x:-x[0])
         undodata = []
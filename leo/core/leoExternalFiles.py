@@ -5,9 +5,12 @@
 import leo.core.leoGlobals as g
 import getpass
 import os
+import struct
 import subprocess
+import sys
 import tempfile
 import time
+import unittest
 #@+others
 #@+node:ekr.20160306110233.1: ** class ExternalFile
 class ExternalFile:
@@ -71,6 +74,21 @@ class ExternalFilesController:
             # Copy of g.app.commanders()
         self.unchecked_files = []
             # Copy of self file. Only one files is checked at idle time.
+        self.watcher = None
+            # An InotifyWatcher, or None.
+        self.watcher_changed_paths = set()
+            # Watched paths that changed since the last round of idle checks.
+            # None: the watcher lost events, so all paths must be checked.
+        self.watcher_d = {}
+            # Keys are commanders. Values are tuples (signature, paths_d).
+            # See efc.watcher_check_commander.
+        self.watcher_enabled_d = {}
+            # Keys are commanders.
+            # Values are cached @bool watch-external-files settings.
+        self.watcher_failed = False
+            # True: InotifyWatcher is not available.
+        self.watcher_unwatched = set()
+            # Paths that the watcher can not watch. Always check them.
         self._time_d = {}
             # Keys are full paths, values are modification times.
             # DO NOT alter directly, use set_time(path) and
@@ -154,6 +172,8 @@ class ExternalFilesController:
                     z for z in g.app.commanders() if self.is_enabled(z)
                 ]
                 self.unchecked_files = [z for z in self.files if z.exists()]
+                if self.watcher:
+                    self.start_watcher_round()
         else:
             # First, check all existing open-with files.
             for ef in self.files:  # A list of ExternalFile instances.
@@ -170,6 +190,9 @@ class ExternalFilesController:
         Check all external files corresponding to @<file> nodes in c for
         changes.
         '''
+        if self.use_watcher(c):
+            self.watcher_check_commander(c)
+            return
         # #1100: always scan the entire file for @<file> nodes.
         # #1134: Nested @<file> nodes are no longer valid, but this will do no harm.
         for p in c.all_unique_positions():
@@ -222,6 +245,109 @@ class ExternalFilesController:
             else:
                 p.setDirty()
                 c.setChanged()
+    #@+node:ekr.20261018150210.1: *5* efc.watcher helpers
+    #@+node:ekr.20261018150210.2: *6* efc.find_at_file_paths
+    def find_at_file_paths(self, c):
+        '''
+        Return a dict describing all @<file> nodes of c.
+        Keys are full paths. Values are positions.
+        '''
+        d = {}
+        for p in c.all_unique_positions():
+            if p.isAnyAtFileNode():
+                path = g.fullPath(c, p)
+                if path and path not in d:
+                    d[path] = p.copy()
+        return d
+    #@+node:ekr.20261018150210.3: *6* efc.outline_signature
+    def outline_signature(self, c):
+        '''
+        Return a value that changes whenever the paths of c's @<file> nodes
+        may have changed.
+
+        Scripts, imports, at.readAll and the bridge change outlines without
+        using the undoer, so use the counts that the low-level vnode methods
+        increment: tree.generation for structure changes, tree.headGeneration
+        for headline changes and tree.bodyGeneration for changes to bodies
+        other than the body being edited. Typing into that body changes the
+        signature only if the old or new body contains an @path directive.
+        '''
+        tree = c.frame.tree
+        v = tree.lastBodyChanged
+        b = v._bodyString if v else ''
+        return (
+            c.fileName(), tree.generation, tree.headGeneration,
+            tree.bodyGeneration, b if '@path' in b else None,
+        )
+    #@+node:ekr.20261018150210.4: *6* efc.start_watcher_round
+    def start_watcher_round(self):
+        '''
+        Start a new round of idle checks:
+        read all pending watcher events and forget closed commanders.
+        '''
+        commanders = g.app.commanders()
+        closed = [z for z in self.watcher_d if z not in commanders]
+        for c in closed:
+            del self.watcher_d[c]
+            self.watcher_enabled_d.pop(c, None)
+        if closed:
+            self.update_watcher()
+        self.watcher_changed_paths = self.watcher.read_events()
+    #@+node:ekr.20261018150210.5: *6* efc.update_watcher
+    def update_watcher(self):
+        '''Tell the watcher to watch the @<file> paths of all commanders.'''
+        paths = set()
+        for signature, paths_d in self.watcher_d.values():
+            paths.update(paths_d)
+        self.watcher_unwatched = self.watcher.set_paths(paths)
+    #@+node:ekr.20261018150210.6: *6* efc.use_watcher
+    def use_watcher(self, c):
+        '''
+        Return True if idle_check_commander should use the watcher for c.
+        Create the watcher if necessary.
+        '''
+        d = self.watcher_enabled_d
+        val = d.get(c)
+        if val is None:
+            val = c.config.getBool('watch-external-files', default=True)
+            d[c] = val
+        if not val or self.watcher_failed:
+            return False
+        if not self.watcher:
+            try:
+                self.watcher = InotifyWatcher()
+                self.watcher_changed_paths = set()
+            except Exception:
+                # Fall back to polling.
+                self.watcher_failed = True
+                return False
+        return True
+    #@+node:ekr.20261018150210.7: *6* efc.watcher_check_commander
+    def watcher_check_commander(self, c):
+        '''
+        Check only the external files of c that the watcher reports as changed.
+
+        Rescan c's @<file> nodes only when their paths may have changed.
+        Poll newly found files once, to initialize their times & checksums.
+        '''
+        signature = self.outline_signature(c)
+        old_signature, old_paths_d = self.watcher_d.get(c, (None, {}))
+        if signature == old_signature:
+            paths_d = old_paths_d
+            new_paths = set()
+        else:
+            paths_d = self.find_at_file_paths(c)
+            new_paths = set(paths_d) - set(old_paths_d)
+            self.watcher_d[c] = signature, paths_d
+            if set(paths_d) != set(old_paths_d):
+                self.update_watcher()
+        changed = self.watcher_changed_paths
+        for path, p in paths_d.items():
+            if (
+                changed is None or path in changed or
+                path in new_paths or path in self.watcher_unwatched
+            ):
+                self.idle_check_at_file_node(c, p)
     #@+node:ekr.20150404082344.1: *4* efc.open_with & helpers
     def open_with(self, c, d):
         '''
@@ -459,6 +585,9 @@ class ExternalFilesController:
         for ef in self.files[:]:
             self.destroy_temp_file(ef)
         self.files = []
+        if self.watcher:
+            self.watcher.close()
+            self.watcher = None
     #@+node:ekr.20150405110219.1: *3* efc.utilities
     # pylint: disable=no-value-for-parameter
     #@+node:ekr.20150405200212.1: *4* efc.ask
@@ -616,7 +745,272 @@ class ExternalFilesController:
             title='External file changed',
         )
     #@-others
+#@+node:ekr.20261018150210.8: ** class InotifyWatcher
+class InotifyWatcher:
+    '''
+    A class that watches a set of files using Linux's inotify API.
+
+    The watcher places watches on the files' directories, so it sees files
+    that editors replace by renaming a new file.
+
+    The ctor raises an exception if inotify is not available.
+    '''
+    # Constants from <sys/inotify.h>.
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    mask = (
+        IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+        IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR)
+    #@+others
+    #@+node:ekr.20261018150210.9: *3* watcher.ctor
+    def __init__(self):
+        '''Ctor for InotifyWatcher class.'''
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify requires Linux')
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.ctypes = ctypes
+        self.libc = libc
+        self.fd = fd
+        self.dirs_d = {}
+            # Keys are real paths of directories. Values are watch descriptors.
+        self.paths_d = {}
+            # Keys are real paths of files. Values are the paths given to set_paths.
+        self.wd_d = {}
+            # Keys are watch descriptors. Values are real paths of directories.
+    #@+node:ekr.20261018150210.10: *3* watcher.close
+    def close(self):
+        '''Close the inotify file descriptor, removing all watches.'''
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        self.dirs_d, self.paths_d, self.wd_d = {}, {}, {}
+    #@+node:ekr.20261018150210.11: *3* watcher.read_events
+    def read_events(self):
+        '''
+        Read all pending events without blocking.
+
+        Return the set of watched paths that have changed since the last call,
+        or None if the kernel's event queue overflowed.
+        '''
+        changed, overflow = set(), False
+        if self.fd is None:
+            return changed
+        header_size = struct.calcsize('iIII')
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            i = 0
+            while i + header_size <= len(data):
+                wd, mask, cookie, n = struct.unpack_from('iIII', data, i)
+                name = data[i + header_size : i + header_size + n].rstrip(b'\0')
+                i += header_size + n
+                if mask & self.IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                directory = self.wd_d.get(wd)
+                if directory is None:
+                    continue
+                if mask & self.IN_IGNORED:
+                    # The directory has been deleted or moved.
+                    # Report all its files and forget the watch.
+                    del self.wd_d[wd]
+                    del self.dirs_d[directory]
+                    changed.update(path for real_path, path in self.paths_d.items()
+                        if os.path.dirname(real_path) == directory)
+                    continue
+                path = self.paths_d.get(os.path.join(directory, os.fsdecode(name)))
+                if path:
+                    changed.add(path)
+        return None if overflow else changed
+    #@+node:ekr.20261018150210.12: *3* watcher.set_paths
+    def set_paths(self, paths):
+        '''
+        Watch exactly the given paths, adding and removing directory watches as needed.
+
+        Return the set of paths that can not be watched.
+        '''
+        if self.fd is None:
+            return set(paths)
+        paths_d = {os.path.realpath(z): z for z in paths}
+        directories = {os.path.dirname(z) for z in paths_d}
+        for directory in list(self.dirs_d):
+            if directory not in directories:
+                wd = self.dirs_d.pop(directory)
+                del self.wd_d[wd]
+                self.libc.inotify_rm_watch(self.fd, wd)
+        for directory in directories:
+            if directory not in self.dirs_d:
+                wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.mask)
+                if wd >= 0:
+                    self.dirs_d[directory] = wd
+                    self.wd_d[wd] = directory
+        self.paths_d = paths_d
+        return {path for real_path, path in paths_d.items()
+            if os.path.dirname(real_path) not in self.dirs_d}
+    #@-others
+#@+node:ekr.20261018150210.13: ** class TestExternalFiles
+class TestExternalFiles(unittest.TestCase):
+    '''Test cases for leoExternalFiles.py'''
+    #@+others
+    #@+node:ekr.20261018150210.15: *3* TestExternalFiles.test_efc_watcher
+    def test_efc_watcher(self):
+        '''Test that efc.idle_check_commander checks only changed files.'''
+        import leo.core.leoBridge as leoBridge
+        try:
+            InotifyWatcher().close()
+        except Exception:
+            self.skipTest('inotify not available')
+        bridge = leoBridge.headless_controller()
+        import leo.core.leoApp as leoApp
+        temp_dir = tempfile.TemporaryDirectory()
+        c = bridge.openLeoFile(os.path.join(temp_dir.name, 'test.leo'))
+        old_manager = g.app.idleTimeManager
+        g.app.idleTimeManager = old_manager or leoApp.IdleTimeManager()
+            # The bridge does not create an IdleTimeManager.
+        efc = ExternalFilesController(c)
+        try:
+            root = c.rootPosition()
+            paths = []
+            for i in range(3):
+                p = root.insertAsLastChild()
+                path = os.path.join(temp_dir.name, f"x{i}.py")
+                p.h = f"@clean {path}"
+                paths.append(path)
+                with open(path, 'w') as f:
+                    f.write('original\n')
+            checked = []
+            efc.idle_check_at_file_node = lambda c, p: checked.append(p.h)
+            efc.idle_check_commander(c)
+            assert efc.watcher, 'no watcher'
+            # All new files are checked once.
+            assert len(checked) == 3, checked
+            checked.clear()
+            efc.start_watcher_round()
+            efc.idle_check_commander(c)
+            assert checked == [], checked
+            # Change a file.
+            with open(paths[1], 'w') as f:
+                f.write('changed\n')
+            efc.start_watcher_round()
+            efc.idle_check_commander(c)
+            assert checked == [f"@clean {paths[1]}"], checked
+            checked.clear()
+            # Add an @clean node.
+            p = root.insertAsLastChild()
+            path = os.path.join(temp_dir.name, 'x3.py')
+            with open(path, 'w') as f:
+                f.write('original\n')
+            p.h = f"@clean {path}"
+            efc.start_watcher_round()
+            efc.idle_check_commander(c)
+            assert checked == [p.h], checked
+            checked.clear()
+            # Rename an @clean node, without using the undoer.
+            path = os.path.join(temp_dir.name, 'x4.py')
+            with open(path, 'w') as f:
+                f.write('original\n')
+            p.h = f"@clean {path}"
+            efc.start_watcher_round()
+            efc.idle_check_commander(c)
+            assert checked == [p.h], checked
+            checked.clear()
+            # Add an @path directive to the body being edited.
+            sub_dir = os.path.join(temp_dir.name, 'sub')
+            os.mkdir(sub_dir)
+            path = os.path.join(sub_dir, 'x5.py')
+            with open(path, 'w') as f:
+                f.write('original\n')
+            p.h = '@clean x5.py'
+            p.b = 'body\n'
+            efc.start_watcher_round()
+            efc.idle_check_commander(c)
+            assert checked == [p.h], checked
+            checked.clear()
+            p.b = f"@path {sub_dir}\nbody\n"
+            efc.start_watcher_round()
+            efc.idle_check_commander(c)
+            assert checked == [p.h], checked
+            assert path in efc.watcher_d[c][1]
+            checked.clear()
+            p.b = 'body\n'
+            efc.start_watcher_round()
+            efc.idle_check_commander(c)
+            assert checked == [p.h], checked
+            checked.clear()
+            # Other changes to that body don't cause a rescan.
+            efc.find_at_file_paths = None
+            p.b = 'changed body\n'
+            efc.start_watcher_round()
+            efc.idle_check_commander(c)
+            assert checked == [], checked
+            del efc.find_at_file_paths
+        finally:
+            efc.shut_down()
+            g.app.idleTimeManager = old_manager
+            c.close()
+            temp_dir.cleanup()
+    #@+node:ekr.20261018150210.14: *3* TestExternalFiles.test_inotify_watcher
+    def test_inotify_watcher(self):
+        '''Test that InotifyWatcher reports only changed files.'''
+        try:
+            watcher = InotifyWatcher()
+        except Exception:
+            self.skipTest('inotify not available')
+        temp_dir = tempfile.TemporaryDirectory()
+        try:
+            paths = [os.path.join(temp_dir.name, f"file{i}.py") for i in range(3)]
+            for path in paths:
+                with open(path, 'w') as f:
+                    f.write('original')
+            missing = os.path.join(temp_dir.name, 'no-such-directory', 'x.py')
+            unwatched = watcher.set_paths(paths + [missing])
+            assert unwatched == {missing}, unwatched
+            assert watcher.read_events() == set()
+            # Write a file in place.
+            with open(paths[0], 'w') as f:
+                f.write('changed')
+            # Replace a file, as many editors do.
+            temp_path = os.path.join(temp_dir.name, 'temp')
+            with open(temp_path, 'w') as f:
+                f.write('replaced')
+            os.replace(temp_path, paths[1])
+            # Create an unwatched file.
+            with open(os.path.join(temp_dir.name, 'other.py'), 'w') as f:
+                f.write('other')
+            assert watcher.read_events() == {paths[0], paths[1]}
+            assert watcher.read_events() == set()
+            # Stop watching the files.
+            watcher.set_paths([])
+            with open(paths[2], 'w') as f:
+                f.write('changed')
+            assert watcher.read_events() == set()
+        finally:
+            watcher.close()
+            temp_dir.cleanup()
+    #@-others
 #@-others
+if __name__ == '__main__':
+    unittest.main()
 #@@language python
 #@@tabwidth -4
 #@@pagewidth 70
@@ -9,12 +9,25 @@ For an explanation, see this thread:
 https://groups.google.com/forum/#!topic/leo-editor/hpHyHU2sWtM
 """
 import leo.core.leoGlobals as g
+import leo.core.leoNodes as leoNodes
+import bisect
 import difflib
+import itertools
+import random
 import re
 import time
+import unittest
 
 class FastRedraw:
     #@+others
+    #@+node:ekr.20261019013344.1: ** FastRedraw.__init__
+    def __init__(self):
+        # The previous flattened outline. See redraw_from_journal.
+        self.old_outline = None
+        self.old_vnodes = None
+        self.old_levels = None
+        self.old_clones = None
+        self.old_p = None
     #@+node:ekr.20181202060924.4: ** LeoGui.dump_diff_op_codes
     def dump_diff_op_codes(self, a, b, op_codes):
         """Dump the opcodes returned by difflib.SequenceMatcher."""
@@ -54,15 +67,37 @@ class FastRedraw:
     #@+node:ekr.20181202060924.2: ** LeoGui.flatten_outline
     def flatten_outline(self, c):
         """Return a flat list of strings "level:gnx" for all *visible* positions."""
+        return self.flatten_visible_outline(c)[0]
+
+    def flatten_visible_outline(self, c):
+        """
+        Return (aList, vnodes, levels) for all *visible* positions.
+
+        aList is the list returned by flatten_outline.
+        vnodes and levels are parallel lists.
+        """
         trace = False and not g.unitTesting
         t1 = time.process_time()
-        aList = []
-        for p in c.rootPosition().self_and_siblings():
-            self.extend_flattened_outline(aList, p)
+        snapshot = c.getOutlineSnapshot()
+        vnodes, levels, ends = snapshot.vnodes, snapshot.levels, snapshot.ends
+        aList, visible_vnodes, visible_levels = [], [], []
+        i, n = 0, len(vnodes)
+        while i < n:
+            v = vnodes[i]
+            aList.append(f"{levels[i]}:{v.gnx}:{v.h}\n")
+                # Padding the fields causes problems later.
+            visible_vnodes.append(v)
+            visible_levels.append(levels[i])
+            if v.isCloned():
+                expanded = snapshot.position(i).isExpanded()
+            else:
+                expanded = v.isExpanded()
+            # Skip the tree of collapsed nodes.
+            i = i + 1 if expanded else ends[i]
         if trace:
             t2 = time.process_time()
             print(f"app.flatten_outline: {len(aList)} entries {t2 - t1:6.4f} sec.")
-        return aList
+        return aList, visible_vnodes, visible_levels
 
     def extend_flattened_outline(self, aList, p):
         """Add p and all p's visible descendants to aList."""
@@ -129,11 +164,503 @@ class FastRedraw:
                 if gnxs0[0] == gnxs1[0]:
                     result.append(['move', index0, index1, gnxs0, gnxs1])
                     i += 2  # Don't scan either op again!
-                    break
+                    continue
             # The default is to retain the opcode.
             result.append(op0)
             i += 1
         return result
+    #@+node:ekr.20261019013344.2: ** FastRedraw: change journal
+    #@+node:ekr.20261019013344.3: *3* FastRedraw.start_journal & stop_journal
+    def start_journal(self, c):
+        """
+        Start recording outline changes in c.changeJournal.
+        Return the flattened outline.
+
+        VNode link, expand/contract and headline methods append (kind, v)
+        tuples to c.changeJournal:
+
+        ('link', parent_v): parent_v.children changed.
+        ('expand', v):      v was expanded or contracted.
+        ('head', v):        v's headline changed.
+        """
+        if c.changeJournal is None:
+            c.changeJournal = []
+        else:
+            c.changeJournal.clear()
+        aList, vnodes, levels = self.flatten_visible_outline(c)
+        self.old_outline, self.old_vnodes, self.old_levels = aList, vnodes, levels
+        self.old_clones = self.find_clones(vnodes)
+        self.old_p = c.p and c.p.copy()
+        return aList
+
+    def stop_journal(self, c):
+        """Stop recording outline changes in c.changeJournal."""
+        c.changeJournal = None
+        self.old_outline = self.old_vnodes = self.old_levels = self.old_clones = None
+        self.old_p = None
+    #@+node:ekr.20261019013344.4: *3* FastRedraw.redraw_from_journal
+    def redraw_from_journal(self, c):
+        """
+        Return (aList, opcodes), where aList is the new flattened outline and
+        opcodes is the redraw instruction list from the previous outline.
+
+        Compute the opcodes from c.changeJournal if possible.
+        Otherwise, fall back to make_redraw_list, which diffs the entire outline.
+        """
+        trace = False and not g.unitTesting
+        t1 = time.process_time()
+        journal = c.changeJournal
+        result = None
+        if self.old_outline is not None and journal is not None:
+            result = self.make_journal_opcodes(c)
+        if result is None:
+            b, b_vnodes, b_levels = self.flatten_visible_outline(c)
+            opcodes = self.make_redraw_list(self.old_outline or [], b)
+            clones = self.find_clones(b_vnodes)
+        else:
+            b, b_vnodes, b_levels, opcodes, clones = result
+            opcodes = self.peep_hole(opcodes)
+        if trace:
+            t2 = time.process_time()
+            kind = 'diff' if result is None else 'journal'
+            print(f"redraw_from_journal: {kind} {len(journal or [])} changes {t2 - t1:6.4f} sec.")
+        if journal is not None:
+            journal.clear()
+        self.old_outline, self.old_vnodes, self.old_levels = b, b_vnodes, b_levels
+        self.old_clones = clones
+        self.old_p = c.p and c.p.copy()
+        return b, opcodes
+    #@+node:ekr.20261019013344.5: *3* FastRedraw.make_journal_opcodes & helpers
+    def make_journal_opcodes(self, c):
+        """
+        Use c.changeJournal to update the previous flattened outline.
+
+        Return (aList, vnodes, levels, opcodes, clones): the new flattened
+        outline, its parallel lists, the opcodes that convert the previous
+        outline to the new outline and the set of visible cloned vnodes.
+
+        Only the rows of journaled nodes change: the rows of their visible
+        trees for link and expansion changes, single rows for headline
+        changes. All other rows are copied from the previous outline, so
+        code that changes v.children or v._headString directly must call
+        start_journal again.
+
+        The expansion state of a cloned position depends on the position
+        and on c.p, so the trees of clones that were cloned or uncloned, or
+        that are ancestors of the old or new c.p, also change.
+        """
+        a, a_vnodes, a_levels = self.old_outline, self.old_vnodes, self.old_levels
+        b, b_vnodes, b_levels = [], [], []
+        heads, trees, clones = set(), set(), set(self.old_clones)
+        for kind, v in c.changeJournal:
+            if kind == 'head':
+                heads.add(v)
+            else:
+                trees.add(v)
+                if kind == 'link':
+                    # v and its children may have become clones with children.
+                    clones.update(z for z in [v] + v.children if z.children and z.isCloned())
+        # The trees of new clones and of uncloned vnodes change.
+        trees.update(clones - self.old_clones)
+        trees.update(z for z in self.old_clones if not z.children or not z.isCloned())
+        if c.p != self.old_p:
+            for p in (self.old_p, c.p):
+                if p:
+                    vnodes = [z for z, childIndex in p.stack]
+                    trees.update(z for z in vnodes if z.isCloned())
+        # The state of this redraw.
+        r = g.Bunch(c=c,
+            old=(a, a_vnodes, a_levels),
+            new=(b, b_vnodes, b_levels),
+            changed=self.find_rows(heads | trees, a_vnodes),
+            clones=clones,
+            clone_rows=None,  # Computed when needed.
+        )
+        opcodes = []
+        if c.hiddenRootNode in trees:
+            # The top-level nodes changed.
+            self.extend_children(r, None, 0, 0, len(a))
+            self.diff_region(a, b, 0, len(a), 0, len(b), opcodes)
+        else:
+            i2 = 0
+            for i1, i3 in self.find_regions(heads, trees, a_vnodes, a_levels, r.changed):
+                # Copy the unchanged rows.
+                b.extend(a[i2:i1])
+                b_vnodes.extend(a_vnodes[i2:i1])
+                b_levels.extend(a_levels[i2:i1])
+                # The ancestors of the region's node have not changed.
+                p = self.row_position(c, a_vnodes, a_levels, i1)
+                j1 = len(b)
+                if p.v in trees:
+                    self.extend_tree(r, p, a_levels[i1], i1, i3)
+                else:
+                    level = a_levels[i1]
+                    b.append(f"{level}:{p.gnx}:{p.h}\n")
+                    b_vnodes.append(p.v)
+                    b_levels.append(level)
+                self.diff_region(a, b, i1, i3, j1, len(b), opcodes)
+                i2 = i3
+            b.extend(a[i2:])
+            b_vnodes.extend(a_vnodes[i2:])
+            b_levels.extend(a_levels[i2:])
+        clones = set(z for z in clones if z.children and z.isCloned())
+        return b, b_vnodes, b_levels, opcodes, clones
+    #@+node:ekr.20261019060012.18: *4* FastRedraw.extend_tree & extend_children
+    def extend_tree(self, r, p, level, i1, i3, moved=False):
+        """
+        Add the rows of p and its visible descendants to r.new.
+        r.old[0][i1:i3] are p's rows in the previous outline.
+        moved is True if the child index of p or of an ancestor changed.
+        """
+        b, b_vnodes, b_levels = r.new
+        b.append(f"{level}:{p.gnx}:{p.h}\n")
+        b_vnodes.append(p.v)
+        b_levels.append(level)
+        if p.hasChildren() and p.isExpanded():
+            self.extend_children(r, p, level + 1, i1 + 1, i3, moved)
+
+    def extend_children(self, r, parent, level, k1, k2, moved=False):
+        """
+        Add the rows of the children of parent, a position or None for the
+        top-level nodes, to r.new. r.old[0][k1:k2] are the rows of those
+        children in the previous outline.
+
+        Copy the rows of unchanged trees from the previous outline. The
+        expansion of cloned positions depends on the child indices of all
+        their ancestors, so trees containing clones are unchanged only if
+        those indices are unchanged.
+        """
+        a, a_vnodes, a_levels = r.old
+        b, b_vnodes, b_levels = r.new
+        changed = r.changed
+        # Find the previous rows and child index of each child.
+        ranges = {}  # Keys are vnodes, values are lists of (start, end, n) tuples.
+        k, n = k1, 0
+        while k < k2:
+            j = k + 1
+            while j < k2 and a_levels[j] > level:
+                j += 1
+            ranges.setdefault(a_vnodes[k], []).append((k, j, n))
+            k, n = j, n + 1
+        if parent:
+            children = parent.children()
+        else:
+            children = r.c.rootPosition().self_and_siblings()
+        for n, child in enumerate(children):
+            aList = ranges.get(child.v)
+            if not aList:
+                self.extend_visible_outline(child, b, b_vnodes, b_levels, r.clones)
+                continue
+            k, j, n2 = aList.pop(0)
+            moved2 = moved or n != n2
+            i = bisect.bisect_left(changed, k)
+            if (
+                i < len(changed) and changed[i] < j
+                or moved2 and self.has_clone_rows(r, k, j)
+            ):
+                self.extend_tree(r, child, level, k, j, moved2)
+            else:
+                b.extend(a[k:j])
+                b_vnodes.extend(a_vnodes[k:j])
+                b_levels.extend(a_levels[k:j])
+
+    def has_clone_rows(self, r, k, j):
+        """Return True if r.old[0][k:j] contains the rows of any cloned vnode."""
+        if r.clone_rows is None:
+            r.clone_rows = self.find_rows(self.old_clones, r.old[1])
+        i = bisect.bisect_left(r.clone_rows, k)
+        return i < len(r.clone_rows) and r.clone_rows[i] < j
+    #@+node:ekr.20261019060012.15: *3* FastRedraw.row_position
+    def row_position(self, c, vnodes, levels, i):
+        """Return the position of row i of a flattened outline."""
+        hidden = c.hiddenRootNode
+        # Use v.parents if no node in the path is cloned.
+        stack, v = [], vnodes[i]
+        while v is not hidden and len(v.parents) == 1:
+            parent = v.parents[0]
+            if parent.children.count(v) != 1:
+                break
+            stack.append((v, parent.children.index(v)))
+            v = parent
+        if v is not hidden:
+            # Find the rows of the ancestors, counting the rows of siblings.
+            stack, j = [], i
+            while j >= 0:
+                level, n, k = levels[j], 0, j - 1
+                while k >= 0 and levels[k] >= level:
+                    if levels[k] == level:
+                        n += 1
+                    k -= 1
+                stack.append((vnodes[j], n))
+                j = k
+        stack.reverse()
+        v, childIndex = stack.pop()
+        return leoNodes.Position(v, childIndex, stack)
+    #@+node:ekr.20261019060012.16: *3* FastRedraw.extend_visible_outline
+    def extend_visible_outline(self, p, aList, vnodes, levels, clones=None):
+        """
+        Add the rows of p and its visible descendants to the three lists.
+        Add cloned vnodes with children to clones if clones is not None.
+        """
+        p = p.copy()
+        after = p.nodeAfterTree()
+        while p and p != after:
+            level = p.level()
+            aList.append(f"{level}:{p.gnx}:{p.h}\n")
+            vnodes.append(p.v)
+            levels.append(level)
+            if clones is not None and p.v.children and p.isCloned():
+                clones.add(p.v)
+            if p.hasChildren() and p.isExpanded():
+                p.moveToFirstChild()
+            else:
+                p.moveToNodeAfterTree()
+    #@+node:ekr.20261019013344.6: *3* FastRedraw.find_clones, find_rows & find_regions
+    def find_clones(self, vnodes):
+        """Return the set of cloned vnodes with children in vnodes."""
+        return set(v for v in vnodes if v.children and v.isCloned())
+
+    def find_rows(self, affected, vnodes):
+        """
+        Return the sorted list of the rows of all vnodes in affected.
+        Both list.index and itertools.compress are much faster than a loop
+        over all rows.
+        """
+        if len(affected) > 4:
+            return list(itertools.compress(range(len(vnodes)), map(affected.__contains__, vnodes)))
+        rows = []
+        for v in affected:
+            i = -1
+            while True:
+                try:
+                    i = vnodes.index(v, i + 1)
+                except ValueError:
+                    break
+                rows.append(i)
+        return sorted(rows)
+
+    def find_regions(self, heads, trees, vnodes, levels, rows):
+        """
+        Return a list of (i, j) tuples: the rows of vnodes that may have changed.
+
+        rows is the sorted list of the rows of the nodes in heads and trees.
+        Rows of nodes in trees include all visible descendants.
+        Rows of nodes in heads are single rows.
+        Regions do not overlap.
+        """
+        regions, end, n = [], 0, len(vnodes)
+        for i in rows:
+            if i < end:
+                continue  # Already in a region.
+            if vnodes[i] in trees:
+                level, j = levels[i], i + 1
+                while j < n and levels[j] > level:
+                    j += 1
+            else:
+                j = i + 1
+            regions.append((i, j))
+            end = j
+        return regions
+    #@+node:ekr.20261019013344.7: *3* FastRedraw.diff_region
+    def diff_region(self, a, b, i1, i2, j1, j2, opcodes):
+        """
+        Append at most one opcode to opcodes, converting a[i1:i2] to b[j1:j2].
+        """
+        # Skip the common prefix and suffix, comparing slices while they are equal.
+        n = 64
+        while n and i1 < i2 and j1 < j2:
+            n = min(n, i2 - i1, j2 - j1)
+            if a[i1 : i1 + n] == b[j1 : j1 + n]:
+                i1, j1, n = i1 + n, j1 + n, n * 2
+            else:
+                n //= 2
+        n = 64
+        while n and i1 < i2 and j1 < j2:
+            n = min(n, i2 - i1, j2 - j1)
+            if a[i2 - n : i2] == b[j2 - n : j2]:
+                i2, j2, n = i2 - n, j2 - n, n * 2
+            else:
+                n //= 2
+        if i1 < i2 and j1 < j2:
+            opcodes.append(['replace', i1,
+                [z.strip() for z in a[i1:i2]], [z.strip() for z in b[j1:j2]]])
+        elif i1 < i2:
+            opcodes.append(['delete', i1, [z.strip() for z in a[i1:i2]]])
+        elif j1 < j2:
+            opcodes.append(['insert', i1, [z.strip() for z in b[j1:j2]]])
+    #@-others
+#@+node:ekr.20261019013344.8: ** class TestFastRedraw
+class TestFastRedraw(unittest.TestCase):
+    """Test cases for leoFastRedraw.py"""
+    #@+others
+    #@+node:ekr.20261019013344.9: *3* make_commander
+    def make_commander(self, n=60):
+        """Return a headless commander containing n randomly nested nodes."""
+        import os
+        import tempfile
+        import leo.core.leoBridge as leoBridge
+        bridge = leoBridge.headless_controller()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        c = bridge.openLeoFile(os.path.join(temp_dir.name, 'test.leo'))
+        self.rng = rng = random.Random(42)
+        vnodes = [c.rootPosition().v]
+        for i in range(n):
+            v = rng.choice(vnodes).insertAsLastChild()
+            v.setHeadString(f"node {i}")
+            if rng.random() < 0.7:
+                v.expand()
+            vnodes.append(v)
+        c.selectPosition(c.rootPosition())
+        return c
+    #@+node:ekr.20261019013344.10: *3* apply_opcodes
+    def apply_opcodes(self, a, opcodes):
+        """Apply the insert, delete and replace opcodes to the stripped list a."""
+        result, i = [], 0
+        for op in opcodes:
+            kind, i1 = op[0], op[1]
+            result.extend(a[i:i1])
+            if kind == 'insert':
+                result.extend(op[2])
+                i = i1
+            elif kind == 'delete':
+                i = i1 + len(op[2])
+            else:
+                assert kind == 'replace', op
+                result.extend(op[3])
+                i = i1 + len(op[2])
+        result.extend(a[i:])
+        return result
+    #@+node:ekr.20261019013344.11: *3* change_outline
+    def change_outline(self, c):
+        """Make a random change to c's outline using the Position class."""
+        rng = self.rng
+        positions = list(c.all_positions())
+        p = rng.choice(positions)
+        kinds = ['expand', 'head']
+        if p.parent() or p.hasBack() or p.hasNext():
+            kinds.extend(['delete', 'move'])  # Never remove the last top-level node.
+        if len(positions) < 200:
+            kinds.extend(['insert', 'clone'])  # Clones multiply positions.
+        kind = rng.choice(kinds)
+        if kind == 'insert':
+            p2 = p.insertAsLastChild() if rng.random() < 0.5 else p.insertAfter()
+            p2.h = 'inserted'
+        elif kind == 'delete':
+            p.doDelete()
+        elif kind == 'move':
+            parent = rng.choice(positions)
+            # Don't create a cycle.
+            seen, todo = set(), [parent.v]
+            while todo:
+                v = todo.pop()
+                if v not in seen:
+                    seen.add(v)
+                    todo.extend(v.parents)
+            if p.v not in seen:
+                p.moveToNthChildOf(parent, rng.randint(0, parent.numberOfChildren()))
+        elif kind == 'clone':
+            p.clone()
+        elif kind == 'expand':
+            if p.isExpanded():
+                p.contract()
+            else:
+                p.expand()
+        elif kind == 'head':
+            p.h = p.h + '!'
+    #@+node:ekr.20261019013344.12: *3* test_journal_opcodes
+    def test_journal_opcodes(self):
+        c = self.make_commander()
+        x = FastRedraw()
+        a = x.start_journal(c)
+        n_top = 0
+        for i in range(200):
+            for j in range(self.rng.randint(1, 3)):
+                self.change_outline(c)
+            b, b_vnodes, b_levels = x.flatten_visible_outline(c)
+            if ('link', c.hiddenRootNode) in c.changeJournal:
+                n_top += 1
+            b2, b2_vnodes, b2_levels, opcodes, clones = x.make_journal_opcodes(c)
+            self.assertEqual(b2, b, msg=i)
+            self.assertEqual(b2_vnodes, b_vnodes, msg=i)
+            self.assertEqual(b2_levels, b_levels, msg=i)
+            old, new = [z.strip() for z in a], [z.strip() for z in b]
+            self.assertEqual(self.apply_opcodes(old, opcodes), new, msg=i)
+            # Check redraw_from_journal.
+            b3, opcodes = x.redraw_from_journal(c)
+            self.assertEqual(b3, b)
+            self.assertEqual(c.changeJournal, [])
+            a = b
+        self.assertTrue(0 < n_top < 200, n_top)
+        x.stop_journal(c)
+        self.assertIsNone(c.changeJournal)
+    #@+node:ekr.20261019013344.13: *3* test_journal_fallback
+    def test_journal_fallback(self):
+        c = self.make_commander()
+        x = FastRedraw()
+        x.start_journal(c)
+        # Unchanged trees are copied from the previous outline.
+        c.rootPosition().insertAfter().h = 'new'
+        old_vnodes = x.old_vnodes
+        b, opcodes = x.redraw_from_journal(c)
+        self.assertEqual(b, x.flatten_outline(c))
+        self.assertEqual(opcodes, [['insert', 1, ['0:' + c.rootPosition().next().gnx + ':new']]])
+        self.assertEqual(x.old_vnodes[2:], old_vnodes[1:])
+        # Without a journal, redraw_from_journal diffs the entire outline.
+        x.stop_journal(c)
+        c.rootPosition().next().doDelete()
+        b, opcodes = x.redraw_from_journal(c)
+        self.assertEqual(b, x.flatten_outline(c))
+        self.assertTrue(opcodes)
+    #@+node:ekr.20261019060012.17: *3* test_row_position
+    def test_row_position(self):
+        c = self.make_commander()
+        x = FastRedraw()
+        for p in c.all_positions():
+            p.expand()
+        for i in range(20):
+            self.change_outline(c)  # Create clones.
+        aList, vnodes, levels = x.flatten_visible_outline(c)
+        self.assertTrue(any(v.isCloned() for v in vnodes))
+        positions = [p.copy() for p in c.all_positions() if p.isVisible(c)]
+        self.assertEqual(len(positions), len(aList))
+        for i, p in enumerate(positions):
+            self.assertEqual(x.row_position(c, vnodes, levels, i), p, msg=i)
+    #@+node:ekr.20261019060012.23: *3* test_qt_tree_model
+    def test_qt_tree_model(self):
+        """
+        Check the rows of qt_tree.LeoTreeModel after 300 random changes,
+        using leo/test/qt-tree-benchmark.py.
+        """
+        import importlib
+        import importlib.util
+        import os
+        # leoQt refuses to import Qt in the bridge.
+        old_in_bridge, g.in_bridge = g.in_bridge, False
+        try:
+            leoQt = importlib.import_module('leo.core.leoQt')
+        finally:
+            g.in_bridge = old_in_bridge
+        if not leoQt.QtWidgets:
+            self.skipTest('requires Qt')
+        path = os.path.join(os.path.dirname(__file__), '..', 'test', 'qt-tree-benchmark.py')
+        spec = importlib.util.spec_from_file_location('qt_tree_benchmark', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.check_random_changes(n_changes=300)
+    #@+node:ekr.20261019013344.14: *3* test_peep_hole
+    def test_peep_hole(self):
+        x = FastRedraw()
+        opcodes = [
+            ['delete', 1, ['1:a:A']],
+            ['insert', 4, ['1:a:A']],
+            ['insert', 7, ['1:b:B']],
+        ]
+        result = x.peep_hole(opcodes)
+        self.assertEqual(result, [
+            ['move', 1, 4, ['1:a:A'], ['1:a:A']],
+            ['insert', 7, ['1:b:B']],
+        ])
     #@-others
 
 #@@language python
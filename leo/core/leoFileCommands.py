@@ -13,6 +13,7 @@ except Exception:
 import leo.core.leoGlobals as g
 import leo.core.leoNodes as leoNodes
 import binascii
+import codecs
 from collections import defaultdict
 import difflib
 import time
@@ -25,6 +26,7 @@ import tempfile
 import zipfile
 import sqlite3
 import hashlib
+import unittest
 from contextlib import contextmanager
 #@-<< imports >>
 PRIVAREA = '---begin-private-area---'
@@ -55,9 +57,12 @@ class FastRead:
     #@+node:ekr.20180604110143.1: *3* fast.readFile/FromClipboard & helper
     def readFile(self, path):
         """Read the file, change splitter ratiors, and return its hidden vnode."""
-        with open(path, 'rb') as f:
-            s = f.read()
-        v, g_element = self.readWithElementTree(path, s)
+        if self.useIterParse(path):
+            v, g_element = self.readWithIterParse(path)
+        else:
+            with open(path, 'rb') as f:
+                s = f.read()
+            v, g_element = self.readWithElementTree(path, s)
         if not v:  # #1510.
             return None
         self.scanGlobals(g_element)
@@ -270,7 +275,7 @@ class FastRead:
     #@+node:ekr.20180602062323.9: *5* fast.scanVnodes & helper
     def scanVnodes(self, gnx2body, gnx2vnode, gnx2ua, v_elements):
 
-        c, fc = self.c, self.c.fileCommands
+        c = self.c
         #@+<< define v_element_visitor >>
         #@+node:ekr.20180605102822.1: *6* << define v_element_visitor >>
         def v_element_visitor(parent_e, parent_v):
@@ -310,36 +315,10 @@ class FastRead:
                     #@-<< Make a new vnode, linked to the parent >>
                     #@+<< handle all other v attributes >>
                     #@+node:ekr.20180605075113.1: *7* << handle all other v attributes >>
-                    # Like fc.handleVnodeSaxAttrutes.
-                    #
-                    # The native attributes of <v> elements are a, t, vtag, tnodeList,
-                    # marks, expanded, and descendentTnode/VnodeUnknownAttributes.
-                    d = e.attrib
-                    s = d.get('tnodeList', '')
-                    tnodeList = s and s.split(',')
-                    if tnodeList:
-                        # This tnodeList will be resolved later.
-                        v.tempTnodeList = tnodeList
-                    s = d.get('descendentTnodeUnknownAttributes')
-                    if s:
-                        aDict = fc.getDescendentUnknownAttributes(s, v=v)
-                        if aDict:
-                            fc.descendentTnodeUaDictList.append(aDict)
-                    s = d.get('descendentVnodeUnknownAttributes')
-                    if s:
-                        aDict = fc.getDescendentUnknownAttributes(s, v=v)
-                        if aDict:
-                            fc.descendentVnodeUaDictList.append((v, aDict),)
-                    #
-                    # Handle vnode uA's
                     uaDict = gnx2ua[gnx]
                         # gnx2ua is a defaultdict(dict)
                         # It might already exists because of tnode uA's.
-                    for key, val in d.items():
-                        if key not in self.nativeVnodeAttributes:
-                            uaDict[key] = self.resolveUa(key, val)
-                    if uaDict:
-                        v.unknownAttributes = uaDict
+                    self.handleVnodeAttributes(v, e.attrib, uaDict)
                     #@-<< handle all other v attributes >>
                     # Handle all inner elements.
                     v_element_visitor(e, v)
@@ -356,6 +335,198 @@ class FastRead:
         # Traverse the tree of v elements.
         v_element_visitor(v_elements, hidden_v)
         return hidden_v
+    #@+node:ekr.20261018131402.1: *5* fast.handleVnodeAttributes
+    def handleVnodeAttributes(self, v, d, uaDict):
+        """
+        Handle all attributes of a new vnode's <v> element.
+
+        d is the element's attribute dict. uaDict contains any uA's already
+        found in the vnode's <t> element.
+        """
+        fc = self.c.fileCommands
+        # Like fc.handleVnodeSaxAttrutes.
+        #
+        # The native attributes of <v> elements are a, t, vtag, tnodeList,
+        # marks, expanded, and descendentTnode/VnodeUnknownAttributes.
+        s = d.get('tnodeList', '')
+        tnodeList = s and s.split(',')
+        if tnodeList:
+            # This tnodeList will be resolved later.
+            v.tempTnodeList = tnodeList
+        s = d.get('descendentTnodeUnknownAttributes')
+        if s:
+            aDict = fc.getDescendentUnknownAttributes(s, v=v)
+            if aDict:
+                fc.descendentTnodeUaDictList.append(aDict)
+        s = d.get('descendentVnodeUnknownAttributes')
+        if s:
+            aDict = fc.getDescendentUnknownAttributes(s, v=v)
+            if aDict:
+                fc.descendentVnodeUaDictList.append((v, aDict),)
+        #
+        # Handle vnode uA's
+        for key, val in d.items():
+            if key not in self.nativeVnodeAttributes:
+                uaDict[key] = self.resolveUa(key, val)
+        if uaDict:
+            v.unknownAttributes = uaDict
+    #@+node:ekr.20261018131402.2: *4* fast.readWithIterParse & helpers
+    def readWithIterParse(self, path):
+        """
+        Read the .leo file at path incrementally, creating vnodes as <v>
+        elements arrive and setting bodies as <t> elements arrive.
+
+        Unlike readWithElementTree, this method never holds the entire file
+        or the entire element tree in memory: it discards each element as
+        soon as it has been used. The resulting vnodes and uA's are the same.
+        """
+        c, gnx2vnode = self.c, self.gnx2vnode
+        existing_gnxs = set(gnx2vnode)
+        gnx2body, gnx2ua = {}, {}
+            # Bodies and uA's of <t> elements that precede their <v> elements.
+        unread_bodies = set()
+            # The gnxs of existing vnodes whose bodies have not been read.
+        g_element = None
+        in_vnodes = in_tnodes = False
+        skip = 0
+            # The nesting level within the <v> element of a clone.
+        e_stack = []
+            # The open elements.
+        #
+        # Create the hidden root vnode.
+        gnx = 'hidden-root-vnode-gnx'
+        hidden_v = leoNodes.VNode(context=c, gnx=gnx)
+        hidden_v._headString = '<hidden root vnode>'
+        gnx2vnode[gnx] = hidden_v
+        v_stack = [hidden_v]
+            # The vnodes of the open <v> elements.
+        try:
+            for event, e in self.iterParse(path):
+                tag = e.tag
+                if event == 'start':
+                    e_stack.append(e)
+                    if tag == 'vnodes':
+                        in_vnodes = True
+                    elif tag == 'tnodes':
+                        in_tnodes = True
+                    elif tag == 'v' and in_vnodes:
+                        if skip:
+                            skip += 1
+                            continue
+                        #@+<< start a <v> element >>
+                        #@+node:ekr.20261018131402.3: *5* << start a <v> element >>
+                        parent_v = v_stack[-1]
+                        # #1581: Attempt to handle old Leo outlines.
+                        gnx = e.attrib.get('t')
+                        v = None if gnx is None else gnx2vnode.get(gnx)
+                        if v:
+                            # A clone. Like scanVnodes, ignore all inner elements.
+                            parent_v.children.append(v)
+                            v.parents.append(parent_v)
+                            if gnx in existing_gnxs and gnx not in gnx2body:
+                                unread_bodies.add(gnx)
+                            skip = 1
+                        else:
+                            v = leoNodes.VNode(context=c, gnx=gnx)
+                            gnx2vnode[gnx] = v
+                            parent_v.children.append(v)
+                            v.parents.append(parent_v)
+                            v._bodyString = g.toUnicode(gnx2body.pop(gnx, None) or '')
+                            v._headString = 'PLACE HOLDER'
+                            self.handleVnodeAttributes(v, e.attrib, gnx2ua.pop(gnx, {}))
+                            v_stack.append(v)
+                        #@-<< start a <v> element >>
+                    continue
+                # An 'end' event.
+                e_stack.pop()
+                if tag == 'vnodes':
+                    in_vnodes = False
+                elif tag == 'tnodes':
+                    in_tnodes = False
+                elif tag == 'globals':
+                    g_element = e
+                    continue
+                elif tag == 'vh' and in_vnodes:
+                    if not skip:
+                        v_stack[-1]._headString = g.toUnicode(e.text or '')
+                elif tag == 'v' and in_vnodes:
+                    if skip:
+                        skip -= 1
+                    else:
+                        v_stack.pop()
+                elif tag == 't' and in_tnodes:
+                    #@+<< end a <t> element >>
+                    #@+node:ekr.20261018131402.4: *5* << end a <t> element >>
+                    gnx = e.attrib['tx']
+                    body = g.toUnicode(e.text or '')
+                    uaDict = {}
+                    for key, val in e.attrib.items():
+                        if key != 'tx':
+                            uaDict[key] = self.resolveUa(key, val)
+                    v = gnx2vnode.get(gnx)
+                    if v:
+                        unread_bodies.discard(gnx)
+                        v._bodyString = body
+                        if uaDict:
+                            # Like scanVnodes, vnode uA's override tnode uA's.
+                            uaDict.update(getattr(v, 'unknownAttributes', None) or {})
+                            v.unknownAttributes = uaDict
+                    else:
+                        gnx2body[gnx] = body
+                        if uaDict:
+                            gnx2ua[gnx] = uaDict
+                    #@-<< end a <t> element >>
+                else:
+                    continue
+                # Discard the consumed element.
+                # All its previous siblings have been discarded, so this is fast.
+                e.clear()
+                if e_stack:
+                    e_stack[-1].remove(e)
+        except Exception as e:
+            # Like readWithElementTree.
+            message = f"bad .leo file: {g.shortFileName(path)}"
+            g.es_print('\n' + message, color='red')
+            g.es_print(g.toUnicode(str(e)))
+            print('')
+            return None, None
+        for gnx in unread_bodies:
+            gnx2vnode[gnx]._bodyString = ''
+        self.handleBits()
+        return hidden_v, g_element
+    #@+node:ekr.20261018131402.5: *5* fast.iterParse
+    iterParseChunkSize = 1 << 20
+
+    def iterParse(self, path):
+        """
+        Yield (event, element) tuples for all 'start' and 'end' events of
+        the .leo file at path, reading the file in chunks.
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        parser = ElementTree.XMLPullParser(events=('start', 'end'))
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(self.iterParseChunkSize)
+                final = not chunk
+                s = decoder.decode(chunk, final=final)
+                if s:
+                    parser.feed(s.translate(self.translate_table))
+                        # Fix #1036 and #1046.
+                if final:
+                    break
+                yield from parser.read_events()
+        parser.close()
+        yield from parser.read_events()
+    #@+node:ekr.20261018131402.6: *5* fast.useIterParse
+    def useIterParse(self, path):
+        """Return True if readFile should read the file at path with readWithIterParse."""
+        threshold = self.c.config.getInt('leo-file-streaming-threshold') or 0
+        if threshold <= 0:
+            return False
+        try:
+            return os.path.getsize(path) >= threshold
+        except OSError:
+            return False
     #@-others
 #@+node:ekr.20160514120347.1: ** class FileCommands
 class FileCommands:
@@ -415,6 +586,20 @@ class FileCommands:
             # 2011/12/10: This dict is never re-inited.
         self.vnodesDict = {}
             # keys are gnx strings; values are ignored
+        # For incremental writing...
+        self.headFragments = {}
+            # Keys are vnodes. Values are tuples describing the <v> element.
+        self.tnodeFragments = {}
+            # Keys are vnodes. Values are tuples (gnx, body, <t> element).
+        self.fragmentsRegenerated = 0
+        self.fragmentsTotal = 0
+        self.uniqueVnodes = None
+            # A list of all unique vnodes, set by fc.putVnodesIncrementally.
+        # For incremental sqlite writing...
+        self.dbRows = None
+            # Keys are gnxs. Values are the rows last read from or written to the vnodes table.
+        self.dbStamp = None
+            # The stamp of the .db file containing self.dbRows.
     #@+node:ekr.20031218072017.3020: *3* fc.Reading
     #@+node:ekr.20060919104836: *4*  fc.Reading Top-level
     #@+node:ekr.20031218072017.1559: *5* fc.Paste
@@ -954,10 +1139,11 @@ class FileCommands:
              iconVal,
              statusBits,
              ua from vnodes'''
-        vnodes = []
+        vnodes, rows = [], {}
         try:
             for row in conn.execute(sql):
                 (gnx, h, b, children, parents, iconVal, statusBits, ua) = row
+                rows[gnx] = row
                 try:
                     ua = pickle.loads(g.toEncodedString(ua))
                 except ValueError:
@@ -990,6 +1176,9 @@ class FileCommands:
             v.children = [findNode(x) for x in v.children]
             v.parents = [findNode(x) for x in v.parents]
         c.hiddenRootNode.children = rootChildren
+        # The next save need only write changed rows.
+        fc.dbRows, fc.dbStamp = rows, fc.getDbStamp(conn)
+        c.dbChanges = set()
         (w, h, x, y, r1, r2, encp) = fc.getWindowGeometryFromDb(conn)
         c.frame.setTopGeometry(w, h, x, y)
         c.frame.resizePanesToRatio(r1, r2)
@@ -1216,14 +1405,25 @@ class FileCommands:
         self.put('<leo_header file_format="2"/>\n')
     #@+node:ekr.20040324080819.1: *4* fc.putLeoFile & helpers
     def putLeoFile(self):
-        self.putProlog()
-        self.putHeader()
-        self.putGlobals()
-        self.putPrefs()
-        self.putFindSettings()
-        self.putVnodes()
-        self.putTnodes()
-        self.putPostlog()
+        trace = 'save' in g.app.debug
+        t1 = time.process_time()
+        self.fragmentsRegenerated = self.fragmentsTotal = 0
+        try:
+            self.putProlog()
+            self.putHeader()
+            self.putGlobals()
+            self.putPrefs()
+            self.putFindSettings()
+            self.putVnodes()
+            self.putTnodes()
+            self.putPostlog()
+        finally:
+            self.uniqueVnodes = None
+        if trace:
+            t2 = time.process_time()
+            g.trace(
+                f"{t2 - t1:5.3f} sec. regenerated "
+                f"{self.fragmentsRegenerated} of {self.fragmentsTotal} fragments")
     #@+node:ekr.20031218072017.3035: *5* fc.putFindSettings
     def putFindSettings(self):
         # New in 4.3:  These settings never get written to the .leo file.
@@ -1241,6 +1441,8 @@ class FileCommands:
         c.db['body_secondary_ratio'] = str(c.frame.secondary_ratio)
         w, h, l, t = c.frame.get_window_info()
         c.db['window_position'] = str(t), str(l), str(h), str(w)
+        if c.findCommands.symbol_index:
+            c.findCommands.symbol_index.save()
         if trace:
             g.trace(f"\nset c.db for {c.shortFileName()}")
             print('window_position:', c.db['window_position'])
@@ -1314,6 +1516,9 @@ class FileCommands:
     def putReferencedTnodes(self):
         """Put all referenced tnodes."""
         c = self.c
+        if self.uniqueVnodes is not None and not self.usingClipboard:
+            self.putTnodesIncrementally()
+            return
         if self.usingClipboard:  # write the current tree.
             theIter = self.currentPosition.self_and_subtree(copy=False)
         else:  # write everything
@@ -1403,7 +1608,8 @@ class FileCommands:
     def putVnodes(self, p=None):
         """Puts all <v> elements in the order in which they appear in the outline."""
         c = self.c
-        c.clearAllVisited()
+        if self.usingClipboard:
+            c.clearAllVisited()
         self.put("<vnodes>\n")
         # Make only one copy for all calls.
         self.currentPosition = p or c.p
@@ -1415,8 +1621,8 @@ class FileCommands:
             self.putVnode(self.currentPosition)
                 # Write only current tree.
         else:
-            for p in c.rootPosition().self_and_siblings():
-                self.putVnode(p, isIgnore=p.isAtIgnoreNode())
+            # Clears all visited and write bits, like c.clearAllVisited.
+            self.putVnodesIncrementally()
             # Fix #1018: scan *all* nodes.
             self.setCachedBits()
         self.put("</vnodes>\n")
@@ -1431,8 +1637,11 @@ class FileCommands:
         if not c.mFileName:
             return  # New.
         current = [str(z) for z in self.currentPosition.archivedPosition()]
-        expanded = [v.gnx for v in c.all_unique_nodes() if v.isExpanded()]
-        marked = [v.gnx for v in c.all_unique_nodes() if v.isMarked()]
+        vnodes = self.uniqueVnodes
+        if vnodes is None:
+            vnodes = list(c.all_unique_nodes())
+        expanded = [v.gnx for v in vnodes if v.isExpanded()]
+        marked = [v.gnx for v in vnodes if v.isMarked()]
         c.db['expanded'] = ','.join(expanded)
         c.db['marked'] = ','.join(marked)
         c.db['current_position'] = ','.join(current)
@@ -1442,6 +1651,172 @@ class FileCommands:
             print('marked:', marked)
             print('current_position:', current)
             print('')
+    #@+node:ekr.20261018121807.1: *5* fc.putVnodesIncrementally & helpers
+    def putVnodesIncrementally(self):
+        """
+        Put all <v> elements of the outline, in outline order, reusing the
+        parts of the <v> elements that have not changed since the last save.
+
+        The result is the same as calling fc.putVnode for all top-level nodes.
+
+        fc.headFragments caches the escaped headline and the kind of each
+        vnode. Entries are valid as long as the vnode's headline and body
+        strings are the *same objects* as when the entry was made. Strings
+        are immutable, so any change to a headline or body replaces the string
+        and thereby invalidates the entry. This method traverses the children
+        of vnodes directly, so changes to child lists need no invalidation.
+        """
+        fc, c = self, self.c
+        old_fragments = fc.headFragments
+        fc.headFragments = {}
+        fc.uniqueVnodes = fc.clearAllVisitedAndWriteBits()
+        result = []
+        stack = []
+            # Entries are (v, childIndex), as in p.stack.
+        for i, v in enumerate(c.hiddenRootNode.children):
+            fc.putVnodeIncrementally(
+                v, i, stack, v.isAtIgnoreNode(), old_fragments, result)
+        fc.put(''.join(result))
+    #@+node:ekr.20261018121807.2: *6* fc.clearAllVisitedAndWriteBits
+    def clearAllVisitedAndWriteBits(self):
+        """
+        Clear the visited and write bits of all vnodes, like c.clearAllVisited.
+        Return the list of all unique vnodes, in c.all_unique_nodes order.
+        """
+        c = self.c
+        mask = ~(leoNodes.VNode.visitedBit | leoNodes.VNode.writeBit)
+        result, seen = [], set()
+        todo = list(reversed(c.hiddenRootNode.children))
+        while todo:
+            v = todo.pop()
+            if v in seen:
+                continue
+            seen.add(v)
+            result.append(v)
+            v.statusBits &= mask
+            if v.children:
+                todo.extend(reversed(v.children))
+        return result
+    #@+node:ekr.20261018121807.3: *6* fc.getHeadFragment
+    def getHeadFragment(self, v, old_fragments):
+        """
+        Return (h, b, gnx, isIgnore, isAtFile, isAtEdit, v_head) for v,
+        using the cached value if possible.
+
+        v_head is the <v> element's start tag followed by the <vh> element,
+        without any descendentVnodeUnknownAttributes field.
+        """
+        fc = self
+        h, b, gnx = v._headString, v._bodyString, v.fileIndex
+        data = old_fragments.get(v)
+        fc.fragmentsTotal += 1
+        if data and data[0] is h and data[1] is b and data[2] == gnx:
+            return data
+        fc.fragmentsRegenerated += 1
+        isAtFile = bool(
+            v.isAtAutoNode() and v.atAutoNodeName().strip() or
+            v.isAtFileNode() or v.isAtShadowFileNode() or v.isAtThinFileNode())
+        isAtEdit = bool(v.isAtEditNode() and v.atEditNodeName().strip())
+        head = xml.sax.saxutils.escape(v.headString() or '')
+        v_head = f'<v t="{gnx}"><vh>{head}</vh>'
+        return h, b, gnx, v.isAtIgnoreNode(), isAtFile, isAtEdit, v_head
+    #@+node:ekr.20261018121807.4: *6* fc.putVnodeIncrementally
+    def putVnodeIncrementally(self, v, childIndex, stack, isIgnore, old_fragments, result):
+        """
+        Append the <v> element for v to the result list.
+        This method must produce the same output as fc.putVnode.
+        """
+        fc = self
+        data = fc.headFragments.get(v) or fc.getHeadFragment(v, old_fragments)
+        fc.headFragments[v] = data
+        h, b, gnx, isAtIgnore, isAtFile, isAtEdit, v_head = data
+        hasChildren = bool(v.children)
+        #
+        # Set forcewrite.
+        if isIgnore or isAtIgnore:
+            forceWrite = True
+        elif isAtFile or (isAtEdit and not hasChildren):
+            forceWrite = False
+        else:
+            forceWrite = True
+        if forceWrite:
+            v.setWriteBit()
+        #
+        # Compute the attributes only for @<file> trees containing uA's.
+        attrs = ''
+        if hasChildren and not forceWrite and fc.subtreeHasUas(v):
+            p = leoNodes.Position(v, childIndex, stack)
+            attrs = fc.compute_attribute_bits(forceWrite, p)
+        #
+        # Write the node.
+        if gnx in fc.vnodesDict:
+            result.append(f'<v t="{gnx}"{attrs}></v>\n')
+            return
+        fc.vnodesDict[gnx] = True
+        if attrs:
+            v_head = f'<v t="{gnx}"{attrs}>' + v_head[len(f'<v t="{gnx}">') :]
+        if hasChildren and forceWrite:
+            result.append(f"{v_head}\n")
+            stack.append((v, childIndex),)
+            for i, child in enumerate(v.children):
+                fc.putVnodeIncrementally(
+                    child, i, stack, isIgnore, old_fragments, result)
+            stack.pop()
+            result.append('</v>\n')
+        else:
+            result.append(f"{v_head}</v>\n")
+    #@+node:ekr.20261018121807.5: *6* fc.subtreeHasUas
+    def subtreeHasUas(self, v):
+        """Return True if v or any of its descendants has unknownAttributes."""
+        todo, seen = [v], set()
+        while todo:
+            v = todo.pop()
+            if v in seen:
+                continue
+            seen.add(v)
+            if hasattr(v, 'unknownAttributes'):
+                return True
+            todo.extend(v.children)
+        return False
+    #@+node:ekr.20261018121807.6: *5* fc.putTnodesIncrementally
+    def putTnodesIncrementally(self):
+        """
+        Put all <t> elements whose vnodes were written, in gnx order,
+        reusing the <t> elements of vnodes whose body has not changed.
+
+        The result is the same as fc.putReferencedTnodes when writing the
+        entire outline.
+
+        Nodes containing unknownAttributes are always regenerated, because
+        uA's are mutable.
+        """
+        fc = self
+        old_fragments = fc.tnodeFragments
+        fc.tnodeFragments = {}
+        tnodes = {v.fileIndex: v for v in fc.uniqueVnodes}
+        result = []
+        for index in sorted(tnodes):
+            v = tnodes.get(index)
+            # Write only those tnodes whose vnodes were written.
+            if not v.isWriteBit():
+                continue
+            fc.fragmentsTotal += 1
+            if hasattr(v, 'unknownAttributes'):
+                fc.fragmentsRegenerated += 1
+                ua = fc.putUnknownAttributes(v)
+                b = v.b
+                body = xml.sax.saxutils.escape(b) if b else ''
+                result.append(f'<t tx="{index}"{ua}>{body}</t>\n')
+                continue
+            data = old_fragments.get(v)
+            if not data or data[0] != index or data[1] is not v._bodyString:
+                fc.fragmentsRegenerated += 1
+                b = v.b
+                body = xml.sax.saxutils.escape(b) if b else ''
+                data = index, v._bodyString, f'<t tx="{index}">{body}</t>\n'
+            fc.tnodeFragments[v] = data
+            result.append(data[2])
+        fc.put(''.join(result))
     #@+node:ekr.20031218072017.1247: *5* fc.putXMLLine
     def putXMLLine(self):
         """Put the **properly encoded** <?xml> element."""
@@ -1682,6 +2057,8 @@ class FileCommands:
                 g.trace('unpickleable value', repr(v.u))
             return s
 
+        # Don't write transient bits: they would change the rows of clean vnodes.
+        transientBits = leoNodes.VNode.dirtyBit | leoNodes.VNode.visitedBit | leoNodes.VNode.writeBit
         dbrow = lambda v: (
                 v.gnx,
                 v.h,
@@ -1689,20 +2066,47 @@ class FileCommands:
                 ' '.join(x.gnx for x in v.children),
                 ' '.join(x.gnx for x in v.parents),
                 v.iconVal,
-                v.statusBits,
+                v.statusBits & ~transientBits,
                 dump_u(v)
             )
         ok = False
+        # Update the table incrementally only if c.dbChanges describes all
+        # changes since the .db file was last read or written.
+        incremental = (
+            fc.dbRows is not None and c.dbChanges is not None
+            and fc.dbStamp == fc.getDbStamp(conn))
+        if incremental:
+            vnodes, deleted = fc.findChangedVnodes()
+            rows = {v.gnx: dbrow(v) for v in vnodes}
+        else:
+            deleted = []
+            rows = {v.gnx: dbrow(v) for v in c.all_unique_nodes()}
         try:
-            fc.prepareDbTables(conn)
+            # Everything happens in a single transaction.
+            if incremental:
+                fc.exportChangedVnodesToSqlite(conn, rows, deleted)
+            else:
+                fc.prepareDbTables(conn)
+                fc.exportVnodesToSqlite(conn, rows.values())
             fc.exportDbVersion(conn)
-            fc.exportVnodesToSqlite(conn, (dbrow(v) for v in c.all_unique_nodes()))
             fc.exportGeomToSqlite(conn)
             fc.exportHashesToSqlite(conn)
             conn.commit()
+            if incremental:
+                for gnx in deleted:
+                    del fc.dbRows[gnx]
+                fc.dbRows.update(rows)
+            else:
+                fc.dbRows = rows
+            fc.dbStamp = fc.getDbStamp(conn)
+            c.dbChanges = set()
             ok = True
         except sqlite3.Error as e:
             g.internalError(e)
+            conn.rollback()
+            # Rewrite the entire table next time.
+            fc.dbRows, fc.dbStamp = None, None
+            c.dbChanges = None
         return ok
     #@+node:vitalije.20170705075107.1: *6* fc.decodePosition
     def decodePosition(self, s):
@@ -1722,9 +2126,64 @@ class FileCommands:
         """New schema for encoding current position hopefully simplier one."""
         jn = '<->'
         mk = '%s,%s'
-        res = [mk % (x.gnx, y) for x, y in p.stack]
+        res = [mk % (x.gnx, y) for x, y in p._getStack()]
         res.append(mk % (p.gnx, p._childIndex))
         return jn.join(res)
+    #@+node:ekr.20261019060012.13: *6* fc.findChangedVnodes
+    def findChangedVnodes(self):
+        """
+        Use c.dbChanges to find the rows of the vnodes table that may have
+        changed since the .db file was last read or written.
+
+        Return (vnodes, deleted): a list of the live vnodes whose rows may have
+        changed and a list of the gnxs of the deleted vnodes.
+
+        VNode setters and link methods add vnodes to c.dbChanges. Changes to
+        v.u and v.iconVal that don't set v dirty are not saved.
+        """
+        c, old_rows = self.c, self.dbRows
+        hidden = c.hiddenRootNode
+        alive_d = {hidden: True}
+
+        def alive(v):
+            """Return True if v is in the outline."""
+            if v not in alive_d:
+                alive_d[v] = False  # Stop the recursion.
+                alive_d[v] = any(alive(z) for z in v.parents)
+            return alive_d[v]
+
+        vnodes, deleted, seen = [], [], set()
+        todo = list(c.dbChanges)
+        while todo:
+            v = todo.pop()
+            if v in seen or v is hidden:
+                continue
+            seen.add(v)
+            if alive(v):
+                vnodes.append(v)
+                if v.gnx not in old_rows:
+                    # A new or undeleted tree: its descendants may be new too.
+                    todo.extend(v.children)
+            else:
+                if v.gnx in old_rows:
+                    deleted.append(v.gnx)
+                # v's descendants may have been deleted too.
+                todo.extend(v.children)
+        return vnodes, deleted
+    #@+node:ekr.20261018140516.2: *6* fc.getDbStamp
+    def getDbStamp(self, conn):
+        """
+        Return a tuple (path, mtime, size) describing conn's database file,
+        or None if the database is not a file.
+        """
+        try:
+            path = conn.execute('pragma database_list').fetchone()[2]
+            if not path:
+                return None
+            stat = os.stat(path)
+            return path, stat.st_mtime_ns, stat.st_size
+        except(OSError, sqlite3.Error):
+            return None
     #@+node:vitalije.20170811130512.1: *6* fc.prepareDbTables
     def prepareDbTables(self, conn):
         conn.execute('''drop table if exists vnodes;''')
@@ -1751,6 +2210,31 @@ class FileCommands:
             values(?,?,?,?,?,?,?,?);''',
             rows,
         )
+    #@+node:ekr.20261018140516.1: *6* fc.exportChangedVnodesToSqlite
+    def exportChangedVnodesToSqlite(self, conn, rows, deleted):
+        """
+        Update the vnodes table incrementally.
+
+        rows:    a dict: keys are gnxs; values are the rows of the vnodes
+                 returned by fc.findChangedVnodes.
+        deleted: a list of the gnxs of deleted vnodes.
+
+        Write only new or changed rows and delete the rows of deleted vnodes.
+        """
+        old_rows = self.dbRows
+        changed = [row for gnx, row in rows.items() if old_rows.get(gnx) != row]
+        if 'save' in g.app.debug:
+            g.trace(
+                f"{len(changed)} changed, {len(deleted)} deleted, "
+                f"{len(rows)} checked, {len(old_rows)} total")
+        conn.executemany('delete from vnodes where gnx = ?', [(z,) for z in deleted])
+        conn.executemany(
+            '''replace into vnodes
+            (gnx, head, body, children, parents,
+                iconVal, statusBits, ua)
+            values(?,?,?,?,?,?,?,?);''',
+            changed,
+        )
     #@+node:vitalije.20170701162052.1: *6* fc.exportGeomToSqlite
     def exportGeomToSqlite(self, conn):
         c = self.c
@@ -2025,7 +2509,242 @@ def dump_clone_parents(event):
         if len(v.parents) > 1:
             print(v.h)
             g.printObj(v.parents)
+#@+node:ekr.20261018121807.7: ** class TestFileCommands
+class TestFileCommands(unittest.TestCase):
+    """Test cases for leoFileCommands.py"""
+    #@+others
+    #@+node:ekr.20261018121807.8: *3* TestFileCommands.bridge
+    def bridge(self):
+        """Return an instance of Leo's bridge."""
+        import leo.core.leoBridge as leoBridge
+        return leoBridge.headless_controller()
+    #@+node:ekr.20261018121807.9: *3* TestFileCommands.test_incremental_write
+    def test_incremental_write(self):
+        """Test that the incremental writer matches fc.putVnode and fc.putTnode."""
+        import os
+        import tempfile
+        temp_dir = tempfile.TemporaryDirectory()
+        c = self.bridge().openLeoFile(f"{temp_dir.name}{os.sep}test.leo")
+        fc = c.fileCommands
+        root = c.rootPosition()
+        root.h = 'root <&>'
+        root.b = 'root body <&>\n'
+        for i, h in enumerate(('@file x.py', '@ignore', '@edit y.txt', 'plain')):
+            p = root.insertAsLastChild()
+            p.h = h
+            p.b = f"body {i}\n"
+            for j in range(2):
+                child = p.insertAsLastChild()
+                child.h = f"child {i}.{j}"
+                child.b = f"child body {i}.{j}\n"
+        child.v.unknownAttributes = {'str_test': 'value'}
+        root.firstChild().firstChild().v.unknownAttributes = {'key': 1}
+        clone = root.firstChild().next().firstChild().clone()
+        clone.moveToLastChildOf(root)
+        p = root.insertAfter()
+        p.h = '@ignore top-level'
+        p.insertAsLastChild().h = 'ignored child'
+
+        def legacy_write():
+            fc.outputFile = StringIO()
+            c.clearAllVisited()
+            fc.currentPosition = c.p
+            fc.vnodesDict = {}
+            for p in c.rootPosition().self_and_siblings():
+                fc.putVnode(p, isIgnore=p.isAtIgnoreNode())
+            fc.putReferencedTnodes()
+            return fc.outputFile.getvalue()
+
+        def incremental_write():
+            fc.outputFile = StringIO()
+            fc.fragmentsRegenerated = 0
+            fc.putVnodes()
+            fc.putReferencedTnodes()
+            fc.uniqueVnodes = None
+            s = fc.outputFile.getvalue()
+            return s.replace('<vnodes>\n', '').replace('</vnodes>\n', '')
+
+        expected = legacy_write()
+        assert incremental_write() == expected
+        # Nothing has changed.
+        assert incremental_write() == expected
+        assert fc.fragmentsRegenerated == 1, fc.fragmentsRegenerated  # The uA node.
+        # Change one body.
+        clone.b = 'changed'
+        expected = legacy_write()
+        assert incremental_write() == expected
+        assert fc.fragmentsRegenerated == 3, fc.fragmentsRegenerated
+        c.close()
+    #@+node:ekr.20261018140516.3: *3* TestFileCommands.test_incremental_sqlite_save
+    def test_incremental_sqlite_save(self):
+        """Test that saving a .db file writes only changed rows."""
+        import os
+        import tempfile
+        temp_dir = tempfile.TemporaryDirectory()
+        path = f"{temp_dir.name}{os.sep}test.db"
+        bridge = self.bridge()
+        c = bridge.openLeoFile(path)
+        root = c.rootPosition()
+        root.h = 'root'
+        for i in range(5):
+            p = root.insertAsLastChild()
+            p.h = f"node {i}"
+            p.b = f"body {i}\n"
+        c.save()
+        c.close()
+        # Reopen the file.
+        c = bridge.openLeoFile(path)
+        fc = c.fileCommands
+        assert fc.dbRows is not None
+        assert c.rootPosition().numberOfChildren() == 5
+
+        def get_rowids():
+            conn = sqlite3.connect(path)
+            try:
+                return dict(conn.execute('select gnx, rowid from vnodes'))
+            finally:
+                conn.close()
+
+        old_rowids = get_rowids()
+        root = c.rootPosition()
+        changed = root.firstChild()
+        changed.b = 'changed'
+        deleted = root.lastChild()
+        deleted_gnx = deleted.gnx
+        deleted.doDelete()
+        c.save()
+        new_rowids = get_rowids()
+        assert deleted_gnx not in new_rowids
+        assert len(new_rowids) == len(old_rowids) - 1
+        # Replaced rows get new rowids, unchanged rows keep theirs.
+        for gnx, rowid in new_rowids.items():
+            if gnx in (root.gnx, changed.gnx):
+                assert rowid != old_rowids[gnx], (gnx, rowid)
+            else:
+                assert rowid == old_rowids[gnx], (gnx, rowid)
+        c.close()
+        # Check the saved outline.
+        c = bridge.openLeoFile(path)
+        aList = [(p.h, p.b) for p in c.all_positions()]
+        assert aList == [
+            ('root', ''),
+            ('node 0', 'changed'),
+            ('node 1', 'body 1\n'),
+            ('node 2', 'body 2\n'),
+            ('node 3', 'body 3\n'),
+        ], aList
+        c.close()
+    #@+node:ekr.20261019060012.14: *3* TestFileCommands.test_sqlite_changes
+    def test_sqlite_changes(self):
+        """Test that c.dbChanges drives incremental saves of .db files."""
+        import os
+        import tempfile
+        temp_dir = tempfile.TemporaryDirectory()
+        path = f"{temp_dir.name}{os.sep}test.db"
+        bridge = self.bridge()
+        c = bridge.openLeoFile(path)
+        fc = c.fileCommands
+        root = c.rootPosition()
+        root.h = 'root'
+        for i in range(3):
+            p = root.insertAsLastChild()
+            p.h = f"node {i}"
+            for j in range(2):
+                child = p.insertAsLastChild()
+                child.h = f"child {i}.{j}"
+        c.save()
+        self.assertEqual(c.dbChanges, set())
+        self.assertEqual(fc.findChangedVnodes(), ([], []))
+        n = len(list(c.all_unique_nodes()))
+        # Change the outline.
+        root.firstChild().setMarked()
+        root.firstChild().expand()
+        new = root.insertAsLastChild()
+        new.h = 'new'
+        new.insertAsLastChild().h = 'new child'
+        deleted = root.getNthChild(2)
+        deleted_gnxs = [z.gnx for z in deleted.self_and_subtree()]
+        deleted.doDelete()
+        vnodes, deleted = fc.findChangedVnodes()
+        self.assertEqual(sorted(deleted), sorted(deleted_gnxs))
+        self.assertEqual(
+            sorted(v.h for v in vnodes),
+            ['new', 'new child', 'node 0', 'root'])
+        self.assertTrue(len(vnodes) < n)
+        c.save()
+        # The table contains exactly the rows of the live vnodes.
+        conn = sqlite3.connect(path)
+        try:
+            rows = {row[0]: row for row in conn.execute('select * from vnodes')}
+        finally:
+            conn.close()
+        self.assertEqual(set(rows), {v.gnx for v in c.all_unique_nodes()})
+        self.assertEqual(rows, fc.dbRows)
+        expected = [(p.h, p.isMarked(), p.isExpanded()) for p in c.all_positions()]
+        self.assertEqual(expected[:2], [('root', False, False), ('node 0', True, True)])
+        self.assertEqual(len(expected), 9)
+        c.close()
+        # Check the saved outline.
+        c = bridge.openLeoFile(path)
+        aList = [(p.h, p.isMarked(), p.isExpanded()) for p in c.all_positions()]
+        self.assertEqual(aList, expected)
+        c.close()
+    #@+node:ekr.20261018131402.8: *3* TestFileCommands.test_streaming_read
+    def test_streaming_read(self):
+        """Test that fast.readWithIterParse matches fast.readWithElementTree."""
+        import os
+        import tempfile
+        temp_dir = tempfile.TemporaryDirectory()
+        path = f"{temp_dir.name}{os.sep}test.leo"
+        c = self.bridge().openLeoFile(path)
+        root = c.rootPosition()
+        root.h = 'root <&>'
+        root.b = 'root body <&>\n\x01'
+        root.v.unknownAttributes = {'str_test': 'value', 'key': [1, 2]}
+        for i in range(3):
+            p = root.insertAsLastChild()
+            p.h = f"node {i} \u00fc"
+            p.b = f"body {i} \u00fc\n" * 100
+            for j in range(2):
+                child = p.insertAsLastChild()
+                child.h = f"child {i}.{j}"
+                child.b = f"child body {i}.{j}\n"
+        child.v.unknownAttributes = {'key': {'a': 1}}
+        clone = root.firstChild().firstChild().clone()
+        clone.moveToLastChildOf(root.lastChild())
+        c.save()
+
+        def read(kind):
+            gnx2vnode = {}
+            fast = FastRead(c, gnx2vnode)
+            if kind == 'iterparse':
+                fast.iterParseChunkSize = 7  # Split everything across chunks.
+                hidden_v, g_element = fast.readWithIterParse(path)
+            else:
+                with open(path, 'rb') as f:
+                    hidden_v, g_element = fast.readWithElementTree(path, f.read())
+            assert hidden_v, kind
+            assert g_element is not None, kind
+            return gnx2vnode
+
+        def dump(gnx2vnode):
+            return {
+                gnx: (
+                    v.h, v.b,
+                    [z.gnx for z in v.children],
+                    [z.gnx for z in v.parents],
+                    getattr(v, 'unknownAttributes', None),
+                ) for gnx, v in gnx2vnode.items()
+            }
+
+        expected = dump(read('element-tree'))
+        assert len(expected) == 11, len(expected)
+        assert dump(read('iterparse')) == expected
+        c.close()
+    #@-others
 #@-others
+if __name__ == '__main__':
+    unittest.main()
 #@@language python
 #@@tabwidth -4
 #@@pagewidth 70
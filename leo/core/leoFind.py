@@ -2,6 +2,8 @@
 #@+node:ekr.20060123151617: * @file leoFind.py
 """Leo's gui-independent find classes."""
 import leo.core.leoGlobals as g
+import ast
+import hashlib
 import keyword
 import re
 import sys
@@ -131,6 +133,10 @@ class LeoFind:
         self.frame = None
         self.k = c.k
         self.re_obj = None
+        self.search_index = None
+            # A SearchIndex, created when first needed.
+        self.symbol_index = None
+            # A SymbolIndex, created when first needed.
         # Options ivars: set by FindTabManager.init.
         self.batch = None
         self.ignore_case = None
@@ -167,7 +173,11 @@ class LeoFind:
             # Set of vnodes.
         #
         # Ivars containing internal state...
+        self.batch_spans = None
+            # The spans (i, j) replaced by the last batch replace.
         self.buttonFlag = False
+        self.candidates = None
+            # For find-all commands: None or a set of vnodes that might match.
         self.changeAllFlag = False
         self.findAllFlag = False
         self.findAllUniqueFlag = False
@@ -215,6 +225,8 @@ class LeoFind:
         c = self.c
         self.ignore_dups = c.config.getBool('find-ignore-duplicates', default=False)
         self.minibuffer_mode = c.config.getBool('minibuffer-find-mode', default=False)
+        self.use_search_index = c.config.getBool('find-use-search-index', default=True)
+        self.use_symbol_index = c.config.getBool('use-symbol-index', default=True)
     #@+node:ekr.20060123065756.1: *3* LeoFind.Buttons (immediate execution)
     #@+node:ekr.20031218072017.3057: *4* find.changeAllButton
     def changeAllButton(self, event=None):
@@ -336,6 +348,8 @@ class LeoFind:
         word = self.initFindDef(event)
         if not word:
             return
+        if self.findDefInSymbolIndex(word, defFlag):
+            return
         save_sel = w.getSelectionRange()
         ins = w.getInsertPoint()
         # For the command, always start in the root position.
@@ -405,6 +419,48 @@ class LeoFind:
             c.redraw()
             w.setSelectionRange(i, j, insert=ins)
             c.bodyWantsFocusNow()
+    #@+node:ekr.20261018231512.14: *6* findDefInSymbolIndex
+    def findDefInSymbolIndex(self, word, defFlag):
+        """
+        Use the symbol index to select the definition of word.
+        Return True if the index contains a definition.
+
+        Repeating the command selects the next definition.
+        """
+        c = self.c
+        index = self.getSymbolIndex()
+        if not index or c.config.getBool('find-def-creates-clones', default=False):
+            return False
+        kinds = ('class', 'def') if defFlag else ('var',)
+        for word2 in (word, defFlag and self.switchStyle(word)):
+            if not word2:
+                continue
+            hits = []
+            for v, row, kind, class_name in index.find(word2, kinds):
+                p = c.vnode2position(v)
+                if p and not g.inAtNosearch(p):
+                    hits.append((p, row))
+            if not hits:
+                continue
+            # Select the definition after the definition containing the cursor.
+            w = c.frame.body.wrapper
+            row, col = g.convertPythonIndexToRowCol(c.p.b, w.getInsertPoint())
+            n = 0
+            for i, (p, row2) in enumerate(hits):
+                if p.v == c.p.v and row2 == row:
+                    n = (i + 1) % len(hits)
+                    break
+            p, row = hits[n]
+            lines = g.splitLines(p.b)
+            col = max(0, lines[row].find(word2)) if row < len(lines) else 0
+            i = g.convertRowColToPythonIndex(p.b, row, col, lines=lines)
+            c.selectPosition(p)
+            c.redraw()
+            c.bodyWantsFocusNow()
+            w.setSelectionRange(i, i + len(word2), insert=i + len(word2))
+            w.see(i)
+            return True
+        return False
     #@+node:ekr.20180511045458.1: *6* switchStyle
     def switchStyle(self, word):
         """
@@ -1428,7 +1484,6 @@ class LeoFind:
         saveData = self.save()
         self.initBatchCommands()
         count = 0
-        u.beforeChangeGroup(current, undoType)
         # Fix bug 338172: ReplaceAll will not replace newlines
         # indicated as \n in target string.
         if not self.find_text:
@@ -1440,6 +1495,8 @@ class LeoFind:
                 return
         if not self.search_headline and not self.search_body:
             return
+        # A single undo node contains compact deltas for all changed nodes.
+        undoData = u.beforeChangeMultiNodeContents(current)
         # #1428: Honor limiters in replace-all.
         if self.node_only:
             positions = [c.p]
@@ -1447,24 +1504,33 @@ class LeoFind:
             positions = c.p.self_and_subtree()
         else:
             positions = c.all_unique_positions()
+        candidates = self.getSearchCandidates()
         count = 0
         for p in positions:
+            if candidates is not None and p.v not in candidates:
+                continue
             count_h, count_b = 0, 0
-            undoData = u.beforeChangeNodeContents(p)
+            old_h, old_b = p.h, p.b
+            h_delta = b_delta = None
+                # None: the undoer computes the deltas.
             if self.search_headline:
                 count_h, new_h = self.batchSearchAndReplace(p.h)
                 if count_h:
                     count += count_h
                     p.h = new_h
+                    if self.batch_spans is not None and p.h == new_h:
+                        h_delta = u.replacementDelta(old_h, self.batch_spans, self.change_text)
             if self.search_body:
                 count_b, new_b = self.batchSearchAndReplace(p.b)
                 if count_b:
                     count += count_b
                     p.b = new_b
+                    if self.batch_spans is not None:
+                        b_delta = u.replacementDelta(old_b, self.batch_spans, self.change_text)
             if count_h or count_b:
-                u.afterChangeNodeContents(p, 'Replace All', undoData)
+                u.recordNodeContents(undoData, p, old_h, old_b, h_delta, b_delta)
         p = c.p
-        u.afterChangeGroup(p, undoType, reportFlag=True)
+        u.afterChangeMultiNodeContents(p, undoType, undoData)
         t2 = time.process_time()
         g.es_print(f"changed {count} instances{g.plural(count)} in {t2 - t1:4.2f} sec.")
         c.recolor()
@@ -1477,6 +1543,8 @@ class LeoFind:
         
         Return (found, new text)
         """
+        s0 = s
+        self.batch_spans = None
         if sys.platform.lower().startswith('win'):
             s = s.replace('\r', '')
                 # Ignore '\r' characters, which may appear in @edit nodes.
@@ -1484,13 +1552,19 @@ class LeoFind:
                 # This hack would be dangerous on MacOs: it uses '\r' instead of '\n' (!)
         if not s:
             return False, None
+        stripped = len(s) != len(s0)
         #
         # Order matters: regex matches ignore whole-word.
         if self.pattern_match:
-            return self.batchRegexReplace(s)
-        if self.whole_word:
-            return self.batchWordReplace(s)
-        return self.batchPlainReplace(s)
+            count, s = self.batchRegexReplace(s)
+        elif self.whole_word:
+            count, s = self.batchWordReplace(s)
+        else:
+            count, s = self.batchPlainReplace(s)
+        if stripped:
+            # The spans don't apply to the original text.
+            self.batch_spans = None
+        return count, s
     #@+node:ekr.20190602151043.4: *6* batchPlainReplace
     def batchPlainReplace(self, s):
         """
@@ -1504,7 +1578,7 @@ class LeoFind:
         if self.ignore_case:
             s = s0.lower()
             find = find0.lower()
-        count, prev_i, result = 0, 0, []
+        count, prev_i, result, spans = 0, 0, [], []
         while True:
             # #1166: Scan using s and find.
             i = s.find(find, prev_i)
@@ -1515,8 +1589,10 @@ class LeoFind:
             result.append(s0[prev_i:i])
             result.append(change)
             prev_i = i + len(find)
+            spans.append((i, prev_i))
         # #1166: Complete the result using s0.
         result.append(s0[prev_i:])
+        self.batch_spans = spans
         return count, ''.join(result)
     #@+node:ekr.20190602151043.2: *6* batchRegexReplace
     def batchRegexReplace(self, s):
@@ -1524,7 +1600,7 @@ class LeoFind:
         Perform all regex find/replace on s.
         return (count, new_s)
         """
-        count, prev_i, result = 0, 0, []
+        count, prev_i, result, spans = 0, 0, [], []
 
         flags = re.MULTILINE
         if self.ignore_case:
@@ -1535,9 +1611,11 @@ class LeoFind:
             result.append(s[prev_i:i])
             result.append(self.change_text)
             prev_i = m.end()
+            spans.append((i, prev_i))
         # Compute the result.
         result.append(s[prev_i:])
         s = ''.join(result)
+        self.batch_spans = spans
         return count, s
     #@+node:ekr.20190602155933.1: *6* batchWordReplace
     def batchWordReplace(self, s):
@@ -1552,22 +1630,25 @@ class LeoFind:
         if self.ignore_case:
             s = s0.lower()
             find = find0.lower()
-        count, prev_i, result = 0, 0, []
+        count, prev_i, result, spans = 0, 0, [], []
         while True:
             # #1166: Scan using s and find.
             i = s.find(find, prev_i)
             if i == -1:
                 break
-            # #1166: Replace using s0, change & find0.
+            # #1166: Replace using s0 & change.
             result.append(s0[prev_i:i])
             if g.match_word(s, i, find):
                 count += 1
                 result.append(change)
+                spans.append((i, i + len(find)))
             else:
-                result.append(find0)
+                # Don't change the case of non-matches.
+                result.append(s0[i : i + len(find)])
             prev_i = i + len(find)
         # #1166: Complete the result using s0.
         result.append(s0[prev_i:])
+        self.batch_spans = spans
         return count, ''.join(result)
     #@+node:ekr.20031218072017.3070: *4* find.changeSelection
     # Replace selection with self.change_text.
@@ -1723,6 +1804,7 @@ class LeoFind:
         old_sparse_find = c.sparse_find
         try:
             c.sparse_find = False
+            self.candidates = self.getSearchCandidates()
             if clone_find:
                 count = self.doCloneFindAll(after, data, flatten, p, undoType)
             else:
@@ -1731,6 +1813,7 @@ class LeoFind:
             # c.contractAllHeadlines()
         finally:
             c.sparse_find = old_sparse_find
+            self.candidates = None
         if count:
             c.redraw()
         g.es("found", count, "matches for", self.find_text)
@@ -1875,6 +1958,8 @@ class LeoFind:
     #@+node:ekr.20160224141710.1: *6* find.findNextBatchMatch
     def findNextBatchMatch(self, p):
         """Find the next batch match at p."""
+        if self.candidates is not None and p.v not in self.candidates:
+            return False
         table = []
         if self.search_headline:
             table.append(p.h)
@@ -1947,6 +2032,14 @@ class LeoFind:
             ok = self.precompilePattern()
             if not ok: return None, None
         while p:
+            if self.candidates is not None and p.v not in self.candidates:
+                # The search index shows that p can not match.
+                attempts += 1
+                p = self.p = self.nextNodeAfterFail(p)
+                if p and p.v in self.candidates:
+                    self.in_headline = self.firstSearchPane()
+                    self.initNextText()
+                continue
             pos, newpos = self.search()
             if self.errors:
                 g.trace('find errors')
@@ -2105,6 +2198,36 @@ class LeoFind:
             self.search_headline and self.search_body and (
             (self.reverse and not self.in_headline) or
             (not self.reverse and self.in_headline)))
+    #@+node:ekr.20261018161122.1: *4* find.getSearchCandidates
+    def getSearchCandidates(self):
+        """
+        Return the set of vnodes that might match the find text,
+        or None if all nodes must be searched.
+        """
+        if not self.use_search_index:
+            return None
+        if self.pattern_match or self.findAllUniqueFlag or not self.find_text:
+            # The index can't help with regex searches.
+            return None
+        if not self.search_index:
+            self.search_index = SearchIndex(self.c)
+        # The search helpers handle backslashes and ignore-case in slightly different ways.
+        s = self.find_text
+        patterns = [
+            self.replaceBackSlashes(s),
+            self.replaceBackSlashes(s.lower()),
+            self.replaceBackSlashes(s).lower(),
+        ]
+        return self.search_index.candidates(
+            patterns, self.search_headline, self.search_body)
+    #@+node:ekr.20261018231512.15: *4* find.getSymbolIndex
+    def getSymbolIndex(self):
+        """Return the SymbolIndex for this commander, or None if disabled."""
+        if not self.use_symbol_index:
+            return None
+        if not self.symbol_index:
+            self.symbol_index = SymbolIndex(self.c)
+        return self.symbol_index
     #@+node:ekr.20031218072017.3076: *4* find.resetWrap
     def resetWrap(self, event=None):
         self.wrapPosition = None
@@ -2653,6 +2776,509 @@ class LeoFind:
             s = s[:-1]
         self.change_text = s
     #@-others
+#@+node:ekr.20261018161122.2: ** class SearchIndex
+class SearchIndex:
+    """
+    A per-commander index that narrows the nodes searched by find-all,
+    clone-find-all and replace-all commands.
+
+    For each vnode, the index contains signatures of the headline and body.
+    A signature is a Bloom filter of all trigrams within the
+    whitespace-delimited tokens of the casefolded text, folded to about
+    8 bits per trigram. A node can contain a pattern only if its signature
+    contains all the pattern's trigrams that do not contain whitespace.
+
+    The index updates itself lazily: it remembers the string objects it
+    indexed, so changing p.h or p.b invalidates that node's entry.
+    """
+    max_cache_size = 100000
+    max_signature_size = 4096
+    #@+others
+    #@+node:ekr.20261018161122.3: *3* SearchIndex.__init__
+    def __init__(self, c):
+        self.c = c
+        self.entries = {}
+            # Keys are vnodes.
+            # Values are tuples (h, b, h_signature, b_signature).
+        self.token_cache = {}
+            # Keys are tokens.
+            # Values are tuples (number of trigrams, max-size signature).
+        self.indexed = 0
+            # The number of nodes indexed by the last update.
+    #@+node:ekr.20261018161122.4: *3* SearchIndex.candidates
+    def candidates(self, patterns, search_headline, search_body):
+        """
+        Return the set of vnodes that might contain any of the given
+        versions of the find pattern, or None if the index can't help.
+        """
+        hashes = None
+        for pattern in patterns:
+            if hashes is None:
+                hashes = self.pattern_hashes(pattern)
+            else:
+                hashes &= self.pattern_hashes(pattern)
+        if not hashes:
+            return None
+        self.update()
+        masks = {}
+            # Keys are signature sizes. Values are the pattern's mask for that size.
+
+        def contains(signature):
+            n, bits = signature
+            mask = masks.get(n)
+            if mask is None:
+                mask = masks[n] = self.make_signature(hashes, n)[1]
+            return bits & mask == mask
+
+        result = set()
+        for v, entry in self.entries.items():
+            if (
+                search_headline and contains(entry[2]) or
+                search_body and contains(entry[3])
+            ):
+                result.add(v)
+        return result
+    #@+node:ekr.20261018161122.5: *3* SearchIndex.make_signature
+    def make_signature(self, hashes, n):
+        """Return (n, bits), where bits is an n-bit Bloom filter for the given hashes."""
+        mask = n - 1
+        bits = bytearray(n >> 3)
+        for h in hashes:
+            h &= mask
+            bits[h >> 3] |= 1 << (h & 7)
+        return n, int.from_bytes(bits, 'little')
+    #@+node:ekr.20261018161122.6: *3* SearchIndex.pattern_hashes
+    def pattern_hashes(self, pattern):
+        """Return the set of hashes of all pattern's trigrams without whitespace."""
+        s = pattern.casefold()
+        trigrams = (s[i : i + 3] for i in range(len(s) - 2))
+        return {hash(z) for z in trigrams if z.split() == [z]}
+    #@+node:ekr.20261018161122.7: *3* SearchIndex.signature
+    def signature(self, s):
+        """Return the signature of s."""
+        cache, size = self.token_cache, self.max_signature_size
+        # Searches on Windows ignore '\r' characters.
+        count, bits = 0, 0
+        for token in set(s.replace('\r', '').casefold().split()):
+            entry = cache.get(token)
+            if entry is None:
+                if len(cache) > self.max_cache_size:
+                    cache.clear()
+                hashes = {hash(token[i : i + 3]) for i in range(len(token) - 2)}
+                entry = cache[token] = (len(hashes), self.make_signature(hashes, size)[1])
+            # Or-ing cached masks is much faster than setting individual bits.
+            count += entry[0]
+            bits |= entry[1]
+        # Fold the signature to a size proportional to the number of trigrams.
+        n = max(64, 1 << (8 * count).bit_length())
+        while size > n:
+            size >>= 1
+            bits = (bits & ((1 << size) - 1)) | (bits >> size)
+        return size, bits
+    #@+node:ekr.20261018161122.8: *3* SearchIndex.update
+    def update(self):
+        """Update the entries for all changed, inserted and deleted vnodes."""
+        old_entries, entries = self.entries, {}
+        indexed = 0
+        # Walking vnodes is much faster than c.all_unique_nodes.
+        stack = list(self.c.hiddenRootNode.children)
+        while stack:
+            v = stack.pop()
+            if v in entries:
+                continue
+            stack.extend(v.children)
+            h, b = v._headString, v._bodyString
+            entry = old_entries.get(v)
+            if not entry or entry[0] is not h or entry[1] is not b:
+                indexed += 1
+                entry = (h, b, self.signature(h), self.signature(b))
+            entries[v] = entry
+        self.entries = entries
+        self.indexed = indexed
+    #@-others
+#@+node:ekr.20261018231512.1: ** class SymbolIndex
+class SymbolIndex:
+    """
+    A per-commander index of the definitions in the bodies of @<file> trees,
+    used by the find-def and find-var commands and by the autocompleter.
+
+    Definitions are tuples (v, row, kind, class_name), where row is the
+    zero-based line number in v.b, kind is 'class', 'def' or 'var' and
+    class_name is the name of the enclosing class or ''.
+
+    Python bodies are scanned with the ast module. Other languages and
+    Python bodies that do not parse are scanned line by line.
+
+    Like the SearchIndex, the index updates itself lazily, rescanning only
+    changed nodes. Saving or closing the outline saves the scans of all
+    bodies in c.db.
+    """
+    dbKey = 'symbol-index'
+    #@+<< define SymbolIndex patterns >>
+    #@+node:ekr.20261018231512.2: *3* << define SymbolIndex patterns >>
+    # Languages for which line-oriented scanning makes sense.
+    code_languages = frozenset([
+        'actionscript', 'c', 'coffeescript', 'cplusplus', 'csharp', 'cython',
+        'dart', 'elisp', 'go', 'java', 'javascript', 'julia', 'lisp', 'lua',
+        'pascal', 'perl', 'php', 'python', 'ruby', 'rust', 'scala', 'tcl',
+        'typescript',
+    ])
+
+    c_languages = frozenset([
+        'c', 'cplusplus', 'csharp', 'dart', 'go', 'java', 'php', 'rust', 'scala',
+    ])
+
+    c_keywords = frozenset([
+        'case', 'catch', 'delete', 'else', 'for', 'goto', 'if', 'new',
+        'return', 'sizeof', 'switch', 'throw', 'while',
+    ])
+
+    python_patterns = (
+        ('class', re.compile(r'^\s*class\s+(\w+)')),
+        ('def', re.compile(r'^\s*(?:async\s+)?def\s+(\w+)')),
+        ('var', re.compile(r'^(\w+)\s*(?::[^=]*)?=[^=]')),
+    )
+
+    patterns = (
+        ('class', re.compile(
+            r'^\s*(?:(?:abstract|export|final|partial|private|protected|public|sealed|static)\s+)*'
+            r'(?:class|enum|interface|module|struct|trait)\s+(\w+)')),
+        ('def', re.compile(
+            r'^\s*(?:(?:async|export|private|protected|pub|public|static)\s+)*'
+            r'(?:def|fn|func|function|proc|sub)\s+(\w+)')),
+        ('def', re.compile(
+            r'^\s*(?:(?:const|export|let|var)\s+)*(\w+)\s*[:=]\s*(?:async\s+)?'
+            r'(?:function\b|\([^)]*\)\s*=>)')),
+        ('def', re.compile(r'^\s*\(\s*def(?:macro|un)\s+([\w-]+)')),
+        ('var', re.compile(r'^\s*(?:export\s+)?(?:const|let|var)\s+(\w+)')),
+        ('var', re.compile(r'^\s*\(\s*def(?:const|custom|var)\s+([\w-]+)')),
+    )
+
+    c_function_pattern = re.compile(r'^\s*(?:[\w:<>,\*&\[\]]+\s+)+[\*&]*([A-Za-z_][\w:]*)\s*\([^;]*$')
+    directive_pattern = re.compile(r'^(\s*)@(\w*)')
+    ivar_pattern = re.compile(r'\bself\.(\w+)\s*(?::[^=]*)?(?:[-+*/%&|^@]|//|<<|>>|\*\*)?=(?!=)')
+    section_pattern = re.compile(r'^(\s*)<<.*>>')
+    #@-<< define SymbolIndex patterns >>
+    #@+others
+    #@+node:ekr.20261018231512.3: *3* SymbolIndex.__init__
+    def __init__(self, c):
+        self.c = c
+        self.definitions = {}
+            # Keys are names. Values are lists of definitions.
+        self.entries = {}
+            # Keys are vnodes.
+            # Values are tuples (b, language, hash, outer_class, (symbols, others_class)).
+        self.members = {}
+            # Keys are class names. Values are lists of the names of members.
+        self.order = {}
+            # Keys are vnodes. Values are the index of the vnode in outline order.
+        self.dirty = False
+            # True: the scans differ from the saved scans.
+        self.indexed = 0
+            # The number of bodies scanned by the last update.
+        self.key = None
+            # (generation, v, headline) for the selected vnode at the last update.
+        self.body_key = None
+            # (tree.bodyGeneration, tree.lastBodyChanged) at the last refresh.
+        self.loaded = False
+        self.saved = {}
+            # Keys are gnx's, values are (hash, scan) tuples from c.db.
+    #@+node:ekr.20261018231512.4: *3* SymbolIndex.add & remove
+    def add(self, v, entry):
+        """Add the definitions in the entry for v."""
+        outer = entry[3]
+        for name, kind, row, class_name in entry[4][0]:
+            class_name = outer if class_name is None else class_name
+            self.definitions.setdefault(name, []).append((v, row, kind, class_name))
+            if class_name:
+                self.members.setdefault(class_name, []).append(name)
+
+    def remove(self, v, entry):
+        """Remove the definitions in the entry for v."""
+        outer = entry[3]
+        for name, kind, row, class_name in entry[4][0]:
+            class_name = outer if class_name is None else class_name
+            aList = self.definitions.get(name)
+            if aList is not None:
+                aList = [z for z in aList if z[0] is not v]
+                if aList:
+                    self.definitions[name] = aList
+                else:
+                    del self.definitions[name]
+            aList = self.members.get(class_name)
+            if aList is not None:
+                aList.remove(name)
+                if not aList:
+                    del self.members[class_name]
+    #@+node:ekr.20261018231512.5: *3* SymbolIndex.class_at
+    def class_at(self, v, row):
+        """Return the name of the class enclosing the given row of v.b, or None."""
+        self.refresh()
+        entry = self.entries.get(v)
+        if not entry:
+            return None
+        class_name = entry[3]
+        for name, kind, row2, class_name2 in entry[4][0]:
+            if row2 > row:
+                break
+            if kind == 'def':
+                class_name = entry[3] if class_name2 is None else class_name2
+        return class_name or None
+    #@+node:ekr.20261018231512.6: *3* SymbolIndex.find
+    def find(self, name, kinds):
+        """Return the definitions of the given kinds of name, in outline order."""
+        self.refresh()
+        order = self.order
+        aList = [z for z in self.definitions.get(name, []) if z[2] in kinds]
+        return sorted(aList, key=lambda z: (order.get(z[0], 0), z[1]))
+    #@+node:ekr.20261018231512.7: *3* SymbolIndex.load & save
+    def load(self):
+        """Load the saved scans from c.db, once."""
+        if self.loaded:
+            return
+        self.loaded = True
+        try:
+            self.saved = self.c.db.get(self.dbKey) or {}
+        except Exception:
+            g.es_exception()
+
+    def save(self):
+        """Save the scans of all bodies in c.db, if they have changed."""
+        if not self.dirty:
+            return
+        self.dirty = False
+        self.saved = {v.gnx: (entry[2], entry[4]) for v, entry in self.entries.items()}
+        try:
+            self.c.db[self.dbKey] = self.saved
+        except Exception:
+            g.es_exception()
+    #@+node:ekr.20261018231512.8: *3* SymbolIndex.member_names & names
+    def member_names(self, class_name):
+        """Return the sorted list of the names of all members of a class."""
+        self.refresh()
+        return sorted(set(self.members.get(class_name, [])))
+
+    def names(self, prefix, kinds):
+        """Return the sorted list of all names with the given prefix and kinds."""
+        self.refresh()
+        return sorted(
+            name for name, aList in self.definitions.items()
+                if name.startswith(prefix) and any(z[2] in kinds for z in aList))
+    #@+node:ekr.20261018224510.1: *3* SymbolIndex.refresh
+    def refresh(self):
+        """
+        Update the index before a query.
+
+        Walking the entire outline after every keystroke is too slow. If the
+        tree generation and the selected vnode and its headline are unchanged
+        since the last update, only bodies can have changed. tree.bodyGeneration
+        and tree.lastBodyChanged tell which vnodes those can be: usually just
+        the vnode being edited. Rescan just those bodies if they are leaves
+        whose old and new bodies contain no @language directives.
+        """
+        c, tree = self.c, self.c.frame.tree
+        v = c.p.v if c.p else None
+        if self.key != (tree.generation, v, v and v._headString):
+            self.update()
+            return
+        generation, last = self.body_key
+        if tree.bodyGeneration == generation:
+            # Only the body of the last changed vnode can have changed again.
+            vnodes = [last]
+        elif tree.bodyGeneration == generation + 1:
+            vnodes = [last, tree.lastBodyChanged]
+        else:
+            self.update()
+            return
+        self.body_key = (tree.bodyGeneration, tree.lastBodyChanged)
+        pattern = g.g_language_pat
+        indexed = 0
+        for v in vnodes:
+            entry = self.entries.get(v)
+            if not entry or entry[0] is v._bodyString:
+                continue
+            b = v._bodyString
+            if v.children or pattern.search(entry[0]) or pattern.search(b):
+                self.update()
+                return
+            language = entry[1]
+            h = hashlib.md5(g.toEncodedString(f"{language}\n{b}")).hexdigest()
+            new_entry = (b, language, h, entry[3], self.scan(b, language))
+            self.remove(v, entry)
+            self.add(v, new_entry)
+            self.entries[v] = new_entry
+            indexed += 1
+        if indexed:
+            self.indexed = indexed
+            self.dirty = True
+    #@+node:ekr.20261018231512.9: *3* SymbolIndex.scan & helpers
+    def scan(self, s, language):
+        """
+        Return (symbols, others_class) for body text s.
+
+        symbols is a tuple of tuples (name, kind, row, class_name).
+        class_name is None for definitions at the outer level of s.
+
+        others_class is the name of the class containing @others
+        or the first section reference, or None.
+        """
+        if language in ('python', 'cython'):
+            result = self.scan_python(s)
+            if result:
+                return result
+        if language in self.code_languages:
+            return self.scan_lines(s, language), None
+        return (), None
+    #@+node:ekr.20261018231512.10: *4* SymbolIndex.scan_lines
+    def scan_lines(self, s, language):
+        """Scan s line by line, ignoring enclosing classes."""
+        if language in ('python', 'cython'):
+            patterns = self.python_patterns
+        else:
+            patterns = self.patterns
+        c_pattern = self.c_function_pattern if language in self.c_languages else None
+        symbols = []
+        for row, line in enumerate(s.split('\n')):
+            for kind, pattern in patterns:
+                m = pattern.match(line)
+                if m:
+                    symbols.append((m.group(1), kind, row, None))
+                    break
+            else:
+                m = c_pattern and c_pattern.match(line)
+                if m and not self.c_keywords.intersection([line.split()[0], m.group(1)]):
+                    symbols.append((m.group(1).split('::')[-1], 'def', row, None))
+        return tuple(symbols)
+    #@+node:ekr.20261018231512.11: *4* SymbolIndex.scan_python
+    def scan_python(self, s):
+        """
+        Scan s with Python's ast module. Return None if s does not parse.
+
+        Leo directives and section references become pass statements,
+        and doc parts become blank lines, preserving all line numbers.
+        """
+        lines, refs, in_doc = s.split('\n'), set(), False
+        for i, line in enumerate(lines):
+            m = self.directive_pattern.match(line)
+            word = m and m.group(2)
+            if in_doc:
+                in_doc = not (line.startswith('@') and word in ('c', 'code'))
+                lines[i] = ''
+            elif line.startswith('@') and word in ('', 'doc'):
+                in_doc = True
+                lines[i] = ''
+            else:
+                m = m if m and word in g.globalDirectiveList else self.section_pattern.match(line)
+                if m:
+                    lines[i] = m.group(1) + 'pass'
+                    refs.add(i + 1)
+        try:
+            tree = ast.parse('\n'.join(lines))
+        except(SyntaxError, ValueError):
+            return None
+        symbols, others = [], []
+
+        def add(name, kind, node, class_name):
+            symbols.append((name, kind, node.lineno - 1, class_name))
+
+        def visit(nodes, class_name):
+            for node in nodes:
+                if isinstance(node, ast.ClassDef):
+                    add(node.name, 'class', node, class_name)
+                    visit(node.body, node.name)
+                elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    add(node.name, 'def', node, class_name)
+                    # Add the ivars assigned in methods.
+                    # Matching lines is much faster than walking the tree.
+                    seen = set()
+                    for row in range(node.lineno - 1, node.end_lineno):
+                        for m in self.ivar_pattern.finditer(lines[row]):
+                            name = m.group(1)
+                            if name not in seen:
+                                seen.add(name)
+                                symbols.append((name, 'var', row, class_name))
+                elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+                    targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                    for target in targets:
+                        for z in ast.walk(target):
+                            if isinstance(z, ast.Name):
+                                add(z.id, 'var', z, class_name)
+                elif isinstance(node, ast.Pass):
+                    if node.lineno in refs and not others:
+                        others.append(class_name)
+                else:
+                    # Look inside if, try, with, etc.
+                    visit([z for z in ast.iter_child_nodes(node)
+                        if isinstance(z, (ast.stmt, ast.excepthandler))], class_name)
+
+        visit(tree.body, None)
+        symbols.sort(key=lambda z: z[2])
+        return tuple(symbols), others[0] if others else None
+    #@+node:ekr.20261018231512.12: *3* SymbolIndex.update & helper
+    def update(self):
+        """Update the entries for all changed, inserted and deleted vnodes."""
+        c = self.c
+        self.load()
+        v = c.p.v if c.p else None
+        tree = c.frame.tree
+        self.key = (tree.generation, v, v and v._headString)
+        self.body_key = (tree.bodyGeneration, tree.lastBodyChanged)
+        old_entries, entries, order = self.entries, {}, {}
+        indexed = 0
+        # Entries are (v, language, outer_class). language is None outside @<file> trees.
+        stack = [(v, None, '') for v in reversed(c.hiddenRootNode.children)]
+        while stack:
+            v, language, outer = stack.pop()
+            if v in order:
+                continue
+            order[v] = len(order)
+            if language is None:
+                if not v.isAnyAtFileNode():
+                    stack.extend((z, None, '') for z in reversed(v.children))
+                    continue
+                language = self.file_language(v)
+            b = v._bodyString
+            m = g.g_language_pat.search(b)
+            if m and g.isValidLanguage(m.group(1)):
+                language = m.group(1)
+            entry = old_entries.get(v)
+            if not entry or entry[0] is not b or entry[1] != language:
+                h = hashlib.md5(g.toEncodedString(f"{language}\n{b}")).hexdigest()
+                data = self.saved.get(v.gnx)
+                if data and data[0] == h:
+                    result = data[1]
+                else:
+                    indexed += 1
+                    result = self.scan(b, language)
+                entry = (b, language, h, outer, result)
+            elif entry[3] != outer:
+                entry = entry[:3] + (outer,) + entry[4:]
+            entries[v] = entry
+            inner = entry[4][1] or outer
+            stack.extend((z, language, inner) for z in reversed(v.children))
+        # Update the definitions of all changed, inserted and deleted vnodes.
+        for v, entry in old_entries.items():
+            new_entry = entries.get(v)
+            if new_entry is None or new_entry[3:] != entry[3:]:
+                self.remove(v, entry)
+        for v, entry in entries.items():
+            old_entry = old_entries.get(v)
+            if old_entry is None or old_entry[3:] != entry[3:]:
+                self.add(v, entry)
+        self.entries, self.order = entries, order
+        self.indexed = indexed
+        if indexed or len(entries) != len(old_entries):
+            self.dirty = True
+    #@+node:ekr.20261018231512.13: *4* SymbolIndex.file_language
+    def file_language(self, v):
+        """Return the language implied by the extension of @<file> node v."""
+        c = self.c
+        junk, ext = g.os_path_splitext(v.anyAtFileNodeName())
+        language = g.app.extension_dict.get(ext[1:])
+        if g.isValidLanguage(language):
+            return language
+        return c.target_language.lower() if c.target_language else 'python'
+    #@-others
 #@+node:ekr.20200216063538.1: ** class TestFind
 class TestFind(unittest.TestCase):
     """Test cases for leoFind.py"""
@@ -2666,6 +3292,284 @@ class TestFind(unittest.TestCase):
         expected = r"""f' AA line\\n BB \3'"""
         result = x.makeRegexSubs(change_text, groups)
         assert result == expected, (expected, result)
+    #@+node:ekr.20261018172014.7: *3* make_commander
+    def make_commander(self, n=100):
+        """
+        Return a headless commander containing n random nodes,
+        with c.findCommands ready for batch commands.
+        """
+        import os
+        import random
+        import tempfile
+        import leo.core.leoBridge as leoBridge
+        bridge = leoBridge.headless_controller()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        c = bridge.openLeoFile(os.path.join(temp_dir.name, 'test.leo'))
+        root = c.rootPosition()
+        words = ['alpha', 'Beta', 'GAMMA', 'delta-x', 'zeta', 'eta', 'ΑΣ', 'x\\ny', 'ab\tcd']
+        rng = random.Random(42)
+        for i in range(n):
+            p = root.insertAsLastChild()
+            p.h = ' '.join(rng.choice(words) for _ in range(2))
+            p.b = '\n'.join(' '.join(rng.choice(words) for _ in range(4)) for _ in range(4))
+        c.selectPosition(root)
+        x = c.findCommands
+
+        class FindTabManager:
+            entry_focus = None
+
+            def getFindText(self):
+                return x.find_text
+
+        x.ftm = FindTabManager()
+        x.buttonFlag, x.was_in_headline = True, False
+            # Don't look at the focus widget.
+        for ivar in ('ignore_case', 'mark_changes', 'mark_finds', 'node_only',
+            'pattern_match', 'reverse', 'suboutline_only', 'whole_word', 'wrap',
+        ):
+            setattr(x, ivar, False)
+        x.search_headline = x.search_body = True
+        return c
+    #@+node:ekr.20261019003512.1: *3* test_batch_word_replace
+    def test_batch_word_replace(self):
+        """Test that whole-word replacements don't change the case of other matches."""
+        c = self.make_commander(n=0)
+        x = c.findCommands
+        x.find_text, x.change_text = 'foo', 'bar'
+        x.ignore_case = x.whole_word = True
+        result = x.batchWordReplace('Foobar FOO foo Foo.')
+        assert result == (3, 'Foobar bar bar bar.'), result
+        assert x.batch_spans == [(7, 10), (11, 14), (15, 18)], x.batch_spans
+    #@+node:ekr.20261018172014.8: *3* test_replace_all_undo
+    def test_replace_all_undo(self):
+        """Test undo and redo of replace-all."""
+        c = self.make_commander()
+        u, x = c.undoer, c.findCommands
+
+        def contents():
+            return [(p.h, p.b) for p in c.all_positions()]
+
+        table = (
+            # find, change, ignore_case, pattern_match
+            ('eta', 'ETA', False, False),
+            ('ab', 'x\\ny\\nz', True, False),
+            ('a\\nalpha', '', True, False),
+            (r'\bx\\ny\s+', 'x\\n', False, True),
+        )
+        redraws = []
+        c.redraw = lambda *args, **kwargs: redraws.append(args)
+        for find, change, ignore_case, pattern_match in table:
+            x.find_text, x.change_text = find, change
+            x.ignore_case, x.pattern_match = ignore_case, pattern_match
+            before = contents()
+            x.changeAll()
+            after = contents()
+            assert after != before, find
+            bead = u.beads[u.bead]
+            assert bead.kind == 'multi-node', bead.kind
+            # Undo and redo redraw the tree if they change headlines.
+            heads_changed = [z[0] for z in before] != [z[0] for z in after]
+            redraws.clear()
+            u.undo()
+            assert contents() == before, find
+            assert redraws or not heads_changed, find
+            redraws.clear()
+            u.redo()
+            assert contents() == after, find
+            assert redraws or not heads_changed, find
+        del c.redraw
+        while u.canUndo():
+            u.undo()
+        # Replace-all adds no undo node when it changes nothing,
+        # including when it returns early because of bad arguments.
+        beads, bead = u.beads[:], u.bead
+        table = (
+            # find, pattern_match, search
+            ('', False, True),
+            ('(', True, True),
+            ('eta', False, False),
+            ('no such text', False, True),
+        )
+        for find, pattern_match, search in table:
+            x.find_text, x.pattern_match = find, pattern_match
+            x.search_headline = x.search_body = search
+            x.changeAll()
+            assert (u.beads, u.bead) == (beads, bead), find
+        x.search_headline = x.search_body = True
+        # Undo and redo update the selected headline's widget.
+        p = c.rootPosition().firstChild()
+        while 'eta' not in p.h:
+            p.moveToNext()
+        c.selectPosition(p)
+        x.find_text, x.change_text = 'eta', 'ETA'
+        x.ignore_case = x.pattern_match = False
+        x.changeAll()
+        tree = c.frame.tree
+        for undo in (u.undo, u.redo):
+            undo()
+            assert tree.edit_widget(c.p).getAllText() == c.p.h, undo.__name__
+        # Test deltas directly.
+        table = (
+            ('', 'a'),
+            ('a\nb\nc\n', 'a\nB\nc\n'),
+            ('a\nb\nc', 'a\nb\nc\nd\ne'),
+            ('a\nb\nc\n', 'x\nb\n'),
+            ('a\r\nb\n', 'ab'),
+        )
+        for old, new in table:
+            for s1, s2 in ((old, new), (new, old)):
+                delta = u.computeDelta(s1, s2)
+                assert u.applyDelta(s1, delta) == s2, (s1, s2, delta)
+                assert u.applyDelta(s2, delta, reverse=True) == s1, (s1, s2, delta)
+    #@+node:ekr.20261018161122.9: *3* test_search_index
+    def test_search_index(self):
+        """Test that the search index does not change the results of batch commands."""
+        c = self.make_commander()
+        root, x = c.rootPosition(), c.findCommands
+
+        def run(kind):
+            saved = {v: (v._headString, v._bodyString) for v in c.all_unique_nodes()}
+            n = len(root.v.parents[0].children)
+            x.change_text = 'CHANGED'
+            if kind == 'replace-all':
+                x.changeAll()
+            else:
+                x.findAll(clone_find_all=kind == 'clone-find-all')
+            result = [(p.level(), p.h, p.b) for p in c.all_positions()]
+            # Restore the outline.
+            while len(root.v.parents[0].children) > n:
+                c.lastTopLevel().doDelete()
+            for v, (h, b) in saved.items():
+                v._headString, v._bodyString = h, b
+            c.selectPosition(root)
+            return result
+
+        patterns = ('eta', 'ETA zeta', 'ta-x', 'a\\n', 'b\tc', 'ασ', 'ta\ndel', 'no match')
+        for pattern in patterns:
+            for ignore_case in (True, False):
+                for whole_word in (True, False):
+                    for kind in ('find-all', 'clone-find-all', 'replace-all'):
+                        x.find_text = pattern
+                        x.ignore_case, x.whole_word = ignore_case, whole_word
+                        x.use_search_index = False
+                        expected = run(kind)
+                        x.use_search_index = True
+                        result = run(kind)
+                        assert result == expected, (pattern, ignore_case, whole_word, kind)
+        # Only changed nodes are reindexed.
+        index = x.search_index
+        assert index and index.entries, index
+        index.update()
+        assert index.indexed == 0, index.indexed
+        root.firstChild().b = 'changed'
+        index.update()
+        assert index.indexed == 1, index.indexed
+    #@+node:ekr.20261018231512.17: *3* test_symbol_index
+    def test_symbol_index(self):
+        """Test the symbol index and find-def."""
+        c = self.make_commander(n=0)
+        x = c.findCommands
+        x.use_symbol_index = True
+        index = x.getSymbolIndex()
+        root = c.rootPosition()
+        root.h = '@file test.py'
+        root.b = (
+            'import os\n'
+            'CONSTANT = 1\n'
+            'class Outer:\n'
+            '    """doc"""\n'
+            '    @others\n'
+            '@language python\n'
+        )
+        child = root.insertAsLastChild()
+        child.h = 'Outer.method'
+        child.b = (
+            '@\n'
+            'A doc part.\n'
+            '@c\n'
+            '@g.command(\'my-command\')\n'
+            'def method(self, a):\n'
+            '    self.ivar = a\n'
+            '    self.ivar = 2\n'
+            '    << section >>\n'
+        )
+        section = child.insertAsLastChild()
+        section.h = '<< section >>'
+        section.b = 'class Inner:\n    def inner_method(self):\n        pass\n'
+        js = root.insertAfter()
+        js.h = '@clean test.js'
+        js.b = 'function jsFunction(a) {\n    var jsVar = 1;\n}\n'
+        other = js.insertAfter()
+        other.h = 'Not in an @file tree'
+        other.b = 'def method():\n    pass\n'
+        assert index.find('method', ('def',)) == [(child.v, 4, 'def', 'Outer')]
+        assert index.find('ivar', ('var',)) == [(child.v, 5, 'var', 'Outer')]
+        assert index.find('CONSTANT', ('var',)) == [(root.v, 1, 'var', '')]
+        assert index.find('inner_method', ('def',)) == [(section.v, 1, 'def', 'Inner')]
+        assert index.find('jsFunction', ('def',)) == [(js.v, 0, 'def', '')]
+        assert index.find('jsVar', ('var',)) == [(js.v, 1, 'var', '')]
+        assert index.member_names('Outer') == ['Inner', 'ivar', 'method']
+        assert index.class_at(child.v, 6) == 'Outer'
+        assert index.class_at(section.v, 2) == 'Inner'
+        assert index.names('js', ('def',)) == ['jsFunction']
+        # Only changed nodes are rescanned.
+        index.update()
+        assert index.indexed == 0, index.indexed
+        child.b = child.b.replace('method', 'new_method')
+        index.update()
+        assert index.indexed == 1, index.indexed
+        assert not index.find('method', ('def',))
+        assert index.member_names('Outer') == ['Inner', 'ivar', 'new_method']
+        # Changing the outer class changes the classes of all descendants.
+        root.b = root.b.replace('Outer', 'Renamed')
+        assert index.find('ivar', ('var',)) == [(child.v, 5, 'var', 'Renamed')]
+        assert 'Outer' not in index.members
+        # Deleting a node deletes its definitions.
+        js.doDelete()
+        assert not index.find('jsFunction', ('def',))
+        # Queries rescan only the selected leaf. Only saving the outline saves the index.
+
+        def fail():
+            raise AssertionError('walked the outline or saved the index')
+
+        c.selectPosition(section)
+        index.update()
+        index.update = index.save = fail
+        section.b = section.b + '    def another_method(self):\n        pass\n'
+        assert index.find('another_method', ('def',)) == [(section.v, 3, 'def', 'Inner')]
+        assert index.indexed == 1, index.indexed
+        assert index.class_at(section.v, 4) == 'Inner'
+        del index.update, index.save
+        assert index.dirty
+        # Queries also rescan leaves that aren't selected,
+        # for example after replace-all or a script changes them.
+        leaf = section.insertAfter()
+        leaf.h = 'leaf'
+        leaf.b = 'def leaf_function():\n    pass\n'
+        c.selectPosition(section)
+        index.update()
+        index.update = index.save = fail
+        leaf.b = leaf.b.replace('leaf_function', 'changed_function')
+        assert not index.find('leaf_function', ('def',))
+        assert [z[:2] for z in index.find('changed_function', ('def',))] == [(leaf.v, 0)]
+        assert index.indexed == 1, index.indexed
+        del index.update, index.save
+        # Changing several bodies updates the whole index.
+        leaf.b = leaf.b.replace('changed_function', 'leaf_function')
+        child.b = child.b.replace('new_method', 'method')
+        assert [z[:2] for z in index.find('leaf_function', ('def',))] == [(leaf.v, 0)]
+        assert [z[:2] for z in index.find('method', ('def',))] == [(child.v, 4)]
+        assert not index.find('new_method', ('def',))
+        # find-def selects the definition.
+        c.selectPosition(other)
+        assert x.findDefInSymbolIndex('inner_method', defFlag=True)
+        assert c.p.v == section.v
+        w = c.frame.body.wrapper
+        assert w.getSelectedText() == 'inner_method', repr(w.getSelectedText())
+        assert x.findDefInSymbolIndex('leafFunction', defFlag=True)
+        assert c.p.v == leaf.v
+        assert not x.findDefInSymbolIndex('inner_method', defFlag=False)
     #@-others
 #@-others
 if __name__ == '__main__':
@@ -1278,6 +1278,13 @@ class LeoTree:
         self.generation = 0
             # Leo 5.6: low-level vnode methods increment
             # this count whenever the tree changes.
+        self.headGeneration = 0
+            # v.setHeadString increments this count.
+        self.bodyGeneration = 0
+        self.lastBodyChanged = None
+            # v.setBodyString increments bodyGeneration whenever it changes the body
+            # of a vnode other than lastBodyChanged, so typing into one body
+            # increments the count only once.
         self.redrawCount = 0  # For traces
         self.revertHeadline = None
         self.use_chapters = False  # May be overridden in subclasses.
@@ -2537,10 +2537,50 @@ class TestLeoGlobals(unittest.TestCase):
         # pylint: disable=import-self
         import leo.core.leoGlobals as leo_g
         import leo.core.leoApp as leoApp
+        old_app = leo_g.app
         leo_g.app = leoApp.LeoApp()
-        assert leo_g.comment_delims_from_extension(".py") == ('#', '', '')
-        assert leo_g.comment_delims_from_extension(".c") == ('//', '/*', '*/')
-        assert leo_g.comment_delims_from_extension(".html") == ('', '<!--', '-->')
+        try:
+            assert leo_g.comment_delims_from_extension(".py") == ('#', '', '')
+            assert leo_g.comment_delims_from_extension(".c") == ('//', '/*', '*/')
+            assert leo_g.comment_delims_from_extension(".html") == ('', '<!--', '-->')
+        finally:
+            # Don't break tests that use the bridge.
+            leo_g.app = old_app or leo_g.app
+    #@+node:ekr.20261018195310.3: *4* test_directives_cache
+    def test_directives_cache(self):
+        """Test that cached directives follow changes to headlines and bodies."""
+        import leo.core.leoBridge as leoBridge
+        bridge = leoBridge.headless_controller()
+        leo_g = bridge.globals()
+        c = leo_g.app.newCommander(fileName=None, gui=leo_g.app.gui)
+        root = c.rootPosition()
+        child = root.insertAsLastChild()
+        child.h = '@file x.py'
+
+        def directory():
+            return leo_g.os_path_basename(leo_g.os_path_dirname(leo_g.fullPath(c, child)))
+
+        def language():
+            return c.scanAllDirectives(child)['language']
+
+        root.h = '@path a'
+        child.b = '@language c\n'
+        assert (directory(), language()) == ('a', 'c')
+        # Cached results.
+        n = c.scanAtPathDirectivesCount
+        assert (directory(), language()) == ('a', 'c')
+        assert c.scanAtPathDirectivesCount == n
+        # Changed headlines and bodies.
+        root.h = '@path b'
+        assert directory() == 'b'
+        child.b = '@language python\n'
+        assert language() == 'python'
+        # Results of path expressions aren't cached.
+        root.h = '@path {{"a" + "b"}}'
+        assert directory() == 'ab'
+        n = c.scanAtPathDirectivesCount
+        assert directory() == 'ab'
+        assert c.scanAtPathDirectivesCount > n
     #@+node:ekr.20200219072957.1: *4* test_is_sentinel
     def test_is_sentinel(self):
 
@@ -3352,9 +3392,26 @@ def get_directives_dict(p, root=None):
 
     Returns a dict containing the stripped remainder of the line
     following the first occurrence of each recognized directive
+
+    c.directivesCache caches the result for each vnode.
     """
     if root:
         root_node = root[0]
+    # The result depends only on p.h, p.b, g.directives_pat and root.
+    cache = getattr(p.v.context, 'directivesCache', None)
+    if root and not root_node:
+        cache = None  # Always report the error below.
+    if cache is not None:
+        h, b, is_root = p.h, p.b, bool(root)
+        entries = cache.get(p.v)
+        if entries is None:
+            entries = cache[p.v] = {}
+        entry = entries.get(is_root)
+        if (
+            entry and entry[0] == h and entry[1] == b and
+            entry[2] is g.directives_pat
+        ):
+            return dict(entry[3])
     d = {}
     #
     # #1688:    legacy: Always compute the pattern.
@@ -3387,6 +3444,9 @@ def get_directives_dict(p, root=None):
             else:
                 g.es(f'{g.angleBrackets("*")} may only occur in a topmost node (i.e., without a parent)')
             break
+    if cache is not None:
+        entries[is_root] = (h, b, g.directives_pat, d)
+        return dict(d)
     return d
 #@+node:ekr.20080827175609.1: *3* g.get_directives_dict_list (must be fast)
 def get_directives_dict_list(p):
@@ -3929,18 +3989,25 @@ def fullPath(c, p, simulate=False):
     """
     Return the full path (including fileName) in effect at p. Neither the
     path nor the fileName will be created if it does not exist.
+
+    c.getResolvedDirectives caches the result.
     """
-    # Search p and p's parents.
-    for p in p.self_and_parents(copy=False):
-        aList = g.get_directives_dict_list(p)
-        path = c.scanAtPathDirectives(aList)
-        fn = p.h if simulate else p.anyAtFileNodeName()
-            # Use p.h for unit tests.
-        if fn:
-            # Fix #102: expand path expressions.
-            fn = c.expand_path_expression(fn)  # #1341.
-            return g.os_path_finalize_join(path, fn)  # #1341.
-    return ''
+
+    def compute():
+        # Search p and p's parents.
+        for p2 in p.self_and_parents(copy=False):
+            aList = g.get_directives_dict_list(p2)
+            path = c.scanAtPathDirectives(aList)
+            fn = p2.h if simulate else p2.anyAtFileNodeName()
+                # Use p.h for unit tests.
+            if fn:
+                # Fix #102: expand path expressions.
+                fn = c.expand_path_expression(fn)  # #1341.
+                return g.os_path_finalize_join(path, fn)  # #1341.
+        return ''
+
+    context = (simulate, c.getPathContext())
+    return c.getResolvedDirectives('path', p, context, compute)
 #@+node:ekr.20190327192721.1: *3* g.get_files_in_directory
 def get_files_in_directory(directory, kinds=None, recursive=True):
     """
@@ -7,6 +7,8 @@
 # Required so the unit test that simulates an @auto leoImport.py will work!
 import leo.core.leoGlobals as g
 import leo.core.leoNodes as leoNodes
+import leo.core.leoProcesses as leoProcesses
+import concurrent.futures
 import csv
 try:
     import docutils
@@ -22,9 +24,12 @@ try:
     import lxml.html
 except ImportError:
     lxml = None
+import multiprocessing
 import os
 import re
+import sys
 import time
+import unittest
 import urllib
 #@-<< imports >>
 #@+others
@@ -202,6 +207,7 @@ class LeoImportCommands:
         self.errors = 0
         self.fileName = None  # The original file name, say x.cpp
         self.fileType = None  # ".py", ".c", etc.
+        self.importer_versions = {}  # Keys are importer classes.
         self.methodName = None  # x, as in < < x methods > > =
         self.output_newline = g.getOutputNewline(c=c)  # Value of @bool output_newline
         self.rootLine = ""  # Empty or @root + self.fileName
@@ -1368,6 +1374,81 @@ class LeoImportCommands:
     #@+node:ekr.20031218072017.3307: *4* ic.error
     def error(self, s):
         g.es('', s)
+    #@+node:ekr.20261018213344.5: *4* ic.get_import_settings & get_import_signature
+    def get_import_settings(self):
+        """Return a list of tuples (kind, name, val) for all settings that affect importers."""
+        c = self.c
+        settings = []
+        for kind, name in (
+            ('bool', 'add-context-to-headlines'),
+            ('bool', 'add-file-context-to-headlines'),
+            ('bool', 'at_auto_warns_about_leading_whitespace'),
+            ('bool', 'put-cython-decorators-in-imported-headlines'),
+            ('bool', 'put-python-decorators-in-imported-headlines'),
+            ('bool', 'suppress-import-parsing'),
+            ('data', 'c-import-typedefs'),
+            ('data', 'import-html-tags'),
+            ('data', 'import-xml-tags'),
+        ):
+            val = c.config.getData(name) if kind == 'data' else c.config.getBool(name)
+            if val is not None:
+                settings.append((kind, name, val))
+        return settings
+
+    def get_import_signature(self, fileName, p):
+        """
+        Return a string describing everything besides the file's contents
+        that affects the outline that createOutline creates from fileName in p:
+        the importer, the versions of its modules, the importer settings,
+        the encoding and the tab width.
+        """
+        c = self.c
+        junk, ext = g.os_path_splitext(fileName)
+        ext = ext.lower()
+        func = self.dispatch(ext, p)
+        aClass = getattr(func, 'scanner_class', None)
+        versions = self.importer_versions.get(aClass)
+        if versions is None:
+            modules = [z.__module__ for z in aClass.__mro__] if aClass else []
+            versions = []
+            for name in sorted(set(modules + [__name__])):
+                path = getattr(sys.modules.get(name), '__file__', None)
+                try:
+                    stat = os.stat(path)
+                    versions.append((name, stat.st_mtime, stat.st_size))
+                except Exception:
+                    versions.append((name, None, None))
+            self.importer_versions[aClass] = versions
+        self.setEncoding(p=p, default=c.config.default_at_auto_file_encoding)
+        return repr((
+            aClass and aClass.__name__,
+            versions,
+            ext,
+            self.get_import_settings(),
+            self.encoding,
+            c.getTabWidth(p),
+        ))
+    #@+node:ekr.20261018213344.6: *4* ic.graft_tree
+    def graft_tree(self, tree, p):
+        """
+        Copy tree, a tuple (headline, body, uA, children) created by
+        ic.tree_of, to p, a position without children.
+        The headline of p does not change.
+        """
+        h, b, u, children = tree
+        p.v.b = b
+        if u:
+            p.v.u = u
+        stack = [(p, children)]
+        while stack:
+            parent, children = stack.pop()
+            for h, b, u, grandChildren in children:
+                child = parent.insertAsLastChild()
+                child.v.h, child.v.b = h, b
+                if u:
+                    child.v.u = u
+                if grandChildren:
+                    stack.append((child, grandChildren))
     #@+node:ekr.20031218072017.3309: *4* ic.isDocStart & isModuleStart
     # The start of a document part or module in a noweb or cweb file.
     # Exporters may have to test for @doc as well.
@@ -1458,6 +1539,10 @@ class LeoImportCommands:
             self.encoding = default
         else:
             self.encoding = 'utf-8'
+    #@+node:ekr.20261018213344.7: *4* ic.tree_of
+    def tree_of(self, v):
+        """Return a tuple (headline, body, uA, children) describing v's tree."""
+        return (v.h, v.b, v.u or None, [self.tree_of(child) for child in v.children])
     #@-others
 #@+node:ekr.20160503144404.1: ** class MindMapImporter
 class MindMapImporter:
@@ -1775,18 +1860,30 @@ class RecursiveImportController:
         safe_at_file=True,
         theTypes=None,
         ignore_pattern=None,
+        processes=None,  # Override setting only if an int.
     ):
         """Ctor for RecursiveImportController class."""
         self.c = c
         self.add_path = add_path
         self.file_pattern = re.compile(r'^(([@])+(auto|clean|edit|file|nosent))')
+        self.jobs = []
+            # Tuples (path, fileName, p) of files to be imported by other processes.
         self.kind = kind
             # in ('@auto', '@clean', '@edit', '@file', '@nosent')
+        self.parallel = False
+            # True: import_one_file defers the import to other processes.
+        self.pool_failed = False
+            # True: the process pool failed, so this process imported the remaining files.
+        self.processes = (
+            c.config.getInt('recursive-import-processes') or 0
+            if processes is None else processes)
         # self.force_at_others = force_at_others #tag:no-longer-used
         self.recursive = recursive
         self.root = None
         self.safe_at_file = safe_at_file
         self.theTypes = theTypes
+        self.times = {}
+            # Keys are file names, values are the time, in seconds, to import the file.
         self.ignore_pattern = ignore_pattern or re.compile(r'\.git|node_modules')
         # #1605:
 
@@ -1817,11 +1914,20 @@ class RecursiveImportController:
             parent.v.h = 'imported files'
             # Leo 5.6: Special case for a single file.
             self.n_files = 0
+            self.jobs, self.times = [], {}
+            self.parallel = (
+                self.processes > 1 and self.kind != '@edit'
+                and not g.os_path_isfile(dir_))
+            if self.parallel and not leoProcesses.can_spawn():
+                g.es_print('recursive-import: can not create processes: no __main__ guard')
+                self.parallel = False
             if g.os_path_isfile(dir_):
                 g.es_print('\nimporting file:', dir_)
                 self.import_one_file(dir_, parent)
             else:
                 self.import_dir(dir_, parent)
+            if self.jobs:
+                self.import_files_in_processes()
             self.post_process(parent, dir_)
                 # Fix # 1033.
             c.undoer.afterChangeTree(p1, 'recursive-import', bunch)
@@ -1839,6 +1945,8 @@ class RecursiveImportController:
             f"imported {n} node{g.plural(n)} "
             f"in {self.n_files} file{g.plural(self.n_files)} "
             f"in {t2 - t1:2.2f} seconds")
+        if 'importers' in g.app.debug:
+            self.print_times()
     #@+node:ekr.20130823083943.12597: *4* ric.import_dir
     def import_dir(self, dir_, parent):
         """Import selected files from dir_, a directory."""
@@ -1887,6 +1995,14 @@ class RecursiveImportController:
             s, e = g.readFileIntoString(path, kind=self.kind)
             p.v.b = s
             return
+        if self.parallel:
+            # Create an empty @file node. import_files_in_processes will fill it.
+            p = parent.insertAsLastChild()
+            p.h = f"@file {path}"
+            fileName = c.importCommands.get_import_filename(path, p)
+            self.jobs.append((path, fileName, p))
+            return
+        t1 = time.perf_counter()
         # #1484: Use this for @auto as well.
         c.importCommands.importFilesCommand(
             files=[path],
@@ -1895,7 +2011,102 @@ class RecursiveImportController:
             shortFn=True,
             treeType='@file',  # '@auto','@clean','@nosent' cause problems.
         )
-        p = parent.lastChild()
+        self.times[path] = time.perf_counter() - t1
+        self.set_kind(parent.lastChild())
+    #@+node:ekr.20261018210514.1: *4* ric.import_files_in_processes & helpers
+    def import_files_in_processes(self):
+        """
+        Import all files in self.jobs using a pool of processes.
+
+        Each process imports one file at a time into a tree of tuples. The main
+        process grafts each tree into its (empty) @file node, in the order
+        given by self.jobs, so the resulting outline is the same as the
+        outline created by a serial import.
+        """
+        c, jobs = self.c, self.jobs
+        ic = c.importCommands
+        n = len(jobs)
+        workers = min(n, self.processes)
+        g.es_print(f"importing {n} file{g.plural(n)} in {workers} processes")
+        # Don't fork: the main process may be running Qt.
+        context = multiprocessing.get_context('spawn')
+        i, progress = 0, time.perf_counter()
+        try:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=leoProcesses.init_process,
+                initargs=(
+                    'leo.core.leoImport.init_import_process',
+                    *self.process_settings()),
+            ) as executor:
+                futures = [
+                    executor.submit(import_file_in_process, path, fileName)
+                    for path, fileName, p in jobs
+                ]
+                for future, (path, fileName, p) in zip(futures, jobs):
+                    try:
+                        tree, self.times[path] = future.result()
+                        self.graft(tree, path, p)
+                        if not g.unitTesting:
+                            g.blue("imported", g.shortFileName(path))
+                    except concurrent.futures.process.BrokenProcessPool:
+                        raise
+                    except Exception:
+                        g.es_print('Exception importing', fileName)
+                        g.es_exception()
+                    i += 1
+                    if time.perf_counter() - progress > 1.0:
+                        progress = time.perf_counter()
+                        g.es_print(f"imported {i} of {n} files")
+        except Exception:
+            g.es_print('recursive-import: process pool failed')
+            g.es_exception()
+            self.pool_failed = True
+            # Import the remaining files in this process.
+            ic.tab_width = c.getTabWidth(c.p)
+            for path, fileName, p in jobs[i:]:
+                try:
+                    t1 = time.perf_counter()
+                    ic.createOutline(path, parent=p)
+                    self.times[path] = time.perf_counter() - t1
+                except Exception:
+                    g.es_print('Exception importing', fileName)
+                    g.es_exception()
+        for path, fileName, p in jobs:
+            self.set_kind(p)
+        self.jobs = []
+    #@+node:ekr.20261018210514.2: *5* ric.graft
+    def graft(self, tree, path, p):
+        """
+        Copy tree, a tuple (headline, body, uA, children) created by
+        import_file_in_process, to p, the empty @file node for path.
+        """
+        c = self.c
+        c.importCommands.graft_tree(tree, p)
+        c.atFileCommands.rememberReadPath(path, p)
+    #@+node:ekr.20261018210514.3: *5* ric.process_settings
+    def process_settings(self):
+        """
+        Return the arguments of init_import_process: the settings that affect
+        importers, the default encoding and the tab width.
+        """
+        c = self.c
+        return (
+            c.importCommands.get_import_settings(),
+            c.config.default_at_auto_file_encoding,
+            c.tab_width,
+        )
+    #@+node:ekr.20261018210514.4: *4* ric.print_times
+    def print_times(self, n=10):
+        """Print the n files that took the longest time to import."""
+        times = sorted(self.times.items(), key=lambda item: item[1], reverse=True)
+        g.es_print(f"slowest imported files: total {sum(self.times.values()):2.2f} sec")
+        for path, t in times[:n]:
+            g.es_print(f"{t:6.3f} sec {path}")
+    #@+node:ekr.20261018210514.5: *4* ric.set_kind
+    def set_kind(self, p):
+        """Change the newly imported @file node p to the requested kind."""
         p.h = self.kind + p.h[5:]
             # Bug fix 2017/10/27: honor the requested kind.
         if self.safe_at_file:
@@ -2011,6 +2222,41 @@ class RecursiveImportController:
         if aList:
             c.deletePositionsInList(aList, redraw=False)
     #@-others
+#@+node:ekr.20261018210514.6: ** Import processes (leoImport)
+# These functions run in the processes created by
+# RecursiveImportController.import_files_in_processes.
+
+import_commander = None
+    # The commander that imports files in this process.
+#@+node:ekr.20261018210514.7: *3* init_import_process
+def init_import_process(settings, encoding, tab_width):
+    """Create a hidden commander that will import files in this process."""
+    global import_commander
+    import leo.core.leoBridge as leoBridge
+    bridge = leoBridge.headless_controller()
+    if not g.app.classDispatchDict:
+        g.app.loadManager.createAllImporterData()
+    c = import_commander = bridge.openLeoFile('')
+    for kind, name, val in settings:
+        c.config.set(None, kind, name, val, warn=False)
+    c.config.default_at_auto_file_encoding = encoding
+    c.tab_width = tab_width
+#@+node:ekr.20261018210514.8: *3* import_file_in_process
+def import_file_in_process(path, fileName):
+    """
+    Import the file whose full path is fileName, as importFilesCommand does.
+    Return (tree, seconds), where tree is a tuple (headline, body, uA,
+    children) and children is a list of such tuples.
+    """
+    c = import_commander
+    t1 = time.perf_counter()
+    p = c.rootPosition().insertAfter()
+    p.h = f"@file {path}"
+    try:
+        c.importCommands.createOutline(fileName, parent=p)
+        return c.importCommands.tree_of(p.v), time.perf_counter() - t1
+    finally:
+        p.doDelete()
 #@+node:ekr.20161006071801.1: ** class TabImporter
 class TabImporter:
     """
@@ -2735,6 +2981,73 @@ def parse_body_command(event):
     c = event.get('c')
     if c and c.p:
         c.importCommands.parse_body(c.p)
+#@+node:ekr.20261018210514.11: ** class TestRecursiveImport
+class TestRecursiveImport(unittest.TestCase):
+    """Test cases for the RecursiveImportController class."""
+    #@+others
+    #@+node:ekr.20261018210514.12: *3* TestRecursiveImport.import_tree
+    def import_tree(self, dir_, processes):
+        """Import dir_ into a new outline. Return a list describing the result."""
+        import leo.core.leoBridge as leoBridge
+        bridge = leoBridge.headless_controller()
+        if not g.app.classDispatchDict:
+            g.app.loadManager.createAllImporterData()
+        c = bridge.openLeoFile('')
+        cc = RecursiveImportController(c, '@clean', theTypes=['.py'], processes=processes)
+        cc.run(dir_)
+        # Don't hide problems with the process pool.
+        self.assertFalse(cc.pool_failed)
+        root = c.lastTopLevel()
+        self.assertEqual(root.h, 'imported files')
+        return [(p.level(), p.h, p.b) for p in root.self_and_subtree()]
+    #@+node:ekr.20261018210514.13: *3* TestRecursiveImport.test_import_in_processes
+    def test_import_in_processes(self):
+        import os
+        import tempfile
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        for i, path in enumerate(('a.py', 'b.py', 'b.txt', 'sub/c.py', 'sub/d.py')):
+            path = os.path.join(temp_dir.name, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(
+                    f"import os\n\nclass Class{i}:\n"
+                    f"    def spam(self):\n        pass\n\n"
+                    f"def function{i}():\n    return {i}\n")
+        expected = self.import_tree(temp_dir.name, processes=0)
+        self.assertEqual(
+            sorted(h for level, h, b in expected if h.startswith('@@clean')),
+            ['@@clean a.py', '@@clean b.py', '@@clean c.py', '@@clean d.py'])
+        self.assertTrue(any(h.startswith('Class3') for level, h, b in expected))
+        self.assertEqual(expected, self.import_tree(temp_dir.name, processes=2))
+    #@+node:ekr.20261019060012.11: *3* TestRecursiveImport.test_import_without_main_guard
+    def test_import_without_main_guard(self):
+        import concurrent.futures
+        import os
+        import sys
+        import tempfile
+        import types
+        from unittest import mock
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        for path in ('a.py', 'b.py'):
+            with open(os.path.join(temp_dir.name, path), 'w') as f:
+                f.write('def spam():\n    pass\n')
+        # Processes would run this script, starting Leo again.
+        script_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(script_dir.cleanup)
+        main = types.ModuleType('__main__')
+        main.__file__ = os.path.join(script_dir.name, 'launch.py')
+        main.__spec__ = None
+        with open(main.__file__, 'w') as f:
+            f.write('import leo.core.runLeo\nleo.core.runLeo.run()\n')
+        with mock.patch.dict(sys.modules, {'__main__': main}), \
+            mock.patch.object(concurrent.futures, 'ProcessPoolExecutor', None):
+            result = self.import_tree(temp_dir.name, processes=2)
+        self.assertEqual(
+            [h for level, h, b in result if h.startswith('@@clean')],
+            ['@@clean a.py', '@@clean b.py'])
+    #@-others
 #@-others
 #@@language python
 #@@tabwidth -4
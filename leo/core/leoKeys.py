@@ -543,7 +543,14 @@ class AutoCompleterClass:
                 d[prefix] = aList
                 return aList
         #
-        # Not jedi. Use codewise.
+        # Not jedi. Use the symbol index.
+        # Don't cache the results: they depend on the class containing the cursor.
+        if self.c.findCommands.getSymbolIndex():
+            return (
+                self.get_leo_completions(prefix) or
+                self.get_codewise_completions(prefix))
+        #
+        # Use codewise.
         # Precompute the codewise completions for '.self'.
         if not self.codewiseSelfList:
             aList = self.get_codewise_completions('self.')
@@ -562,7 +569,7 @@ class AutoCompleterClass:
         return aList
     #@+node:ekr.20110510120621.14539: *5* ac.get_codewise_completions & helpers
     def get_codewise_completions(self, prefix):
-        """Use codewise to generate a list of hits."""
+        """Use Leo's symbol index or codewise to generate a list of hits."""
         c = self.c
         m = re.match(r"(\S+(\.\w+)*)\.(\w*)$", prefix)
         if m:
@@ -585,7 +592,7 @@ class AutoCompleterClass:
                 hits = self.lookup_functions(func)
             else:
                 hits = []
-        if 1:  # A kludge: add the prefix to each hit.
+        if varname:  # A kludge: add the prefix to each hit.
             hits = [f"{varname}.{z}" for z in hits]
         return hits
     #@+node:ekr.20110510120621.14540: *6* ac.clean
@@ -622,6 +629,13 @@ class AutoCompleterClass:
             return 'class', ['Commands']
         if varname == 'self':
             # Return the nearest enclosing class.
+            index = c.findCommands.getSymbolIndex()
+            if index:
+                w = c.frame.body.wrapper
+                row, col = g.convertPythonIndexToRowCol(c.p.b, w.getInsertPoint())
+                class_name = index.class_at(c.p.v, row)
+                if class_name:
+                    return 'class', [class_name]
             for p in c.p.parents():
                 h = p.h
                 m = re.search(r'class\s+(\w+)', h)
@@ -634,12 +648,20 @@ class AutoCompleterClass:
             aList = ContextSniffer().get_classes(c.p.b, varname)
         return 'class', aList
     #@+node:ekr.20110510120621.14543: *6* ac.lookup_functions/methods/modules
+    # These methods use Leo's symbol index if possible, and codewise otherwise.
+
     def lookup_functions(self, prefix):
+        index = self.c.findCommands.getSymbolIndex()
+        if index:
+            return index.names(prefix, ('class', 'def'))
         aList = codewise.cmd_functions([prefix])
         hits = [z.split(None, 1) for z in aList if z.strip()]
         return self.clean(hits)
 
     def lookup_methods(self, aList, prefix):  # prefix not used, only aList[0] used.
+        index = self.c.findCommands.getSymbolIndex()
+        if index:
+            return index.member_names(aList[0])
         aList = codewise.cmd_members([aList[0]])
         hits = [z.split(None, 1) for z in aList if z.strip()]
         return self.clean(hits)
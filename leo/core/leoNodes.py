@@ -7,8 +7,10 @@
 #@+node:ekr.20060904165452.1: ** << imports >> (leoNodes.py)
 import copy
 import itertools
+import operator
 import time
 import re
+import unittest
 import leo.core.leoGlobals as g
 import leo.core.signal_manager as sig
 #@-<< imports >>
@@ -182,6 +184,14 @@ class NodeIndices:
 # each ancestor **at the spot in tree traversal. Positions p has a unique set of
 # parents.
 #
+# Positions represent the stack as an immutable linked chain of cells
+# (v, childIndex, parent_cell, n), where n is the number of cells in the chain.
+# Copies of a position share the chain, so p.copy(), p.moveToParent and
+# p.moveToFirstChild take constant time, regardless of the depth of p.
+#
+# Reading or setting p.stack converts p to the legacy representation, a list of
+# tuples (v, childIndex). Changes to that list change p, as in the past.
+#
 # The p.moveToX methods may return a null (invalid) position p with p.v = None.
 #
 # The tests "if p" or "if not p" are the _only_ correct way to test whether a
@@ -192,6 +202,9 @@ class NodeIndices:
 
 
 class Position:
+
+    __slots__ = ('_childIndex', '_parents', '_stack', 'v')
+
     #@+others
     #@+node:ekr.20040228094013: *3*  p.ctor & other special methods...
     #@+node:ekr.20080416161551.190: *4*  p.__init__
@@ -202,10 +215,8 @@ class Position:
         self._childIndex = childIndex
         self.v = v
         # Stack entries are tuples (v, childIndex).
-        if stack:
-            self.stack = stack[:]  # Creating a copy here is safest and best.
-        else:
-            self.stack = []
+        self._stack = None  # Not None: the legacy stack. See p.stack.
+        self._parents = self._stackToParents(stack) if stack else None
         g.app.positions += 1
     #@+node:ekr.20080920052058.3: *4* p.__eq__ & __ne__
     def __eq__(self, p2):
@@ -216,9 +227,18 @@ class Position:
             return False
         if p2 is None or p2.v is None:
             return p1.v is None
-        return (p1.v == p2.v and
-            p1._childIndex == p2._childIndex and
-            p1.stack == p2.stack)
+        if p1.v != p2.v or p1._childIndex != p2._childIndex:
+            return False
+        cell1 = p1._parents if p1._stack is None else p1._getParents()
+        cell2 = p2._parents if p2._stack is None else p2._getParents()
+        while cell1 is not cell2:
+            if (
+                cell1 is None or cell2 is None or
+                cell1[0] != cell2[0] or cell1[1] != cell2[1]
+            ):
+                return False
+            cell1, cell2 = cell1[2], cell2[2]
+        return True
 
     def __ne__(self, p2):
         """Return True if two postions are not equivalent."""
@@ -235,7 +255,7 @@ class Position:
     #@+node:ekr.20091210082012.6233: *4* p.__gt__
     def __gt__(self, other):
         """Return True if self appears after other in outline order."""
-        stack1, stack2 = self.stack, other.stack
+        stack1, stack2 = self._getStack(), other._getStack()
         n1, n2 = len(stack1), len(stack2); n = min(n1, n2)
         # Compare the common part of the stacks.
         for item1, item2 in zip(stack1, stack2):
@@ -249,11 +269,11 @@ class Position:
             x1, x2 = self._childIndex, other._childIndex
             return x1 > x2
         if n1 < n2:
-            x1 = self._childIndex; v2, x2 = other.stack[n]
+            x1 = self._childIndex; v2, x2 = stack2[n]
             return x1 > x2
         # n1 > n2
         # 2011/07/28: Bug fix suggested by SegundoBob.
-        x1 = other._childIndex; v2, x2 = self.stack[n]
+        x1 = other._childIndex; v2, x2 = stack1[n]
         return x2 >= x1
     #@+node:ekr.20040117173448: *4* p.__nonzero__ & __bool__
     def __bool__(self):
@@ -279,7 +299,7 @@ class Position:
                 f"{p.h}"
                 ">"
             )
-        return f"<pos {id(p)} [{len(p.stack)}] None>"
+        return f"<pos {id(p)} [{len(p._getStack())}] None>"
 
     __repr__ = __str__
     #@+node:ekr.20061006092649: *4* p.archivedPosition
@@ -312,7 +332,7 @@ class Position:
         # For unified nodes we must include a complete key,
         # so we can distinguish between clones.
         result = []
-        for z in p.stack:
+        for z in p._getStack():
             v, childIndex = z
             result.append(f"{id(v)}:{childIndex}")
         result.append(f"{id(p.v)}:{p._childIndex}")
@@ -796,7 +816,7 @@ class Position:
 
     def hasParent(self):
         p = self
-        return p.v and p.stack
+        return p.v and bool(p._parents if p._stack is None else p._stack)
 
     def hasThreadBack(self):
         p = self
@@ -807,18 +827,15 @@ class Position:
         p = self
         if not p.v: return False
         if p.hasChildren() or p.hasNext(): return True
-        n = len(p.stack) - 1
-        while n >= 0:
-            v, childIndex = p.stack[n]
+        cell = p._getParents()
+        while cell:
+            v, childIndex, parent_cell = cell[:3]
             # See how many children v's parent has.
-            if n == 0:
-                parent_v = v.context.hiddenRootNode
-            else:
-                parent_v, junk = p.stack[n - 1]
+            parent_v = parent_cell[0] if parent_cell else v.context.hiddenRootNode
             if len(parent_v.children) > childIndex + 1:
                 # v has a next sibling.
                 return True
-            n -= 1
+            cell = parent_cell
         return False
     #@+node:ekr.20060920203352: *4* p.findRootPosition
     def findRootPosition(self):
@@ -833,10 +850,11 @@ class Position:
         c = p.v.context
         if not c.positionExists(p2):
             return False
-        for z in p2.stack:
+        cell = p2._getParents()
+        while cell:
             # 2013/12/25: bug fix: test childIndices.
             # This is required for the new per-position expansion scheme.
-            parent_v, parent_childIndex = z
+            parent_v, parent_childIndex, cell = cell[:3]
             if parent_v == p.v and parent_childIndex == p._childIndex:
                 return True
         return False
@@ -876,7 +894,11 @@ class Position:
     def level(self):
         """Return the number of p's parents."""
         p = self
-        return len(p.stack) if p.v else 0
+        if not p.v:
+            return 0
+        if p._stack is not None:
+            return len(p._stack)
+        return p._parents[3] if p._parents else 0
 
     simpleLevel = level
     #@+node:ekr.20111005152227.15566: *4* p.positionAfterDeletedTree
@@ -968,8 +990,9 @@ class Position:
                 return
         # Adjust p's stack.
         stack = []; changed = False; i = 0
-        while i < len(p.stack):
-            v, childIndex = p.stack[i]
+        p_stack = p._getStack()
+        while i < len(p_stack):
+            v, childIndex = p_stack[i]
             p3 = Position(v=v, childIndex=childIndex, stack=stack[:i])
             while p3:
                 if p2 == p3:
@@ -983,13 +1006,13 @@ class Position:
                 stack.append((v, childIndex),)
             i += 1
         if changed:
-            p.stack = stack
+            p._setParents(p._stackToParents(stack))
     #@+node:ekr.20080416161551.214: *4* p._linkAfter
     def _linkAfter(self, p_after):
         """Link self after p_after."""
         p = self
         parent_v = p_after._parentVnode()
-        p.stack = p_after.stack[:]
+        p._setParents(p_after._getParents())
         p._childIndex = p_after._childIndex + 1
         child = p.v
         n = p_after._childIndex + 1
@@ -999,7 +1022,7 @@ class Position:
         """Link self, a newly copied tree, after p_after."""
         p = self
         parent_v = p_after._parentVnode()
-        p.stack = p_after.stack[:]
+        p._setParents(p_after._getParents())
         p._childIndex = p_after._childIndex + 1
         child = p.v
         n = p_after._childIndex + 1
@@ -1009,8 +1032,7 @@ class Position:
         """Link self as the n'th child of the parent."""
         p = self
         parent_v = parent.v
-        p.stack = parent.stack[:]
-        p.stack.append((parent_v, parent._childIndex),)
+        p._setParents(parent._childParents())
         p._childIndex = n
         child = p.v
         child._addLink(n, parent_v)
@@ -1019,11 +1041,60 @@ class Position:
         """Link a copied self as the n'th child of the parent."""
         p = self
         parent_v = parent.v
-        p.stack = parent.stack[:]
-        p.stack.append((parent_v, parent._childIndex),)
+        p._setParents(parent._childParents())
         p._childIndex = n
         child = p.v
         child._addCopiedLink(n, parent_v)
+    #@+node:ekr.20261018185021.1: *4* p._getParents & helpers
+    def _getParents(self):
+        """Return p's chain of parent cells."""
+        p = self
+        if p._stack is None:
+            return p._parents
+        return p._stackToParents(p._stack)
+
+    def _setParents(self, cell):
+        """Make cell p's chain of parent cells."""
+        p = self
+        p._parents = cell
+        p._stack = None
+
+    def _childParents(self):
+        """Return the chain of parent cells of p's children."""
+        p = self
+        cell = p._getParents()
+        return (p.v, p._childIndex, cell, cell[3] + 1 if cell else 1)
+
+    def _pushParent(self):
+        """Make p.v and p._childIndex the last entry of p's parent stack."""
+        p = self
+        if p._stack is None:
+            p._parents = p._childParents()
+        else:
+            p._stack.append((p.v, p._childIndex),)
+
+    def _getStack(self):
+        """
+        Return a new list of tuples (v, childIndex), p's parent stack.
+        Unlike p.stack, this does not change p's representation.
+        """
+        p = self
+        if p._stack is not None:
+            return p._stack[:]
+        stack = []
+        cell = p._parents
+        while cell:
+            stack.append((cell[0], cell[1]),)
+            cell = cell[2]
+        stack.reverse()
+        return stack
+
+    def _stackToParents(self, stack):
+        """Return the chain of parent cells corresponding to a legacy stack."""
+        cell = None
+        for n, (v, childIndex) in enumerate(stack, 1):
+            cell = (v, childIndex, cell, n)
+        return cell
     #@+node:ekr.20080416161551.216: *4* p._linkAsRoot (changed)
     def _linkAsRoot(self):
         """Link self as the root node."""
@@ -1033,7 +1104,7 @@ class Position:
         assert parent_v, g.callers()
         #
         # Make p the root position.
-        p.stack = []
+        p._setParents(None)
         p._childIndex = 0
         #
         # Make p.v the first child of parent_v.
@@ -1047,9 +1118,11 @@ class Position:
         """
         p = self
         if p.v:
-            data = p.stack and p.stack[-1]
-            if data:
-                v, junk = data
+            if p._stack is None:
+                if p._parents:
+                    return p._parents[0]
+            elif p._stack:
+                v, junk = p._stack[-1]
                 return v
             return p.v.context.hiddenRootNode
         return None
@@ -1138,7 +1211,7 @@ class Position:
         """Move a position to it's first child's position."""
         p = self
         if p.v and p.v.children:
-            p.stack.append((p.v, p._childIndex),)
+            p._pushParent()
             p.v = p.v.children[0]
             p._childIndex = 0
         else:
@@ -1149,7 +1222,7 @@ class Position:
         """Move a position to it's last child's position."""
         p = self
         if p.v and p.v.children:
-            p.stack.append((p.v, p._childIndex),)
+            p._pushParent()
             n = len(p.v.children)
             p.v = p.v.children[n - 1]
             p._childIndex = n - 1
@@ -1194,7 +1267,7 @@ class Position:
     def moveToNthChild(self, n):
         p = self
         if p.v and len(p.v.children) > n:
-            p.stack.append((p.v, p._childIndex),)
+            p._pushParent()
             p.v = p.v.children[n]
             p._childIndex = n
         else:
@@ -1204,10 +1277,17 @@ class Position:
     def moveToParent(self):
         """Move a position to its parent position."""
         p = self
-        if p.v and p.stack:
-            p.v, p._childIndex = p.stack.pop()
-        else:
-            p.v = None
+        if not p.v:
+            pass
+        elif p._stack is None:
+            cell = p._parents
+            if cell:
+                p.v, p._childIndex, p._parents = cell[:3]
+                return p
+        elif p._stack:
+            p.v, p._childIndex = p._stack.pop()
+            return p
+        p.v = None
         return p
     #@+node:ekr.20080416161551.208: *4* p.moveToThreadBack
     def moveToThreadBack(self):
@@ -1355,7 +1435,9 @@ class Position:
     #@+node:ekr.20040117171654: *4* p.copy
     def copy(self):
         """"Return an independent copy of a position."""
-        return Position(self.v, self._childIndex, self.stack)
+        p = Position(self.v, self._childIndex)
+        p._parents = self._parents if self._stack is None else self._getParents()
+        return p
     #@+node:ekr.20040303175026.9: *4* p.copyTreeAfter, copyTreeTo
     # These used by unit tests, by the group_operations plugin,
     # and by the files-compare-leo-files command.
@@ -1684,6 +1766,29 @@ class Position:
     u = property(
         __get_u, __set_u,
         doc="p.u property")
+    #@+node:ekr.20261018185021.2: *4* p.stack property
+    def __get_stack(self):
+        """
+        Return p's parent stack, a list of tuples (v, childIndex).
+
+        Callers may change the list, so the list remains p's representation
+        of its parents until p is relinked. Copying such positions takes
+        time proportional to their level.
+        """
+        p = self
+        if p._stack is None:
+            p._stack = p._getStack()
+            p._parents = None
+        return p._stack
+
+    def __set_stack(self, stack):
+        p = self
+        p._stack = stack
+        p._parents = None
+
+    stack = property(
+        __get_stack, __set_stack,
+        doc="position stack property")
     #@+node:ekr.20040305222924: *3* p.Setters
     #@+node:ekr.20040306220634: *4* p.VNode proxies
     #@+node:ekr.20131222112420.16371: *5* p.contract/expand/isExpanded
@@ -1888,6 +1993,246 @@ class PosList(list):
         return res
     #@-others
 Poslist = PosList  # compatibility.
+#@+node:ekr.20261018191544.1: ** class OutlineSnapshot
+class OutlineSnapshot:
+    """
+    A flat, preorder snapshot of an outline, kept in parallel lists.
+
+    Entry i describes the i'th position of the outline, in outline order:
+
+    vnodes[i]:       the position's vnode.
+    childIndices[i]: the position's child index.
+    levels[i]:       the position's level.
+    parents[i]:      the index of the entry of the position's parent, or -1.
+    ends[i]:         the index of the entry following the position's tree.
+    chains[i]:       the position's chain of parent cells. See p._parents.
+
+    Skipping a tree is just i = ends[i].
+
+    uniqueVnodes contains each vnode once, in outline order. firsts[k] is
+    the index of the first entry for uniqueVnodes[k]. repeated is the set of
+    vnodes having more than one entry.
+
+    c.getOutlineSnapshot() rebuilds the snapshot only when the structure
+    of the outline has changed. Leo changes v.children in many places, so
+    snapshot.isValid compares the children of every vnode with the lists
+    saved by snapshot.build. These comparisons run at C speed.
+
+    The generators used by c.all_positions and friends check the snapshot
+    lazily instead: they compare v.children with entryChildren[i] as they
+    yield each entry, so callers that stop early pay only for what they see.
+    """
+    #@+others
+    #@+node:ekr.20261018191544.2: *3* snapshot.__init__
+    def __init__(self, c):
+        self.c = c
+        self.root = None  # The hidden root vnode when the snapshot was built.
+        self.rootChildren = []
+        # Parallel lists. See the class docstring.
+        self.vnodes = []
+        self.childIndices = []
+        self.levels = []
+        self.parents = []
+        self.ends = []
+        self.chains = []
+        # Unique vnodes.
+        self.firsts = []
+        self.uniqueVnodes = []
+        self.savedChildren = []  # Copies of v.children, for uniqueVnodes.
+        self.entryChildren = []  # The copies of v.children, for all entries.
+        self.repeated = set()
+    #@+node:ekr.20261018191544.3: *3* snapshot.build
+    def build(self):
+        """Rebuild the snapshot from c's outline."""
+        root = self.c.hiddenRootNode
+        vnodes, childIndices, levels, parents, ends, chains = [], [], [], [], [], []
+        firsts, uniqueVnodes, savedChildren, entryChildren = [], [], [], []
+        saved_d, repeated = {}, set()  # Keys are vnodes, values are copies of v.children.
+        empty = []  # Shared by all leaves. Never changed.
+        # Stack entries are tuples (children, n, parent, chain, level).
+        children, n, parent, chain, level = root.children, 0, -1, None, 0
+        stack = []
+        while True:
+            if n < len(children):
+                v = children[n]
+                v_children = v.children
+                i = len(vnodes)
+                vnodes.append(v)
+                childIndices.append(n)
+                levels.append(level)
+                parents.append(parent)
+                ends.append(i + 1)
+                chains.append(chain)
+                saved = saved_d.get(v)
+                if saved is None:
+                    saved = saved_d[v] = v_children[:] if v_children else empty
+                    firsts.append(i)
+                    uniqueVnodes.append(v)
+                    savedChildren.append(saved)
+                else:
+                    repeated.add(v)
+                entryChildren.append(saved)
+                n += 1
+                if v_children:
+                    # Descend into v's tree.
+                    stack.append((children, n, parent, chain, level))
+                    chain = (v, n - 1, chain, level + 1)
+                    children, n, parent, level = v_children, 0, i, level + 1
+            elif stack:
+                # Finish the parent's tree.
+                ends[parent] = len(vnodes)
+                children, n, parent, chain, level = stack.pop()
+            else:
+                break
+        self.root = root
+        self.rootChildren = root.children[:]
+        self.vnodes, self.childIndices, self.levels = vnodes, childIndices, levels
+        self.parents, self.ends, self.chains = parents, ends, chains
+        self.firsts, self.uniqueVnodes, self.savedChildren = firsts, uniqueVnodes, savedChildren
+        self.entryChildren = entryChildren
+        self.repeated = repeated
+    #@+node:ekr.20261018191544.4: *3* snapshot.indexOf
+    def indexOf(self, p):
+        """Return the index of p's entry, or -1 if p is not in the snapshot."""
+        vnodes, ends = self.vnodes, self.ends
+        if not p:
+            return -1
+        i, end = 0, len(vnodes)
+        for v, childIndex in p._getStack() + [(p.v, p._childIndex)]:
+            # Skip the trees of previous siblings.
+            for _ in range(childIndex):
+                if i >= end:
+                    return -1
+                i = ends[i]
+            if i >= end or vnodes[i] is not v:
+                return -1
+            i, end = i + 1, ends[i]
+        return i - 1
+    #@+node:ekr.20261018191544.5: *3* snapshot.isValid
+    def isValid(self):
+        """Return True if the snapshot matches the structure of c's outline."""
+        return (
+            self.isRootValid() and
+            all(map(
+                operator.eq,
+                map(operator.attrgetter('children'), self.uniqueVnodes),
+                self.savedChildren,
+            ))
+        )
+    #@+node:ekr.20261018213045.1: *3* snapshot.isRootValid
+    def isRootValid(self):
+        """Return True if the top-level entries of the snapshot are valid."""
+        root = self.c.hiddenRootNode
+        return root is self.root and root.children == self.rootChildren
+    #@+node:ekr.20261018191544.6: *3* snapshot.nodes
+    def nodes(self, unique=False):
+        """
+        Yield the vnodes of all positions of the outline in outline order.
+        If unique is True, yield each vnode only once.
+        """
+        tree = self.c.frame.tree
+        generation = tree.generation
+        if not self.isRootValid():
+            for p in self.traverseAll(False, unique):
+                yield p.v
+            return
+        vnodes = self.uniqueVnodes if unique else self.vnodes
+        firsts, entryChildren = self.firsts, self.entryChildren
+        for n, v in enumerate(vnodes):
+            yield v
+            if tree.generation != generation:
+                break
+            if v.children != entryChildren[firsts[n] if unique else n]:
+                # Leo has changed v.children directly.
+                self.root = None
+                break
+        else:
+            return
+        # The outline has changed. Continue the traversal from entry n.
+        i = firsts[n] if unique else n
+        seen = set(vnodes[: n + 1]) if unique else None
+        for p in self.traverse(self.position(i), False, seen):
+            yield p.v
+    #@+node:ekr.20261018191544.7: *3* snapshot.position
+    def position(self, i):
+        """Return a new position for entry i."""
+        p = Position(self.vnodes[i], self.childIndices[i])
+        p._parents = self.chains[i]
+        return p
+    #@+node:ekr.20261018191544.8: *3* snapshot.positions
+    def positions(self, copy=True, unique=False):
+        """
+        Yield all positions of the outline in outline order.
+        If unique is True, yield only the first position of each vnode.
+
+        If the snapshot is out of date, if the outline changes during the
+        iteration, or if copy is False and the caller moves the yielded
+        position, continue by traversing the outline itself, just as
+        c.all_positions always has.
+        """
+        tree = self.c.frame.tree
+        generation = tree.generation
+        if not self.isRootValid():
+            yield from self.traverseAll(copy, unique)
+            return
+        vnodes, childIndices, chains = self.vnodes, self.childIndices, self.chains
+        firsts, entryChildren = self.firsts, self.entryChildren
+        indices = firsts if unique else range(len(vnodes))
+        p = Position(None)
+        for n, i in enumerate(indices):
+            v, childIndex, chain = vnodes[i], childIndices[i], chains[i]
+            if copy:
+                p = Position(v, childIndex)
+                p._parents = chain
+                yield p
+                moved = False
+            else:
+                p.v, p._childIndex, p._parents, p._stack = v, childIndex, chain, None
+                yield p
+                moved = (
+                    p.v is not v or p._childIndex != childIndex or
+                    p._parents is not chain or p._stack is not None)
+            if moved or tree.generation != generation:
+                break
+            if v.children != entryChildren[i]:
+                # Leo has changed v.children directly.
+                self.root = None
+                break
+        else:
+            return
+        # Continue the traversal from p.
+        if copy:
+            p = self.position(i)
+        seen = {vnodes[j] for j in firsts[: n + 1]} if unique else None
+        yield from self.traverse(p, copy, seen)
+    #@+node:ekr.20261018191544.12: *3* snapshot.traverse
+    def traverse(self, p, copy, seen):
+        """
+        Yield the positions following p in outline order by traversing the
+        outline itself. If seen is not None, skip the trees of vnodes in seen.
+        """
+        p.moveToThreadNext()
+        while p:
+            if seen is not None:
+                if p.v in seen:
+                    p.moveToNodeAfterTree()
+                    continue
+                seen.add(p.v)
+            yield p.copy() if copy else p
+            p.moveToThreadNext()
+    #@+node:ekr.20261018213045.2: *3* snapshot.traverseAll
+    def traverseAll(self, copy, unique):
+        """
+        Yield all positions of the outline by traversing the outline itself.
+        Rebuild the snapshot when the traversal completes.
+        """
+        self.root = None
+        p = self.c.rootPosition()
+        if p:
+            yield p.copy() if copy else p
+            yield from self.traverse(p, copy, {p.v} if unique else None)
+        self.build()
+    #@-others
 #@+node:ekr.20031218072017.3341: ** class VNode
 #@@nobeautify
 
@@ -2262,13 +2607,16 @@ class VNode:
     def setDirty(self):
         """Set the vnode dirty bit."""
         self.statusBits |= self.dirtyBit
+        self.dbRowModified()
     #@+node:ekr.20031218072017.3386: *4*  v.Status bits
     #@+node:ekr.20031218072017.3389: *5* v.clearClonedBit
     def clearClonedBit(self):
         self.statusBits &= ~self.clonedBit
+        self.dbRowModified()
     #@+node:ekr.20031218072017.3391: *5* v.clearMarked
     def clearMarked(self):
         self.statusBits &= ~self.markedBit
+        self.dbRowModified()
     #@+node:ekr.20080429053831.8: *5* v.clearWriteBit
     def clearWriteBit(self):
         self.statusBits &= ~self.writeBit
@@ -2276,6 +2624,7 @@ class VNode:
     def clearOrphan(self):
         # if self.h.startswith('@file'): g.trace(self.h,g.callers())
         self.statusBits &= ~self.orphanBit
+        self.dbRowModified()
     #@+node:ekr.20031218072017.3393: *5* v.clearVisited
     def clearVisited(self):
         self.statusBits &= ~self.visitedBit
@@ -2283,10 +2632,18 @@ class VNode:
     def contract(self):
         """Contract the node."""
         self.statusBits &= ~self.expandedBit
+        self.dbRowModified()
+        journal = self.context.changeJournal
+        if journal is not None:
+            journal.append(('expand', self))
 
     def expand(self):
         """Expand the node."""
         self.statusBits |= self.expandedBit
+        self.dbRowModified()
+        journal = self.context.changeJournal
+        if journal is not None:
+            journal.append(('expand', self))
 
     def initExpandedBit(self):
         """Init self.statusBits."""
@@ -2301,15 +2658,18 @@ class VNode:
     #@+node:ekr.20031218072017.3397: *5* v.setClonedBit & initClonedBit
     def setClonedBit(self):
         self.statusBits |= self.clonedBit
+        self.dbRowModified()
 
     def initClonedBit(self, val):
         if val:
             self.statusBits |= self.clonedBit
         else:
             self.statusBits &= ~self.clonedBit
+        self.dbRowModified()
     #@+node:ekr.20031218072017.3398: *5* v.setMarked & initMarkedBit
     def setMarked(self):
         self.statusBits |= self.markedBit
+        self.dbRowModified()
 
     def initMarkedBit(self):
         self.statusBits |= self.markedBit
@@ -2317,11 +2677,13 @@ class VNode:
     def setOrphan(self):
         """Set the vnode's orphan bit."""
         self.statusBits |= self.orphanBit
+        self.dbRowModified()
     #@+node:ekr.20031218072017.3400: *5* v.setSelected
     # This only sets the selected bit.
 
     def setSelected(self):
         self.statusBits |= self.selectedBit
+        self.dbRowModified()
     #@+node:ekr.20031218072017.3401: *5* v.setVisited
     # Compatibility routine for scripts
 
@@ -2347,6 +2709,12 @@ class VNode:
     #@+node:ville.20120502221057.7498: *4* v.contentModified
     def contentModified(self):
         g.contentModifiedSet.add(self)
+    #@+node:ekr.20261019060012.12: *4* v.dbRowModified
+    def dbRowModified(self):
+        """Record that v's row in the commander's .db file may have changed."""
+        changes = self.context.dbChanges
+        if changes is not None:
+            changes.add(self)
     #@+node:ekr.20100303074003.5636: *4* v.restoreCursorAndScroll
     # Called only by LeoTree.selectHelper.
 
@@ -2392,6 +2760,12 @@ class VNode:
 
     def setBodyString(self, s):
         v = self
+        frame = v.context.frame
+        if frame and frame.tree.lastBodyChanged is not v:
+            # The commander may not have a frame yet.
+            frame.tree.lastBodyChanged = v
+            frame.tree.bodyGeneration += 1
+        v.dbRowModified()
         if isinstance(s, str):
             v._bodyString = s
             return
@@ -2408,6 +2782,12 @@ class VNode:
         # Fix bug: https://bugs.launchpad.net/leo-editor/+bug/1245535
         # API allows headlines to contain newlines.
         v = self
+        if v.context.frame:
+            v.context.frame.tree.headGeneration += 1
+        v.dbRowModified()
+        journal = v.context.changeJournal
+        if journal is not None:
+            journal.append(('head', v))
         if g.isUnicode(s):
             v._headString = s.replace('\n', '')
             return
@@ -2472,6 +2852,11 @@ class VNode:
         """Adjust links after adding a link to v."""
         v = self
         v.context.frame.tree.generation += 1
+        v.dbRowModified()
+        parent_v.dbRowModified()
+        journal = v.context.changeJournal
+        if journal is not None:
+            journal.append(('link', parent_v))
         parent_v.childrenModified()
             # For a plugin.
         # Update parent_v.children & v.parents.
@@ -2485,6 +2870,11 @@ class VNode:
         """Adjust links after adding a link to v."""
         v = self
         v.context.frame.tree.generation += 1
+        v.dbRowModified()
+        parent_v.dbRowModified()
+        journal = v.context.changeJournal
+        if journal is not None:
+            journal.append(('link', parent_v))
         parent_v.childrenModified()
             # For a plugin.
         # Update parent_v.children & v.parents.
@@ -2504,6 +2894,7 @@ class VNode:
 
         v = self
         v.parents.append(parent)
+        v.dbRowModified()
         if len(v.parents) == 1:
             for child in v.children:
                 child._addParentLinks(parent=v)
@@ -2512,6 +2903,11 @@ class VNode:
         """Adjust links after cutting a link to v."""
         v = self
         v.context.frame.tree.generation += 1
+        v.dbRowModified()
+        parent_v.dbRowModified()
+        journal = v.context.changeJournal
+        if journal is not None:
+            journal.append(('link', parent_v))
         parent_v.childrenModified()
         assert parent_v.children[childIndex] == v
         del parent_v.children[childIndex]
@@ -2535,6 +2931,7 @@ class VNode:
 
         v = self
         v.parents.remove(parent)
+        v.dbRowModified()
         if not v.parents:
             for child in v.children:
                 child._cutParentLinks(parent=v)
@@ -2547,7 +2944,10 @@ class VNode:
         It is not intended as a general replacement for p.doDelete().
         """
         v = self
+        v.context.frame.tree.generation += 1
+        v.dbRowModified()
         for v2 in v.children:
+            v2.dbRowModified()
             try:
                 v2.parents.remove(v)
             except ValueError:
@@ -2603,6 +3003,7 @@ class VNode:
             v.unknownAttributes = val
         else:
             raise ValueError
+        v.dbRowModified()
 
     u = property(
         __get_u, __set_u,
@@ -2619,6 +3020,126 @@ class VNode:
 vnode = VNode  # compatibility.
 
 #@@beautify
+#@+node:ekr.20261018191544.13: ** class TestOutlineSnapshot
+class TestOutlineSnapshot(unittest.TestCase):
+    """Test cases for the OutlineSnapshot class."""
+    #@+others
+    #@+node:ekr.20261018191544.14: *3* make_commander
+    def make_commander(self):
+        """Return a headless commander containing a few trees and clones."""
+        import os
+        import tempfile
+        import leo.core.leoBridge as leoBridge
+        bridge = leoBridge.headless_controller()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        c = bridge.openLeoFile(os.path.join(temp_dir.name, 'test.leo'))
+        root = c.rootPosition()
+        for i in range(3):
+            p = root.insertAfter()
+            p.h = f"node {i}"
+            for j in range(3):
+                child = p.insertAsLastChild()
+                child.h = f"node {i}.{j}"
+                child.insertAsLastChild().h = f"node {i}.{j}.0"
+        clone = root.next().firstChild().clone()
+        clone.moveToLastChildOf(root.next().next())
+        return c
+    #@+node:ekr.20261018191544.15: *3* traverse (TestOutlineSnapshot)
+    def traverse(self, c, unique=False):
+        """Return the positions of c's outline, found by moveToThreadNext."""
+        result, seen = [], set()
+        p = c.rootPosition()
+        while p:
+            if unique and p.v in seen:
+                p.moveToNodeAfterTree()
+                continue
+            seen.add(p.v)
+            result.append(p.copy())
+            p.moveToThreadNext()
+        return result
+    #@+node:ekr.20261018191544.16: *3* test_snapshot_matches_outline
+    def test_snapshot_matches_outline(self):
+        """Test that the snapshot tracks all changes to the outline."""
+        c = self.make_commander()
+
+        def check():
+            for unique in (False, True):
+                expected = self.traverse(c, unique)
+                if unique:
+                    positions = list(c.all_unique_positions())
+                    vnodes = list(c.all_unique_nodes())
+                else:
+                    positions = list(c.all_positions())
+                    vnodes = list(c.all_nodes())
+                assert positions == expected
+                assert [p.level() for p in positions] == [p.level() for p in expected]
+                assert vnodes == [p.v for p in expected]
+            snapshot = c.getOutlineSnapshot()
+            for i, p in enumerate(self.traverse(c)):
+                assert snapshot.indexOf(p) == i
+                assert snapshot.levels[i] == p.level()
+                assert snapshot.ends[i] == i + 1 + len(list(p.subtree()))
+                parent = p.parent()
+                assert snapshot.parents[i] == (snapshot.indexOf(parent) if parent else -1)
+
+        check()
+        # Links.
+        c.rootPosition().insertAsLastChild().h = 'new'
+        check()
+        # Direct changes to v.children.
+        v = c.rootPosition().next().v
+        v.children.reverse()
+        check()
+        v.children[0], v.children[1] = v.children[1], v.children[0]
+        check()
+        c.rootPosition().next().doDelete()
+        check()
+    #@+node:ekr.20261018191544.17: *3* test_changes_during_iteration
+    def test_changes_during_iteration(self):
+        """Test that generators follow changes made during the iteration."""
+        c = self.make_commander()
+        n = len(self.traverse(c))
+        seen = []
+        for p in c.all_positions():
+            seen.append(p.h)
+            if p.h == 'node 0':
+                p.insertAsNthChild(0).h = 'inserted'
+        i = seen.index('node 0')
+        assert seen[i + 1] == 'inserted', seen
+        assert len(seen) == n + 1
+        # Moving a position yielded with copy=False.
+        seen = []
+        for p in c.all_positions(copy=False):
+            seen.append(p.h)
+            if p.h == 'node 1':
+                p.moveToNodeAfterTree()
+                seen.append(p.h)
+        i = seen.index('node 1')
+        assert seen[i + 1 : i + 3] == ['node 0', 'inserted'], seen
+    #@+node:ekr.20261018213045.3: *3* test_lazy_checks
+    def test_lazy_checks(self):
+        """Test that generators check the snapshot only as far as they go."""
+        c = self.make_commander()
+        snapshot = c.getOutlineSnapshot()
+
+        def fail():
+            raise AssertionError('checked the entire snapshot')
+
+        # Stopping early neither checks nor rebuilds the snapshot.
+        snapshot.isValid = snapshot.build = fail
+        for p in c.all_positions():
+            break
+        assert next(c.all_unique_nodes()) is c.rootPosition().v
+        del snapshot.isValid, snapshot.build
+        # A direct change to v.children is found during the iteration.
+        c.rootPosition().next().v.children.reverse()
+        assert list(c.all_positions()) == self.traverse(c)
+        assert snapshot.root is None
+        # The next complete iteration rebuilds the snapshot.
+        assert list(c.all_positions()) == self.traverse(c)
+        assert snapshot.isValid()
+    #@-others
 #@-others
 #@@language python
 #@@tabwidth -4
@@ -0,0 +1,84 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20261019060012.1: * @file leoProcesses.py
+"""
+Support for Leo's pools of spawned processes.
+
+This module imports only a few standard modules, so spawned processes
+can fix sys.path before they import any part of Leo.
+
+TestBatchFiles in leoBeautify.py tests this module.
+"""
+#@+<< imports >>
+#@+node:ekr.20261019060012.2: ** << imports >> (leoProcesses.py)
+import importlib
+import os
+import re
+import sys
+#@-<< imports >>
+#@+others
+#@+node:ekr.20261019060012.3: ** can_spawn
+main_guard_pattern = re.compile(
+    r'''^if\s+__name__\s*==\s*['"]__main__['"]\s*:''', re.MULTILINE)
+
+def can_spawn():
+    """
+    Return True if this process may create processes with multiprocessing's
+    spawn start method.
+
+    Spawned processes run the script that started this process again, as
+    the __mp_main__ module. A script without an
+    ``if __name__ == '__main__':`` guard would start Leo again in every
+    spawned process.
+    """
+    main = sys.modules.get('__main__')
+    path = getattr(main, '__file__', None)
+    if not path or getattr(main, '__spec__', None) is not None:
+        # Spawned processes import modules run with -m by name.
+        return True
+    try:
+        with open(path, 'rb') as f:
+            s = f.read().decode('utf-8', 'replace')
+    except Exception:
+        return False
+    return bool(main_guard_pattern.search(s))
+#@+node:ekr.20261019060012.4: ** clean_sys_path
+def clean_sys_path():
+    """
+    Remove the directories inside the leo package from sys.path.
+
+    leoBridge and Leo's plugins add leo/plugins/importers and other
+    directories to sys.path, and spawned processes inherit sys.path.
+    importers/org.py would then hide the org package, which the copy
+    module tries to import.
+    """
+    leo_dir = os.path.normcase(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    result = []
+    for path in sys.path:
+        if path:
+            path2 = os.path.normcase(os.path.abspath(path))
+            if path2 == leo_dir or path2.startswith(leo_dir + os.sep):
+                continue
+        result.append(path)
+    sys.path[:] = result
+#@+node:ekr.20261019060012.5: ** init_process
+def init_process(initializer=None, *args):
+    """
+    The initializer of all processes in Leo's process pools.
+
+    initializer: None, or the full name of a function that initializes the
+                 process, for example 'leo.core.leoImport.init_import_process'.
+    args:        The arguments of that function.
+
+    The initializer is a name, not a function, so that unpickling it does not
+    import its module before clean_sys_path runs.
+    """
+    clean_sys_path()
+    if initializer:
+        module_name, name = initializer.rsplit('.', 1)
+        func = getattr(importlib.import_module(module_name), name)
+        func(*args)
+#@-others
+#@@language python
+#@@tabwidth -4
+#@@pagewidth 70
+#@-leo
@@ -40,6 +40,12 @@
 #
 # I first saw this model of unlimited undo in the documentation for Apple's Yellow Box classes.
 #@-<< How Leo implements unlimited undo >>
+import array
+import itertools
+import pickle
+import unittest
+import weakref
+import zlib
 import leo.core.leoGlobals as g
 # pylint: disable=unpacking-non-sequence
 #@+others
@@ -56,6 +62,13 @@ class Undoer:
         self.c = c
         self.granularity = None  # Set in reloadSettings.
         self.max_undo_stack_size = c.config.getInt('max-undo-stack-size') or 0
+        self.max_undo_memory = 0  # Set in reloadSettings.
+        self.min_pack_size = 1024  # Don't compress or delta-encode shorter text.
+        self.max_delta_chain = 32  # Keep a full copy of the text in every 32nd bead.
+        self.bead_sizes = weakref.WeakKeyDictionary()  # Keys are beads, values are estimated sizes.
+        self.packed_beads = weakref.WeakSet()  # Beads compressed by u.packBead.
+        self.undo_memory_bound = None  # An upper bound for the estimated size of all beads.
+        self.undo_memory_trigger = 0  # Compress beads when undo_memory_bound exceeds this.
         # State ivars...
         self.beads = []  # List of undo nodes.
         self.bead = -1  # Index of the present bead: -1:len(beads)
@@ -117,6 +130,9 @@ class Undoer:
             self.granularity = self.granularity.lower()
         if self.granularity not in ('node', 'line', 'word', 'char'):
             self.granularity = 'line'
+        # The setting is in megabytes.
+        self.max_undo_memory = 1024 * 1024 * (c.config.getInt('max-undo-memory') or 0)
+        self.undo_memory_bound = None  # Unknown.
     #@+node:ekr.20150509193222.1: *4* u.cmd (decorator)
     def cmd(name):
         """Command decorator for the Undoer class."""
@@ -129,21 +145,144 @@ class Undoer:
         u.p = None  # The position/node being operated upon for undo and redo.
         for ivar in u.optionalIvars:
             setattr(u, ivar, None)
+    #@+node:ekr.20261018172014.1: *4* u.computeDelta & helpers
+    def computeDelta(self, old, new):
+        """
+        Return a compact line-level delta that transforms old into new.
+
+        A delta is () or a tuple (starts, old_pieces, new_pieces):
+        starts is an array of offsets into old. old_pieces and new_pieces
+        are either tuples of strings or a single string used for all
+        offsets.
+        """
+        if old == new:
+            return ()
+        a, b = old.splitlines(True), new.splitlines(True)
+        if len(a) == len(b):
+            # The usual case: compare corresponding lines.
+            starts, old_pieces, new_pieces = [], [], []
+            offset = 0
+            for x, y in zip(a, b):
+                if x != y:
+                    starts.append(offset)
+                    old_pieces.append(x)
+                    new_pieces.append(y)
+                offset += len(x)
+            return array.array('I', starts), tuple(old_pieces), tuple(new_pieces)
+        # Trim common leading and trailing lines.
+        n = min(len(a), len(b))
+        i = 0
+        while i < n and a[i] == b[i]:
+            i += 1
+        j = 0
+        while j < n - i and a[-1 - j] == b[-1 - j]:
+            j += 1
+        start = sum(len(z) for z in a[:i])
+        return (
+            array.array('I', [start]),
+            (''.join(a[i : len(a) - j]),),
+            (''.join(b[i : len(b) - j]),),
+        )
+    #@+node:ekr.20261018172014.9: *5* u.replacementDelta
+    def replacementDelta(self, s, spans, new):
+        """
+        Return a delta that replaces each span (i, j) of s by new.
+
+        Batch commands know their matches, so this is much more compact and
+        faster than computeDelta.
+        """
+        if not spans:
+            return ()
+        pieces = {}
+        old_pieces = tuple(pieces.setdefault(s[i:j], s[i:j]) for i, j in spans)
+        if len(pieces) == 1:
+            old_pieces = old_pieces[0]
+        return array.array('I', [i for i, j in spans]), old_pieces, new
+    #@+node:ekr.20261018172014.10: *5* u.applyDelta
+    def applyDelta(self, s, delta, reverse=False):
+        """
+        Return the result of applying a delta to s.
+        reverse: s is the new text. Return the old text.
+        """
+        if not delta:
+            return s
+        starts, old_pieces, new_pieces = delta
+        if isinstance(old_pieces, str):
+            old_pieces = itertools.repeat(old_pieces)
+        if isinstance(new_pieces, str):
+            new_pieces = itertools.repeat(new_pieces)
+        result, prev, shift = [], 0, 0
+        for i, old, new in zip(starts, old_pieces, new_pieces):
+            if reverse:
+                i, src, dst = i + shift, new, old
+                shift += len(new) - len(old)
+            else:
+                src, dst = old, new
+            result.append(s[prev:i])
+            result.append(dst)
+            prev = i + len(src)
+        result.append(s[prev:])
+        return ''.join(result)
     #@+node:ekr.20060127052111.1: *4* u.cutStack
     def cutStack(self):
         u = self; n = u.max_undo_stack_size
-        if u.bead >= n > 0 and not g.app.unitTesting:
-            # Do nothing if we are in the middle of creating a group.
-            i = len(u.beads) - 1
-            while i >= 0:
-                bunch = u.beads[i]
-                if hasattr(bunch, 'kind') and bunch.kind == 'beforeGroup':
-                    return
-                i -= 1
+        cut = u.bead >= n > 0 and not g.app.unitTesting
+        pack = u.max_undo_memory > 0 and (
+            u.undo_memory_bound is None or
+            u.undo_memory_bound > u.undo_memory_trigger)
+        if not cut and not pack:
+            return
+        # Do nothing if we are in the middle of creating a group.
+        i = len(u.beads) - 1
+        while i >= 0:
+            bunch = u.beads[i]
+            if hasattr(bunch, 'kind') and bunch.kind == 'beforeGroup':
+                return
+            i -= 1
+        if cut:
             # This work regardless of how many items appear after bead n.
                 # g.trace('Cutting undo stack to %d entries' % (n))
             u.beads = u.beads[-n :]
             u.bead = n - 1
+        if pack:
+            u.limitUndoMemory()
+    #@+node:ekr.20261018181530.1: *5* u.limitUndoMemory
+    def limitUndoMemory(self):
+        """
+        Compress the oldest beads until the estimated size of the undo stack
+        is below u.max_undo_memory. If that isn't enough, delete the oldest
+        beads. The present bead and all redo beads always remain intact.
+
+        Scanning all beads is slow. u.pushBead and u.setUndoTypingParams
+        update u.undo_memory_bound, and u.cutStack calls this method only
+        when the bound exceeds u.undo_memory_trigger.
+        """
+        u = self
+        limit = u.max_undo_memory * 3 // 4
+        sizes = [u.cachedBeadSize(z) for z in u.beads]
+        total = sum(sizes)
+        i = 0
+        while total > limit and i < u.bead:
+            bunch = u.beads[i]
+            if bunch not in u.packed_beads:
+                u.packBead(bunch)
+                u.packed_beads.add(bunch)
+                size = u.beadSize(bunch)
+                u.bead_sizes[bunch] = size
+                total += size - sizes[i]
+                sizes[i] = size
+            i += 1
+        # Compression was not enough. Delete the oldest beads.
+        n = 0
+        while total > limit and n < u.bead:
+            total -= sizes[n]
+            n += 1
+        if n:
+            del u.beads[:n]
+            u.bead -= n
+        u.undo_memory_bound = total
+        # Leave plenty of room, even if the present bead alone exceeds the limit.
+        u.undo_memory_trigger = max(u.max_undo_memory, total + max(u.max_undo_memory, total) // 4)
     #@+node:ekr.20080623083646.10: *4* u.dumpBead
     def dumpBead(self, n):
         u = self
@@ -179,11 +318,141 @@ class Undoer:
         if n < 0 or n >= len(u.beads):
             return None
         return u.beads[n]
+    #@+node:ekr.20261018181530.2: *4* u.packBead & helpers
+    def packBead(self, bunch):
+        """
+        Compress all large text in bunch, in place.
+
+        u.setIvarsFromBunch and u.restoreTnodeUndoInfo unpack the text.
+        """
+        u = self
+        packed = {}  # Keys are ids of compressed strings, values are CompressedValues.
+
+        def pack(val):
+            if isinstance(val, (str, list)) and u.valueSize(val) >= u.min_pack_size:
+                packed[id(val)] = CompressedValue(val)
+                return packed.get(id(val))
+            return val
+
+        keys = [z for z in (
+            'oldBody', 'newBody', 'oldText', 'newText', 'oldMiddleLines', 'newMiddleLines',
+        ) if bunch.get(z)]
+        infos = [tInfo for key in ('oldTree', 'newTree') for v, vInfo, tInfo in bunch.get(key) or []]
+        for key in keys:
+            bunch[key] = pack(bunch.get(key))
+        for tInfo in infos:
+            tInfo.bodyString = pack(tInfo.bodyString)
+        # Make all deltas refer to the compressed text, so the text itself can be freed.
+        for val in [bunch.get(z) for z in keys] + [z.bodyString for z in infos]:
+            if isinstance(val, DeltaValue) and id(val.base) in packed:
+                val.base = packed.get(id(val.base))
+        for item in bunch.get('items') or []:
+            if isinstance(item, g.Bunch):  # Not a multi-node item.
+                u.packBead(item)
+    #@+node:ekr.20261018181530.3: *5* u.beadSize & cachedBeadSize
+    def beadSize(self, bunch):
+        """
+        Return the estimated size in bytes of the data in the bead.
+
+        This is just the total size of all strings, deltas and compressed
+        data. Text shared with the outline counts as if it were a copy.
+        """
+        u = self
+        return sum(u.valueSize(z) for z in bunch.__dict__.values())
+
+    def cachedBeadSize(self, bunch):
+        """
+        Return u.beadSize(bunch), using a cached value if possible.
+
+        The present bead may change (typing extends it), so never cache it.
+        """
+        u = self
+        if 0 <= u.bead < len(u.beads) and bunch is u.beads[u.bead]:
+            u.bead_sizes.pop(bunch, None)
+            u.packed_beads.discard(bunch)
+            return u.beadSize(bunch)
+        size = u.bead_sizes.get(bunch)
+        if size is None:
+            size = u.bead_sizes[bunch] = u.beadSize(bunch)
+        return size
+
+    def valueSize(self, val):
+        """Return the estimated size in bytes of a value in a bead."""
+        u = self
+        if isinstance(val, str):
+            return len(val)
+        if isinstance(val, (list, tuple)):
+            return sum(u.valueSize(z) for z in val)
+        if isinstance(val, g.Bunch):
+            return u.beadSize(val)
+        if isinstance(val, DeltaValue):
+            return u.valueSize(val.delta)
+        if isinstance(val, CompressedValue):
+            return len(val.data)
+        if isinstance(val, array.array):
+            return len(val) * val.itemsize
+        return 0
+    #@+node:ekr.20261018181530.4: *5* u.deltaValue
+    def deltaValue(self, s, base):
+        """
+        Return s, or a DeltaValue representing s as a delta against base.
+
+        base must be a string that the bead also contains.
+        """
+        u = self
+        if not isinstance(s, str) or not isinstance(base, str) or len(s) < u.min_pack_size:
+            return s
+        if s == base:
+            return base  # Share the string.
+        delta = u.computeDelta(base, s)
+        if u.valueSize(delta) > len(s) // 2:
+            return s
+        return DeltaValue(base, delta)
+    #@+node:ekr.20261018181530.13: *5* u.rebasePreviousBead
+    def rebasePreviousBead(self, p, bunch, oldBody):
+        """
+        Let the previous bead share bunch.oldBody if both beads change p.b.
+
+        The previous bead's new body is bunch's old body, so afterwards the
+        two beads contain only one full copy of p.b. Every max_delta_chain
+        beads keep their own copy so that unpacking remains fast.
+        """
+        u = self
+        prev = u.peekBead(u.bead)
+        if (
+            not prev or prev.get('kind') != 'node' or prev in u.packed_beads
+            or u.bead % u.max_delta_chain == 0
+            or not prev.p or prev.p.v != p.v
+        ):
+            return
+        newBody = prev.newBody
+        if not isinstance(newBody, str) or newBody != oldBody:
+            return
+        # All changes leave the values of the beads unchanged.
+        prev.newBody = bunch.oldBody
+        if isinstance(prev.oldBody, DeltaValue) and prev.oldBody.base is newBody:
+            prev.oldBody.base = bunch.oldBody
+    #@+node:ekr.20261018181530.5: *5* u.unpackValue
+    def unpackValue(self, val):
+        """Return the value represented by a DeltaValue or CompressedValue."""
+        u = self
+        deltas = []
+        while isinstance(val, DeltaValue):
+            # The base of a DeltaValue may be another DeltaValue.
+            deltas.append(val.delta)
+            val = val.base
+        if isinstance(val, CompressedValue):
+            val = pickle.loads(zlib.decompress(val.data))
+        for delta in reversed(deltas):
+            val = u.applyDelta(val, delta)
+        return val
     #@+node:ekr.20060127113243: *4* u.pushBead
     def pushBead(self, bunch):
         u = self
         # New in 4.4b2:  Add this to the group if it is being accumulated.
         bunch2 = u.bead >= 0 and u.bead < len(u.beads) and u.beads[u.bead]
+        if u.max_undo_memory > 0 and u.undo_memory_bound is not None:
+            u.undo_memory_bound += u.beadSize(bunch)
         if bunch2 and hasattr(bunch2, 'kind') and bunch2.kind == 'beforeGroup':
             # Just append the new bunch the group's items.
             bunch2.items.append(bunch)
@@ -243,7 +512,7 @@ class Undoer:
             assert val in (True, False), f"{val!r} {g.callers()!s}"
         # bunch is not a dict, so bunch.keys() is required.
         for key in list(bunch.keys()):
-            val = bunch.get(key)
+            val = u.unpackValue(bunch.get(key))
             setattr(u, key, val)
             if key not in u.optionalIvars:
                 u.optionalIvars.append(key)
@@ -335,7 +604,7 @@ class Undoer:
     def restoreTnodeUndoInfo(self, bunch):
         v = bunch.v
         v.h = bunch.headString
-        v.b = bunch.bodyString
+        v.b = self.unpackValue(bunch.bodyString)
         v.statusBits = bunch.statusBits
         uA = bunch.get('unknownAttributes')
         if uA is not None:
@@ -457,6 +726,42 @@ class Undoer:
             u.beads[u.bead:] = [bunch]
         # Recalculate the menu labels.
         u.setUndoTypes()
+    #@+node:ekr.20261018172014.2: *5* u.afterChangeMultiNodeContents & recordNodeContents
+    def afterChangeMultiNodeContents(self, p, command, bunch):
+        """
+        Create an undo node for a command, like replace-all, that changes
+        the headlines and bodies of many nodes. bunch was created by
+        beforeChangeMultiNodeContents and updated by recordNodeContents.
+        """
+        u = self; c = self.c
+        w = c.frame.body.wrapper
+        if u.redoing or u.undoing:
+            return
+        if not bunch.items:
+            return
+        # Set the types & helpers.
+        bunch.kind = 'multi-node'
+        bunch.undoType = command
+        bunch.undoHelper = u.undoMultiNodeContents
+        bunch.redoHelper = u.redoMultiNodeContents
+        bunch.newP = p.copy()
+        bunch.newSel = w.getSelectionRange() if w else (0, 0)
+        u.pushBead(bunch)
+
+    def recordNodeContents(self, bunch, p, oldHead, oldBody, headDelta=None, bodyDelta=None):
+        """
+        Add the changes to p's headline and body to bunch.
+
+        bunch.items contains tuples (v, head_delta, body_delta), so the
+        undo node does not contain copies of the old and new texts.
+        Callers may pass deltas created by u.replacementDelta.
+        """
+        u = self
+        if headDelta is None:
+            headDelta = u.computeDelta(oldHead, p.h)
+        if bodyDelta is None:
+            bodyDelta = u.computeDelta(oldBody, p.b)
+        bunch.items.append((p.v, headDelta, bodyDelta))
     #@+node:ekr.20050315134017.2: *5* u.afterChangeNodeContents
     def afterChangeNodeContents(self, p, command, bunch, inHead=False):
         """Create an undo node using d created by beforeChangeNode."""
@@ -474,6 +779,9 @@ class Undoer:
         bunch.newBody = p.b
         bunch.newHead = p.h
         bunch.newMarked = p.isMarked()
+        oldBody = bunch.oldBody
+        bunch.oldBody = u.deltaValue(oldBody, bunch.newBody)
+        u.rebasePreviousBead(p, bunch, oldBody)
         # Bug fix 2017/11/12: don't use ternary operator.
         if w:
             bunch.newSel = w.getSelectionRange()
@@ -495,6 +803,12 @@ class Undoer:
         bunch.newSel = w.getSelectionRange()
         bunch.newText = w.getAllText()
         bunch.newTree = u.saveTree(p)
+        # Store changed bodies as deltas against the new bodies.
+        bunch.oldText = u.deltaValue(bunch.oldText, bunch.newText)
+        new_bodies = {v: tInfo.bodyString for v, vInfo, tInfo in bunch.newTree}
+        for v, vInfo, tInfo in bunch.oldTree:
+            if v in new_bodies:
+                tInfo.bodyString = u.deltaValue(tInfo.bodyString, new_bodies.get(v))
         u.pushBead(bunch)
     #@+node:ekr.20050424161505: *5* u.afterClearRecentFiles
     def afterClearRecentFiles(self, bunch):
@@ -723,6 +1037,13 @@ class Undoer:
         # Push the bunch.
         u.bead += 1
         u.beads[u.bead:] = [bunch]
+    #@+node:ekr.20261018172014.3: *5* u.beforeChangeMultiNodeContents
+    def beforeChangeMultiNodeContents(self, p):
+        """Return data that gets passed to afterChangeMultiNodeContents."""
+        u = self
+        bunch = u.createCommonBunch(p)
+        bunch.items = []
+        return bunch
     #@+node:ekr.20050315133212.2: *5* u.beforeChangeNodeContents
     def beforeChangeNodeContents(self, p, oldBody=None, oldHead=None, oldYScroll=None):
         """Return data that gets passed to afterChangeNode"""
@@ -833,6 +1154,8 @@ class Undoer:
         u.setUndoType("Can't Undo")
         u.beads = []  # List of undo nodes.
         u.bead = -1  # Index of the present bead: -1:len(beads)
+        u.undo_memory_bound = 0
+        u.undo_memory_trigger = u.max_undo_memory
     #@+node:ekr.20031218072017.3611: *4* u.enableMenuItems
     def enableMenuItems(self):
         u = self; frame = u.c.frame
@@ -1078,6 +1401,10 @@ class Undoer:
             u.pushBead(bunch)
         else:
             bunch = old_d
+        # Typing changes the size of the present bead in place.
+        count_size = u.max_undo_memory > 0 and u.undo_memory_bound is not None
+        if count_size:
+            old_size = u.beadSize(bunch)
         bunch.leading = u.leading
         bunch.trailing = u.trailing
         bunch.newMarked = p.isMarked()  # #1694 
@@ -1086,6 +1413,9 @@ class Undoer:
         bunch.newSel = u.newSel
         bunch.newText = u.newText
         bunch.yview = u.yview
+        if count_size:
+            u.undo_memory_bound += max(0, u.beadSize(bunch) - old_size)
+            u.cutStack()
         #@-<< adjust the undo stack, clearing all forward entries >>
         if u.per_node_undo:
             u.putIvarsToVnode(p)
@@ -1273,6 +1603,12 @@ class Undoer:
         u.updateMarks('new')
         u.newP.setDirty()
         c.selectPosition(u.newP)
+    #@+node:ekr.20261018172014.4: *4* u.redoMultiNodeContents
+    def redoMultiNodeContents(self):
+        u = self
+        u.setMultiNodeContents(reverse=False)
+        if not g.unitTesting:
+            g.es("redo", len(u.items), "instances")
     #@+node:ekr.20050318085432.7: *4* u.redoNodeContents
     def redoNodeContents(self):
         c, u = self.c, self
@@ -1433,10 +1769,7 @@ class Undoer:
         aList = u.deleteMarkedNodesData[:]
         aList.reverse()
         for p in aList:
-            if p.stack:
-                parent_v, junk = p.stack[-1]
-            else:
-                parent_v = c.hiddenRootNode
+            parent_v = p._parentVnode()
             p.v._addLink(p._childIndex, parent_v)
             p.v.setDirty()
         u.p.setAllAncestorAtFileNodesDirty()
@@ -1558,6 +1891,49 @@ class Undoer:
         u.updateMarks('old')
         u.p.setDirty()
         c.selectPosition(u.p)
+    #@+node:ekr.20261018172014.5: *4* u.undoMultiNodeContents & helper
+    def undoMultiNodeContents(self):
+        u = self
+        u.setMultiNodeContents(reverse=True)
+        if not g.unitTesting:
+            g.es("undo", len(u.items), "instances")
+    #@+node:ekr.20261018172014.6: *5* u.setMultiNodeContents
+    def setMultiNodeContents(self, reverse):
+        """
+        Undo (reverse is True) or redo the changes to all nodes in u.items.
+
+        Set vnode ivars directly: calling c.setBodyString for each node
+        would be much too slow.
+        """
+        c, u = self.c, self
+        w = c.frame.body.wrapper
+        items = reversed(u.items) if reverse else u.items
+        heads_changed = False
+        for v, head_delta, body_delta in items:
+            if head_delta:
+                heads_changed = True
+                v.setHeadString(u.applyDelta(v.h, head_delta, reverse=reverse))
+            if body_delta:
+                v.setBodyString(u.applyDelta(v.b, body_delta, reverse=reverse))
+            v.setDirty()
+            v.setAllAncestorAtFileNodesDirty()
+        p = u.p if reverse else u.newP
+        if c.p != p:
+            c.selectPosition(p)
+        # Update the body pane: it may show one of the changed nodes.
+        w.setAllText(p.b)
+        c.frame.body.recolor(p)
+        sel = u.oldSel if reverse else u.newSel
+        if sel:
+            i, j = sel
+            w.setSelectionRange(i, j)
+        # Undo/redo always set the changed bit because the file may have been saved.
+        c.setChanged()
+        if heads_changed:
+            # The tree still shows the old headlines.
+            # Set the headline widget first. Otherwise c.redraw will revert the change!
+            c.frame.tree.setHeadline(p, p.h)
+            c.redraw()
     #@+node:ekr.20050318085713.1: *4* u.undoNodeContents
     def undoNodeContents(self):
         """
@@ -1701,6 +2077,35 @@ class Undoer:
         if u.yview:
             c.bodyWantsFocus()
             w.setYScrollPosition(u.yview)
+    #@+node:ekr.20261018181530.6: *3* u.showUndoMemory
+    @cmd('show-undo-memory')
+    def showUndoMemory(self, event=None):
+        """
+        Print the estimated memory used by the undo stack.
+        Return the total size in bytes.
+        """
+        u = self
+        d = {}  # Keys are bead kinds, values are [count, size].
+        packed = 0
+        for bunch in u.beads:
+            aList = d.setdefault(bunch.get('kind') or 'unknown', [0, 0])
+            aList[0] += 1
+            aList[1] += u.cachedBeadSize(bunch)
+            if bunch in u.packed_beads:
+                packed += 1
+        total = sum(size for n, size in d.values())
+        budget = f"{u.max_undo_memory:,} bytes" if u.max_undo_memory > 0 else 'none'
+        lines = [
+            f"undo stack: {len(u.beads)} bead{g.plural(len(u.beads))}, "
+            f"{u.bead + 1} undoable, {packed} compressed",
+        ]
+        for kind in sorted(d):
+            n, size = d.get(kind)
+            lines.append(f"{kind:>12}: {n:6} {size:14,} bytes")
+        lines.append(f"{'total':>12}: {len(u.beads):6} {total:14,} bytes")
+        lines.append(f"{'budget':>12}: {budget}")
+        g.es_print('\n'.join(lines))
+        return total
     #@+node:ekr.20191213092304.1: *3* u.update_status
     def update_status(self):
         """
@@ -1732,6 +2137,143 @@ class Undoer:
             w.setSelectionRange(i, j, insert=ins)
             w.seeInsertPoint()
     #@-others
+#@+node:ekr.20261018181530.7: ** class CompressedValue
+class CompressedValue:
+    """A large string or list of strings in a bead, compressed by u.packBead."""
+
+    __slots__ = ('data',)
+
+    def __init__(self, val):
+        self.data = zlib.compress(pickle.dumps(val, pickle.HIGHEST_PROTOCOL))
+#@+node:ekr.20261018181530.8: ** class DeltaValue
+class DeltaValue:
+    """A string in a bead represented as a delta against another string."""
+
+    __slots__ = ('base', 'delta')
+
+    def __init__(self, base, delta):
+        self.base = base  # A string or DeltaValue that the undo stack contains anyway.
+        self.delta = delta  # A delta created by u.computeDelta.
+#@+node:ekr.20261018181530.9: ** class TestUndo
+class TestUndo(unittest.TestCase):
+    """Test cases for leoUndo.py"""
+    #@+others
+    #@+node:ekr.20261018181530.10: *3* make_commander
+    def make_commander(self):
+        """Return a headless commander containing a few nodes with long bodies."""
+        import os
+        import tempfile
+        import leo.core.leoBridge as leoBridge
+        bridge = leoBridge.headless_controller()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        c = bridge.openLeoFile(os.path.join(temp_dir.name, 'test.leo'))
+        root = c.rootPosition()
+        for i in range(5):
+            p = root.insertAsLastChild()
+            p.h = f"node {i}"
+            p.b = ''.join(f"node {i} line {j}\n" for j in range(200))
+        c.selectPosition(root)
+        c.undoer.clearUndoState()
+        return c
+    #@+node:ekr.20261018181530.11: *3* test_undo_memory_budget
+    def test_undo_memory_budget(self):
+        """Test that packed and deleted beads don't change undo and redo."""
+        c = self.make_commander()
+        u = c.undoer
+
+        def contents():
+            return [(p.h, p.b) for p in c.all_positions()]
+
+        states = [contents()]
+        children = list(c.rootPosition().children())
+        for n in range(40):
+            p = children[(n // 4) % len(children)]
+            if n % 10 == 9:
+                # A tree command.
+                parent = c.rootPosition()
+                bunch = u.beforeChangeTree(parent)
+                for child in parent.children():
+                    child.b = child.b.replace('line 1', f"LINE {n}", 1)
+                u.afterChangeTree(parent, 'change tree', bunch)
+            else:
+                # A node command.
+                c.selectPosition(p)
+                bunch = u.beforeChangeNodeContents(p)
+                lines = g.splitLines(p.b)
+                lines[n] = f"changed {n}\n"
+                if n % 2:
+                    lines.insert(n, 'a new line\n')
+                p.b = ''.join(lines)
+                u.afterChangeNodeContents(p, 'change node', bunch)
+            states.append(contents())
+            if n == 11:
+                assert isinstance(u.beads[u.bead].oldBody, DeltaValue)
+                # The previous bead shares the old body of this bead.
+                assert u.beads[u.bead - 1].newBody is u.beads[u.bead].oldBody
+            elif n == 19:
+                assert any(isinstance(tInfo.bodyString, DeltaValue)
+                    for v, vInfo, tInfo in u.beads[u.bead].oldTree)
+        # All beads are intact.
+        assert len(u.beads) == 40, len(u.beads)
+        total = u.showUndoMemory()
+
+        def change_node(p):
+            bunch = u.beforeChangeNodeContents(p)
+            p.b = p.b + 'last line\n'
+            u.afterChangeNodeContents(p, 'change node', bunch)
+            states.append(contents())
+
+        def check_undo():
+            n = len(u.beads)
+            for i in range(n):
+                u.undo()
+                assert contents() == states[-2 - i], i
+            assert not u.canUndo()
+            for i in range(n):
+                u.redo()
+                assert contents() == states[len(states) - n + i], i
+
+        # Limit the memory, then add one more bead: compress beads.
+        u.max_undo_memory, u.undo_memory_bound = total // 2, None
+        change_node(children[0])
+        assert u.packed_beads, 'no packed beads'
+        assert u.showUndoMemory() <= u.max_undo_memory
+        assert len(u.beads) == 41, len(u.beads)
+        check_undo()
+        # Limit the memory further: compress all beads, then delete the oldest.
+        u.max_undo_memory, u.undo_memory_bound = u.showUndoMemory() // 4, None
+        change_node(children[1])
+        assert 1 < len(u.beads) < 42, len(u.beads)
+        assert u.bead == len(u.beads) - 1
+        assert all(z in u.packed_beads for z in u.beads[: u.bead])
+        assert u.showUndoMemory() <= u.max_undo_memory
+        # Don't rescan the stack after every push.
+        calls = []
+        u.limitUndoMemory = lambda: calls.append(True)
+        change_node(children[2])
+        assert not calls, calls
+        del u.limitUndoMemory
+        # Undo and redo don't change the estimated size.
+        bound = u.undo_memory_bound
+        u.undo()
+        u.redo()
+        assert u.undo_memory_bound == bound
+        check_undo()
+        # Typing into the present bead counts, and deletes old beads.
+        p = children[3]
+        c.selectPosition(p)
+        u.granularity = 'node'
+        n = len(u.beads)
+        for i in range(10):
+            old = p.b
+            p.b = old + f"typed {i} " + 'x' * (u.max_undo_memory // 2) + '\n'
+            u.setUndoTypingParams(p, 'Typing', old, p.b)
+            assert u.undo_memory_bound >= u.showUndoMemory(), i
+        assert u.beads[u.bead].kind == 'typing'
+        assert len(u.beads) < n + 1, (len(u.beads), n)
+        assert u.showUndoMemory() <= u.max_undo_memory + u.cachedBeadSize(u.beads[u.bead])
+    #@-others
 #@-others
 #@@language python
 #@@tabwidth -4
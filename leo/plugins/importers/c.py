@@ -18,6 +18,7 @@ class C_Importer(Importer):
         # Init the base class.
         super().__init__(
             importCommands,
+            fast_scan = True,
             language = 'c',
             state_class = C_ScanState,
         )
@@ -12,6 +12,7 @@ class Csharp_Importer(Importer):
         '''Csharp_Importer.__init__'''
         super().__init__(
             importCommands,
+            fast_scan = True,
             language = 'csharp',
             state_class = Csharp_ScanState,
             strict = False,
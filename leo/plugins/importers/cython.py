@@ -24,6 +24,7 @@ class Cython_Importer(py_importer.Py_Importer):
         '''Cython_Importer.ctor.'''
         super().__init__(
             importCommands,
+            fast_scan=True,
             language='cython',
             state_class = Cython_ScanState,
             strict=True,
@@ -13,6 +13,7 @@ class Dart_Importer(Importer):
         '''Dart_Importer.__init__'''
         super().__init__(
             importCommands,
+            fast_scan = True,
             language = 'dart',
             state_class = Dart_ScanState,
             strict = False,
@@ -15,6 +15,7 @@ class Elisp_Importer(Importer):
         # Init the base class.
         super().__init__(
             importCommands,
+            fast_scan = True,
             language = 'lisp',
             state_class = Elisp_ScanState,
             strict = False,
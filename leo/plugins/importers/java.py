@@ -16,6 +16,7 @@ class Java_Importer(Importer):
         '''Java_Importer.__init__'''
         super().__init__(
             importCommands,
+            fast_scan = True,
             language = 'java',
             state_class = Java_ScanState,
             strict = False,
@@ -78,6 +78,7 @@ need to do so.
 import io
 StringIO = io.StringIO
 import re
+import unittest
 import leo.core.leoGlobals as g
 #@-<< linescanner imports >>
 #@+others
@@ -93,6 +94,7 @@ class Importer:
     #@+node:ekr.20161108155925.1: *3* i.__init__ & reloadSettings
     def __init__(self,
         importCommands,
+        fast_scan=False, # True: i.scan_line skips characters that can't change the state.
         gen_refs=False, # True: generate section references,
         language=None, # For @language directive.
         name=None, # The kind of importer, usually the same as language
@@ -107,6 +109,7 @@ class Importer:
         self.importCommands = ic = importCommands
         self.c = c = ic and ic.c
         self.encoding = ic and ic.encoding or 'utf-8'
+        self.fast_scan = fast_scan
         self.gen_refs = gen_refs
         self.language = language or name
             # For the @language directive.
@@ -269,6 +272,25 @@ class Importer:
             if block1 and block2:
                 add_key(d, block1, ('len', block1, block1, None))
         return d
+    #@+node:ekr.20261018212037.1: *4* i.get_fast_table
+    cached_scan_patterns = {}
+
+    def get_fast_table(self, context):
+        '''
+        Return (table, pattern) for the given context, where table is the
+        state table and pattern is a compiled regex matching any character
+        that is a key of the table.
+        '''
+        key = '%s.%s' % (self.name, context)
+        data = self.cached_scan_patterns.get(key)
+        if data:
+            return data
+        table = self.get_table(context)
+        chars = ''.join(sorted(ch for ch in table if len(ch) == 1))
+        pattern = re.compile('[%s]' % re.escape(chars) if chars else '(?!)')
+        data = table, pattern
+        self.cached_scan_patterns[key] = data
+        return data
     #@+node:ekr.20161113135037.1: *4* i.get_table
     #@@nobeautify
     cached_scan_tables = {}
@@ -360,6 +382,9 @@ class Importer:
             's':s,
         }
         new_state = self.state_class(d)
+        if self.fast_scan:
+            self.fast_scan_line(s, new_state)
+            return new_state
         i = 0
         while i < len(s):
             progress = i
@@ -369,6 +394,32 @@ class Importer:
             i = new_state.update(data)
             assert progress < i
         return new_state
+    #@+node:ekr.20261018212037.2: *4* i.fast_scan_line
+    def fast_scan_line(self, s, state):
+        '''
+        Update the state by scanning line s, exactly as i.scan_line does.
+
+        i.scan_dict leaves the context unchanged and returns zero deltas
+        for every character that is not a key of the state table. A
+        precompiled regex finds the next key, and one call to
+        state.update replaces the calls for all characters before it.
+
+        Importers should set fast_scan only if they use i.scan_dict and
+        if state.update with zero deltas is idempotent.
+        '''
+        i, n = 0, len(s)
+        context = state.context
+        table, pattern = self.get_fast_table(context)
+        while i < n:
+            if context != state.context:
+                context = state.context
+                table, pattern = self.get_fast_table(context)
+            m = pattern.search(s, i)
+            j = m.start() if m else n
+            if j > i:
+                i = state.update((context, j, 0, 0, 0, False))
+            else:
+                i = state.update(self.scan_dict(context, i, s, table))
     #@+node:ekr.20161114024119.1: *4* i.test_scan_state
     def test_scan_state(self, tests, State):
         '''
@@ -1281,6 +1332,43 @@ class Target:
             int(self.gen_refs),
             g.shortFileName(self.p.h),
         )
+#@+node:ekr.20261018212037.4: ** class TestLineScanner
+class TestLineScanner(unittest.TestCase):
+    '''Test cases for Importer.scan_line.'''
+    #@+others
+    #@+node:ekr.20261018212037.5: *3* TestLineScanner.test_fast_scan
+    def test_fast_scan(self):
+        import leo.core.leoBridge as leoBridge
+        bridge = leoBridge.headless_controller()
+        c = bridge.openLeoFile('')
+        if not g.app.classDispatchDict:
+            g.app.loadManager.createAllImporterData()
+        lines = g.splitLines(
+            'int f(int a[], char *s) { // A {comment} (\n'
+            '    char *t = "a {string} with \\"escapes\\"";\n'
+            '    /* A [block]\n'
+            '       comment */ return \'{\' + (a[0]);\n'
+            '    d = {\'key\': [a, (s, 1)], "other": \'"\'} # (\n'
+            '    """A {docstring}\n'
+            '    that \'ends\' here""" + \'\'\'x\'\'\' \\\n'
+            '}\n'
+            '\n'
+            '-- [[ lua ]] (* pascal *) ; elisp ("x")\n'
+            'no newline'
+        )
+        for ext in ('.c', '.cs', '.dart', '.el', '.java', '.lua', '.pas', '.pl', '.py', '.rs', '.tcl', '.ts'):
+            importer = g.app.classDispatchDict[ext](importCommands=c.importCommands)
+            self.assertTrue(importer.fast_scan, msg=ext)
+            results = []
+            for fast_scan in (True, False):
+                importer.fast_scan = fast_scan
+                states, state = [], importer.state_class()
+                for line in lines:
+                    state = importer.scan_line(line, state)
+                    states.append(vars(state))
+                results.append(states)
+            self.assertEqual(results[0], results[1], msg=ext)
+    #@-others
 #@-others
 #@@language python
 #@@tabwidth -4
@@ -20,6 +20,7 @@ class Lua_Importer(Importer):
         '''Lua_Importer.__init__'''
         super().__init__(
             importCommands,
+            fast_scan = True,
             language = 'lua',
             state_class = Lua_ScanState,
             strict = False,
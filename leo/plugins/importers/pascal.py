@@ -14,6 +14,7 @@ class Pascal_Importer(Importer):
         '''Pascal_Importer.__init__'''
         super().__init__(
             importCommands,
+            fast_scan = True,
             language = 'pascal',
             state_class = Pascal_ScanState,
             strict = False,
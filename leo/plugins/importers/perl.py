@@ -14,6 +14,7 @@ class Perl_Importer(Importer):
         '''The ctor for the Perl_ImportController class.'''
         super().__init__(
             importCommands,
+            fast_scan = True,
             language = 'perl',
             state_class = Perl_ScanState,
         )
@@ -16,6 +16,7 @@ class Py_Importer(Importer):
         '''Py_Importer.ctor.'''
         super().__init__(
             importCommands,
+            fast_scan=True,
             language=language,
             state_class = Python_ScanState,
             strict=True,
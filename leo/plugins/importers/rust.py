@@ -16,6 +16,7 @@ class Rust_Importer(Importer):
         # Init the base class.
         super().__init__(
             importCommands,
+            fast_scan = True,
             language = 'rust',
             state_class = Rust_ScanState,
         )
@@ -20,6 +20,7 @@ class Tcl_Importer(Importer):
         '''Tcl_Importer.__init__'''
         super().__init__(
             importCommands,
+            fast_scan = True,
             language = 'tcl',
             state_class = Tcl_ScanState,
             strict = False,
@@ -62,6 +62,7 @@ class TS_Importer(Importer):
         # Init the base class.
         super().__init__(
             importCommands,
+            fast_scan = True,
             language = 'typescript', # Case is important.
             state_class = TS_ScanState,
         )
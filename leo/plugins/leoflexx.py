@@ -291,8 +291,11 @@ class LeoBrowserApp(flx.PyComponent):
         self.old_flattened_outline = []
         self.old_redraw_dict = {}
         self.redraw_generation = 0
+        self.full_redraw_needed = True
+            # True if the tree must be redrawn from scratch.
         self.fast_redrawer = leoFastRedraw.FastRedraw()
-        self.old_flattened_outline = self.fast_redrawer.flatten_outline(c)
+        self.old_flattened_outline = self.fast_redrawer.start_journal(c)
+            # Record outline changes in c.changeJournal.
         self.old_redraw_dict = self.make_redraw_dict(c.p)
         # Select the proper position.
         c.selectPosition(c.p or c.rootPosition())
@@ -506,24 +509,81 @@ class LeoBrowserApp(flx.PyComponent):
         t1 = time.process_time()
         ap = self.p_to_ap(p)
         w.tree.select_ap(ap)
-        redraw_dict = self.make_redraw_dict(p)
-            # Needed to compare generations, even if there are no changes.
-        new_flattened_outline = redrawer.flatten_outline(c)
-        redraw_instructions = redrawer.make_redraw_list(
-            self.old_flattened_outline,
-            new_flattened_outline,
-        )
-        w.tree.redraw_with_dict(redraw_dict, redraw_instructions)
-            # At present, this does a full redraw using redraw_dict.
-            # The redraw instructions are not used.
+        c.expandAllAncestors(c.p)
+            # Ensure that c.p will be shown.
+        old_vnodes, old_levels = redrawer.old_vnodes, redrawer.old_levels
+        journal = c.changeJournal is not None and old_vnodes is not None
+        new_flattened_outline, redraw_instructions = redrawer.redraw_from_journal(c)
+            # Falls back to make_redraw_list if c.changeJournal is incomplete.
+        parents = None
+        if journal and not self.full_redraw_needed:
+            parents = self.find_redraw_parents(old_vnodes, old_levels, redraw_instructions)
+        if parents is None:
+            # Redraw the entire tree.
+            redraw_dict = self.make_redraw_dict(p)
+            w.tree.redraw_with_dict(redraw_dict, redraw_instructions)
+            self.old_redraw_dict = redraw_dict
+            self.full_redraw_needed = False
+        else:
+            # Redraw only the children of the parents of the changed rows.
+            for parent in parents:
+                items = [
+                    self.make_dict_for_position(child)
+                        for child in parent.children()
+                ] if parent.isExpanded() else []
+                w.tree.redraw_children(self.p_to_ap(parent), items, ap)
         #
         # Do not call c.setChanged() here.
-        if trace: print('app.redraw: %5.3f sec.' % (time.process_time()-t1))
+        if trace:
+            kind = 'full' if parents is None else '%s parents' % len(parents)
+            print('app.redraw: %s %5.3f sec.' % (kind, time.process_time()-t1))
         #
         # Move to the next redraw generation.
         self.old_flattened_outline = new_flattened_outline
-        self.old_redraw_dict = redraw_dict
         self.redraw_generation += 1
+    #@+node:ekr.20261019060012.19: *5* app.action.full_redraw
+    @flx.action
+    def full_redraw(self):
+        '''Redraw the entire tree. The tree calls this if a partial redraw fails.'''
+        self.full_redraw_needed = True
+        self.redraw(None)
+    #@+node:ekr.20261019060012.20: *5* app.find_redraw_parents
+    def find_redraw_parents(self, vnodes, levels, opcodes):
+        '''
+        Return the list of positions whose children contain all the rows
+        changed by the redraw instructions, or None if the top-level nodes
+        changed.
+
+        vnodes and levels are the rows of the previous flattened outline.
+        The ancestors of all changed rows are unchanged.
+        '''
+        c, redrawer = self.c, self.fast_redrawer
+        changes = []  # Tuples (i, lines): lines changed at row i.
+        for z in opcodes:
+            kind = z[0]
+            if kind == 'move':
+                changes.extend([(z[1], z[3]), (z[2], z[4])])
+            elif kind == 'replace':
+                changes.append((z[1], z[2] + z[3]))
+            else:
+                changes.append((z[1], z[2]))
+        rows = set()
+        for i, lines in changes:
+            # The parent is the nearest preceding row with a lower level.
+            level = min(int(s.split(':', 1)[0]) for s in lines)
+            k = i - 1
+            while k >= 0 and levels[k] >= level:
+                k -= 1
+            if k < 0:
+                return None
+            rows.add(k)
+        # Redraw only the outermost parents.
+        parents = []
+        for k in sorted(rows):
+            p = redrawer.row_position(c, vnodes, levels, k)
+            if not any(z.isAncestorOf(p) for z in parents):
+                parents.append(p)
+        return parents
     #@+node:ekr.20181111095640.1: *5* app.action.send_children_to_tree
     @flx.action
     def send_children_to_tree(self, parent_ap):
@@ -2327,6 +2387,7 @@ class LeoFlexxTree(flx.Widget):
             }
         '''
         # This is called only from app.action.redraw.
+        # The redraw instructions are not used.
         trace = 'drawing' in g.app.debug
         tag = 'redraw_with_dict'
         assert redraw_dict
@@ -2343,6 +2404,47 @@ class LeoFlexxTree(flx.Widget):
         self.select_ap(redraw_dict['c.p'])
         redraw_dict = {}
             # #1127: Remove references to deleted items.
+    #@+node:ekr.20261019060012.21: *5* flx_tree.action.redraw_children & helper
+    @flx.action
+    def redraw_children(self, parent_ap, items, selected_ap):
+        '''
+        Replace the children of the tree item for parent_ap, using the
+        **recursive** items list. items has the form:
+            [
+                self.make_dict_for_position(child)
+                    for child in p.children()
+            ]
+        '''
+        # This is called only from app.action.redraw.
+        trace = 'drawing' in g.app.debug
+        tag = 'redraw_children'
+        key = self.ap_to_key(parent_ap)
+        parent = self.tree_items_dict.get(key)
+        if not parent:
+            if trace: print('%s: no tree item: %s' % (tag, parent_ap['headline']))
+            self.root.full_redraw()
+            return
+        if trace: print('%s: %s %s children' % (tag, parent_ap['headline'], len(items)))
+        self.dispose_children(parent)
+        parent.leo_ap = parent_ap
+        parent.set_collapsed(not parent_ap['expanded'])
+        if items:
+            self.populated_items_dict[key] = True
+        else:
+            del self.populated_items_dict[key]
+        for item in items:
+            self.create_item_with_parent(item, parent)
+        self.select_ap(selected_ap)
+    #@+node:ekr.20261019060012.22: *6* tree.dispose_children
+    def dispose_children(self, tree_item):
+        '''Dispose the tree items for all descendants of tree_item.'''
+        for child in tree_item.leo_children:
+            self.dispose_children(child)
+            key = self.ap_to_key(child.leo_ap)
+            del self.tree_items_dict[key]
+            del self.populated_items_dict[key]
+            child.dispose()
+        tree_item.leo_children = []
     #@+node:ekr.20181124194248.1: *6* tree.create_item_with_parent
     def create_item_with_parent(self, item, parent):
         '''Create a tree item for item and all its visible children.'''
@@ -37,6 +37,11 @@ Settings
     port to use (1 3 0 ~= L E O)
 ``@bool http_allow_remote_exec = False``
     must be changed to True for remote code execution
+``@bool http_use_asyncio = True``
+    True: use the asyncio-based server.
+    False: use the older asyncore-based server.
+``@int http_max_clients = 16``
+    The maximum number of requests the asyncio-based server handles at once.
 ``@string rst_http_attributename = 'rst_http_attribute'``
     link to obsolete rst3 plugin
 ``@data user_bookmark_stylesheet``
@@ -71,6 +76,10 @@ Start clicking :-)
 You can use the browser's refresh button to update the top-level view in the
 browser after you have opened or closed files.
 
+**Note**: The asyncio-based server serves many browser tabs and scripts at
+once. It remembers the pages it has sent until their outlines change, so
+refreshing the page of an unchanged outline is fast.
+
 **Note**: IP address 127.0.0.1 is accessible by all users logged into your
 local machine. That means while Leo and mod_http is running anyone logged into
 your machine will be able to browse all your leo outlines and add bookmarks.
@@ -217,7 +226,9 @@ which node is selected.
     # parse_qs
 import leo.core.leoGlobals as g
 import asynchat
+import asyncio
 import asyncore
+import collections
 import json
 import http.server
 SimpleHTTPRequestHandler = http.server.SimpleHTTPRequestHandler
@@ -227,10 +238,13 @@ BytesIO = io.BytesIO
 # import urllib
 import urllib.parse as urlparse
 import os
+import queue
 import select
 import shutil
 import socket
+import threading
 import time
+import unittest
 from xml.sax.saxutils import quoteattr
 #@-<< imports >>
 #@+<< data >>
@@ -251,13 +265,21 @@ def init():
         getGlobalConfiguration()
         if config.http_active:
             try:
-                Server(config.http_ip, config.http_port, RequestHandler)
+                if config.http_use_asyncio:
+                    config.server = AsyncServer(
+                        config.http_ip, config.http_port, config.http_max_clients)
+                    config.server.start()
+                else:
+                    Server(config.http_ip, config.http_port, RequestHandler)
             except socket.error as e:
                 g.es("mod_http server initialization failed (%s:%s): %s" % (
                     config.http_ip, config.http_port, e))
                 return False
-            asyncore.read = a_read
-            g.registerHandler("idle", plugin_wrapper)
+            if config.http_use_asyncio:
+                g.registerHandler("end1", onEnd)
+            else:
+                asyncore.read = a_read
+                g.registerHandler("idle", plugin_wrapper)
             g.es("http serving enabled at %s:%s" % (
                 config.http_ip, config.http_port), color="purple")
     g.plugin_signon(__name__)
@@ -285,6 +307,19 @@ def getGlobalConfiguration():
     new_rst2_http_attributename = g.app.config.getString("rst2-http-attributename")
     if new_rst2_http_attributename:
         config.rst2_http_attributename = new_rst2_http_attributename
+    # asyncio.
+    newuseasyncio = g.app.config.getBool("http-use-asyncio")
+    if newuseasyncio is not None:
+        config.http_use_asyncio = newuseasyncio
+    newmaxclients = g.app.config.getInt("http-max-clients")
+    if newmaxclients:
+        config.http_max_clients = newmaxclients
+#@+node:ekr.20261019001512.26: *3* onEnd
+def onEnd(tag, keywords):
+    '''Stop the AsyncServer.'''
+    if config.server:
+        config.server.stop()
+        config.server = None
 #@+node:EKR.20040517080250.45: *3* plugin_wrapper
 def plugin_wrapper(tag, keywords):
     if g.app.killed:
@@ -344,10 +379,13 @@ def getData(setting):
 class config:
     enabled = None # True when security check re http-allow-remote-exec passes.
     http_active = False
+    http_max_clients = 16
     http_timeout = 0
     http_ip = '127.0.0.1'
     http_port = 8130
+    http_use_asyncio = True
     rst2_http_attributename = 'rst_http_attribute'
+    server = None # The AsyncServer, if any.
 #@+node:EKR.20040517080250.4: ** class delayedSocketStream
 class delayedSocketStream(asyncore.dispatcher_with_send):
     #@+others
@@ -472,18 +510,27 @@ class leo_interface:
     #@+node:ekr.20161001114512.1: *4* write_leo_tree & helpers
     def write_leo_tree(self, f, window, root):
         '''Wriite the entire html file to f.'''
+        for s in self.leo_tree_chunks(window, root):
+            f.write(s)
+    #@+node:ekr.20261019001512.2: *5* leo_tree_chunks
+    def leo_tree_chunks(self, window, root):
+        '''Yield the entire html file in small pieces.'''
         root = root.copy()
+        f = StringIO()
         self.write_head(f, root.h, window)
-        f.write('<body>')
-        f.write('<div class="container">')
-        f.write('<div class="outlinepane">')
-        f.write('<h1>%s</h1>' % window.shortFileName())
+        yield f.getvalue()
+        yield '<body>'
+        yield '<div class="container">'
+        yield '<div class="outlinepane">'
+        yield '<h1>%s</h1>' % window.shortFileName()
         for sib in root.self_and_siblings():
-            self.write_node_and_subtree(f, sib)
-        f.write('</div>')
-        f.write('</div>')
+            yield from self.node_and_subtree_chunks(sib)
+        yield '</div>'
+        yield '</div>'
+        f = StringIO()
         self.write_body_pane(f, root)
-        f.write('</body></html>')
+        yield f.getvalue()
+        yield '</body></html>'
     #@+node:ekr.20161001124752.1: *5* write_body_pane
     def write_body_pane(self, f, p):
 
@@ -517,21 +564,34 @@ class leo_interface:
     #@+node:ekr.20161001122919.1: *5* write_node_and_subtree
     def write_node_and_subtree(self, f, p):
 
+        for s in self.node_and_subtree_chunks(p):
+            f.write(s)
+    #@+node:ekr.20261019001512.1: *5* node_and_subtree_chunks
+    def node_and_subtree_chunks(self, p):
+        '''Yield the html for p and its subtree, one node at a time.'''
         # This organization, with <headline> elements in <node> elements,
         # allows proper highlighting of nodes.
-        f.write('<div class="node" id=n:%s>' % (
-            quoteattr(p.gnx),
-        ))
-        f.write('<div class="headline" id=h:%s expand="%s" icon="%02d" b=%s>%s</div>' % (
-            quoteattr(p.gnx),
-            '+' if p.hasChildren() else '-',
-            p.computeIcon(),
-            quoteattr(p.b),
-            escape(p.h),
-        ))
-        for child in p.children():
-            self.write_node_and_subtree(f, child)
-        f.write('</div>')
+        level0, n = p.level(), 0
+            # n is the number of open <node> elements.
+        for p in p.self_and_subtree():
+            level = p.level() - level0
+            while n > level:
+                yield '</div>'
+                n -= 1
+            n += 1
+            yield '%s%s' % (
+                '<div class="node" id=n:%s>' % (
+                    quoteattr(p.gnx),
+                ),
+                '<div class="headline" id=h:%s expand="%s" icon="%02d" b=%s>%s</div>' % (
+                    quoteattr(p.gnx),
+                    '+' if p.hasChildren() else '-',
+                    p.computeIcon(),
+                    quoteattr(p.b),
+                    escape(p.h),
+                ),
+            )
+        yield '</div>' * n
     #@+node:EKR.20040517080250.27: *4* write_leo_windowlist
     def write_leo_windowlist(self):
         f = StringIO()
@@ -1181,6 +1241,552 @@ class Server(asyncore.dispatcher):
         # on the incoming connexion
         self.handler(conn, addr, self)
     #@-others
+#@+node:ekr.20261019001512.3: ** class AsyncRequestHandler
+class AsyncRequestHandler(leo_interface):
+    """
+    Compute the response to one request received by the AsyncServer.
+
+    All methods run in Leo's main thread.
+    """
+    #@+others
+    #@+node:ekr.20261019001512.4: *3* __init__
+    def __init__(self, server, request):
+        self.server = server
+        self.command = request.command
+        self.headers = request.headers
+        self.path = request.path
+        self.leo_actions = LeoActions(self)
+        self.response_headers = []
+        self.status = 200
+        self.message = None
+    #@+node:ekr.20261019001512.5: *3* send_error & friends
+    # These methods replace the methods of BaseHTTPRequestHandler used by leo_interface.
+
+    def end_headers(self):
+        pass
+
+    def send_error(self, code, message=None):
+        self.status = code
+        self.message = message
+
+    def send_header(self, keyword, value):
+        self.response_headers.append((keyword, value))
+
+    def send_response(self, code, message=None):
+        self.status = code
+    #@+node:ekr.20261019001512.6: *3* get_response
+    def get_response(self):
+        """Return a g.Bunch describing the response."""
+        path = self.split_leo_path(self.path)
+        if path != '/' and path[0] != '_' and path != ['favicon.ico']:
+            return self.get_page_response(path)
+        f = self.send_head()
+        if f is None:
+            if self.status == 200:
+                self.status, self.message = 404, "Not found"
+            return self.response(self.status, [], self.message or '')
+        return self.response(200, self.response_headers, f.getvalue())
+    #@+node:ekr.20261019001512.7: *3* get_page_response
+    def get_page_response(self, path):
+        """
+        Return the response for the page showing an outline.
+
+        Use the cached page if the outline has not changed since it was
+        rendered. Otherwise, return a response that renders the page in
+        chunks.
+        """
+        window, root = self.find_window_and_root(path)
+        if window is None:
+            return self.response(404, [], "File not found")
+        if root is None:
+            return self.response(404, [], "No root node")
+        version = self.server.page_version(window)
+        etag = '"%016x"' % (version & 0xffffffffffffffff)
+        headers = [
+            ('Content-Type', 'text/html; charset=%s' % browser_encoding),
+            ('ETag', etag),
+            ('Cache-Control', 'no-cache'),
+                # Browsers must revalidate the page with If-None-Match.
+        ]
+        etags = [z.strip() for z in self.headers.get('if-none-match', '').split(',')]
+        if etag in etags or '*' in etags:
+            return self.response(304, headers, '')
+        key = (window.c, root.gnx)
+        body = self.server.cache.get(key, version)
+        if body is not None:
+            return self.response(200, headers, body)
+        if self.command == 'HEAD':
+            return self.response(200, headers, '')
+        response = self.response(200, headers, None)
+        response.chunks = self.leo_tree_chunks(window, root)
+        response.key, response.parts, response.version = key, [], version
+        response.window = window
+        return response
+    #@+node:ekr.20261019001512.9: *3* response
+    def response(self, status, headers, body):
+        """Return a g.Bunch describing a response."""
+        if isinstance(body, str):
+            body = g.toEncodedString(body, encoding=browser_encoding)
+        return g.Bunch(status=status, headers=headers, body=body, chunks=None)
+    #@-others
+#@+node:ekr.20261019001512.10: ** class AsyncServer
+class AsyncServer:
+    """
+    An http server based on asyncio.
+
+    The asyncio event loop runs in a separate thread. It handles all
+    sockets, keep-alive connections and up to max_clients concurrent
+    requests. Leo's data may be accessed only in Leo's main thread, so the
+    server queues all work involving Leo. An IdleTime handler does that
+    work by calling server.process_requests.
+
+    The server caches the pages showing outlines until the outline
+    changes, and supports the ETag and If-None-Match headers. The server
+    sends pages that are not in the cache in chunks, rendering each chunk
+    for at most time_slice seconds.
+    """
+    idle_time_delay = 10
+        # Milliseconds.
+    keep_alive_timeout = 15.0
+        # Seconds.
+    max_request_size = 65536
+        # Bytes.
+    time_slice = 0.02
+        # Seconds.
+    #@+others
+    #@+node:ekr.20261019001512.11: *3* __init__
+    def __init__(self, ip, port, max_clients=16):
+        self.cache = PageCache()
+        self.ip = ip
+        self.loop = None
+            # The asyncio event loop, created in the server's thread.
+        self.max_clients = max_clients
+        self.port = port
+            # The actual port, set when the server starts.
+        self.requests = queue.Queue()
+            # Callables to be called in Leo's main thread.
+        self.semaphore = None
+        self.server = None
+        self.thread = None
+        self.timer = None
+        self.writers = set()
+            # The StreamWriters of all open connections.
+    #@+node:ekr.20261019001512.12: *3* Leo's thread
+    #@+node:ekr.20261019001512.13: *4* process_requests
+    def process_requests(self, timer=None):
+        """
+        Do the work that the server has queued for Leo's main thread.
+
+        This is the server's IdleTime handler.
+        """
+        t1 = time.perf_counter() + 0.1
+        while time.perf_counter() < t1:
+            try:
+                callback = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            callback()
+    #@+node:ekr.20261019001512.8: *4* page_version
+    def page_version(self, window):
+        """
+        Return a hash of everything shown in the page for the window.
+
+        Python caches the hashes of strings, so this is much faster than
+        rendering the page.
+        """
+        c = window.c
+        data = [
+            window.shortFileName(),
+            getData('http_stylesheet'),
+            getData('user_http_stylesheet'),
+            getData('http_script'),
+        ]
+        # Visit nodes as leo_tree_chunks does.
+        stack = [(v, 0) for v in reversed(c.hiddenRootNode.children)]
+        while stack:
+            v, level = stack.pop()
+            data.append((v.gnx, level, v._headString, v._bodyString, v.computeIcon(), bool(v.children)))
+            stack.extend((z, level + 1) for z in reversed(v.children))
+        return hash(tuple(data))
+    #@+node:ekr.20261019001512.14: *4* render_chunk
+    def render_chunk(self, response):
+        """
+        Return the next chunk of a page as bytes, or None if the page is complete.
+
+        Cache the complete page if the outline has not changed.
+        """
+        if response.chunks is None:
+            return None
+        parts, t1 = [], time.perf_counter() + self.time_slice
+        for s in response.chunks:
+            parts.append(s)
+            if time.perf_counter() > t1:
+                break
+        else:
+            response.chunks = None
+        chunk = g.toEncodedString(''.join(parts), encoding=browser_encoding)
+        response.parts.append(chunk)
+        if response.chunks is None:
+            if self.page_version(response.window) == response.version:
+                self.cache.put(response.key, response.version, b''.join(response.parts))
+            response.parts = []
+        return chunk or None
+    #@+node:ekr.20261019001512.15: *4* start & stop
+    def start(self):
+        """
+        Start the server's thread and IdleTime handler.
+        Raise OSError if the server can not be started.
+        """
+        started, errors = threading.Event(), []
+
+        def run():
+            loop = self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self.semaphore = asyncio.Semaphore(self.max_clients)
+            try:
+                self.server = loop.run_until_complete(asyncio.start_server(
+                    self.handle_client, self.ip, self.port, limit=self.max_request_size))
+                self.port = self.server.sockets[0].getsockname()[1]
+            except Exception as e:
+                errors.append(e)
+                loop.close()
+                return
+            finally:
+                started.set()
+            try:
+                loop.run_forever()
+            finally:
+                loop.close()
+
+        self.thread = threading.Thread(target=run, name='mod_http', daemon=True)
+        self.thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+        self.timer = g.IdleTime(self.process_requests, delay=self.idle_time_delay, tag='mod_http')
+        if self.timer:
+            self.timer.start()
+
+    def stop(self):
+        """Close all connections and stop the server's thread."""
+        if self.timer:
+            self.timer.stop()
+            self.timer = None
+        if self.thread and self.thread.is_alive():
+            asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop)
+            self.thread.join(timeout=5.0)
+        self.thread = None
+    #@+node:ekr.20261019001512.16: *3* The server's thread
+    #@+node:ekr.20261019001512.17: *4* call_in_leo
+    async def call_in_leo(self, func, *args):
+        """Call func(*args) in Leo's main thread and return its result."""
+        loop = self.loop
+        future = loop.create_future()
+
+        def set_result(result, exception):
+            if not future.done():
+                if exception:
+                    future.set_exception(exception)
+                else:
+                    future.set_result(result)
+
+        def callback():
+            result, exception = None, None
+            try:
+                result = func(*args)
+            except Exception as e:
+                exception = e
+            try:
+                loop.call_soon_threadsafe(set_result, result, exception)
+            except RuntimeError:
+                pass  # The loop is closed.
+
+        self.requests.put(callback)
+        return await future
+    #@+node:ekr.20261019001512.18: *4* handle_client
+    async def handle_client(self, reader, writer):
+        """Handle all requests on a (keep-alive) connection."""
+        self.writers.add(writer)
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    head = await asyncio.wait_for(
+                        reader.readuntil(b'\r\n\r\n'), self.keep_alive_timeout)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                    break
+                request = self.parse_request(head)
+                if not request:
+                    await self.write_response(writer, 'HTTP/1.0', g.Bunch(
+                        status=400, headers=[], body=b'Bad request', chunks=None), False)
+                    break
+                # Discard the request's body. Only GET and HEAD are supported.
+                n = int(request.headers.get('content-length', '0') or '0')
+                if n > 0:
+                    await reader.readexactly(min(n, self.max_request_size))
+                async with self.semaphore:
+                    keep_alive = await self.respond(request, writer)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        except Exception:
+            import traceback
+            traceback.print_exc()
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+    #@+node:ekr.20261019001512.19: *4* parse_request
+    def parse_request(self, head):
+        """Return a g.Bunch describing the request line and headers, or None."""
+        lines = head.decode('latin-1').split('\r\n')
+        aList = lines[0].split()
+        if len(aList) != 3 or not aList[2].startswith('HTTP/'):
+            return None
+        command, path, version = aList
+        headers = {}
+        for line in lines[1:]:
+            key, sep, value = line.partition(':')
+            if sep:
+                headers[key.strip().lower()] = value.strip()
+        return g.Bunch(command=command, headers=headers, path=path, version=version)
+    #@+node:ekr.20261019001512.20: *4* respond
+    async def respond(self, request, writer):
+        """Respond to one request. Return True if the connection should be kept alive."""
+        connection = request.headers.get('connection', '').lower()
+        if request.version == 'HTTP/1.0':
+            keep_alive = connection == 'keep-alive'
+        else:
+            keep_alive = connection != 'close'
+        if request.command not in ('GET', 'HEAD'):
+            response = g.Bunch(status=501, headers=[], chunks=None,
+                body=b'Unsupported method (%s)' % g.toEncodedString(request.command))
+        else:
+            try:
+                response = await self.call_in_leo(
+                    lambda: AsyncRequestHandler(self, request).get_response())
+            except Exception:
+                import traceback
+                traceback.print_exc()
+                response = g.Bunch(status=500, headers=[], body=b'Server error', chunks=None)
+        if request.command == 'HEAD' or response.chunks is None:
+            return await self.write_response(writer, request.version, response, keep_alive)
+        # Stream the page in chunks.
+        chunked = request.version != 'HTTP/1.0'
+        if chunked:
+            response.headers.append(('Transfer-Encoding', 'chunked'))
+        else:
+            keep_alive = False
+                # The end of the data is the end of the connection.
+        await self.write_response(writer, request.version, response, keep_alive)
+        while True:
+            try:
+                chunk = await self.call_in_leo(self.render_chunk, response)
+            except Exception:
+                # Changing the outline between chunks may break rendering.
+                # Drop the connection so the client can't mistake
+                # the incomplete page for a complete one.
+                import traceback
+                traceback.print_exc()
+                writer.transport.abort()
+                return False
+            if not chunk:
+                break
+            if chunked:
+                chunk = b'%x\r\n%s\r\n' % (len(chunk), chunk)
+            writer.write(chunk)
+            await writer.drain()
+        if chunked:
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+        return keep_alive
+    #@+node:ekr.20261019001512.21: *4* shutdown
+    async def shutdown(self):
+        """Close the server and all connections, then stop the loop."""
+        self.server.close()
+        for writer in list(self.writers):
+            writer.close()
+        # Let the handlers see the closed connections.
+        await asyncio.sleep(0.05)
+        self.loop.stop()
+    #@+node:ekr.20261019001512.22: *4* write_response
+    async def write_response(self, writer, version, response, keep_alive):
+        """
+        Write the status line and headers of the response, and the body, if any.
+        Return keep_alive.
+        """
+        try:
+            reason = http.HTTPStatus(response.status).phrase
+        except ValueError:
+            reason = ''
+        headers = list(response.headers)
+        if response.chunks is None:
+            headers.append(('Content-Length', str(len(response.body or b''))))
+        headers.append(('Connection', 'keep-alive' if keep_alive else 'close'))
+        lines = ['%s %s %s' % ('HTTP/1.1', response.status, reason)]
+        lines.extend('%s: %s' % z for z in headers)
+        writer.write(g.toEncodedString('\r\n'.join(lines) + '\r\n\r\n', encoding='latin-1'))
+        if response.body and response.status != 304:
+            writer.write(response.body)
+        await writer.drain()
+        return keep_alive
+    #@-others
+#@+node:ekr.20261019001512.23: ** class PageCache
+class PageCache:
+    """
+    A cache of rendered pages, used by the AsyncServer.
+
+    Keys are tuples (c, gnx). Values are tuples (version, body).
+    The cache discards the least recently used pages when the total size
+    of all pages exceeds max_size.
+    """
+    #@+others
+    #@+node:ekr.20261019001512.24: *3* __init__
+    def __init__(self, max_size=64 * 1024 * 1024):
+        self.d = collections.OrderedDict()
+        self.max_size = max_size
+        self.size = 0
+    #@+node:ekr.20261019001512.25: *3* get & put
+    def get(self, key, version):
+        """Return the body of the cached page, or None."""
+        entry = self.d.get(key)
+        if entry and entry[0] == version:
+            self.d.move_to_end(key)
+            return entry[1]
+        return None
+
+    def put(self, key, version, body):
+        """Cache the body of a page."""
+        # Forget pages of closed outlines.
+        commanders = g.app.commanders()
+        for key2 in [z for z in self.d if z[0] not in commanders or z == key]:
+            self.size -= len(self.d.pop(key2)[1])
+        if len(body) > self.max_size:
+            return
+        self.d[key] = (version, body)
+        self.size += len(body)
+        while self.size > self.max_size:
+            key2, entry = self.d.popitem(last=False)
+            self.size -= len(entry[1])
+    #@-others
+#@+node:ekr.20261018233012.1: ** class TestAsyncServer
+class TestAsyncServer(unittest.TestCase):
+    """Test cases for the AsyncServer class."""
+    #@+others
+    #@+node:ekr.20261018233012.2: *3* TestAsyncServer.request
+    def request(self, server, path, headers=None, version='HTTP/1.1'):
+        """
+        Send one request to the server from another thread, calling
+        server.process_requests in this thread until the response arrives.
+
+        Return (status, headers, body). The body is dechunked.
+        The body is None if the server dropped the connection
+        before sending the last chunk.
+        """
+        lines = [f"GET {path} {version}", 'Host: localhost', 'Connection: close']
+        lines.extend(f"{key}: {value}" for key, value in (headers or {}).items())
+        data = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        result = []
+
+        def run():
+            with socket.create_connection(('127.0.0.1', server.port), timeout=10) as sock:
+                sock.sendall(data)
+                while True:
+                    try:
+                        s = sock.recv(65536)
+                    except ConnectionError:
+                        break
+                    if not s:
+                        break
+                    result.append(s)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        t1 = time.perf_counter() + 10
+        while thread.is_alive() and time.perf_counter() < t1:
+            server.process_requests()
+            time.sleep(0.002)
+        thread.join(timeout=1)
+        assert not thread.is_alive(), 'no response'
+        head, sep, body = b''.join(result).partition(b'\r\n\r\n')
+        assert sep, head
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        response_headers = {}
+        for line in lines[1:]:
+            key, sep, value = line.partition(':')
+            response_headers[key.strip().lower()] = value.strip()
+        if response_headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while True:
+                n, sep, body = body.partition(b'\r\n')
+                if not sep:
+                    return status, response_headers, None
+                n = int(n, 16)
+                if n == 0:
+                    assert body == b'\r\n', body
+                    break
+                if len(body) < n + 2:
+                    return status, response_headers, None
+                chunks.append(body[:n])
+                assert body[n : n + 2] == b'\r\n'
+                body = body[n + 2 :]
+            body = b''.join(chunks)
+        return status, response_headers, body
+    #@+node:ekr.20261018233012.3: *3* TestAsyncServer.test_async_server
+    def test_async_server(self):
+        """Test the AsyncServer against a null-gui commander."""
+        import tempfile
+        import leo.core.leoBridge as leoBridge
+        bridge = leoBridge.headless_controller()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        # The server finds outlines by their base names,
+        # so other open commanders must not use the same name.
+        name = os.path.basename(temp_dir.name) + '.leo'
+        path = '/' + name
+        c = bridge.openLeoFile(os.path.join(temp_dir.name, name))
+        self.addCleanup(c.close)
+        c.rootPosition().h = 'first headline'
+        server = AsyncServer('127.0.0.1', 0)
+        server.start()
+        self.addCleanup(server.stop)
+        # A new page.
+        status, headers, body = self.request(server, path)
+        assert status == 200, status
+        etag = headers.get('etag')
+        assert etag, headers
+        assert b'first headline' in body
+        assert body.endswith(b'</html>'), body[-20:]
+        # The same page, from the cache.
+        status, headers2, body2 = self.request(server, path)
+        assert (status, headers2.get('etag'), body2) == (200, etag, body)
+        # The browser's copy is up to date.
+        status, headers, body2 = self.request(server, path, {'If-None-Match': etag})
+        assert (status, body2) == (304, b''), status
+        # Changing the outline changes the page.
+        c.rootPosition().h = 'changed headline'
+        status, headers, body = self.request(server, path, {'If-None-Match': etag})
+        assert status == 200, status
+        assert headers.get('etag') not in (None, etag), headers
+        assert b'changed headline' in body
+        # HTTP/1.0 clients don't get chunks.
+        c.rootPosition().h = 'http 1.0 headline'
+        status, headers, body = self.request(server, path, version='HTTP/1.0')
+        assert status == 200, status
+        assert 'transfer-encoding' not in headers, headers
+        assert b'http 1.0 headline' in body and body.endswith(b'</html>')
+        # An unknown outline.
+        status, headers, body = self.request(server, '/unknown.leo')
+        assert status == 404, status
+        # Errors while rendering chunks drop the connection.
+        c.rootPosition().h = 'broken headline'
+
+        def render_chunk(response):
+            raise RuntimeError('the outline changed')
+
+        server.render_chunk = render_chunk
+        status, headers, body = self.request(server, path)
+        assert (status, body) == (200, None), (status, body)
+    #@-others
 #@+node:ekr.20140920145803.17997: ** functions
 #@+node:EKR.20040517080250.47: *3* a_read (asynchore override)
 def a_read(obj):
@@ -642,7 +642,10 @@ class DynamicWindow(QtWidgets.QMainWindow):
     #@+node:ekr.20110605121601.18164: *5* dw.createTreeWidget
     def createTreeWidget(self, parent, name):
         c = self.leo_c
-        w = LeoQTreeWidget(c, parent)
+        if c.config.getBool('qt-tree-use-model', default=False):
+            w = LeoQTreeView(c, parent)
+        else:
+            w = LeoQTreeWidget(c, parent)
         self.setSizePolicy(w)
         # 12/01/07: add new config setting.
         multiple_selection = c.config.getBool('qt-tree-multiple-selection', default=True)
@@ -2091,7 +2094,10 @@ class LeoQtFrame(leoFrame.LeoFrame):
     def createSplitterComponents(self):
 
         c = self.c
-        self.tree = qt_tree.LeoQtTree(c, self)
+        if isinstance(self.top.treeWidget, LeoQTreeView):
+            self.tree = qt_tree.LeoQtModelTree(c, self)
+        else:
+            self.tree = qt_tree.LeoQtTree(c, self)
         self.log = LeoQtLog(self, None)
         self.body = LeoQtBody(self, None)
         self.splitVerticalFlag, ratio, secondary_ratio = self.initialRatios()
@@ -4217,6 +4223,25 @@ class LeoQtSpellTab:
         top.leo_spell_btn_FindChange.setDisabled(not state)
         return state
     #@-others
+#@+node:ekr.20261019031512.22: ** class LeoQTreeView (QTreeView)
+class LeoQTreeView(QtWidgets.QTreeView):
+    """
+    The outline pane when @bool qt-tree-use-model is True.
+
+    qt_tree.LeoQtModelTree sets the view's model.
+    This class does not yet support drag and drop.
+    """
+
+    def __init__(self, c, parent):
+        super().__init__(parent)
+        self.c = c
+        self.setUniformRowHeights(True)
+            # The view need not ask for the size of each row.
+
+    def __repr__(self):
+        return f"LeoQTreeView: {id(self)}"
+
+    __str__ = __repr__
 #@+node:ekr.20110605121601.18438: ** class LeoQtTreeTab
 class LeoQtTreeTab:
     """
@@ -926,7 +926,7 @@ class QHeadlineWrapper(QLineEditWrapper):
         """Return True if the tree item exists and it's edit widget exists."""
         tree = self.c.frame.tree
         try:
-            e = tree.treeWidget.itemWidget(self.item, 0)
+            e = tree.getTreeEditorForItem(self.item)
         except RuntimeError:
             return False
         valid = tree.isValidItem(self.item)
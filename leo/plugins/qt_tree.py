@@ -11,6 +11,7 @@ import leo.core.leoNodes as leoNodes
 import leo.core.leoPlugins as leoPlugins  # Uses leoPlugins.TryNext.
 import leo.plugins.qt_text as qt_text
 from leo.core.leoQt import QtConst, QtCore, QtGui, QtWidgets
+import difflib
 import re
 import time
 assert time
@@ -206,7 +207,6 @@ class LeoQtTree(leoFrame.LeoTree):
         """
         A generator yielding positions from first_p to target_p.
         """
-        c = self.c
         p = first_p.copy()
         yield p
         while p:
@@ -219,14 +219,11 @@ class LeoQtTree(leoFrame.LeoTree):
                 # Use a quick test for non-clones:
                 len(v.parents) <= 1 and (v.statusBits & v.expandedBit) != 0
             )):
-                # p.moveToFirstChild()
-                p.stack.append((v, p._childIndex),)
-                p.v = v.children[0]
-                p._childIndex = 0
+                p.moveToFirstChild()
                 yield p
                 continue
             # if p.hasNext():
-            parent_v = p.stack[-1][0] if p.stack else c.hiddenRootNode
+            parent_v = p._parentVnode()
             if p._childIndex + 1 < len(parent_v.children):
                 # p.moveToNext()
                 p._childIndex += 1
@@ -236,11 +233,10 @@ class LeoQtTree(leoFrame.LeoTree):
             #
             # A fast version of p.moveToThreadNext().
             # We look for a parent with a following sibling.
-            while p.stack:
-                # p.moveToParent()
-                p.v, p._childIndex = p.stack.pop()
+            while p.hasParent():
+                p.moveToParent()
                 # if p.hasNext():
-                parent_v = p.stack[-1][0] if p.stack else c.hiddenRootNode
+                parent_v = p._parentVnode()
                 if p._childIndex + 1 < len(parent_v.children):
                     # p.moveToNext()
                     p._childIndex += 1
@@ -1113,9 +1109,8 @@ class LeoQtTree(leoFrame.LeoTree):
 
         def editingFinishedCallback(e=e, item=item, self=self, wrapper=wrapper):
             c = self.c
-            w = self.treeWidget
             self.onHeadChanged(p=c.p, e=e)
-            w.setCurrentItem(item)
+            self.setCurrentItemHelper(item)
 
         e.editingFinished.connect(editingFinishedCallback)
         return wrapper  # 2011/02/12
@@ -1128,12 +1123,11 @@ class LeoQtTree(leoFrame.LeoTree):
     #@+node:ekr.20110605121601.18420: *4* qtree.createTreeEditorForItem
     def createTreeEditorForItem(self, item):
 
-        w = self.treeWidget
-        w.setCurrentItem(item)  # Must do this first.
+        self.setCurrentItemHelper(item)  # Must do this first.
         if self.use_declutter:
             item.setText(0, item._real_text)
-        w.editItem(item)
-        e = w.itemWidget(item, 0)
+        self.editItemHelper(item)
+        e = self.getTreeEditorForItem(item)
         e.setObjectName('headline')
         wrapper = self.connectEditorWidget(e, item)
         self.sizeTreeEditor(self.c, e)
@@ -1157,13 +1151,12 @@ class LeoQtTree(leoFrame.LeoTree):
         Help nativeTree.editLabel do gui-specific stuff.
         """
         c, vc = self.c, self.c.vimCommands
-        w = self.treeWidget
-        w.setCurrentItem(item)
+        self.setCurrentItemHelper(item)
             # Must do this first.
             # This generates a call to onTreeSelect.
-        w.editItem(item)
+        self.editItemHelper(item)
             # Generates focus-in event that tree doesn't report.
-        e = w.itemWidget(item, 0)  # A QLineEdit.
+        e = self.getTreeEditorForItem(item)  # A QLineEdit.
         if e:
             s = e.text(); len_s = len(s)
             if s == 'newHeadline': selectAll = True
@@ -1193,6 +1186,11 @@ class LeoQtTree(leoFrame.LeoTree):
                 else:
                     g.trace('not a text widget!', wrapper)
         return e, wrapper
+    #@+node:ekr.20261019031512.1: *4* qtree.editItemHelper
+    def editItemHelper(self, item):
+        """Start editing the item's headline."""
+        w = self.treeWidget
+        w.editItem(item)
     #@+node:ekr.20110605121601.18423: *4* qtree.getCurrentItem
     def getCurrentItem(self):
         w = self.treeWidget
@@ -1416,7 +1414,7 @@ class LeoQtTree(leoFrame.LeoTree):
             return item
         try:
             self.busy = True
-            self.treeWidget.setCurrentItem(item)
+            self.setCurrentItemHelper(item)
                 # This generates gui events, so we must use a lockout.
         finally:
             self.busy = False
@@ -1428,6 +1426,685 @@ class LeoQtTree(leoFrame.LeoTree):
         if item:
             item.setSelected(False)
     #@-others
+#@+node:ekr.20261019031512.2: ** class LeoQtModelTree (LeoQtTree)
+class LeoQtModelTree(LeoQtTree):
+    """
+    A Leo Qt tree class that shows the outline in a LeoQTreeView.
+
+    A LeoTreeModel creates rows only when the view asks for them.
+    Redrawing updates the model from c.changeJournal, so the view redraws
+    only the rows that actually change.
+
+    Items are ModelNodes instead of QTreeWidgetItems.
+    """
+    #@+others
+    #@+node:ekr.20261019031512.3: *3* mtree.Birth
+    def __init__(self, c, frame):
+        """Ctor for the LeoQtModelTree class."""
+        super().__init__(c, frame)
+        w = self.treeWidget  # A LeoQTreeView.
+        self.delegate = LeoTreeDelegate(w)
+        self.model = LeoTreeModel(c, w, tree=self)
+        w.setItemDelegate(self.delegate)
+        w.setModel(self.model)
+        w.setHeaderHidden(True)
+
+    def initAfterLoad(self):
+        """Do late-state inits."""
+        # Called by Leo's core.
+        c = self.c
+        tw = self.treeWidget
+        tw.clicked.connect(self.onIndexClicked)
+        tw.doubleClicked.connect(self.onIndexDoubleClicked)
+        tw.collapsed.connect(self.onIndexCollapsed)
+        tw.expanded.connect(self.onIndexExpanded)
+        tw.selectionModel().selectionChanged.connect(self.onSelectionChanged)
+        tw.customContextMenuRequested.connect(self.onContextMenu)
+        g.app.gui.setFilter(c, tw, self, tag='tree')
+    #@+node:ekr.20261019031512.4: *3* mtree.Drawing
+    def clear(self):
+        """Clear all widgets in the tree."""
+        self.model.reset_model()
+
+    def drawTopTree(self, p):
+        """Update the model from c.changeJournal."""
+        trace = 'drawing' in g.app.debug and not g.unitTesting
+        if trace:
+            t1 = time.process_time()
+        self.model.update_model()
+        if trace:
+            t2 = time.process_time()
+            g.trace(f"{t2 - t1:5.2f} sec.", g.callers(5))
+
+    def initData(self):
+        self.editWidgetsDict = {}
+
+    def redraw_after_icons_changed(self):
+        """Recompute the icons of all rows as the view shows them."""
+        if self.busy:
+            return
+        self.redrawCount += 1  # To keep a unit test happy.
+        self.nodeIconsDict = {}
+        self.model.generation += 1
+        self.treeWidget.viewport().update()
+
+    def update_expansion(self, p):
+        """Update the model from c.changeJournal, which records p's expansion."""
+        try:
+            # The view generates events, which would trigger a full redraw.
+            self.busy = True
+            self.model.update_model()
+        finally:
+            self.busy = False
+    #@+node:ekr.20261019031512.5: *3* mtree.decorateNode
+    def decorateNode(self, item):
+        """
+        Set the text and icon of item, a ModelNode.
+        The model calls this method when the view first shows the item.
+        """
+        c = self.c
+        p = self.item2position(item)
+        v = p.v
+        item._real_text = p.h
+        try:
+            g.visit_tree_item(c, p, item)
+        except leoPlugins.TryNext:
+            pass
+        if self.use_declutter:
+            icon = self.declutter_node(c, p, item)
+            if icon:
+                item.setIcon(0, icon)
+            return
+        v.iconVal = v.computeIcon()
+        icon = self.getCompositeIconImage(p, v.iconVal)
+        if icon:
+            item.setIcon(0, icon)
+    #@+node:ekr.20261019031512.6: *3* mtree.Event handlers
+    def onIndexClicked(self, index):
+        self.onItemClicked(self.model.index2item(index), 0)
+
+    def onIndexCollapsed(self, index):
+        self.onItemCollapsed(self.model.index2item(index))
+
+    def onIndexDoubleClicked(self, index):
+        self.onItemDoubleClicked(self.model.index2item(index), 0)
+
+    def onIndexExpanded(self, index):
+        self.onItemExpanded(self.model.index2item(index))
+
+    def onSelectionChanged(self, selected, deselected):
+        self.onTreeSelect()
+    #@+node:ekr.20261019031512.7: *3* mtree.Items
+    def childIndexOfItem(self, item):
+        return item.row
+
+    def childItems(self, parent_item):
+        """
+        Return the list of child items of the parent item,
+        or the top-level items if parent_item is None.
+        """
+        return list(self.model.children(parent_item or self.model.root))
+
+    def closeEditorHelper(self, e, item):
+        """End editing of the underlying QLineEdit widget for the headline."""
+        w = self.treeWidget
+        if e:
+            w.closeEditor(e, QtWidgets.QAbstractItemDelegate.NoHint)
+            self.delegate.onCloseEditor(e)
+            if self.isValidItem(item):
+                self.setCurrentItemHelper(item)
+
+    def contractItem(self, item):
+        self.treeWidget.setExpanded(self.model.node_index(item), False)
+
+    def editItemHelper(self, item):
+        """Start editing the item's headline."""
+        self.treeWidget.edit(self.model.node_index(item))
+
+    def expandItem(self, item):
+        self.treeWidget.setExpanded(self.model.node_index(item), True)
+
+    def getCurrentItem(self):
+        return self.model.index2item(self.treeWidget.currentIndex())
+
+    def getParentItem(self, item):
+        parent = item and item.parent
+        return None if parent is self.model.root else parent
+
+    def getSelectedItems(self):
+        w = self.treeWidget
+        return [self.model.index2item(z) for z in w.selectionModel().selectedRows()]
+
+    def getTreeEditorForItem(self, item):
+        """Return the edit widget if it exists.
+        Do *not* create one if it does not exist.
+        """
+        d = self.delegate
+        return d.editor if item and d.editor_item is item else None
+
+    def scrollToItem(self, item):
+        """Scroll the tree widget so that item is visible."""
+        w = self.treeWidget
+        w.scrollTo(self.model.node_index(item), w.EnsureVisible)
+        self.setHScroll(0)
+
+    def setCurrentItemHelper(self, item):
+        self.treeWidget.setCurrentIndex(self.model.node_index(item))
+
+    def setItemIcon(self, item, icon):
+        if icon and self.isValidItem(item):
+            item.setIcon(0, icon)
+            self.model.node_changed(item)
+
+    def setItemText(self, item, s):
+        if item:
+            item.generation = -1  # Redecorate the item.
+            self.model.node_changed(item)
+
+    def unselectItem(self, p):
+        item = self.position2item(p)
+        if item:
+            self.treeWidget.selectionModel().select(
+                self.model.node_index(item), QtCore.QItemSelectionModel.Deselect)
+    #@+node:ekr.20261019031512.8: *3* mtree.item dict getters
+    def item2position(self, item):
+        return self.model.node_position(item) if self.isValidItem(item) else None
+
+    def item2vnode(self, item):
+        return item.v if self.isValidItem(item) else None
+
+    def position2item(self, p):
+        return self.model.position_node(p)
+
+    def vnode2items(self, v):
+        return self.model.nodes.get(v, [])
+
+    def isValidItem(self, item):
+        return bool(item and item.valid and item.parent)
+    #@-others
+#@+node:ekr.20261019031512.9: ** class LeoTreeDelegate (QStyledItemDelegate)
+class LeoTreeDelegate(QtWidgets.QStyledItemDelegate):
+    """
+    Create the QLineEdit headline editors for a LeoQtModelTree.
+
+    LeoQtTree.onHeadChanged changes headlines, so the delegate never changes
+    the model.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.editor = None  # The open headline editor.
+        self.editor_item = None  # The ModelNode being edited.
+        self.closeEditor.connect(self.onCloseEditor)
+
+    def createEditor(self, parent, option, index):
+        e = QtWidgets.QLineEdit(parent)
+        e.setText(index.data(QtConst.EditRole))
+        self.editor = e
+        self.editor_item = index.internalPointer()
+        return e
+
+    def onCloseEditor(self, e, hint=None):
+        if e is self.editor:
+            self.editor = self.editor_item = None
+
+    def setEditorData(self, e, index):
+        # createEditor sets the text. Don't change it while the user types.
+        pass
+
+    def setModelData(self, e, model, index):
+        pass
+#@+node:ekr.20261019031512.10: ** class LeoTreeModel (QAbstractItemModel)
+class LeoTreeModel(QtCore.QAbstractItemModel):
+    """
+    A lazy Qt item model of c's outline.
+
+    Each row is a ModelNode, representing one position. index and rowCount
+    create the ModelNodes for a node's children only when a view asks for
+    them. update_model applies the changes in c.changeJournal, notifying
+    views with beginInsertRows, beginRemoveRows and dataChanged.
+
+    view is the QTreeView that shows the model: the model keeps the view's
+    expansion state in sync with Leo's.
+
+    tree is a LeoQtModelTree or None. tree.decorateNode sets the text and
+    icon of each row. Otherwise rows show only headlines.
+    """
+    #@+others
+    #@+node:ekr.20261019031512.11: *3* model.Birth
+    def __init__(self, c, view, tree=None):
+        super().__init__()
+        self.c = c
+        self.view = view
+        self.tree = tree
+        self.generation = 0
+            # Rows whose generation differs are redecorated when shown.
+        self.hoist_key = None
+        self.nodes = {}
+            # Keys are vnodes, values are lists of valid ModelNodes.
+        self.removed = []
+            # Removed ModelNodes, kept alive until the next update.
+        self.root = None
+            # The invisible root ModelNode.
+        self.root_p = None
+            # The position whose children are the top-level rows, or None.
+        self.top_p = None
+            # The hoisted position, the only top-level row, or None.
+        self.init_root()
+
+    def init_root(self):
+        """Create the root ModelNode, following c.hoistStack like LeoQtTree.drawTopTree."""
+        c = self.c
+        self.root_p = self.top_p = None
+        root_v = c.hiddenRootNode
+        if c.hoistStack:
+            p = c.hoistStack[-1].p
+            if len(c.hoistStack) == 1 and p.h.startswith('@chapter') and p.hasChildren():
+                self.root_p = p.copy()
+                root_v = p.v
+            else:
+                self.top_p = p.copy()
+        self.root = ModelNode(root_v, None, 0)
+        self.hoist_key = self.get_hoist_key()
+
+    def get_hoist_key(self):
+        return tuple(bunch.p.key() for bunch in self.c.hoistStack)
+    #@+node:ekr.20261019031512.12: *3* model.Qt overrides
+    def columnCount(self, parent=None):
+        return 1
+
+    def data(self, index, role=QtConst.DisplayRole):
+        node = self.index2item(index)
+        if not node:
+            return None
+        if role in (QtConst.EditRole, QtConst.ToolTipRole):
+            return node.v.h
+        if node.generation != self.generation:
+            self.decorate(node)
+        if role == QtConst.DisplayRole:
+            return node.text(0)
+        if role == QtConst.DecorationRole:
+            return node._icon
+        if role == QtConst.BackgroundRole:
+            return node._background
+        if role == QtConst.ForegroundRole:
+            return node._foreground
+        if role == QtConst.FontRole:
+            return node._font
+        return None
+
+    def flags(self, index):
+        if not self.index2item(index):
+            return QtConst.NoItemFlags
+        return QtConst.ItemIsEnabled | QtConst.ItemIsSelectable | QtConst.ItemIsEditable
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        node = self.index2node(parent)
+        return bool(node and self.child_vnodes(node))
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        node = self.index2node(parent)
+        if node and column == 0:
+            children = self.children(node)
+            if 0 <= row < len(children):
+                return self.createIndex(row, 0, children[row])
+        return QtCore.QModelIndex()
+
+    def parent(self, index=None):
+        if index is None:
+            return super().parent()  # QObject.parent.
+        node = self.index2item(index)
+        if not node or node.parent is self.root:
+            return QtCore.QModelIndex()
+        return self.node_index(node.parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        node = self.index2node(parent)
+        if not node or parent.column() > 0:
+            return 0
+        return len(self.children(node))
+    #@+node:ekr.20261019031512.13: *3* model.Nodes & positions
+    def child_vnodes(self, node):
+        """Return the list of vnodes for the child rows of node."""
+        if node is self.root and self.top_p:
+            return [self.top_p.v]
+        return node.v.children
+
+    def children(self, node):
+        """Return node's child ModelNodes, creating them if necessary."""
+        if node.children is None:
+            node.children = [
+                self.new_node(v, node, i) for i, v in enumerate(self.child_vnodes(node))]
+        return node.children
+
+    def decorate(self, node):
+        """Compute the text, icon and colors of node."""
+        node.generation = self.generation
+        node._text = node._icon = node._background = node._foreground = node._font = None
+        if self.tree:
+            self.tree.decorateNode(node)
+
+    def index2item(self, index):
+        """Return the valid ModelNode for index, or None."""
+        node = index.internalPointer() if index.isValid() else None
+        return node if node and node.valid else None
+
+    def index2node(self, index):
+        """Like index2item, but return the root for an invalid index."""
+        return self.index2item(index) if index.isValid() else self.root
+
+    def new_node(self, v, parent, row):
+        node = ModelNode(v, parent, row)
+        aList = self.nodes.get(v)
+        if aList:
+            aList.append(node)
+        else:
+            self.nodes[v] = [node]
+        return node
+
+    def node_index(self, node):
+        """Return the QModelIndex for node."""
+        if not node or node is self.root:
+            return QtCore.QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def node_position(self, node):
+        """Return the position of node."""
+        pairs = []
+        while node is not self.root:
+            pairs.append((node.v, node.row))
+            node = node.parent
+        pairs.reverse()
+        if self.top_p:
+            p = self.top_p
+            pairs = pairs[1:]  # pairs[0] is (p.v, 0).
+            if not pairs:
+                return p.copy()
+        else:
+            p = self.root_p
+        stack = p._getStack() + [(p.v, p._childIndex)] if p else []
+        stack.extend(pairs[:-1])
+        v, childIndex = pairs[-1]
+        return leoNodes.Position(v, childIndex, stack)
+
+    def position_node(self, p):
+        """Return the ModelNode for position p, or None."""
+        if not p:
+            return None
+        stack = p._getStack() + [(p.v, p._childIndex)]
+        if self.top_p or self.root_p:
+            p2 = self.top_p or self.root_p
+            n = len(p2._getStack()) + 1
+            if [v for v, i in stack[:n]] != [v for v, i in p2._getStack()] + [p2.v]:
+                return None  # p is not in the hoisted tree.
+            if [i for v, i in stack[:n]] != [i for v, i in p2._getStack()] + [p2._childIndex]:
+                return None
+            rows = [i for v, i in stack[n:]]
+            if self.top_p:
+                rows.insert(0, 0)
+            elif not rows:
+                return None  # p is the @chapter node.
+        else:
+            rows = [i for v, i in stack]
+        node = self.root
+        for row in rows:
+            children = self.children(node)
+            if row >= len(children):
+                return None
+            node = children[row]
+        return node
+    #@+node:ekr.20261019031512.14: *3* model.Updating
+    #@+node:ekr.20261019031512.15: *4* model.node_changed
+    def node_changed(self, node):
+        """Tell views that node's row has changed."""
+        if node and node is not self.root:
+            index = self.node_index(node)
+            self.dataChanged.emit(index, index)
+    #@+node:ekr.20261019031512.16: *4* model.reset_model
+    def reset_model(self):
+        """Recreate the model and start recording changes in c.changeJournal."""
+        c = self.c
+        if c.changeJournal is None:
+            c.changeJournal = []
+        else:
+            c.changeJournal.clear()
+        self.beginResetModel()
+        for aList in self.nodes.values():
+            for node in aList:
+                node.valid = False
+        self.nodes = {}
+        self.removed = []
+        self.init_root()
+        self.endResetModel()
+        self.sync_expansion(self.root)
+    #@+node:ekr.20261019031512.17: *4* model.sync_children & helpers
+    def sync_children(self, node):
+        """
+        Make node.children match the outline, notifying views of all
+        removed and inserted rows. Return the list of vnodes whose rows
+        were inserted or removed.
+        """
+        if node.children is None:
+            # No view has seen the children. Just update the expansion box.
+            self.node_changed(node)
+            return []
+        old = [z.v for z in node.children]
+        new = self.child_vnodes(node)
+        if old == new:
+            return []
+        parent_index = self.node_index(node)
+        if self.move_child(node, parent_index, old, new):
+            return []
+        relinked = []
+        matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+        # Work backwards, so the indices of earlier rows remain valid.
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag in ('delete', 'replace'):
+                self.beginRemoveRows(parent_index, i1, i2 - 1)
+                for child in node.children[i1:i2]:
+                    self.invalidate(child)
+                relinked.extend(old[i1:i2])
+                del node.children[i1:i2]
+                self.renumber(node, i1)
+                self.endRemoveRows()
+            if tag in ('insert', 'replace'):
+                self.beginInsertRows(parent_index, i1, i1 + j2 - j1 - 1)
+                nodes = [self.new_node(v, node, i1) for v in new[j1:j2]]
+                node.children[i1:i1] = nodes
+                self.renumber(node, i1)
+                self.endInsertRows()
+                relinked.extend(new[j1:j2])
+        return relinked
+
+    def invalidate(self, node):
+        """Invalidate node and all its descendant ModelNodes."""
+        todo = [node]
+        while todo:
+            node = todo.pop()
+            node.valid = False
+            aList = self.nodes.get(node.v)
+            if aList:
+                aList.remove(node)
+                if not aList:
+                    del self.nodes[node.v]
+            if node.children:
+                todo.extend(node.children)
+            self.removed.append(node)
+
+    def move_child(self, node, parent_index, old, new):
+        """
+        If new is old with one vnode moved, move the row and return True.
+        Moving a row preserves its descendant rows and their expansion state.
+        """
+        if len(old) != len(new):
+            return False
+        i, j = 0, len(old) - 1
+        while old[i] is new[i]:
+            i += 1
+        while old[j] is new[j]:
+            j -= 1
+        children = node.children
+        if old[i + 1 : j + 1] == new[i:j] and old[i] is new[j]:
+            # Move row i down to row j.
+            self.beginMoveRows(parent_index, i, i, parent_index, j + 1)
+            children.insert(j, children.pop(i))
+        elif old[i:j] == new[i + 1 : j + 1] and old[j] is new[i]:
+            # Move row j up to row i.
+            self.beginMoveRows(parent_index, j, j, parent_index, i)
+            children.insert(i, children.pop(j))
+        else:
+            return False
+        self.renumber(node, i)
+        self.endMoveRows()
+        return True
+
+    def renumber(self, node, start):
+        children = node.children
+        for i in range(start, len(children)):
+            children[i].row = i
+    #@+node:ekr.20261019031512.18: *4* model.sync_expansion
+    def sync_expansion(self, node):
+        """
+        Make the view's expansion state of node match Leo's.
+        Do the same for node's children when the view expands node.
+        """
+        view = self.view
+        todo = list(self.children(node)) if node is self.root else [node]
+        while todo:
+            node = todo.pop()
+            v = node.v
+            if not v.children:
+                continue
+            if v.isCloned():
+                expanded = self.node_position(node).isExpanded()
+            else:
+                expanded = v.isExpanded()
+            index = self.node_index(node)
+            if view.isExpanded(index) != expanded:
+                view.setExpanded(index, expanded)
+                if expanded:
+                    todo.extend(self.children(node))
+    #@+node:ekr.20261019031512.19: *4* model.update_model
+    def update_model(self):
+        """
+        Update the model from the changes recorded in c.changeJournal.
+
+        Reset the model if the journal is off, the hoist changed, or the
+        outline changed in ways the journal does not record.
+        """
+        c = self.c
+        journal = c.changeJournal
+        if journal is None or self.hoist_key != self.get_hoist_key():
+            self.reset_model()
+            return
+        self.removed = []
+        # Dicts are ordered sets of vnodes.
+        links, heads, expands = {}, {}, {}
+        for kind, v in journal:
+            if kind == 'link':
+                links[v] = True
+            elif kind == 'head':
+                heads[v] = True
+            else:
+                expands[v] = True
+        journal.clear()
+        relinked = {}
+        for v in links:
+            nodes = list(self.nodes.get(v, []))
+            if v is self.root.v:
+                nodes.append(self.root)
+            for node in nodes:
+                if node.valid:
+                    for v2 in self.sync_children(node):
+                        relinked[v2] = True
+        if not self.verify():
+            self.reset_model()
+            return
+        for v in heads:
+            for node in self.nodes.get(v, []):
+                node.generation = -1
+                self.node_changed(node)
+        # A parent may gain its first child. Linking and unlinking clones
+        # can change the expansion of all their rows.
+        for v in list(expands) + list(links) + list(relinked):
+            for node in list(self.nodes.get(v, [])):
+                if node.valid:
+                    self.sync_expansion(node)
+        self.view.viewport().update()
+            # Code may change headlines without the journal.
+    #@+node:ekr.20261019031512.20: *4* model.verify
+    def verify(self):
+        """
+        Return True if the children of all ModelNodes match the outline.
+        This catches changes to v.children that bypass the VNode methods.
+        """
+        todo = [self.root]
+        while todo:
+            node = todo.pop()
+            children = node.children
+            if children is not None:
+                if [z.v for z in children] != self.child_vnodes(node):
+                    return False
+                todo.extend(children)
+        return True
+    #@-others
+#@+node:ekr.20261019031512.21: ** class ModelNode
+class ModelNode:
+    """
+    A row of a LeoTreeModel, representing one position.
+
+    The setters mimic QTreeWidgetItem, so LeoQtTree.declutter_node and the
+    visit_tree_item hook can decorate the row.
+    """
+
+    __slots__ = (
+        'v', 'parent', 'row', 'children', 'valid', 'generation', '_real_text',
+        '_text', '_icon', '_background', '_foreground', '_font',
+    )
+
+    def __init__(self, v, parent, row):
+        self.v = v
+        self.parent = parent  # The parent ModelNode, or None for the root.
+        self.row = row  # The index of this node in parent.children.
+        self.children = None  # None until a view asks for the child rows.
+        self.valid = True
+        self.generation = -1  # See LeoTreeModel.decorate.
+        self._real_text = self._text = None
+        self._icon = self._background = self._foreground = self._font = None
+
+    def __repr__(self):
+        return f"ModelNode: {self.row} {self.v.h if self.parent else '<root>'}"
+
+    __str__ = __repr__
+
+    # QTreeWidgetItem methods...
+
+    def font(self, col):
+        return QtGui.QFont(self._font) if self._font else QtGui.QFont()
+
+    def icon(self, col):
+        return self._icon
+
+    def setBackground(self, col, brush):
+        self._background = brush
+
+    def setFont(self, col, font):
+        self._font = font
+
+    def setForeground(self, col, brush):
+        self._foreground = brush
+
+    def setIcon(self, col, icon):
+        self._icon = icon
+
+    def setText(self, col, s):
+        self._text = s
+
+    def setToolTip(self, col, s):
+        pass  # The model's tool tip is always the headline.
+
+    def text(self, col):
+        return self.v.h if self._text is None else self._text
 #@-others
 #@@language python
 #@@tabwidth -4
@@ -67,6 +67,10 @@ This plugin defines the following commands that can be bound to keys:
   you search for, say "file txt", it will search for "file*txt", matching
   e.g. @file readme.txt.
 
+  The live search runs in short time slices, so typing stays responsive
+  even in large outlines. Typing more characters searches only the
+  previous hits.
+
 - history:
   Lists nodes from c.nodeHistory.
 
@@ -89,6 +93,7 @@ from leo.core import leoNodes
     # Uses leoNodes.PosList.
 import fnmatch
 import re
+import time
 from leo.plugins import threadutil
     # Bug fix. See: https://groups.google.com/forum/?fromgroups=#!topic/leo-editor/PAZloEsuk7g
 from leo.plugins import qt_quicksearch_sub as qt_quicksearch
@@ -344,18 +349,21 @@ class LeoQuickSearchWidget(QtWidgets.QWidget):
 
         t = self.ui.lineEdit.text()
         if not t.strip():
+            self.scon.live.cancel()
             if self.scon.frozen:
                 self.scon.freeze(False)
                 self.scon.clear()
             return
         if len(t) < 3:
+            self.scon.live.cancel()
             return
         if self.scon.frozen:
             return
         if t == 'm':
+            self.scon.live.cancel()
             self.scon.doShowMarked()
             return
-        self.scon.worker.set_input(t)
+        self.scon.live.start(t.replace(" ", "*"))
     #@+node:ekr.20190210152123.1: *3* quick_w.selectAndDismiss
     def selectAndDismiss(self):
         self.hide()
@@ -369,7 +377,6 @@ class QuickSearchController:
         self.c = c
         self.lw = w = listWidget # A QListWidget.
         self.its = {} # Keys are id(w),values are tuples (p,pos)
-        self.worker = threadutil.UnitWorker()
         self.widgetUI = ui
         self.fileDirectives = ["@clean", "@file", "@asis", "@edit",
                                "@auto", "@auto-md", "@auto-org",
@@ -377,42 +384,8 @@ class QuickSearchController:
 
         self.frozen = False
         self._search_patterns = []
-
-        def searcher(inp):
-            #print("searcher", inp)
-            if self.frozen:
-                return None
-            exp = inp.replace(" ", "*")
-            res =  self.bgSearch(exp)
-            return res
-
-        def dumper():
-            # always run on ui thread
-            if self.frozen:
-                return
-            out = self.worker.output
-            #print("dumper")
-            self.throttler.add(out)
-
-        def throttledDump(lst):
-            """ dumps the last output """
-            #print "Throttled dump"
-            # we do get called with empty list on occasion
-            if not lst:
-                return
-            if self.frozen:
-                return
-            hm,bm = lst[-1]
-            self.clear()
-            self.addHeadlineMatches(hm)
-            self.addBodyMatches(bm)
-
-        self.throttler = threadutil.NowOrLater(throttledDump)
-
-        self.worker.set_worker(searcher)
-        #self.worker.set_output_f(dumper)
-        self.worker.resultReady.connect(dumper)
-        self.worker.start()
+        self.live = LiveSearch(self)
+            # The live search of the nav box.
         if 1: # Compatible with PyQt5
             # we want both single-clicks and activations (press enter)
             w.itemActivated.connect(self.onActivated)
@@ -432,6 +405,8 @@ class QuickSearchController:
     #@+node:ville.20121120225024.3636: *3* freeze
     def freeze(self, val = True):
         self.frozen = val
+        if val:
+            self.live.cancel()
 
     #@+node:vitalije.20170705203722.1: *3* addItem
     def addItem(self, it, val):
@@ -639,14 +614,7 @@ class QuickSearchController:
 
         if self.frozen:
             return None
-        if not pat.startswith('r:'):
-            hpat = fnmatch.translate('*'+ pat + '*').replace(r"\Z(?ms)","")
-            # bpat = fnmatch.translate(pat).rstrip('$').replace(r"\Z(?ms)","")
-            flags = re.IGNORECASE
-        else:
-            hpat = pat[2:]
-            # bpat = pat[2:]
-            flags = 0
+        hpat, flags = self.headline_pattern(pat)
         combo = self.widgetUI.comboBox.currentText()
         if combo == "All":
             hNodes = self.c.all_positions()
@@ -660,6 +628,16 @@ class QuickSearchController:
         # self.addBodyMatches(bm)
         return hm, []
         # self.lw.insertItem(0, "%d hits"%self.lw.count())
+    #@+node:ekr.20261018225510.1: *3* headline_pattern
+    def headline_pattern(self, pat):
+        """
+        Return (regex, flags) for a headline search for pat, a case
+        insensitive fnmatch pattern or a regex starting with 'r:'.
+        """
+        if pat.startswith('r:'):
+            return pat[2:], 0
+        hpat = fnmatch.translate('*'+ pat + '*').replace(r"\Z(?ms)","")
+        return hpat, re.IGNORECASE
     #@+node:jlunz.20150826091415.1: *3* find_h
     def find_h(self, regex, nodes, flags=re.IGNORECASE):
         """ Return list (a PosList) of all nodes where zero or more characters at
@@ -764,6 +742,156 @@ class QuickSearchController:
 
         c.bodyWantsFocusNow()
     #@-others
+#@+node:ekr.20261018225510.2: ** class LiveSearch
+class LiveSearch:
+    """
+    The live (search as you type) headline search of the nav box.
+
+    - The search runs in short time slices, so typing stays responsive.
+      Starting a new search cancels the search in progress.
+    - Hits appear in the list widget as soon as they are found.
+    - The search matches each vnode once, no matter how many clones it
+      has, and shows a hit for every position of a matching vnode.
+    - If the new query narrows the previous query, the search looks only
+      at the hits of the previous query.
+
+    Searches use c's outline snapshot: an entry is the index of a position
+    in the snapshot.
+    """
+
+    slice_time = 0.02  # The maximum duration of a time slice, in seconds.
+
+    #@+others
+    #@+node:ekr.20261018225510.3: *3* live.__init__
+    def __init__(self, scon):
+        self.scon = scon
+        self.c = scon.c
+        self.gen = None  # The generator of the search in progress.
+        self.last = None  # (query, scope, generation, entries) for the last completed search.
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.run_slice)
+        # Set by start.
+        self.entries = []  # The entries of the hits of the search in progress.
+        self.full = False  # True: the list widget is full.
+        self.generation = None  # The tree generation when the search started.
+        self.query = None
+        self.scope = None
+        self.shown = 0  # The number of entries shown in the list widget.
+        self.snapshot = None
+    #@+node:ekr.20261018225510.4: *3* live.cancel
+    def cancel(self):
+        """Cancel the search in progress, if any."""
+        self.timer.stop()
+        self.gen = None
+    #@+node:ekr.20261018225510.5: *3* live.narrows
+    def narrows(self, old, new):
+        """
+        Return True if every headline matching the query new must also match
+        the query old.
+
+        Appending characters to an fnmatch pattern narrows the pattern,
+        unless old contains an unfinished [...] class. Appending
+        characters to a regex may widen the regex.
+        """
+        return (
+            new.startswith(old) and
+            '[' not in old and
+            not old.startswith('r:')
+        )
+    #@+node:ekr.20261018225510.6: *3* live.run_slice
+    def run_slice(self):
+        """Run one time slice of the search in progress."""
+        c = self.c
+        if not self.gen:
+            self.timer.stop()
+            return
+        if c.frame.tree.generation != self.generation:
+            # The outline has changed. Start again.
+            self.last = None
+            self.start(self.query)
+            return
+        try:
+            next(self.gen)
+            done = False
+        except StopIteration:
+            done = True
+        self.show_hits()
+        if done:
+            self.cancel()
+            self.last = (self.query, self.scope, self.generation, self.entries)
+    #@+node:ekr.20261018225510.7: *3* live.search
+    def search(self, regex, entries):
+        """
+        A generator matching regex against the headlines of the given
+        entries, appending the entries of hits to self.entries. Yield after
+        each time slice.
+        """
+        vnodes = self.snapshot.vnodes
+        match = regex.match
+        hits = self.entries
+        memo = {}  # Keys are vnodes, values are True if v.h matches.
+        t1 = time.perf_counter()
+        for n, i in enumerate(entries):
+            v = vnodes[i]
+            found = memo.get(v)
+            if found is None:
+                found = memo[v] = bool(match(v.h))
+            if found:
+                hits.append(i)
+            if n % 500 == 499 and time.perf_counter() - t1 > self.slice_time:
+                yield
+                t1 = time.perf_counter()
+    #@+node:ekr.20261018225510.8: *3* live.show_hits
+    def show_hits(self):
+        """Add items for the new hits to the list widget."""
+        scon, snapshot = self.scon, self.snapshot
+        if self.full:
+            return
+        positions = [snapshot.position(i) for i in self.entries[self.shown:]]
+        self.shown = len(self.entries)
+        if positions:
+            scon.addHeadlineMatches(positions)
+            self.full = len(scon.its) > 300
+    #@+node:ekr.20261018225510.9: *3* live.start
+    def start(self, query):
+        """Start a live search for query, cancelling any search in progress."""
+        c, scon = self.c, self.scon
+        self.cancel()
+        scon.clear()
+        pattern, flags = scon.headline_pattern(query)
+        try:
+            regex = re.compile(pattern, flags)
+        except Exception:
+            return  # The user is still typing the regex.
+        snapshot = self.snapshot = c.getOutlineSnapshot()
+        # Compute the scope, a range of entries.
+        combo = scon.widgetUI.comboBox.currentText()
+        if combo == "All":
+            scope = range(len(snapshot.vnodes))
+        else:
+            i = snapshot.indexOf(c.p)
+            if i == -1:
+                scope = range(0)
+            elif combo == "Subtree":
+                scope = range(i, snapshot.ends[i])
+            else:
+                scope = range(i, i + 1)
+        # Narrow the previous hits if possible.
+        generation = c.frame.tree.generation
+        last = self.last
+        if (
+            last and last[1] == scope and last[2] == generation and
+            self.narrows(last[0], query)
+        ):
+            entries = last[3]
+        else:
+            entries = scope
+        self.entries, self.full, self.shown = [], False, 0
+        self.generation = generation
+        self.query, self.scope = query, scope
+        self.gen = self.search(regex, entries)
+        self.timer.start(0)
+    #@-others
 #@-others
 #@@language python
 #@@tabwidth -4
@@ -0,0 +1,516 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20261018171305.2: * @file ../test/leo-benchmarks.py
+"""
+Simple benchmarks for Leo's core, run via leoBridge.
+
+Usage: python leo/test/leo-benchmarks.py [name...]
+
+With no arguments, run all benchmarks.
+"""
+# pylint: disable=invalid-name
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Import stuff...
+dir_ = os.path.abspath('.')
+if dir_ not in sys.path:
+    sys.path.append(dir_)
+import leo.core.leoBridge as leoBridge
+import leo.core.leoFastRedraw as leoFastRedraw
+
+controller = leoBridge.headless_controller()
+g = controller.globals()
+temp_dir = tempfile.TemporaryDirectory()
+#@+others
+#@+node:ekr.20261018171305.3: ** make_outline
+def make_outline(n_nodes=20000, n_lines=20, seed=1):
+    """Create a new outline containing n_nodes random nodes."""
+    rng = random.Random(seed)
+    words = [
+        ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz_') for _ in range(rng.randint(2, 10)))
+        for _ in range(5000)
+    ]
+    path = os.path.join(temp_dir.name, f"bench-{n_nodes}.leo")
+    c = controller.openLeoFile(path)
+    root = c.rootPosition()
+    for i in range(n_nodes):
+        p = root.insertAsLastChild()
+        p.h = f"node {i} {rng.choice(words)}"
+        p.b = '\n'.join(
+            ' '.join(rng.choice(words) for _ in range(8))
+            for _ in range(n_lines)) + '\n'
+    c.selectPosition(root)
+    return c
+#@+node:ekr.20261018171305.4: ** timeit
+def timeit(name, func, repeat=3):
+    """Print the best time of repeat calls to func."""
+    times = []
+    for _ in range(repeat):
+        t1 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t1)
+    print(f"{name:>60}: {min(times):7.3f} sec")
+#@+node:ekr.20261018201512.16: ** bench_colorizer
+def bench_colorizer(n_lines=5000):
+    """Time the jEdit colorizer on large bodies in several languages."""
+    import glob
+    import leo.core.leoColorizer as leoColorizer
+    path = os.path.join(temp_dir.name, 'bench-colorizer.leo')
+    c = controller.openLeoFile(path)
+    root = c.rootPosition()
+
+    def make_highlighter(c):
+        colorizer = leoColorizer.JEditColorizer(c, None, c.frame.body.wrapper)
+        return leoColorizer.StringHighlighter(colorizer)
+
+    def read(pattern):
+        lines = []
+        for fn in sorted(glob.glob(os.path.join(g.app.loadDir, '..', pattern))):
+            with open(fn, encoding='utf-8', errors='replace') as f:
+                lines.extend(f.read().splitlines())
+        return '\n'.join(lines[:n_lines])
+
+    table = (
+        ('python', 'core/leoCommands.py'),
+        ('javascript', 'doc/html/_static/jquery-1.11.1.js'),
+        ('html', 'doc/html/*.html'),
+        ('rest', 'doc/sphinx-docs/*.rst'),
+    )
+    other = root.insertAsLastChild()
+    other.b = '@language python\npass\n'
+    for language, pattern in table:
+        p = root.insertAsLastChild()
+        p.b = f"@language {language}\n{read(pattern)}\n"
+        highlighter = make_highlighter(c)
+
+        def first_color(p=p):
+            c.selectPosition(p)
+            make_highlighter(c).rehighlight(p.b)
+
+        def reselect(p=p, highlighter=highlighter):
+            for p2 in (other, p):
+                c.selectPosition(p2)
+                highlighter.rehighlight(p2.b)
+
+        def edit_line(highlighter=highlighter):
+            n = len(highlighter.lines) // 2
+            line = highlighter.lines[n]
+            highlighter.setLine(n, line + '#')
+            highlighter.setLine(n, line)
+
+        reselect()
+        name = f"{language} ({len(highlighter.lines)} lines)"
+        timeit(f"{name}: color new node", first_color)
+        timeit(f"{name}: reselect node", reselect)
+        timeit(f"{name}: edit one line", edit_line)
+    # Show a huge body: color the first screenful, then color the rest at idle time.
+    huge = root.insertAsLastChild()
+    huge.b = '@language python\n' + (read(table[0][1]) + '\n') * (50000 // n_lines)
+
+    class Timer:
+        def start(self):
+            pass
+        def stop(self):
+            pass
+
+    def show_huge(background_lines):
+        c.selectPosition(huge)
+        highlighter = make_highlighter(c)
+        highlighter.colorizer.background_lines = background_lines
+        highlighter.colorizer.makeBackgroundTimer = Timer
+        highlighter.rehighlight(huge.b)
+
+    name = f"python ({huge.b.count(chr(10))} lines)"
+    timeit(f"{name}: color new node", lambda: show_huge(0))
+    timeit(f"{name}: show new node", lambda: show_huge(2000))
+    c.close()
+#@+node:ekr.20261018195310.2: ** bench_directives
+def bench_directives():
+    """Time g.fullPath and c.scanAllDirectives."""
+    c = make_tree_outline(n_nodes=20000, n_files=200)
+    positions = list(c.all_positions())
+    at_files = [p for p in positions if p.isAnyAtFileNode()]
+    for i, p in enumerate(positions[::20]):
+        p.b = f"@path dir{i}\n@language python\n@tabwidth -4\n" + p.b
+    some_positions = positions[::20]
+    at = c.atFileCommands
+
+    def full_path():
+        for p in at_files:
+            g.fullPath(c, p)
+
+    def scan_all_directives():
+        for p in some_positions:
+            c.scanAllDirectives(p)
+
+    def count(func):
+        n = c.scanAtPathDirectivesCount
+        func()
+        return c.scanAtPathDirectivesCount - n
+
+    print(f"{'@<file> nodes':>60}: {len(at_files):7}")
+    print(f"{'max level':>60}: {max(p.level() for p in positions):7}")
+    timeit('g.fullPath for all @<file> nodes', full_path)
+    timeit(f"c.scanAllDirectives for {len(some_positions)} positions", scan_all_directives)
+    timeit('findFilesToRead', lambda: at.findFilesToRead(False, c.rootPosition()))
+    timeit('findFilesToWrite', lambda: at.findFilesToWrite(False))
+    print(f"{'scanAtPathDirectives calls per g.fullPath pass':>60}: {count(full_path):7}")
+    c.close()
+#@+node:ekr.20261018212037.3: ** bench_importers
+def bench_importers(n_units=2000):
+    """Time Importer.scan_line and complete imports of large generated sources."""
+    c = controller.openLeoFile(os.path.join(temp_dir.name, 'bench-importers.leo'))
+    if not g.app.classDispatchDict:
+        g.app.loadManager.createAllImporterData()
+    c_unit = (
+        '/* Function {i}.\n'
+        '   A "block" comment. */\n'
+        'int function{i}(int a, char *s) {{\n'
+        '    // A line comment: {{ ( [\n'
+        '    char *t = "a string with \\"escapes\\" and {{";\n'
+        '    if (a > {i}) {{ return strlen(s) + a * (a - 1); }}\n'
+        '    return a[{i}] + \'}}\';\n'
+        '}}\n\n'
+    )
+    java_unit = (
+        'class Class{i} {{\n'
+        '    /** A javadoc comment. */\n'
+        '    public int method{i}(int a, String s) {{\n'
+        '        String t = "a string with \\"escapes\\" and {{"; // A comment.\n'
+        '        return s.length() + a * (a - {i});\n'
+        '    }}\n'
+        '}}\n\n'
+    )
+    python_unit = (
+        'class Class{i}:\n'
+        '    """A docstring: {{ ( ["""\n\n'
+        '    def method{i}(self, a, s=\'string\'):\n'
+        '        # A comment: ( [\n'
+        '        d = {{\'key\': [a, (s, {i})], "other": \'"\'}}\n'
+        '        return len(s) + a * (a - {i})\n\n'
+    )
+    table = (
+        ('.c', 'c', c_unit),
+        ('.java', 'java', java_unit),
+        ('.py', 'python', python_unit),
+    )
+    root = c.rootPosition()
+    for ext, name, unit in table:
+        s = ''.join(unit.format(i=i) for i in range(n_units))
+        lines = g.splitLines(s)
+        importer = g.app.classDispatchDict[ext](importCommands=c.importCommands)
+
+        def scan_lines(fast_scan, importer=importer, lines=lines):
+            importer.fast_scan = fast_scan
+            states = []
+            prev_state = importer.state_class()
+            for line in lines:
+                prev_state = importer.scan_line(line, prev_state)
+                states.append(vars(prev_state))
+            return states
+
+        def import_file(ext=ext, name=name, s=s):
+            p = root.insertAsLastChild()
+            p.h = f"@file {name}{ext}"
+            c.importCommands.createOutline(f"{name}{ext}", parent=p, ext=ext, s=s)
+            p.doDelete()
+
+        assert scan_lines(True) == scan_lines(False), name
+        prefix = f"{name} ({len(lines)} lines)"
+        timeit(f"{prefix}: scan_line", lambda: scan_lines(False))
+        timeit(f"{prefix}: scan_line, fast_scan", lambda: scan_lines(True))
+        timeit(f"{prefix}: import", import_file)
+    c.close()
+#@+node:ekr.20261018171305.5: ** bench_find
+def bench_find():
+    """Time find-all and replace-all with and without the search index."""
+    c = make_outline()
+    x = c.findCommands
+
+    class FindTabManager:
+        entry_focus = None
+
+        def getFindText(self):
+            return x.find_text
+
+    x.ftm = FindTabManager()
+    x.buttonFlag, x.was_in_headline = True, False
+    for ivar in ('ignore_case', 'mark_changes', 'mark_finds', 'node_only',
+        'pattern_match', 'reverse', 'suboutline_only', 'whole_word', 'wrap',
+    ):
+        setattr(x, ivar, False)
+    x.search_headline = x.search_body = True
+    x.change_text = 'xyzzy'
+    g.es_print = g.es = lambda *args, **keys: None
+
+    def find_all():
+        last = c.lastTopLevel()
+        x.findAll()
+        if c.lastTopLevel() != last:
+            c.lastTopLevel().doDelete()
+        c.selectPosition(c.rootPosition())
+        c.undoer.clearUndoState()
+
+    def replace_all():
+        x.changeAll()
+        while c.undoer.canUndo():
+            c.undoer.undo()
+        c.selectPosition(c.rootPosition())
+
+    table = (
+        # pattern, ignore_case, whole_word
+        ('no such word', False, False),
+        ('no such word', True, True),
+        ('node 1234 ', True, False),
+        ('abc', False, False),
+    )
+    for pattern, ignore_case, whole_word in table:
+        x.find_text = pattern
+        x.ignore_case, x.whole_word = ignore_case, whole_word
+        options = ''.join([' (ignore case)' if ignore_case else '', ' (whole word)' if whole_word else ''])
+        for use_index in (False, True):
+            x.use_search_index = use_index
+            if use_index and not x.search_index:
+                t1 = time.perf_counter()
+                x.getSearchCandidates()
+                t2 = time.perf_counter()
+                print(f"{'build index':>60}: {t2-t1:7.3f} sec")
+            suffix = 'indexed' if use_index else 'linear'
+            timeit(f"find-all {pattern!r}{options} ({suffix})", find_all)
+            timeit(f"replace-all {pattern!r}{options} ({suffix})", replace_all)
+    c.close()
+#@+node:ekr.20261018185021.3: ** bench_positions
+def bench_positions():
+    """Time full-outline traversals of a deep outline."""
+    c = make_deep_outline()
+    root = c.rootPosition()
+
+    def all_positions():
+        for p in c.all_positions():
+            pass
+
+    def all_positions_no_copy():
+        for p in c.all_positions(copy=False):
+            pass
+
+    def subtree_parents():
+        for p in root.subtree():
+            p.parent()
+
+    def level():
+        for p in c.all_positions(copy=False):
+            p.level()
+
+    print(f"{'positions':>60}: {len(list(c.all_positions())):7}")
+    timeit('all_positions', all_positions)
+    timeit('all_positions(copy=False)', all_positions_no_copy)
+    timeit('subtree & parent', subtree_parents)
+    timeit('level', level)
+    memory('list(all_positions)', lambda: list(c.all_positions()))
+    c.close()
+#@+node:ekr.20261018223102.1: ** bench_tokens
+def bench_tokens():
+    """Tokenize, parse and link leoAst.py, as orange and fstringify do."""
+    import leo.core.leoAst as leoAst
+    path = leoAst.__file__
+    encoding, contents = leoAst.read_file_with_encoding(path)
+
+    def tokenize():
+        return leoAst.make_tokens(contents)
+
+    def link():
+        tokens = leoAst.make_tokens(contents)
+        tree = leoAst.parse_ast(contents)
+        list(leoAst.TokenOrderGenerator().create_links(tokens, tree))
+        return tokens, tree
+
+    n = len(tokenize())
+    for name, func in (('tokenize', tokenize), ('tokenize, parse & link', link)):
+        times = []
+        for _ in range(3):
+            t1 = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - t1)
+        t = min(times)
+        print(f"{name + ' leoAst.py':>60}: {t:7.3f} sec {n / t:9.0f} tokens/sec")
+        memory(f"peak memory: {name}", func)
+#@+node:ekr.20261018185021.4: ** make_deep_outline
+def make_deep_outline(n_spines=10, depth=25, n_leaves=2000):
+    """
+    Create a new outline containing n_spines chains of depth nodes.
+    The last node of each chain has n_leaves children.
+    """
+    path = os.path.join(temp_dir.name, f"bench-deep-{n_spines}-{depth}-{n_leaves}.leo")
+    c = controller.openLeoFile(path)
+    root = c.rootPosition()
+    for i in range(n_spines):
+        p = root
+        for j in range(depth):
+            p = p.insertAsLastChild()
+            p.v.setHeadString(f"spine {i} level {j}")
+        for j in range(n_leaves):
+            child = p.insertAsLastChild()
+            child.v.setHeadString(f"leaf {j}")
+    c.selectPosition(root)
+    return c
+#@+node:ekr.20261018191544.10: ** bench_snapshot
+def bench_snapshot():
+    """Time full scans of a large outline."""
+    c = make_tree_outline()
+    at = c.atFileCommands
+    for p in c.all_positions():
+        p.v.expand()
+    fast_redrawer = leoFastRedraw.FastRedraw()
+
+    def all_positions():
+        for p in c.all_positions():
+            pass
+
+    def all_positions_no_copy():
+        for p in c.all_positions(copy=False):
+            pass
+
+    def all_unique_positions():
+        for p in c.all_unique_positions():
+            pass
+
+    def all_unique_nodes():
+        for v in c.all_unique_nodes():
+            pass
+
+    print(f"{'positions':>60}: {len(list(c.all_positions())):7}")
+    timeit('all_positions', all_positions)
+    timeit('all_positions(copy=False)', all_positions_no_copy)
+    timeit('all_unique_positions', all_unique_positions)
+    timeit('all_unique_nodes', all_unique_nodes)
+    timeit('findFilesToRead', lambda: at.findFilesToRead(False, c.rootPosition()))
+    timeit('findFilesToWrite', lambda: at.findFilesToWrite(False))
+    timeit('flatten_outline', lambda: fast_redrawer.flatten_outline(c))
+    snapshot = getattr(c, 'outlineSnapshot', None)
+    if snapshot:
+        timeit('snapshot.build', snapshot.build)
+        timeit('snapshot.isValid', snapshot.isValid)
+    c.close()
+#@+node:ekr.20261019013344.15: ** bench_redraw
+def bench_redraw():
+    """
+    Compare diff-based and journal-based redraw lists
+    on a large, fully expanded outline.
+    """
+    c = make_tree_outline()
+    for p in c.all_positions():
+        p.v.expand()
+    root = c.rootPosition()
+    p = root.firstChild()
+    differ = leoFastRedraw.FastRedraw()
+    journal = leoFastRedraw.FastRedraw()
+    differ.old_outline = differ.flatten_outline(c)
+    journal.start_journal(c)
+    print(f"{'visible rows':>60}: {len(differ.old_outline):7}")
+
+    def diff():
+        b = differ.flatten_outline(c)
+        differ.make_redraw_list(differ.old_outline, b)
+        differ.old_outline = b
+
+    def headline():
+        p.h = 'changed' if p.h != 'changed' else 'node'
+
+    def insert():
+        if p.hasNext() and p.next().h == 'inserted':
+            p.next().doDelete()
+        else:
+            p.insertAfter().h = 'inserted'
+
+    def expand():
+        if p.isExpanded():
+            p.contract()
+        else:
+            p.expand()
+
+    def move():
+        root.firstChild().moveToLastChildOf(root)
+
+    for name, change in (
+        ('no change', None),
+        ('headline', headline),
+        ('insert/delete', insert),
+        ('expand/contract', expand),
+        ('move', move),  # Must be last: invalidates p.
+    ):
+        for kind, redraw in (('diff', diff), ('journal', lambda: journal.redraw_from_journal(c))):
+
+            def func(change=change, redraw=redraw):
+                if change:
+                    change()
+                redraw()
+
+            func()  # Make sure both redrawers are up to date.
+            timeit(f"{kind} redraw: {name}", func)
+    c.close()
+#@+node:ekr.20261018191544.11: ** make_tree_outline
+def make_tree_outline(n_nodes=100000, n_files=100, n_clones=100, seed=1):
+    """
+    Create a new outline containing n_nodes nodes in a random tree,
+    n_files @file nodes and n_clones clones.
+    """
+    rng = random.Random(seed)
+    path = os.path.join(temp_dir.name, f"bench-tree-{n_nodes}.leo")
+    c = controller.openLeoFile(path)
+    root = c.rootPosition()
+    vnodes = [root.v]
+    for i in range(1, n_nodes):
+        parent = rng.choice(vnodes)
+        v = parent.insertAsLastChild()
+        v.setHeadString(f"@file file-{i}.py" if i % (n_nodes // n_files) == 0 else f"node {i}")
+        vnodes.append(v)
+
+    def ancestors(v):
+        result, todo = set(), [v]
+        while todo:
+            v = todo.pop()
+            if v not in result:
+                result.add(v)
+                todo.extend(v.parents)
+        return result
+
+    for i in range(n_clones):
+        v, parent = rng.choice(vnodes), rng.choice(vnodes)
+        if v not in parent.children and v not in ancestors(parent):
+            v.cloneAsNthChild(parent, len(parent.children))
+    c.selectPosition(root)
+    return c
+#@+node:ekr.20261018185021.5: ** memory
+def memory(name, func):
+    """Print the peak memory allocated while calling func."""
+    tracemalloc.start()
+    result = func()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print(f"{name:>60}: {peak / 1e6:7.1f} MB")
+#@-others
+benchmarks = {
+    'colorizer': bench_colorizer,
+    'directives': bench_directives,
+    'find': bench_find,
+    'importers': bench_importers,
+    'positions': bench_positions,
+    'redraw': bench_redraw,
+    'snapshot': bench_snapshot,
+    'tokens': bench_tokens,
+}
+names = sys.argv[1:] or list(benchmarks)
+for name in names:
+    if name in benchmarks:
+        print(f"{name}...")
+        benchmarks[name]()
+    else:
+        print(f"unknown benchmark: {name}")
+#@@language python
+#@@tabwidth -4
+#@-leo
@@ -0,0 +1,230 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20261019031512.24: * @file ../test/qt-tree-benchmark.py
+"""
+Compare the redraw latency of Leo's two Qt outline panes:
+QTreeWidget items, rebuilt by every redraw, and a lazy LeoTreeModel,
+updated from c.changeJournal.
+
+Usage: python leo/test/qt-tree-benchmark.py [n_nodes]
+
+Uses Qt's offscreen platform unless QT_QPA_PLATFORM is set. After each
+change, the script checks that the rows of the model's view match the
+flattened outline.
+
+TestFastRedraw.test_qt_tree_model in leoFastRedraw.py imports this
+script and runs check_random_changes.
+"""
+# pylint: disable=invalid-name
+import os
+import random
+import sys
+import time
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+# Import stuff...
+dir_ = os.path.abspath('.')
+if dir_ not in sys.path:
+    sys.path.append(dir_)
+import leo.core.leoQt as leoQt
+    # Import Qt *before* leoBridge: leoQt refuses to import Qt in the bridge.
+import leo.core.leoBridge as leoBridge
+import leo.core.leoFastRedraw as leoFastRedraw
+QtCore, QtWidgets = leoQt.QtCore, leoQt.QtWidgets
+if not QtWidgets:
+    print('qt-tree-benchmark.py: can not import PyQt5')
+    sys.exit(1)
+import leo.plugins.qt_tree as qt_tree
+
+qtApp = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+controller = leoBridge.headless_controller()
+g = controller.globals()
+#@+others
+#@+node:ekr.20261019031512.25: ** make_outline
+def make_outline(n_nodes, seed=1):
+    """Create a new, fully expanded outline containing n_nodes nodes in a random tree."""
+    import tempfile
+    rng = random.Random(seed)
+    temp_dir = tempfile.mkdtemp()
+    c = controller.openLeoFile(os.path.join(temp_dir, 'qt-tree-benchmark.leo'))
+    root = c.rootPosition()
+    vnodes = [root.v]
+    for i in range(1, n_nodes):
+        v = rng.choice(vnodes).insertAsLastChild()
+        v.setHeadString(f"node {i}")
+        vnodes.append(v)
+    for v in vnodes:
+        v.expand()
+    c.selectPosition(root)
+    return c
+#@+node:ekr.20261019031512.26: ** draw_items
+def draw_items(c, w):
+    """Rebuild w, a QTreeWidget, as LeoQtTree.full_redraw does, without icons."""
+
+    def draw_node(p, parent_item):
+        item = QtWidgets.QTreeWidgetItem(parent_item or w)
+        item.setFlags(item.flags() | QtCore.Qt.ItemIsEditable | item.DontShowIndicatorWhenChildless)
+        item.setText(0, p.h)
+        item.setToolTip(0, p.h)
+        return item
+
+    def draw_tree(p, parent_item=None):
+        item = draw_node(p, parent_item)
+        if p.hasChildren():
+            if p.isExpanded():
+                w.expandItem(item)
+                for child in p.children():
+                    draw_tree(child, item)
+            else:
+                for child in p.children():
+                    draw_node(child, item)
+                w.collapseItem(item)
+
+    w.clear()
+    p = c.rootPosition()
+    while p:
+        draw_tree(p)
+        p.moveToNext()
+#@+node:ekr.20261019031512.27: ** check_rows
+def check_rows(c, view, model):
+    """Check that the visible rows of view match the flattened outline."""
+    expected = leoFastRedraw.FastRedraw().flatten_outline(c)
+    rows = []
+    index = model.index(0, 0)
+    while index.isValid():
+        node = index.internalPointer()
+        level, parent = 0, node.parent
+        while parent is not model.root:
+            level, parent = level + 1, parent.parent
+        rows.append(f"{level}:{node.v.gnx}:{node.v.h}\n")
+        index = view.indexBelow(index)
+    assert rows == expected, (len(rows), len(expected))
+#@+node:ekr.20261019031512.29: ** check_random_changes
+def check_random_changes(n_changes=300, seed=2):
+    """Check the model's rows after random changes to a small outline."""
+    rng = random.Random(seed)
+    c = make_outline(100, seed=seed)
+    view = QtWidgets.QTreeView()
+    model = qt_tree.LeoTreeModel(c, view)
+    view.setModel(model)
+    model.reset_model()
+    check_rows(c, view, model)
+    for i in range(n_changes):
+        positions = list(c.all_positions())
+        p = rng.choice(positions)
+        kinds = ['expand', 'head']
+        if p.parent() or p.hasBack() or p.hasNext():
+            kinds.extend(['delete', 'move', 'move-up'])
+        if len(positions) < 300:
+            kinds.extend(['insert', 'clone'])
+        kind = rng.choice(kinds)
+        if kind == 'insert':
+            p.insertAfter().h = f"inserted {i}"
+        elif kind == 'delete':
+            p.doDelete()
+        elif kind == 'move':
+            parent = rng.choice(positions)
+            # Don't create a cycle.
+            seen, todo = set(), [parent.v]
+            while todo:
+                v = todo.pop()
+                if v not in seen:
+                    seen.add(v)
+                    todo.extend(v.parents)
+            if p.v not in seen:
+                p.moveToNthChildOf(parent, rng.randint(0, parent.numberOfChildren()))
+        elif kind == 'move-up':
+            parent, n = p.parent(), p.childIndex()
+            if parent and n > 0:
+                p.moveToNthChildOf(parent, n - 1)
+        elif kind == 'clone':
+            p.clone()
+        elif kind == 'expand':
+            if p.isExpanded():
+                p.contract()
+            else:
+                p.expand()
+        else:
+            p.h = p.h + '!'
+        model.update_model()
+        check_rows(c, view, model)
+    print(f"{'random changes':>40}: {n_changes:7} ok")
+#@+node:ekr.20261019031512.28: ** main
+def main(n_nodes):
+    c = make_outline(n_nodes)
+    root = c.rootPosition()
+    widget = QtWidgets.QTreeWidget()
+    view = QtWidgets.QTreeView()
+    view.setUniformRowHeights(True)
+    model = qt_tree.LeoTreeModel(c, view)
+    view.setModel(model)
+    for w in (widget, view):
+        w.resize(400, 800)
+        w.show()
+
+    def paint(w):
+        w.viewport().repaint()
+        qtApp.processEvents()
+
+    def headline():
+        p = root.firstChild()
+        p.h = 'changed' if p.h != 'changed' else 'node'
+
+    def insert():
+        p = root.firstChild()
+        if p.hasNext() and p.next().h == 'inserted':
+            p.next().doDelete()
+        else:
+            p.insertAfter().h = 'inserted'
+
+    def expand():
+        p = root.firstChild()
+        if p.isExpanded():
+            p.contract()
+        else:
+            p.expand()
+
+    def move_up():
+        p = root.lastChild()
+        p.moveToNthChildOf(root, p.childIndex() - 1)
+
+    def move_subtree():
+        # The first node's subtree holds about half the outline.
+        root.firstChild().moveToLastChildOf(root)
+
+    def widget_redraw():
+        draw_items(c, widget)
+        paint(widget)
+
+    def model_redraw():
+        model.update_model()
+        paint(view)
+
+    print(f"{'visible rows':>40}: {len(leoFastRedraw.FastRedraw().flatten_outline(c)):7}")
+    for name, change in (
+        ('full redraw', None),
+        ('headline', headline),
+        ('insert/delete', insert),
+        ('expand/contract', expand),
+        ('move up', move_up),
+        ('move big subtree', move_subtree),
+    ):
+        for kind, redraw in (('QTreeWidget', widget_redraw), ('LeoTreeModel', model_redraw)):
+            times = []
+            for i in range(3):
+                if change:
+                    change()
+                elif kind == 'LeoTreeModel':
+                    c.changeJournal = None  # Force a reset.
+                t1 = time.perf_counter()
+                redraw()
+                times.append(time.perf_counter() - t1)
+                if kind == 'LeoTreeModel':
+                    check_rows(c, view, model)
+            print(f"{kind + ': ' + name:>40}: {min(times):7.3f} sec")
+#@-others
+if __name__ == '__main__':
+    check_random_changes()
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
+#@@language python
+#@@tabwidth -4
+#@-leo